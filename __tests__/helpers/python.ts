@@ -0,0 +1,37 @@
+import { spawnSync } from 'child_process'
+import path from 'path'
+
+/**
+ * Python ワーカーを使うテストの共通処理
+ * worker ディレクトリで実行し、結果キャッシュ・メトリクスは使わない（毎回実際に解析する）
+ */
+export const WORKER_DIR = path.join(__dirname, '../../worker')
+export const PYTHON = process.env.PYTHON_BIN || 'python3'
+
+export function runPython(args: string[], options: { timeout?: number, env?: NodeJS.ProcessEnv } = {}) {
+  return spawnSync(PYTHON, args, {
+    cwd: WORKER_DIR, encoding: 'utf-8', timeout: options.timeout ?? 300000,
+    env: { ...process.env, MIXAI_RESULT_CACHE_DIR: 'off', MIXAI_WORKER_METRICS_FILE: 'off', ...options.env }
+  })
+}
+
+/**
+ * Python コード（行の配列）を実行し、標準出力の最終行を JSON として返す
+ * args は sys.argv[1:] として渡す
+ */
+export function evalPython(lines: string[], args: string[] = []) {
+  const result = runPython(['-c', lines.join('\n'), ...args])
+  if (result.status !== 0) {
+    throw new Error(`python exited with ${result.status}: ${result.stderr}`)
+  }
+  return JSON.parse(result.stdout.trim().split('\n').pop() as string)
+}
+
+export function hasModules(names: string[]) {
+  const code = `import importlib.util, sys; sys.exit(0 if all(importlib.util.find_spec(m) for m in ${JSON.stringify(names)}) else 1)`
+  return runPython(['-c', code]).status === 0
+}
+
+// 解析系の依存が揃っている環境でのみ実行する
+export const pythonReady = hasModules(['numpy', 'scipy', 'librosa', 'soundfile'])
+export const describeIfPython = pythonReady ? describe : describe.skip
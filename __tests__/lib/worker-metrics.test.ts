@@ -0,0 +1,106 @@
+import { bucketQuantile, renderWorkerMetrics } from '@/lib/worker-metrics'
+import type { WorkerMetricsFile } from '@/lib/worker-metrics'
+
+const NOW_MS = 1_700_000_000_000
+const SLOT = Math.floor(NOW_MS / 1000 / 300)
+
+function fixture(): WorkerMetricsFile {
+  const labels = { script: 'advanced-analysis', mode: 'analysis', plan: 'standard' }
+  return {
+    version: 1,
+    updated_at: NOW_MS / 1000,
+    window_slot_seconds: 300,
+    window_slots: 12,
+    series: {
+      a: {
+        type: 'histogram',
+        name: 'stage_seconds',
+        labels: { ...labels, stage: 'tempo' },
+        buckets: [1, 5, 10],
+        counts: [1, 2, 1, 0],
+        sum: 14,
+        count: 4,
+        window: [
+          { slot: SLOT - 20, counts: [1, 0, 0, 0], sum: 0.5, count: 1 },  // ウィンドウ外
+          { slot: SLOT, counts: [0, 2, 1, 0], sum: 13.5, count: 3 },
+        ],
+      },
+      b: {
+        type: 'counter',
+        name: 'runs_total',
+        labels: { ...labels, status: 'ok' },
+        value: 4,
+        window: [{ slot: SLOT, value: 3 }],
+      },
+      c: {
+        type: 'histogram',
+        name: 'stage_seconds',
+        labels: { ...labels, stage: 'pitch' },
+        buckets: [1, 5, 10],
+        counts: [2, 0, 0, 0],
+        sum: 1,
+        count: 2,
+        window: [{ slot: SLOT, counts: [2, 0, 0, 0], sum: 1, count: 2 }],
+      },
+      d: {
+        type: 'counter',
+        name: 'cache_total',
+        labels: { ...labels, cache: 'checkpoint', result: 'hit' },
+        value: 1,
+        window: [{ slot: SLOT, value: 1 }],
+      },
+      e: {
+        type: 'counter',
+        name: 'cache_total',
+        labels: { ...labels, cache: 'checkpoint', result: 'miss' },
+        value: 3,
+        window: [{ slot: SLOT, value: 3 }],
+      },
+    },
+  }
+}
+
+describe('lib/worker-metrics', () => {
+  it('累積ヒストグラムをPrometheus形式で出力する', () => {
+    const text = renderWorkerMetrics(fixture(), NOW_MS)
+    expect(text).toContain('# TYPE mixai_worker_stage_seconds histogram')
+    expect(text).toContain('mixai_worker_stage_seconds_bucket{script="advanced-analysis",mode="analysis",plan="standard",stage="tempo",le="5"} 3')
+    expect(text).toContain('mixai_worker_stage_seconds_bucket{script="advanced-analysis",mode="analysis",plan="standard",stage="tempo",le="+Inf"} 4')
+    expect(text).toContain('mixai_worker_stage_seconds_count{script="advanced-analysis",mode="analysis",plan="standard",stage="tempo"} 4')
+    expect(text).toContain('mixai_worker_runs_total{script="advanced-analysis",mode="analysis",plan="standard",status="ok"} 4')
+  })
+
+  it('同じメトリクスの行はまとめて出力する', () => {
+    const lines = renderWorkerMetrics(fixture(), NOW_MS).split('\n')
+    const stageLines = lines
+      .map((line, i) => (/^mixai_worker_stage_seconds_(bucket|sum|count)\{/.test(line) ? i : -1))
+      .filter(i => i >= 0)
+    expect(stageLines[stageLines.length - 1] - stageLines[0]).toBe(stageLines.length - 1)
+    expect(lines.filter(line => line === '# TYPE mixai_worker_stage_seconds histogram')).toHaveLength(1)
+  })
+
+  it('直近ウィンドウの件数とキャッシュヒット率を出力する', () => {
+    const text = renderWorkerMetrics(fixture(), NOW_MS)
+    expect(text).toContain('mixai_worker_stage_seconds_window_count{script="advanced-analysis",mode="analysis",plan="standard",stage="tempo"} 3')
+    expect(text).toContain('mixai_worker_cache_hit_ratio_window{script="advanced-analysis",mode="analysis",plan="standard",cache="checkpoint"} 0.25')
+  })
+
+  it('データがなければ何も出力しない', () => {
+    expect(renderWorkerMetrics(null)).toBe('')
+  })
+
+  describe('bucketQuantile', () => {
+    it('バケット内を線形補間する', () => {
+      expect(bucketQuantile(0.5, [1, 5, 10], [0, 2, 0, 0])).toBe(3)
+      expect(bucketQuantile(1, [1, 5, 10], [0, 2, 0, 0])).toBe(5)
+    })
+
+    it('+Inf バケットは最大の上限を返す', () => {
+      expect(bucketQuantile(0.99, [1, 5, 10], [0, 0, 0, 3])).toBe(10)
+    })
+
+    it('観測がなければ null', () => {
+      expect(bucketQuantile(0.5, [1, 5], [0, 0, 0])).toBeNull()
+    })
+  })
+})
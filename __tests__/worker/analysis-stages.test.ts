@@ -0,0 +1,80 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython, runPython } from '../helpers/python'
+
+describeIfPython('advanced-analysis.py --stages（ステージ選択）', () => {
+  jest.setTimeout(300000)
+
+  let dir: string
+  let paths: { vocal: string, inst: string }
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-stages-'))
+    const code = [
+      'import json, sys',
+      'from bench_fixtures import make_fixture, write_fixture',
+      'print(json.dumps(write_fixture(make_fixture(10.0, offset_ms=120, gap_jitter=0.3, seed=0), sys.argv[1])))'
+    ].join('\n')
+    const result = runPython(['-c', code, dir])
+    expect(result.status).toBe(0)
+    paths = JSON.parse(result.stdout)
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  function analyze(args: string[]) {
+    const result = runPython(['advanced-analysis.py', '--vocal', paths.vocal, ...args])
+    expect(result.status).toBe(0)
+    return JSON.parse(result.stdout)
+  }
+
+  it('指定を実行順に並べ、依存ステージを加え、未知のステージは拒否する', () => {
+    const result = evalPython([
+      'import json',
+      'from bench_fixtures import load_script',
+      'analysis = load_script("advanced-analysis.py")',
+      'parsed = [list(analysis.parse_stages(v)) for v in ("pitch,offset", " Tempo ", "", "all")]',
+      'analysis.STAGE_DEPENDENCIES["pitch"] = ("offset",)',
+      'parsed.append(list(analysis.parse_stages("pitch")))',
+      'try:',
+      '    analysis.parse_stages("tempo,bogus")',
+      '    error = None',
+      'except ValueError as e:',
+      '    error = str(e)',
+      'print(json.dumps({"parsed": parsed, "error": error}))'
+    ])
+    expect(result.parsed).toEqual([
+      ['offset', 'pitch'], ['tempo'], ['offset', 'tempo', 'pitch'], ['offset', 'tempo', 'pitch'], ['offset', 'pitch']
+    ])
+    expect(result.error).toContain('bogus')
+
+    const invalid = runPython(['advanced-analysis.py', '--vocal', paths.vocal, '--inst', paths.inst, '--stages', 'bogus'])
+    expect(invalid.status).toBe(2)
+  })
+
+  it('pitch だけなら伴奏なしで実行でき、伴奏をデコードせず他ステージの結果も返さない', () => {
+    const result = analyze(['--stages', 'pitch'])
+    expect(result.stages).toEqual(['pitch'])
+    expect(result.pitch).toBeDefined()
+    expect(result.offset).toBeUndefined()
+    expect(result.tempo).toBeUndefined()
+    expect(Object.keys(result.timings.stages)).toEqual(['decode_vocal', 'pitch'])
+
+    const missingInst = runPython(['advanced-analysis.py', '--vocal', paths.vocal, '--stages', 'tempo'])
+    expect(missingInst.status).toBe(2)
+    expect(missingInst.stderr).toContain('--inst is required')
+  })
+
+  it('選択したステージの結果は全ステージ実行時の結果と一致する', () => {
+    const full = analyze(['--inst', paths.inst])
+    const offset = analyze(['--inst', paths.inst, '--stages', 'offset'])
+    const pitch = analyze(['--stages', 'pitch'])
+    expect(full.stages).toEqual(['offset', 'tempo', 'pitch'])
+    expect(offset.offset).toEqual(full.offset)
+    expect(offset.timings.stages.tempo).toBeUndefined()
+    expect(pitch.pitch).toEqual(full.pitch)
+  })
+})
@@ -0,0 +1,74 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython } from '../helpers/python'
+
+// 220Hz の正弦波 + ピンクノイズ（-3dB/oct）の20秒信号
+const SIGNAL = [
+  'import numpy as np',
+  'sr = 44100',
+  'n = 20 * sr',
+  'rng = np.random.default_rng(1)',
+  'spectrum = np.fft.rfft(rng.standard_normal(n))',
+  'freqs = np.fft.rfftfreq(n, 1 / sr)',
+  'spectrum[0] = 0',
+  'spectrum[1:] /= np.sqrt(freqs[1:])',
+  'pink = np.fft.irfft(spectrum, n)',
+  'pink = (0.1 * pink / pink.std()).astype(np.float32)',
+  't = np.arange(n) / sr',
+  'y = (pink + 0.2 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)'
+]
+
+describeIfPython('band_analyzer（ストリーミング帯域エネルギー解析）', () => {
+  jest.setTimeout(120000)
+
+  let dir: string
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-band-analyzer-'))
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  it('帯域平均振幅は従来の librosa.stft マスク平均と一致し、ブロック分割・ファイル入力でも変わらない', () => {
+    const result = evalPython([
+      ...SIGNAL,
+      'import json, sys, librosa, soundfile as sf',
+      'from band_analyzer import TONAL_BANDS, analyze_bands, analyze_bands_file',
+      'magnitude = np.abs(librosa.stft(y))',
+      'stft_freqs = librosa.fft_frequencies(sr=sr)',
+      'baseline = {name: float(magnitude[(stft_freqs >= lo) & (stft_freqs <= hi)].mean())',
+      '            for name, (lo, hi) in TONAL_BANDS.items()}',
+      'path = sys.argv[1] + "/stereo.wav"',
+      'sf.write(path, np.stack([y, y], axis=1), sr, subtype="FLOAT")',
+      'print(json.dumps({',
+      "    'baseline': baseline,",
+      "    'whole': analyze_bands(y, sr).band_means(),",
+      "    'blocks': analyze_bands(y, sr, block_size=10007).band_means(),",
+      "    'file': analyze_bands_file(path, block_seconds=3.3).band_means(),",
+      '}))'
+    ], [dir])
+    for (const band of ['low', 'mid', 'high']) {
+      expect(Math.abs(result.whole[band] / result.baseline[band] - 1)).toBeLessThan(0.01)
+      expect(Math.abs(result.blocks[band] / result.whole[band] - 1)).toBeLessThan(1e-6)
+      expect(Math.abs(result.file[band] / result.whole[band] - 1)).toBeLessThan(1e-6)
+    }
+  })
+
+  it('1/3オクターブ傾斜はピンクノイズで約 -3dB/oct、ホワイトノイズで約 0dB/oct', () => {
+    const tilt = evalPython([
+      ...SIGNAL,
+      'import json',
+      'from band_analyzer import analyze_bands',
+      'white = (0.1 * rng.standard_normal(n)).astype(np.float32)',
+      'print(json.dumps({',
+      "    'pink': analyze_bands(pink, sr).spectral_tilt()['tilt_db_per_octave'],",
+      "    'white': analyze_bands(white, sr).spectral_tilt()['tilt_db_per_octave'],",
+      '}))'
+    ])
+    expect(Math.abs(tilt.pink + 3.0)).toBeLessThan(0.3)
+    expect(Math.abs(tilt.white)).toBeLessThan(0.3)
+  })
+})
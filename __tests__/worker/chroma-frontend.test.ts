@@ -0,0 +1,113 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython, runPython } from '../helpers/python'
+
+describeIfPython('chroma_frontend（DTW用クロマ・カーネルキャッシュ）', () => {
+  jest.setTimeout(300000)
+
+  let dir: string
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-chroma-'))
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  it('カーネルはプロセス内ではメモリから、別プロセスではディスクから再構築せずに読み込む', () => {
+    const code = [
+      'import json, os, sys, numpy as np',
+      'import chroma_frontend as cf',
+      'def fail(**config):',
+      '    raise AssertionError("rebuilt")',
+      'config = dict(sr=cf.CHROMA_SR, n_fft=cf.CQT_N_FFT, bins=cf.CQT_BINS, fmin=round(cf.CQT_FMIN, 3))',
+      'if sys.argv[1] == "build":',
+      '    kernel = cf.cached_kernel("cqt", cf.build_cqt_kernel, **config)',
+      '    same = cf.cached_kernel("cqt", fail, **config) is kernel',
+      'else:',
+      '    kernel = cf.cached_kernel("cqt", fail, **config)',
+      '    same = True',
+      'expected = cf.build_cqt_kernel(**config)',
+      'print(json.dumps({"same": same, "equal": bool(np.array_equal(kernel, expected)),',
+      '                  "files": sorted(os.listdir(sys.argv[2]))}))'
+    ].join('\n')
+    const run = (mode: string, cacheDir: string) => {
+      const result = runPython(['-c', code, mode, cacheDir], { env: { MIXAI_KERNEL_CACHE_DIR: cacheDir } })
+      expect(result.status).toBe(0)
+      return JSON.parse(result.stdout)
+    }
+
+    const cacheDir = path.join(dir, 'kernels')
+    const built = run('build', cacheDir)
+    expect(built.same).toBe(true)
+    expect(built.equal).toBe(true)
+    expect(built.files.length).toBe(1)
+    const loaded = run('load', cacheDir)
+    expect(loaded.equal).toBe(true)
+    expect(loaded.files).toEqual(built.files)
+
+    const offDir = path.join(dir, 'off')
+    fs.mkdirSync(offDir)
+    const off = runPython(['-c', code, 'build', offDir], { env: { MIXAI_KERNEL_CACHE_DIR: 'off' } })
+    expect(off.status).toBe(0)
+    expect(fs.readdirSync(offDir)).toEqual([])
+  })
+
+  it('stft クロマは librosa.feature.chroma_stft と一致する', () => {
+    const similarity = evalPython([
+      'import json, librosa, numpy as np',
+      'from bench_fixtures import make_fixture',
+      'from chroma_frontend import BASE_HOP, STFT_N_FFT, chroma_features, decimate',
+      'fx = make_fixture(10.0, seed=2)',
+      'ours, _ = chroma_features(fx["vocal"], fx["sr"], "stft")',
+      'y, sr = decimate(fx["vocal"], fx["sr"])',
+      'ref = librosa.feature.chroma_stft(y=y, sr=sr, n_fft=STFT_N_FFT, hop_length=BASE_HOP)',
+      'n = min(ours.shape[1], ref.shape[1])',
+      'a, b = ours[:, :n], ref[:, :n]',
+      'norms = np.linalg.norm(a, axis=0) * np.linalg.norm(b, axis=0)',
+      'voiced = norms > 1e-6',
+      'print(json.dumps({"frames": [ours.shape[1], ref.shape[1]],',
+      '                  "cosine": float(np.mean(np.sum(a * b, axis=0)[voiced] / norms[voiced]))}))'
+    ])
+    expect(similarity.frames[0]).toBe(similarity.frames[1])
+    expect(similarity.cosine).toBeGreaterThan(0.999)
+  })
+
+  it('テンポが揺れる素材の DTW 時間マップは従来の librosa.chroma_cqt（44.1kHz・hop 512）と同等の精度', () => {
+    const errors = evalPython([
+      'import json, librosa, numpy as np',
+      'from bench_fixtures import load_script, make_fixture',
+      'from chroma_frontend import chroma_features',
+      'analysis = load_script("advanced-analysis.py")',
+      'fx = make_fixture(30.0, offset_ms=120, tempo_ratio=1.06, seed=2)',
+      'sr, truth, max_frames = fx["sr"], fx["truth"], 250',
+      '',
+      'def baseline(y):',
+      '    # 従来の特徴量を同じフレーム数まで平均プーリング',
+      '    chroma = librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=512)',
+      '    starts = np.arange(0, chroma.shape[1], int(np.ceil(chroma.shape[1] / max_frames)))',
+      '    pooled = np.add.reduceat(chroma, starts, axis=1) / np.diff(np.append(starts, chroma.shape[1]))',
+      '    return pooled / (pooled.max(axis=0, keepdims=True) + 1e-9), starts * 512 / sr',
+      '',
+      'def time_map_error(vocal, inst):',
+      '    (cv, tv), (ci, ti) = vocal, inst',
+      '    n = min(cv.shape[1], ci.shape[1])',
+      '    path, _ = analysis.banded_dtw(cv[:, :n], ci[:, :n])',
+      '    offset = truth["offset_ms"] / 1000',
+      '    errors = [abs(ti[j] - (tv[i] - offset) / truth["tempo_ratio"]) for i, j in path',
+      '              if offset < tv[i] < fx["duration"] - 1.0]',
+      '    return float(np.median(errors))',
+      '',
+      'result = {"librosa": time_map_error(baseline(fx["vocal"]), baseline(fx["inst"]))}',
+      'for method in ("cqt", "stft"):',
+      '    result[method] = time_map_error(chroma_features(fx["vocal"], sr, method, max_frames),',
+      '                                    chroma_features(fx["inst"], sr, method, max_frames))',
+      'print(json.dumps(result))'
+    ])
+    expect(errors.librosa).toBeLessThan(0.1)
+    expect(errors.cqt).toBeLessThanOrEqual(errors.librosa + 0.03)
+    expect(errors.stft).toBeLessThanOrEqual(errors.librosa + 0.03)
+  })
+})
@@ -0,0 +1,63 @@
+import { describeIfPython, evalPython } from '../helpers/python'
+
+describeIfPython('filter_chain（バイクアッド設計キャッシュ + SOSカスケード）', () => {
+  jest.setTimeout(120000)
+
+  it('同じ設定の設計はキャッシュから同じ読み取り専用の係数を返す', () => {
+    const result = evalPython([
+      'import json',
+      'from filter_chain import design_section',
+      'design_section.cache_clear()',
+      "a = design_section('peaking', 2500.0, 1.0, 44100, -0.5)",
+      "b = design_section('peaking', 2500.0, 1.0, 44100, -0.5)",
+      'info = design_section.cache_info()',
+      'print(json.dumps({"same": a is b, "writeable": bool(a.flags.writeable), "hits": info.hits, "misses": info.misses}))'
+    ])
+    expect(result).toEqual({ same: true, writeable: false, hits: 1, misses: 1 })
+  })
+
+  it('設計したセクションの周波数特性が指定どおりになる', () => {
+    const gains = evalPython([
+      'import json, numpy as np',
+      'from scipy import signal',
+      'from filter_chain import design_section',
+      'sr = 44100',
+      'def gain_db(sos, freq):',
+      '    _, h = signal.sosfreqz(sos.reshape(1, 6), worN=[freq], fs=sr)',
+      '    return float(20 * np.log10(abs(h[0])))',
+      'print(json.dumps({',
+      "    'peaking': gain_db(design_section('peaking', 2500.0, 1.0, sr, -6.0), 2500.0),",
+      "    'lowpass': gain_db(design_section('lowpass', 6000.0, 0.7071, sr), 6000.0),",
+      "    'highpass_pass': gain_db(design_section('highpass', 150.0, 0.7071, sr), 5000.0),",
+      "    'lowshelf_dc': gain_db(design_section('lowshelf', 200.0, 0.7071, sr, 4.0), 1.0),",
+      '}))'
+    ])
+    expect(gains.peaking).toBeCloseTo(-6.0, 3)
+    expect(gains.lowpass).toBeCloseTo(-3.01, 1)
+    expect(Math.abs(gains.highpass_pass)).toBeLessThan(0.01)
+    expect(gains.lowshelf_dc).toBeCloseTo(4.0, 2)
+  })
+
+  it('ハモリEQのチェーンはブロック分割しても各セクションを順に掛けた結果と一致する', () => {
+    const result = evalPython([
+      'import json, numpy as np',
+      'from scipy import signal',
+      'from bench_fixtures import load_script',
+      "harmony = load_script('harmony-generator.py')",
+      'sr = 44100',
+      'rng = np.random.default_rng(0)',
+      'audio = (0.3 * rng.standard_normal(3 * sr)).astype(np.float32)',
+      "chain = harmony.build_harmony_eq_chain(sr, 'down_m3')",
+      'out = chain.process(audio.copy(), block_size=1000)',
+      'expected = audio.astype(np.float64)',
+      'for row in chain.sos.astype(np.float64):',
+      '    expected = signal.lfilter(row[:3], row[3:], expected)',
+      'expected *= chain.gain',
+      'print(json.dumps({"sections": len(chain), "dtype": str(out.dtype),',
+      '                  "max_error": float(np.max(np.abs(out - expected)))}))'
+    ])
+    expect(result.sections).toBe(3)
+    expect(result.dtype).toBe('float32')
+    expect(result.max_error).toBeLessThan(1e-4)
+  })
+})
@@ -0,0 +1,91 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython, hasModules, runPython } from '../helpers/python'
+
+// F0推定（WORLD）は pyworld がある環境でのみ行われる
+const hasWorld = hasModules(['pyworld'])
+
+describeIfPython('harmony-generator --lazy / --analysis', () => {
+  jest.setTimeout(600000)
+
+  let dir: string
+  let vocalPath: string
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-harmony-lazy-'))
+    const code = [
+      'import json, sys',
+      'from bench_fixtures import make_fixture, write_fixture',
+      'print(json.dumps(write_fixture(make_fixture(20.0, seed=6), sys.argv[1])))'
+    ].join('\n')
+    const result = runPython(['-c', code, dir])
+    expect(result.status).toBe(0)
+    vocalPath = JSON.parse(result.stdout).vocal
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  function harmony(outputDir: string, args: string[]) {
+    const result = runPython(['harmony-generator.py', '--vocal', vocalPath, '--output-dir', outputDir,
+      '--detect-regions', ...args])
+    expect(result.status).toBe(0)
+    return JSON.parse(result.stdout)
+  }
+
+  // 区間検出と WORLD の F0 推定（DIO）の呼び出し回数を数えながら実行する
+  function countCalls(outputDir: string, args: string[]) {
+    return evalPython([
+      'import json, runpy, sys',
+      'import vad',
+      "calls = {'vad': 0, 'dio': 0}",
+      'def counted(name, fn):',
+      '    def wrapper(*a, **k):',
+      '        calls[name] += 1',
+      '        return fn(*a, **k)',
+      '    return wrapper',
+      "vad.detect_vocal_regions = counted('vad', vad.detect_vocal_regions)",
+      'try:',
+      '    import pyworld',
+      "    pyworld.dio = counted('dio', pyworld.dio)",
+      'except ImportError:',
+      '    pass',
+      "sys.argv = ['harmony-generator.py', '--vocal', sys.argv[1], '--output-dir', sys.argv[2], '--detect-regions',",
+      '            *sys.argv[3:]]',
+      'try:',
+      "    runpy.run_path('harmony-generator.py', run_name='__main__')",
+      'except SystemExit as e:',
+      '    if e.code:',
+      '        raise',
+      'print()',
+      'print(json.dumps(calls))'
+    ], [vocalPath, outputDir, ...args])
+  }
+
+  it('--lazy は共通解析と全タイプのプレビューだけを書き、--analysis は区間検出・F0推定を省いて全長を生成する', () => {
+    const lazyDir = path.join(dir, 'lazy')
+    const lazy = harmony(lazyDir, ['--harmony-type', 'all', '--lazy'])
+    expect(fs.existsSync(lazy.analysis_file)).toBe(true)
+    for (const type of ['up_m3', 'down_m3', 'perfect_5th']) {
+      expect(fs.existsSync(lazy.harmonies[type].preview_file)).toBe(true)
+      expect(fs.existsSync(path.join(lazyDir, `harmony_${type}.wav`))).toBe(false)
+    }
+
+    const reused = harmony(lazyDir, ['--harmony-type', 'up_m3', '--analysis', lazy.analysis_file])
+    expect(reused.analysis_reused).toBe(true)
+    expect(fs.existsSync(reused.file)).toBe(true)
+    expect(reused.vocal_regions).toEqual(lazy.vocal_regions)
+    expect(reused.timings.stages.vad).toBeUndefined()
+
+    // 共通解析を使えば区間検出も F0 推定も呼ばれない（なければ両方とも行う）
+    const reusedCalls = countCalls(lazyDir, ['--harmony-type', 'up_m3', '--analysis', lazy.analysis_file])
+    expect(reusedCalls).toEqual({ vad: 0, dio: 0 })
+    const freshCalls = countCalls(path.join(dir, 'fresh'), ['--harmony-type', 'up_m3'])
+    expect(freshCalls.vad).toBe(1)
+    if (hasWorld) {
+      expect(freshCalls.dio).toBeGreaterThan(0)
+    }
+  })
+})
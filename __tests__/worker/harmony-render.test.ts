@@ -0,0 +1,80 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython } from '../helpers/python'
+
+// render_all_harmonies を生成・書き出しだけ差し替えて実行する（書き出しは 0.5 秒かかり、同時実行数を数える）
+const SETUP = [
+  'import json, sys, threading, time, numpy as np',
+  'from bench_fixtures import load_script',
+  'from progress import Cancelled, ProgressReporter',
+  "hg = load_script('harmony-generator.py')",
+  'out_dir = sys.argv[1]',
+  'lock = threading.Lock()',
+  "state = {'active': 0, 'max_active': 0, 'written': []}",
+  'def slow_write(path, audio, sr, fmt=None):',
+  '    with lock:',
+  "        state['active'] += 1",
+  "        state['max_active'] = max(state['max_active'], state['active'])",
+  '    time.sleep(0.5)',
+  "    open(path, 'wb').close()",
+  '    with lock:',
+  "        state['active'] -= 1",
+  "        state['written'].append(path)",
+  '    return path',
+  'hg.write_audio = slow_write',
+  'hg.shared_f0 = lambda *args, **kwargs: None',
+  'hg.generate_harmony = lambda vocal, *args, **kwargs: vocal.copy()',
+  'vocal = np.zeros(44100, dtype=np.float32)'
+]
+
+describeIfPython('harmony-generator の全タイプ書き出し', () => {
+  jest.setTimeout(120000)
+
+  let dir: string
+
+  beforeEach(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-harmony-render-'))
+  })
+
+  afterEach(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  it('全タイプのエンコードを並列に行い、完了ごとにステージを記録する', () => {
+    const output = evalPython([
+      ...SETUP,
+      "progress = ProgressReporter(checkpoint=f'{out_dir}/checkpoint.json', key='k')",
+      "results = hg.render_all_harmonies(vocal, 44100, None, out_dir, 'wav', progress)",
+      "print(json.dumps({'max_active': state['max_active'], 'stages': sorted(progress.results),",
+      "                  'files': sorted(r['file'] for r in results.values())}))"
+    ], [dir])
+    expect(output.max_active).toBeGreaterThan(1)
+    expect(output.stages).toEqual(['down_m3', 'perfect_5th', 'up_m3'])
+    for (const file of output.files) {
+      expect(fs.existsSync(file)).toBe(true)
+    }
+  })
+
+  it('中断時は書き出し中のタイプを完了・記録してから Cancelled を送出する', () => {
+    const output = evalPython([
+      ...SETUP,
+      'class CancelAfterSecond(ProgressReporter):',
+      '    def progress(self, stage, fraction):',
+      '        if fraction > 0.5:',
+      '            raise Cancelled()',
+      "progress = CancelAfterSecond(checkpoint=f'{out_dir}/checkpoint.json', key='k')",
+      'try:',
+      "    hg.render_all_harmonies(vocal, 44100, None, out_dir, 'wav', progress)",
+      '    cancelled = False',
+      'except Cancelled:',
+      '    cancelled = True',
+      "saved = json.load(open(f'{out_dir}/checkpoint.json'))['stages']",
+      "print(json.dumps({'cancelled': cancelled, 'written': len(state['written']), 'stages': sorted(saved)}))"
+    ], [dir])
+    expect(output.cancelled).toBe(true)
+    // 2タイプ目の投入直後に中断: 投入済みの2タイプは書き出し完了まで待ってチェックポイントに残る
+    expect(output.written).toBe(2)
+    expect(output.stages).toEqual(['down_m3', 'up_m3'])
+  })
+})
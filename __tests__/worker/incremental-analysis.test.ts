@@ -0,0 +1,91 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, runPython } from '../helpers/python'
+
+describeIfPython('advanced-analysis.py --state（差分解析）', () => {
+  jest.setTimeout(600000)
+
+  let dir: string
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-incremental-'))
+    // 前回版と、先頭を1.3秒詰めて1フレーズを差し替えた版・中央の1フレーズだけを差し替えた版
+    const code = [
+      'import sys, numpy as np, soundfile as sf',
+      'from bench_fixtures import make_fixture',
+      'fx = make_fixture(40.0, seed=3)',
+      'sr, d = fx["sr"], sys.argv[1]',
+      'sf.write(f"{d}/inst.wav", fx["inst"], sr, subtype="FLOAT")',
+      'sf.write(f"{d}/take1.wav", fx["vocal"], sr, subtype="FLOAT")',
+      't = np.arange(int(1.5 * sr)) / sr',
+      'phrase = 0.4 * np.sin(2 * np.pi * 523.25 * t) * np.hanning(len(t))',
+      'take2 = fx["vocal"][int(1.3 * sr):].copy()',
+      'take2[int(20 * sr):int(21.5 * sr)] = phrase',
+      'sf.write(f"{d}/take2.wav", take2, sr, subtype="FLOAT")',
+      'take3 = fx["vocal"].copy()',
+      'take3[int(20 * sr):int(21.5 * sr)] = phrase',
+      'sf.write(f"{d}/take3.wav", take3, sr, subtype="FLOAT")'
+    ].join('\n')
+    expect(runPython(['-c', code, dir]).status).toBe(0)
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  function analyze(take: string, state: string) {
+    const result = runPython(['advanced-analysis.py', '--vocal', path.join(dir, take),
+      '--inst', path.join(dir, 'inst.wav'), '--state', path.join(dir, state)])
+    expect(result.status).toBe(0)
+    return JSON.parse(result.stdout)
+  }
+
+  it('ずれた版の差分解析でも時間マップが両軸とも逆行しない', () => {
+    analyze('take1.wav', 'shifted.npz')
+    const result = analyze('take2.wav', 'shifted.npz')
+
+    expect(result.incremental.mode).toBe('incremental')
+    expect(result.incremental.lag_s).toBeCloseTo(-1.3, 1)
+    expect(result.incremental.changed_spans.length).toBeGreaterThan(0)
+
+    const timeMap: Array<{ vocal_time: number, inst_time: number }> = result.tempo.time_map
+    expect(timeMap.length).toBeGreaterThan(10)
+    for (let i = 1; i < timeMap.length; i++) {
+      expect(timeMap[i].vocal_time).toBeGreaterThanOrEqual(timeMap[i - 1].vocal_time)
+      expect(timeMap[i].inst_time).toBeGreaterThanOrEqual(timeMap[i - 1].inst_time)
+    }
+  })
+
+  it('中央のフレーズだけを差し替えた版では変更区間外の結果が前回の状態からそのまま返る', () => {
+    const previous = analyze('take1.wav', 'middle.npz')
+    const result = analyze('take3.wav', 'middle.npz')
+
+    expect(result.incremental.mode).toBe('incremental')
+    expect(result.incremental.lag_s).toBe(0)
+    const spans: Array<[number, number]> = result.incremental.changed_spans
+    expect(spans.length).toBeGreaterThan(0)
+    for (const [start, end] of spans) {
+      expect(start).toBeGreaterThan(18)
+      expect(end).toBeLessThan(24)
+    }
+
+    const outside = (start: number, end: number) => spans.every(([s, e]) => end <= s || start >= e)
+    const serialized = (events: any[]) => new Set(events.map((event) => JSON.stringify(event)))
+
+    const candidates = serialized(result.pitch.correction_candidates)
+    const unchangedCandidates = previous.pitch.correction_candidates
+      .filter((c: any) => outside(c.start_time, c.start_time + c.duration))
+    expect(unchangedCandidates.length).toBeGreaterThan(0)
+    for (const candidate of unchangedCandidates) {
+      expect(candidates.has(JSON.stringify(candidate))).toBe(true)
+    }
+
+    const timeMap = serialized(result.tempo.time_map)
+    const unchangedPoints = previous.tempo.time_map.filter((p: any) => outside(p.vocal_time, p.vocal_time))
+    expect(unchangedPoints.length).toBeGreaterThan(10)
+    for (const point of unchangedPoints) {
+      expect(timeMap.has(JSON.stringify(point))).toBe(true)
+    }
+  })
+})
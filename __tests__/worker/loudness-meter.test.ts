@@ -0,0 +1,34 @@
+import { describeIfPython, evalPython } from '../helpers/python'
+
+// BS.1770-4 に記載された 48kHz の Kウェイト係数（b0, b1, b2, a0, a1, a2）
+const SPEC_SHELF_48K = [1.53512485958697, -2.69169618940638, 1.19839281085285, 1, -1.69065929318241, 0.73248077421585]
+const SPEC_HIGHPASS_48K = [1, -2, 1, 1, -1.99004745483398, 0.99007225036621]
+
+describeIfPython('loudness_meter（BS.1770 Kウェイト）', () => {
+  jest.setTimeout(120000)
+
+  it('48kHz の係数が規格の値に一致する', () => {
+    const sos: number[][] = evalPython([
+      'import json',
+      'from loudness_meter import k_weighting_sos',
+      'print(json.dumps(k_weighting_sos(48000).tolist()))'
+    ])
+    SPEC_SHELF_48K.forEach((value, i) => expect(sos[0][i]).toBeCloseTo(value, 9))
+    SPEC_HIGHPASS_48K.forEach((value, i) => expect(sos[1][i]).toBeCloseTo(value, 9))
+  })
+
+  it.each([44100, 48000])('-20dBFS・997Hz のステレオ正弦波は -20.0 LUFS / -20 dBTP（%i Hz）', (sr) => {
+    const dynamics = evalPython([
+      'import json, sys, numpy as np',
+      'from loudness_meter import LoudnessMeter',
+      'sr = int(sys.argv[1])',
+      't = np.arange(10 * sr) / sr',
+      'tone = (10 ** (-20 / 20) * np.sin(2 * np.pi * 997 * t)).astype(np.float32)',
+      'meter = LoudnessMeter(sr, 2)',
+      'meter.feed(np.stack([tone, tone], axis=1))',
+      'print(json.dumps(meter.dynamics()))'
+    ], [String(sr)])
+    expect(Math.abs(dynamics.integrated_lufs + 20.0)).toBeLessThan(0.02)
+    expect(Math.abs(dynamics.true_peak_dbtp + 20.0)).toBeLessThan(0.05)
+  })
+})
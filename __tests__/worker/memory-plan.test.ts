@@ -0,0 +1,97 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython, runPython } from '../helpers/python'
+
+// ボーカルを伴奏より遅らせる量（ms）とオフセットの許容誤差
+const VOCAL_DELAY_MS = 120
+const TOLERANCE_MS = 15
+// 120秒の入力で accurate（44.1kHz）のままでは収まらない予算
+const BUDGET_MB = 450
+
+describeIfPython('memory_plan（メモリ予算に応じた実行計画）', () => {
+  jest.setTimeout(600000)
+
+  let dir: string
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-memory-plan-'))
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  it('予算の指定を MB に変換し、予算が小さいほど解像度・区間長・ブロック長を下げる', () => {
+    const result = evalPython([
+      'import json',
+      'from memory_plan import parse_budget, plan_analysis, plan_pitch_correct, plan_stream',
+      'from profiles import PROFILES',
+      'budgets = [None, 800, 500, 400]',
+      'print(json.dumps({',
+      '    "parsed": [parse_budget(v) for v in ("1500", "1500M", "1.5G", "512K", "0", "")],',
+      '    "analysis": [plan_analysis(120.0, b) for b in budgets],',
+      '    "capped": plan_analysis(120.0, None, PROFILES["fast"]),',
+      '    "world": [plan_pitch_correct(120.0, b) for b in budgets],',
+      '    "stream": [plan_stream(44100, 2, b) for b in (None, 252.5, 251)],',
+      '}))'
+    ])
+    expect(result.parsed).toEqual([1500, 1500, 1536, 0.5, null, null])
+
+    const rates = result.analysis.map((plan: any) => plan.analysis_sr)
+    expect(rates[0]).toBe(44100)
+    for (let i = 1; i < rates.length; i++) {
+      expect(rates[i]).toBeLessThanOrEqual(rates[i - 1])
+    }
+    expect(rates[rates.length - 1]).toBeLessThan(44100)
+    for (const plan of result.analysis) {
+      if (plan.fits && plan.budget_mb) {
+        expect(plan.estimated_peak_mb).toBeLessThanOrEqual(plan.budget_mb)
+      }
+    }
+    expect(result.capped.analysis_sr).toBeLessThanOrEqual(16000)
+    expect(result.capped.dtw.max_frames).toBeLessThanOrEqual(125)
+
+    // pitch_correct は出力品質のため原音レートのまま、WORLD の区間長だけを縮める
+    expect(result.world[0].world_chunk_s).toBe(null)
+    for (let i = 1; i < result.world.length; i++) {
+      expect(result.world[i].analysis_sr).toBe(44100)
+      expect(result.world[i].world_chunk_s).toBeGreaterThan(0)
+      if (i > 1) {
+        expect(result.world[i].world_chunk_s).toBeLessThanOrEqual(result.world[i - 1].world_chunk_s)
+      }
+    }
+
+    const blocks = result.stream.map((plan: any) => plan.block_seconds)
+    expect(blocks[0]).toBeGreaterThan(blocks[blocks.length - 1])
+  })
+
+  it('--memory-budget を指定すると解析サンプルレートを下げ、実測ピークが予算内に収まりオフセットも変わらない', () => {
+    const code = [
+      'import json, sys',
+      'from bench_fixtures import make_fixture, write_fixture',
+      `fx = make_fixture(120.0, offset_ms=${VOCAL_DELAY_MS}, gap_jitter=0.3, seed=1)`,
+      'print(json.dumps(write_fixture(fx, sys.argv[1])))'
+    ].join('\n')
+    const fixture = runPython(['-c', code, dir])
+    expect(fixture.status).toBe(0)
+    const paths = JSON.parse(fixture.stdout)
+
+    const analyze = (budget: string) => {
+      const result = runPython(['advanced-analysis.py', '--vocal', paths.vocal, '--inst', paths.inst,
+        '--speed-profile', 'accurate', '--memory-budget', budget])
+      expect(result.status).toBe(0)
+      return JSON.parse(result.stdout)
+    }
+    const unlimited = analyze('0')
+    const limited = analyze(`${BUDGET_MB}M`)
+
+    expect(unlimited.memory_plan.analysis_sr).toBe(44100)
+    expect(limited.memory_plan.budget_mb).toBe(BUDGET_MB)
+    expect(limited.memory_plan.fits).toBe(true)
+    expect(limited.memory_plan.analysis_sr).toBeLessThan(44100)
+    expect(limited.timings.rss_peak_mb).toBeLessThan(unlimited.timings.rss_peak_mb)
+    expect(limited.timings.rss_peak_mb).toBeLessThanOrEqual(BUDGET_MB)
+    expect(Math.abs(limited.offset.offset_ms - VOCAL_DELAY_MS)).toBeLessThan(TOLERANCE_MS)
+  })
+})
@@ -0,0 +1,57 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, runPython } from '../helpers/python'
+
+// ボーカルを伴奏より遅らせる量（ms）
+const VOCAL_DELAY_MS = 250
+// オンセット包絡のフレーム間隔（5.8ms）+ 余裕
+const TOLERANCE_MS = 15
+
+describeIfPython('オフセットの符号', () => {
+  jest.setTimeout(300000)
+
+  let dir: string
+  let paths: { vocal: string, inst: string }
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-offset-sign-'))
+    const code = [
+      'import json, sys',
+      'from bench_fixtures import make_fixture, write_fixture',
+      `fx = make_fixture(20.0, offset_ms=${VOCAL_DELAY_MS}, gap_jitter=0.3, seed=5)`,
+      'print(json.dumps(write_fixture(fx, sys.argv[1])))'
+    ].join('\n')
+    const result = runPython(['-c', code, dir])
+    expect(result.status).toBe(0)
+    paths = JSON.parse(result.stdout)
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  it('advanced-offset.py はボーカルの遅れを負で返す（detectOffset が読む値）', () => {
+    const result = runPython(['advanced-offset.py', paths.inst, paths.vocal])
+    expect(result.status).toBe(0)
+    const offsetMs = JSON.parse(result.stdout).best_result.offset_ms
+    expect(Math.abs(offsetMs + VOCAL_DELAY_MS)).toBeLessThan(TOLERANCE_MS)
+  })
+
+  it('メモリ予算が小さくても advanced-offset.py は ENGINE_SR で解析し、縮めるのは窓の長さだけ', () => {
+    const result = runPython(['advanced-offset.py', paths.inst, paths.vocal, '--memory-budget', '270M'])
+    expect(result.status).toBe(0)
+    const output = JSON.parse(result.stdout)
+    expect(output.best_result.analysis_sr).toBe(22050)
+    expect(output.memory_plan.segment_s).toBeLessThan(30)
+    expect(output.best_result.segment_s).toBeLessThanOrEqual(output.memory_plan.segment_s)
+    expect(Math.abs(output.best_result.offset_ms + VOCAL_DELAY_MS)).toBeLessThan(TOLERANCE_MS)
+  })
+
+  it('advanced-analysis.py のオフセットはボーカルの遅れを正で返す', () => {
+    const result = runPython(['advanced-analysis.py', '--vocal', paths.vocal, '--inst', paths.inst, '--stages', 'offset'])
+    expect(result.status).toBe(0)
+    const offsetMs = JSON.parse(result.stdout).offset.offset_ms
+    expect(Math.abs(offsetMs - VOCAL_DELAY_MS)).toBeLessThan(TOLERANCE_MS)
+  })
+})
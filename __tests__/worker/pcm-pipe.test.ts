@@ -0,0 +1,20 @@
+import { pcmSpec, parsePcmMeta, WORKER_PCM_FORMAT } from '../../worker/pcm-pipe'
+
+describe('worker/pcm-pipe', () => {
+  it('標準入出力のPCM指定を生成する', () => {
+    expect(pcmSpec()).toBe('pcm:-')
+    expect(pcmSpec('-', WORKER_PCM_FORMAT)).toBe('pcm:-?rate=44100&channels=1&dtype=f32')
+  })
+
+  it('名前付きパイプのパスとdtypeを指定できる', () => {
+    expect(pcmSpec('/tmp/inst.fifo', { rate: 48000, channels: 2, dtype: 's16' }))
+      .toBe('pcm:/tmp/inst.fifo?rate=48000&channels=2&dtype=s16')
+  })
+
+  it('fd 3 のJSON結果を解析する', () => {
+    const meta = Buffer.from('{"output": "pcm:-", "samplerate": 44100}\n')
+    expect(parsePcmMeta(meta)).toEqual({ output: 'pcm:-', samplerate: 44100 })
+    expect(parsePcmMeta('')).toBeUndefined()
+    expect(parsePcmMeta(undefined)).toBeUndefined()
+  })
+})
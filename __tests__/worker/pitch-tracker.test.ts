@@ -0,0 +1,94 @@
+import { describeIfPython, evalPython } from '../helpers/python'
+
+describeIfPython('pitch_tracker（ベクトル化YINフォールバック）', () => {
+  jest.setTimeout(120000)
+
+  it('倍音付きのグライドを10セント以内で追跡する', () => {
+    const result = evalPython([
+      'import json, numpy as np',
+      'from pitch_tracker import yin_track',
+      'sr = 44100',
+      't = np.arange(3 * sr) / sr',
+      '# 110Hz → 660Hz の指数グライド（5倍音まで）',
+      'freq = 110 * np.exp(np.log(6) * t / 3)',
+      'phase = 2 * np.pi * np.cumsum(freq) / sr',
+      'y = (0.3 * sum(np.sin(h * phase) / h for h in range(1, 6))).astype(np.float32)',
+      'times, f0, confidence = yin_track(y, sr, step_ms=10)',
+      'cents = 1200 * np.abs(np.log2(f0 / np.interp(times, t, freq)))',
+      'print(json.dumps({"p95": float(np.percentile(cents, 95)), "max": float(cents.max()),',
+      '                  "min_confidence": float(confidence.min())}))'
+    ])
+    expect(result.p95).toBeLessThan(10)
+    expect(result.max).toBeLessThan(20)
+    expect(result.min_confidence).toBeGreaterThan(0.9)
+  })
+
+  it('同じフレームで librosa.yin と同じ周期を選ぶ', () => {
+    const result = evalPython([
+      'import json, librosa, numpy as np',
+      'from bench_fixtures import make_fixture',
+      'from chroma_frontend import decimate',
+      'from pitch_tracker import FMAX, FMIN, YIN_SR, yin_track',
+      'fx = make_fixture(10.0, seed=0)',
+      'times, f0, confidence = yin_track(fx["vocal"], fx["sr"], step_ms=10)',
+      'y, _ = decimate(fx["vocal"], fx["sr"], YIN_SR)',
+      'ref = librosa.yin(y, fmin=FMIN, fmax=FMAX, sr=YIN_SR, frame_length=1024, hop_length=220, center=False)',
+      'voiced = confidence > 0.7',
+      'cents = 1200 * np.abs(np.log2(f0[voiced] / ref[:len(f0)][voiced]))',
+      'print(json.dumps({"frames": [len(f0), len(ref)], "voiced": int(voiced.sum()),',
+      '                  "median": float(np.median(cents)), "p99": float(np.percentile(cents, 99))}))'
+    ])
+    expect(result.frames[0]).toBe(result.frames[1])
+    expect(result.voiced).toBeGreaterThan(500)
+    expect(result.median).toBeLessThan(3)
+    expect(result.p99).toBeLessThan(10)
+  })
+
+  it('有声区間は低い純音も含めてエネルギーで検出し、無音区間のフレームは追跡しない', () => {
+    const result = evalPython([
+      'import json, numpy as np',
+      'from pitch_tracker import voiced_spans, yin_track',
+      'sr = 44100',
+      'rng = np.random.default_rng(0)',
+      'y = 0.001 * rng.standard_normal(6 * sr)',
+      'for start, end, freq in ((0.5, 1.5, 100.0), (2.5, 3.0, 220.0), (4.0, 5.5, 440.0)):',
+      '    t = np.arange(int((end - start) * sr)) / sr',
+      '    y[int(start * sr):int(end * sr)] += 0.3 * np.sin(2 * np.pi * freq * t)',
+      'y = y.astype(np.float32)',
+      'spans = voiced_spans(y, sr)',
+      'times, f0, _ = yin_track(y, sr, spans, step_ms=10)',
+      'print(json.dumps({"spans": [[s / sr, e / sr] for s, e in spans], "times": times.tolist(), "f0": f0.tolist()}))'
+    ])
+    const expected = [[0.5, 1.5, 100], [2.5, 3.0, 220], [4.0, 5.5, 440]]
+    expect(result.spans.length).toBe(expected.length)
+    result.spans.forEach(([start, end]: number[], i: number) => {
+      expect(Math.abs(start - expected[i][0])).toBeLessThan(0.06)
+      expect(Math.abs(end - expected[i][1])).toBeLessThan(0.06)
+    })
+    result.times.forEach((time: number, i: number) => {
+      const span = expected.find(([start, end]) => time > start - 0.06 && time < end + 0.06)
+      expect(span).toBeDefined()
+      if (time > span![0] + 0.05 && time < span![1] - 0.05) {
+        expect(Math.abs(1200 * Math.log2(result.f0[i] / span![2]))).toBeLessThan(10)
+      }
+    })
+  })
+
+  it('フォールバック経路で、ずらしたノートだけが補正候補になる', () => {
+    const result = evalPython([
+      'import json',
+      'from bench_fixtures import load_script, make_fixture',
+      'analysis = load_script("advanced-analysis.py")',
+      'fx = make_fixture(10.0, seed=0)',
+      'candidates = analysis.pitch_analysis_basic(fx["vocal"], fx["sr"], "standard")',
+      'print(json.dumps({"candidates": candidates, "detuned": fx["truth"]["detuned_notes"]}))'
+    ])
+    expect(result.candidates.length).toBe(result.detuned.length)
+    result.candidates.forEach((candidate: any, i: number) => {
+      const note = result.detuned[i]
+      expect(Math.abs(candidate.start_time - note.start_time)).toBeLessThan(0.05)
+      expect(Math.abs(candidate.current_cent_error - note.cent_error)).toBeLessThan(5)
+      expect(candidate.recommended_correction).toBeCloseTo(-candidate.current_cent_error, 6)
+    })
+  })
+})
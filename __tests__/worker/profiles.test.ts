@@ -0,0 +1,85 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython, runPython } from '../helpers/python'
+
+// オンセット包絡のフレーム間隔（5.8ms）+ 余裕
+const TOLERANCE_MS = 15
+
+describeIfPython('profiles（プラン別の処理プロファイル）と evaluate_profiles.py', () => {
+  jest.setTimeout(600000)
+
+  let dir: string
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-profiles-'))
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  it('プランから既定のプロファイルを選び、--speed-profile の指定を優先する', () => {
+    const resolved = evalPython([
+      'import json',
+      'from profiles import resolve_profile',
+      'print(json.dumps([resolve_profile(plan)[0] for plan in ("lite", "standard", "creator", "unknown")]',
+      '                 + [resolve_profile("lite", "accurate")[0]]))'
+    ])
+    expect(resolved).toEqual(['fast', 'balanced', 'accurate', 'balanced', 'accurate'])
+
+    const code = [
+      'import json, sys',
+      'from bench_fixtures import make_fixture, write_fixture',
+      'print(json.dumps(write_fixture(make_fixture(10.0, gap_jitter=0.3, seed=0), sys.argv[1])))'
+    ].join('\n')
+    const paths = JSON.parse(runPython(['-c', code, dir]).stdout)
+    const plan = (args: string[]) => {
+      const result = runPython(['advanced-analysis.py', '--vocal', paths.vocal, '--inst', paths.inst,
+        '--stages', 'tempo', ...args])
+      expect(result.status).toBe(0)
+      return JSON.parse(result.stdout).memory_plan
+    }
+    const lite = plan(['--plan', 'lite'])
+    expect(lite.profile).toBe('fast')
+    expect(lite.analysis_sr).toBe(16000)
+    const overridden = plan(['--plan', 'lite', '--speed-profile', 'accurate'])
+    expect(overridden.profile).toBe('accurate')
+    expect(overridden.analysis_sr).toBe(44100)
+  })
+
+  it('評価の指標は正解と重なる候補・時間マップの誤差を数える', () => {
+    const scores = evalPython([
+      'import json',
+      'from evaluate_profiles import pitch_scores, tempo_error',
+      'notes = [{"start_time": 1.0, "duration": 0.5}, {"start_time": 3.0, "duration": 0.5}]',
+      'candidates = [{"start_time": 1.2, "duration": 0.2}, {"start_time": 2.0, "duration": 0.3}]',
+      'truth = {"offset_ms": 100.0, "tempo_ratio": 1.0}',
+      'time_map = [{"vocal_time": t, "inst_time": t - 0.1 + e} for t, e in ((1.0, 0.02), (2.0, 0.04), (3.0, 0.0))]',
+      'print(json.dumps({"pitch": pitch_scores(candidates, notes), "tempo": tempo_error(time_map, truth, 10.0)}))'
+    ])
+    expect(scores.pitch).toEqual({ recall: 0.5, precision: 0.5, candidates: 2 })
+    expect(scores.tempo).toBeCloseTo(0.02, 6)
+  })
+
+  it('evaluate_profiles.py はプロファイルごとの解析レートでオフセット誤差・再現率・処理時間を報告する', () => {
+    const outputPath = path.join(dir, 'report.json')
+    const result = runPython(['evaluate_profiles.py', '--durations', '10', '--offsets', '120', '--no-world',
+      '--output', outputPath])
+    expect(result.status).toBe(0)
+    const report = JSON.parse(fs.readFileSync(outputPath, 'utf-8'))
+
+    expect(Object.keys(report.profiles)).toEqual(['fast', 'balanced', 'accurate'])
+    for (const name of Object.keys(report.profiles)) {
+      const { settings, summary, cases } = report.profiles[name]
+      expect(cases.length).toBe(1)
+      expect(cases[0].analysis_sr).toBe(settings.analysis_sr)
+      expect(summary.offset_error_ms_max).toBeLessThan(TOLERANCE_MS)
+      expect(summary.pitch_recall).toBeGreaterThan(0)
+      expect(summary.wall_s).toBeGreaterThan(0)
+      expect(summary.rtf).toBeCloseTo(summary.wall_s / 10, 6)
+    }
+    expect(report.offset_engine.method).toBe('onset_xcorr')
+    expect(report.offset_engine.refinement).toBe('parabolic')
+  })
+})
@@ -0,0 +1,158 @@
+import { AdmissionError, PythonScheduler, defaultLimits } from '../../worker/python-scheduler'
+
+// ジョブの代わりに外から完了させられるタスク
+function deferred() {
+  let resolve!: () => void
+  const promise = new Promise<void>((r) => { resolve = r })
+  return { promise, resolve }
+}
+
+const flush = () => new Promise((r) => setImmediate(r))
+
+function fakeClock() {
+  let time = 0
+  return { now: () => time, advance: (ms: number) => { time += ms } }
+}
+
+describe('worker/python-scheduler', () => {
+  it('クラスごとの同時実行枠を超えて開始しない', async () => {
+    const scheduler = new PythonScheduler({ limits: { heavy: 1 } })
+    const first = deferred()
+    const second = deferred()
+    const started: string[] = []
+
+    scheduler.run({ jobClass: 'heavy' }, () => { started.push('first'); return first.promise })
+    scheduler.run({ jobClass: 'heavy' }, () => { started.push('second'); return second.promise })
+    // 別クラスは heavy の混雑に影響されない
+    await scheduler.run({ jobClass: 'light' }, async () => { started.push('light') })
+    expect(started).toEqual(['first', 'light'])
+
+    first.resolve()
+    await flush()
+    expect(started).toEqual(['first', 'light', 'second'])
+  })
+
+  it('空いた枠はプランの優先度順に割り当てる', async () => {
+    const clock = fakeClock()
+    const scheduler = new PythonScheduler({ limits: { heavy: 1 }, now: clock.now })
+    const blocker = deferred()
+    const started: string[] = []
+    scheduler.run({ jobClass: 'heavy', plan: 'standard' }, () => blocker.promise)
+    for (const plan of ['lite', 'standard', 'creator'] as const) {
+      scheduler.run({ jobClass: 'heavy', plan }, async () => { started.push(plan) })
+    }
+
+    blocker.resolve()
+    await flush()
+    expect(started).toEqual(['creator', 'standard', 'lite'])
+  })
+
+  it('長く待ったジョブは優先度が上がる', async () => {
+    const clock = fakeClock()
+    const scheduler = new PythonScheduler({ limits: { heavy: 1 }, now: clock.now })
+    const blocker = deferred()
+    const started: string[] = []
+    scheduler.run({ jobClass: 'heavy' }, () => blocker.promise)
+    scheduler.run({ jobClass: 'heavy', plan: 'lite' }, async () => { started.push('lite') })
+    clock.advance(70000)
+    scheduler.run({ jobClass: 'heavy', plan: 'creator' }, async () => { started.push('creator') })
+
+    blocker.resolve()
+    await flush()
+    expect(started).toEqual(['lite', 'creator'])
+  })
+
+  it('長い入力は入力長に応じて複数の枠を占有する', async () => {
+    const scheduler = new PythonScheduler({ limits: { analysis: 2 } })
+    expect(scheduler.weight('analysis', 60)).toBe(1)
+    expect(scheduler.weight('analysis', 600)).toBe(2)
+    expect(scheduler.weight('analysis', 3600)).toBe(2)
+    expect(scheduler.estimateMs('heavy', 100)).toBeGreaterThan(scheduler.estimateMs('heavy', 10))
+
+    const long = deferred()
+    const started: string[] = []
+    scheduler.run({ jobClass: 'analysis', durationSec: 600 }, () => { started.push('long'); return long.promise })
+    scheduler.run({ jobClass: 'analysis', durationSec: 30 }, async () => { started.push('short') })
+    await flush()
+    expect(started).toEqual(['long'])
+    expect(scheduler.stats().classes.analysis).toMatchObject({ running: 1, usedSlots: 2 })
+
+    long.resolve()
+    await flush()
+    expect(started).toEqual(['long', 'short'])
+  })
+
+  it('キューが満杯なら受け付けない', async () => {
+    const scheduler = new PythonScheduler({ limits: { heavy: 1 }, queueLimit: 1 })
+    scheduler.run({ jobClass: 'heavy' }, () => deferred().promise)
+    scheduler.run({ jobClass: 'heavy' }, async () => {})
+
+    const run = scheduler.run({ jobClass: 'heavy' }, async () => {})
+    await expect(run).rejects.toBeInstanceOf(AdmissionError)
+    await expect(run).rejects.toMatchObject({ reason: 'queue_full' })
+    // 別プランのキューは独立
+    scheduler.run({ jobClass: 'heavy', plan: 'creator' }, async () => {})
+    expect(scheduler.stats().classes.heavy.queued).toEqual({ creator: 1, standard: 1, lite: 0 })
+  })
+
+  it('空いていれば通常の長さの曲は期限で拒否しない', async () => {
+    const scheduler = new PythonScheduler({ limits: { heavy: 1 } })
+    // 4分のボーカルのハモリ（既定の推定でも120秒のタイムアウトに収まる）
+    expect(scheduler.estimateMs('heavy', 240)).toBeLessThan(120000)
+    await expect(scheduler.run({ jobClass: 'heavy', durationSec: 240, timeoutMs: 120000, label: 'harmony' },
+      async () => 'done')).resolves.toBe('done')
+    // すぐ開始できるなら推定が期限を超えていても実行する（超えた場合は呼び出し側のタイムアウト）
+    await expect(scheduler.run({ jobClass: 'heavy', durationSec: 3600, timeoutMs: 60000 }, async () => 'long'))
+      .resolves.toBe('long')
+    expect(scheduler.stats().rejected).toBe(0)
+  })
+
+  it('実測のある label は混雑時にタイムアウトまでに終わらない見込みなら受付時点で拒否する', async () => {
+    const clock = fakeClock()
+    const scheduler = new PythonScheduler({ limits: { heavy: 1 }, now: clock.now })
+    // 実測のない label は拒否せず待たせる
+    const blocker = deferred()
+    scheduler.run({ jobClass: 'heavy', durationSec: 100, label: 'harmony' }, () => blocker.promise)
+    const queued = scheduler.run({ jobClass: 'heavy', timeoutMs: 30000, label: 'harmony' }, async () => 'queued')
+    clock.advance(20000)
+    blocker.resolve()
+    await expect(queued).resolves.toBe('queued')
+    // 100秒の入力に20秒 → 実測で単価を補正
+    expect(scheduler.estimateMs('heavy', 100, 'harmony')).toBe(20000)
+
+    scheduler.run({ jobClass: 'heavy', durationSec: 100, label: 'harmony' }, () => deferred().promise)
+    const rejected = scheduler.run({ jobClass: 'heavy', durationSec: 100, timeoutMs: 30000, label: 'harmony' }, async () => {})
+    await expect(rejected).rejects.toMatchObject({ reason: 'deadline' })
+    await expect(rejected).rejects.toHaveProperty('retryAfterMs', scheduler.estimateMs('heavy', 100, 'harmony'))
+    expect(scheduler.stats().rejected).toBe(1)
+  })
+
+  it('待っている間に期限を過ぎたジョブは開始せず拒否する', async () => {
+    const clock = fakeClock()
+    const scheduler = new PythonScheduler({ limits: { heavy: 1 }, now: clock.now })
+    const blocker = deferred()
+    let ran = false
+    scheduler.run({ jobClass: 'heavy' }, () => blocker.promise)
+    const waiting = scheduler.run({ jobClass: 'heavy', timeoutMs: 10000 }, async () => { ran = true })
+
+    clock.advance(11000)
+    blocker.resolve()
+    await expect(waiting).rejects.toMatchObject({ reason: 'deadline' })
+    expect(ran).toBe(false)
+  })
+
+  it('task には占有する枠と全枠数を渡す', async () => {
+    const scheduler = new PythonScheduler({ limits: { light: 4, analysis: 2, heavy: 2 } })
+    await expect(scheduler.run({ jobClass: 'heavy', durationSec: 600 }, async (slot) => slot))
+      .resolves.toEqual({ slots: 2, totalSlots: 8 })
+  })
+
+  it('PYTHON_SCHEDULER_LIMITS で枠数を上書きできる', () => {
+    // 既定では枠の合計がコア数を超えない
+    expect(defaultLimits(8, {})).toEqual({ light: 4, analysis: 2, heavy: 2 })
+    expect(defaultLimits(16, {})).toEqual({ light: 8, analysis: 4, heavy: 4 })
+    expect(defaultLimits(1, {})).toEqual({ light: 1, analysis: 1, heavy: 1 })
+    expect(defaultLimits(8, { PYTHON_SCHEDULER_LIMITS: 'heavy=3, analysis=0, bogus=2' }))
+      .toEqual({ light: 4, analysis: 2, heavy: 3 })
+  })
+})
@@ -0,0 +1,68 @@
+import { describeIfPython, runPython } from '../helpers/python'
+
+// --help（CLI起動のみ）とモード別依存読み込みの予算（ms）
+const HELP_BUDGET_MS = Number(process.env.PYTHON_HELP_BUDGET_MS || 1000)
+const IMPORT_BUDGET_MS = Number(process.env.PYTHON_IMPORT_BUDGET_MS || 5000)
+
+const SCRIPTS = ['advanced-analysis.py', 'advanced-offset.py', 'harmony-generator.py', 'reference-analysis.py']
+
+const MODES: Array<[string, string]> = [
+  ['advanced-analysis.py', 'analysis'],
+  ['advanced-analysis.py', 'pitch_correct'],
+  ['advanced-offset.py', 'offset'],
+  ['harmony-generator.py', 'harmony'],
+  ['reference-analysis.py', 'reference']
+]
+
+describeIfPython('worker python startup', () => {
+  jest.setTimeout(120000)
+
+  describe('--help', () => {
+    it.each(SCRIPTS)('%s が予算内で起動する', script => {
+      const start = Date.now()
+      const result = runPython([script, '--help'])
+      const elapsed = Date.now() - start
+
+      expect(result.status).toBe(0)
+      expect(elapsed).toBeLessThan(HELP_BUDGET_MS)
+    })
+  })
+
+  describe('モード別の依存読み込み', () => {
+    it.each(MODES)('%s (%s) の依存読み込みが予算内', (script, mode) => {
+      const code = [
+        'import json, sys, time',
+        'from bench_fixtures import load_script',
+        'from lazy_deps import time_imports',
+        `module = load_script(${JSON.stringify(script)})`,
+        'start = time.perf_counter()',
+        `timings = time_imports(module.MODE_IMPORTS[${JSON.stringify(mode)}])`,
+        'print(json.dumps({"timings": timings, "total_ms": (time.perf_counter() - start) * 1000,',
+        '                  "tensorflow": "tensorflow" in sys.modules}))'
+      ].join('\n')
+      const result = runPython(['-c', code])
+      expect(result.status).toBe(0)
+
+      const report = JSON.parse(result.stdout.trim().split('\n').pop() as string)
+      expect(report.total_ms).toBeLessThan(IMPORT_BUDGET_MS)
+      // CREPE を使わないモードで TensorFlow が読み込まれないこと
+      if (!report.timings.crepe) {
+        expect(report.tensorflow).toBe(false)
+      }
+    })
+  })
+
+  it('スクリプト読み込みだけでは librosa / TensorFlow を読み込まない', () => {
+    const code = [
+      'import sys',
+      'from bench_fixtures import load_script',
+      ...SCRIPTS.map(script => `load_script(${JSON.stringify(script)})`),
+      'heavy = [m for m in ("tensorflow", "crepe", "numba") if m in sys.modules]',
+      'print(",".join(heavy))'
+    ].join('\n')
+    const result = runPython(['-c', code])
+
+    expect(result.status).toBe(0)
+    expect(result.stdout.trim()).toBe('')
+  })
+})
@@ -0,0 +1,129 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython, runPython } from '../helpers/python'
+
+// ボーカルの前後に付ける無音（秒）
+const LEAD_SILENCE = 8
+const TAIL_SILENCE = 12
+
+describeIfPython('quick-scan.py（無音マップ）と --scan による切り詰め', () => {
+  jest.setTimeout(300000)
+
+  let dir: string
+  let vocalPath: string
+  let scanPath: string
+  let detuned: Array<{ start_time: number, cent_error: number }>
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-quick-scan-'))
+    vocalPath = path.join(dir, 'vocal.wav')
+    scanPath = path.join(dir, 'scan.json')
+    const code = [
+      'import json, sys, numpy as np, soundfile as sf',
+      'from bench_fixtures import make_fixture',
+      'fx = make_fixture(10.0, seed=0)',
+      'sr = fx["sr"]',
+      'rng = np.random.default_rng(0)',
+      'silence = lambda seconds: 1e-5 * rng.standard_normal(int(seconds * sr))',
+      `vocal = np.concatenate([silence(${LEAD_SILENCE}), fx["vocal"], silence(${TAIL_SILENCE})])`,
+      'sf.write(sys.argv[1], np.stack([vocal, vocal], axis=1).astype(np.float32), sr, subtype="FLOAT")',
+      'print(json.dumps(fx["truth"]["detuned_notes"]))'
+    ].join('\n')
+    const result = runPython(['-c', code, vocalPath])
+    expect(result.status).toBe(0)
+    detuned = JSON.parse(result.stdout)
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  it('1パスで長さ・ピーク・エンベロープ・前後の無音区間を求める', () => {
+    const result = runPython(['quick-scan.py', '--input', vocalPath, '--output', scanPath])
+    expect(result.status).toBe(0)
+    const scan = JSON.parse(fs.readFileSync(scanPath, 'utf-8'))
+    const duration = LEAD_SILENCE + 10 + TAIL_SILENCE
+
+    expect(scan.duration).toBeCloseTo(duration, 3)
+    expect(scan.channels).toBe(2)
+    expect(scan.envelope.rms_db.length).toBe(Math.ceil(duration / scan.envelope.hop_s))
+    expect(scan.silence.length).toBe(2)
+    const [lead, tail] = scan.silence
+    expect(lead[0]).toBe(0)
+    // 先頭のノートは 0.62 秒から、末尾のノートは 9.5 秒付近まで
+    expect(Math.abs(lead[1] - (LEAD_SILENCE + 0.62))).toBeLessThan(0.1)
+    expect(tail[0]).toBeGreaterThan(LEAD_SILENCE + 9)
+    expect(tail[0]).toBeLessThan(LEAD_SILENCE + 10)
+    expect(tail[1]).toBeCloseTo(duration, 3)
+    expect(scan.active).toEqual([[lead[1], tail[0]]])
+    // 標準出力の要約にはエンベロープを含めない
+    expect(JSON.parse(result.stdout).envelope).toBeUndefined()
+  })
+
+  it('エンベロープは読み込みブロック長によらず同じ', () => {
+    const result = evalPython([
+      'import json, sys, numpy as np',
+      'from bench_fixtures import load_script',
+      'scan = load_script("quick-scan.py")',
+      'from audio_io import read_info',
+      'sr = read_info(sys.argv[1])["samplerate"]',
+      'a, peak_a, n_a = scan.envelope(sys.argv[1], sr)',
+      'b, peak_b, n_b = scan.envelope(sys.argv[1], sr, block_seconds=0.37)',
+      'print(json.dumps({"same": bool(np.allclose(a, b, rtol=1e-9, atol=1e-12)) and peak_a == peak_b and n_a == n_b}))'
+    ], [vocalPath])
+    expect(result.same).toBe(true)
+  })
+
+  it('切り詰めの対応表で時刻・信号を元に戻せ、削減の小さい区間は切り詰めない', () => {
+    const result = evalPython([
+      'import json, numpy as np',
+      'from silence_map import crop, crop_segments, to_cropped, to_original, uncrop',
+      'sr = 100',
+      'y = np.arange(1000, dtype=np.float32)',
+      'segments = crop_segments([(1.0, 2.5), (6.0, 7.0)], sr, len(y))',
+      'cropped = crop(y, segments)',
+      'times = np.array([1.2, 2.0, 6.5, 6.99])',
+      'print(json.dumps({',
+      '    "segments": segments.tolist(),',
+      '    "restored": bool(np.array_equal(uncrop(cropped, segments, np.zeros_like(y))[100:250], y[100:250])),',
+      '    "roundtrip": to_original(to_cropped(times, segments, sr), segments, sr).tolist(),',
+      '    "gap": to_cropped(np.array([4.0]), segments, sr).tolist(),',
+      '    "small": crop_segments([(0.0, 9.8)], sr, len(y)) is None,',
+      '}))'
+    ])
+    expect(result.segments).toEqual([[0, 100, 150], [150, 600, 100]])
+    expect(result.restored).toBe(true)
+    result.roundtrip.forEach((t: number, i: number) => expect(t).toBeCloseTo([1.2, 2.0, 6.5, 6.99][i], 6))
+    expect(result.gap).toEqual([1.5])
+    expect(result.small).toBe(true)
+  })
+
+  it('--scan で無音を切り詰めても補正候補は元の時刻で返り、別の入力のスキャンは使わない', () => {
+    const analyze = (args: string[]) => {
+      const result = runPython(['advanced-analysis.py', '--vocal', vocalPath, '--stages', 'pitch', ...args])
+      expect(result.status).toBe(0)
+      return { output: JSON.parse(result.stdout), stderr: result.stderr }
+    }
+    const plain = analyze([]).output
+    const scanned = analyze(['--scan', scanPath]).output
+    expect(scanned.scan.silence_spans).toBe(2)
+    expect(scanned.scan.active_ratio).toBeLessThan(0.5)
+
+    const candidates = scanned.pitch.correction_candidates
+    expect(candidates.length).toBe(detuned.length)
+    candidates.forEach((candidate: any, i: number) => {
+      expect(Math.abs(candidate.start_time - (detuned[i].start_time + LEAD_SILENCE))).toBeLessThan(0.05)
+      expect(Math.abs(candidate.start_time - plain.pitch.correction_candidates[i].start_time)).toBeLessThan(0.01)
+    })
+
+    // 入力と照合できないスキャン（ファイルサイズ違い）は使わず、全体を解析する
+    const stale = JSON.parse(fs.readFileSync(scanPath, 'utf-8'))
+    stale.input.size += 1
+    const stalePath = path.join(dir, 'stale.json')
+    fs.writeFileSync(stalePath, JSON.stringify(stale))
+    const mismatched = analyze(['--scan', stalePath])
+    expect(mismatched.output.scan).toBeUndefined()
+    expect(mismatched.stderr).toContain('does not match')
+  })
+})
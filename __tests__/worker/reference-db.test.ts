@@ -0,0 +1,87 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython, runPython } from '../helpers/python'
+
+describeIfPython('reference_db（参照曲プロファイルDBの近傍検索）', () => {
+  jest.setTimeout(300000)
+
+  let dir: string
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-reference-db-'))
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  it('標準化ユークリッド距離の近傍が全件ソートと一致し、保存・読み込みで変わらない', () => {
+    const result = evalPython([
+      'import json, sys, numpy as np',
+      'from reference_db import FEATURE_COLUMNS, ReferenceProfileDB',
+      'rng = np.random.default_rng(7)',
+      '# 列ごとにスケールが大きく異なる特徴量',
+      'scales = np.geomspace(0.01, 100, len(FEATURE_COLUMNS))',
+      'features = (rng.standard_normal((200, len(FEATURE_COLUMNS))) * scales).astype(np.float32)',
+      'db = ReferenceProfileDB(features, [f"ref{i}.wav" for i in range(200)], [{"id": i} for i in range(200)])',
+      'db.save(sys.argv[1] + "/profiles")',
+      'loaded = ReferenceProfileDB.load(sys.argv[1] + "/profiles")',
+      'query = (rng.standard_normal(len(FEATURE_COLUMNS)) * scales).astype(np.float32)',
+      'z = (features - features.mean(axis=0)) / features.std(axis=0)',
+      'q = (query - features.mean(axis=0)) / features.std(axis=0)',
+      'expected = np.argsort(np.linalg.norm(z - q, axis=1))[:5]',
+      'print(json.dumps({',
+      '    "expected": [int(i) for i in expected],',
+      '    "nearest": [r["preset"]["id"] for r in loaded.query(query, k=5)],',
+      '    "distances": [r["distance"] for r in loaded.query(query, k=5)],',
+      '    "same_features": bool(np.array_equal(loaded.features, db.features)),',
+      '    "self": loaded.query(features[42], k=1)[0],',
+      '    "clamped": len(loaded.query(query, k=500)),',
+      '    "empty": ReferenceProfileDB().query(query),',
+      '}))'
+    ], [dir])
+    expect(result.nearest).toEqual(result.expected)
+    for (let i = 1; i < result.distances.length; i++) {
+      expect(result.distances[i]).toBeGreaterThanOrEqual(result.distances[i - 1])
+    }
+    expect(result.same_features).toBe(true)
+    expect(result.self.path).toBe('ref42.wav')
+    expect(result.self.distance).toBeLessThan(1e-4)
+    expect(result.clamped).toBe(200)
+    expect(result.empty).toEqual([])
+  })
+
+  it('--build-db で作ったDBを --db で検索すると、同じ曲が距離0・同じプリセットで最初に返る', () => {
+    const tracks = path.join(dir, 'tracks')
+    fs.mkdirSync(tracks)
+    const code = [
+      'import sys, numpy as np, soundfile as sf',
+      'sr = 44100',
+      't = np.arange(4 * sr) / sr',
+      'rng = np.random.default_rng(3)',
+      'noise = 0.1 * rng.standard_normal((len(t), 2))',
+      'sf.write(sys.argv[1] + "/bright.wav", np.diff(noise, axis=0, prepend=0), sr)',
+      'sf.write(sys.argv[1] + "/dark.wav", np.cumsum(noise, axis=0) * 0.01, sr)',
+      'sf.write(sys.argv[1] + "/tone.wav", 0.3 * np.stack([np.sin(2 * np.pi * 220 * t)] * 2, axis=1), sr)'
+    ].join('\n')
+    expect(runPython(['-c', code, tracks]).status).toBe(0)
+
+    const dbPath = path.join(dir, 'built')
+    const build = runPython(['reference-analysis.py', '--build-db', tracks, '--db', dbPath, '--workers', '2'])
+    expect(build.status).toBe(0)
+    const summary = JSON.parse(build.stdout)
+    expect(summary.profiles).toBe(3)
+    expect(summary.errors).toEqual([])
+
+    const query = runPython(['reference-analysis.py', '--input', path.join(tracks, 'dark.wav'), '--db', dbPath, '--k', '3'])
+    expect(query.status).toBe(0)
+    const result = JSON.parse(query.stdout)
+    const similar = result.similar_profiles
+    expect(similar.length).toBe(3)
+    expect(path.basename(similar[0].path)).toBe('dark.wav')
+    expect(similar[0].distance).toBeLessThan(1e-3)
+    expect(similar[0].preset).toEqual(result.suggest_diff)
+    expect(similar[1].distance).toBeGreaterThan(0.5)
+  })
+})
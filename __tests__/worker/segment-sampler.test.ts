@@ -0,0 +1,64 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython } from '../helpers/python'
+
+// 先頭 SILENT_INTRO 秒がほぼ無音の TRACK_SECONDS 秒のステレオ参照曲
+const TRACK_SECONDS = 150
+const SILENT_INTRO = 30
+
+describeIfPython('segment_sampler（参照曲の代表区間サンプリング）', () => {
+  jest.setTimeout(300000)
+
+  let dir: string
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-segment-sampler-'))
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  it('無音の冒頭を避けて曲全体から固定長の区間を選び、全体デコードとほぼ同じ解析結果になる', () => {
+    const result = evalPython([
+      'import json, sys, numpy as np, soundfile as sf',
+      'from bench_fixtures import load_script',
+      'reference = load_script("reference-analysis.py")',
+      'sr = 44100',
+      'n = int(sys.argv[2]) * sr',
+      'rng = np.random.default_rng(4)',
+      't = np.arange(n) / sr',
+      'y = 0.1 * rng.standard_normal((n, 2)) + 0.2 * np.sin(2 * np.pi * 110 * t)[:, None]',
+      'y[:int(sys.argv[3]) * sr] *= 1e-4',
+      'path = sys.argv[1] + "/reference.wav"',
+      'sf.write(path, y.astype(np.float32), sr, subtype="FLOAT")',
+      'keys = ("tonal", "dynamics", "sampling")',
+      'full = reference.analyze_reference_track(path, sampling="full")',
+      'segments = reference.analyze_reference_track(path, sampling="segments")',
+      'print(json.dumps({"full": {k: full[k] for k in keys}, "segments": {k: segments[k] for k in keys}}))'
+    ], [dir, String(TRACK_SECONDS), String(SILENT_INTRO)])
+
+    const sampling = result.segments.sampling
+    expect(sampling.mode).toBe('segments')
+    expect(sampling.decoded_seconds).toBeLessThanOrEqual(30)
+    expect(sampling.track_duration).toBe(TRACK_SECONDS)
+
+    const segments: Array<{ start: number, duration: number }> = sampling.segments
+    expect(segments.length).toBeGreaterThan(2)
+    for (let i = 0; i < segments.length; i++) {
+      expect(segments[i].start).toBeGreaterThanOrEqual(SILENT_INTRO)
+      expect(segments[i].start + segments[i].duration).toBeLessThanOrEqual(TRACK_SECONDS)
+      if (i > 0) {
+        expect(segments[i].start).toBeGreaterThanOrEqual(segments[i - 1].start + segments[i - 1].duration)
+      }
+    }
+    // 先頭60秒だけでなく曲の後半もカバーする
+    expect(segments[segments.length - 1].start).toBeGreaterThan(TRACK_SECONDS - 30)
+
+    for (const key of ['low_shelf', 'mid_boost', 'high_shelf']) {
+      expect(Math.abs(result.segments.tonal[key] - result.full.tonal[key])).toBeLessThan(0.05)
+    }
+    expect(Math.abs(result.segments.dynamics.integrated_lufs - result.full.dynamics.integrated_lufs)).toBeLessThan(0.5)
+  })
+})
@@ -0,0 +1,27 @@
+import { pythonEnv, pythonThreadBudget } from '../../worker/thread-budget'
+
+describe('worker/thread-budget', () => {
+  it('コア数を同時プロセス数で分ける', () => {
+    expect(pythonThreadBudget(1, 8, {})).toBe(8)
+    expect(pythonThreadBudget(2, 8, {})).toBe(4)
+    expect(pythonThreadBudget(2, 8, { WORKER_PYTHON_CONCURRENCY: '2' })).toBe(2)
+  })
+
+  it('最低1スレッドを割り当てる', () => {
+    expect(pythonThreadBudget(4, 2, { WORKER_PYTHON_CONCURRENCY: '3' })).toBe(1)
+  })
+
+  it('スケジューラの枠の割合でコアを分ける', () => {
+    // 8コア・全8枠のうち2枠を占有するジョブ
+    expect(pythonThreadBudget(1, 8, {}, 2 / 8)).toBe(2)
+    expect(pythonThreadBudget(2, 8, {}, 2 / 8)).toBe(1)
+    expect(pythonThreadBudget(1, 8, {}, 1 / 8)).toBe(1)
+    expect(Number(pythonEnv(1, { slots: 1, totalSlots: 1 }).MIXAI_WORKER_THREADS))
+      .toBe(pythonThreadBudget(1))
+  })
+
+  it('MIXAI_WORKER_THREADS の明示指定を優先する', () => {
+    expect(pythonThreadBudget(2, 8, { MIXAI_WORKER_THREADS: '3' })).toBe(3)
+    expect(pythonThreadBudget(2, 8, { MIXAI_WORKER_THREADS: 'auto' })).toBe(4)
+  })
+})
@@ -0,0 +1,95 @@
+import fs from 'fs'
+import os from 'os'
+import path from 'path'
+import { describeIfPython, evalPython, runPython } from '../helpers/python'
+
+// 伸縮フィクスチャ: ボーカルのノート間隔を伴奏の TEMPO_RATIO 倍にし、VOCAL_DELAY_MS 遅らせる
+const TEMPO_RATIO = 1.06
+const VOCAL_DELAY_MS = 120
+
+describeIfPython('タイムワープの事前予測・事後確認（alignment）', () => {
+  jest.setTimeout(600000)
+
+  let dir: string
+  let fixtures: Record<'bench' | 'tempo', { vocal: string, inst: string }>
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'mixai-time-warp-'))
+    const code = [
+      'import json, sys',
+      'from bench_fixtures import make_fixture, write_fixture',
+      'd = sys.argv[1]',
+      'print(json.dumps({',
+      `    'bench': write_fixture(make_fixture(30.0, offset_ms=${VOCAL_DELAY_MS}, seed=0), d, 'bench'),`,
+      `    'tempo': write_fixture(make_fixture(30.0, offset_ms=${VOCAL_DELAY_MS}, tempo_ratio=${TEMPO_RATIO}, seed=2),`,
+      "                           d, 'tempo'),",
+      '}))'
+    ].join('\n')
+    const result = runPython(['-c', code, dir])
+    expect(result.status).toBe(0)
+    fixtures = JSON.parse(result.stdout)
+  })
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true })
+  })
+
+  function render(name: 'tempo', timeMapPath: string) {
+    const result = runPython(['advanced-analysis.py', '--vocal', fixtures[name].vocal, '--inst', fixtures[name].inst,
+      '--mode', 'render', '--time-map', timeMapPath, '--output', path.join(dir, `${name}_warped.wav`)])
+    expect(result.status).toBe(0)
+    return JSON.parse(result.stdout).alignment
+  }
+
+  it('テンポが揺れる素材では正しい時間マップで伸縮したボーカルが固定オフセットより揃う', () => {
+    // 正解の時間マップ（伴奏時刻 = (ボーカル時刻 - 遅れ) / テンポ比）
+    const timeMap = Array.from({ length: 148 }, (_, k) => {
+      const vocalTime = 0.5 + k * 0.2
+      return { vocal_time: vocalTime, inst_time: (vocalTime - VOCAL_DELAY_MS / 1000) / TEMPO_RATIO }
+    })
+    const timeMapPath = path.join(dir, 'tempo_time_map.json')
+    fs.writeFileSync(timeMapPath, JSON.stringify(timeMap))
+
+    const alignment = render('tempo', timeMapPath)
+    expect(alignment.predicted).toBeGreaterThan(alignment.offset_only)
+    expect(alignment.warped).toBeGreaterThan(alignment.offset_only)
+    expect(alignment.passed).toBe(true)
+  })
+
+  it('曲全体の予測に使う包絡はブロック単位で計算しても onset_strength と一致する', () => {
+    const result = evalPython([
+      'import json, sys, librosa, numpy as np',
+      'import offset_engine',
+      'y, sr = librosa.load(sys.argv[1], sr=None)',
+      'frames = 1 + len(y) // offset_engine.HOP',
+      'expected = librosa.onset.onset_strength(y=y, sr=sr, hop_length=offset_engine.HOP)',
+      'blockwise = offset_engine._blockwise_onset_strength(y, sr)',
+      'print(json.dumps({"blocks": frames / offset_engine.ONSET_BLOCK_FRAMES, "same_length": len(expected) == len(blockwise),',
+      '                  "max_error": float(np.max(np.abs(expected - blockwise)))}))'
+    ], [fixtures.tempo.inst])
+    expect(result.blocks).toBeGreaterThan(1)
+    expect(result.same_length).toBe(true)
+    expect(result.max_error).toBeLessThan(1e-4)
+  })
+
+  it('固定オフセットで揃う素材では解析時の予測で時間マップの伸縮を不採用にし、render も描画しない', () => {
+    const analysis = runPython(['advanced-analysis.py', '--vocal', fixtures.bench.vocal, '--inst', fixtures.bench.inst,
+      '--stages', 'tempo'])
+    expect(analysis.status).toBe(0)
+    const tempo = JSON.parse(analysis.stdout).tempo
+    expect(tempo.predicted_alignment.offset_only).toBeGreaterThan(tempo.predicted_alignment.predicted)
+    expect(tempo.dtw_applicable).toBe(false)
+
+    const analysisPath = path.join(dir, 'bench_analysis.json')
+    fs.writeFileSync(analysisPath, analysis.stdout)
+    const outputPath = path.join(dir, 'bench_warped.wav')
+    const result = runPython(['advanced-analysis.py', '--vocal', fixtures.bench.vocal, '--inst', fixtures.bench.inst,
+      '--mode', 'render', '--time-map', analysisPath, '--output', outputPath])
+    expect(result.status).toBe(0)
+    const render = JSON.parse(result.stdout)
+    expect(render.skipped).toBe('predicted_rejection')
+    expect(render.alignment.passed).toBe(false)
+    expect(render.timings.stages.time_warp).toBeUndefined()
+    expect(fs.existsSync(outputPath)).toBe(false)
+  })
+})
@@ -0,0 +1,64 @@
+import { describeIfPython, evalPython } from '../helpers/python'
+
+// 合成ボーカル: 倍音の多いノート（一部は小音量でエネルギー閾値未満）と完全な無音の繰り返し
+const SYNTHETIC_VOCAL = [
+  'import json, numpy as np',
+  'sr = 44100',
+  'rng = np.random.default_rng(0)',
+  'parts = []',
+  'for _ in range(24):',
+  '    f0 = 196 * 2 ** (rng.integers(0, 12) / 12)',
+  '    t = np.arange(int(rng.uniform(0.3, 1.2) * sr)) / sr',
+  '    note = sum(np.sin(2 * np.pi * f0 * h * t) / np.sqrt(h) for h in range(1, 40) if f0 * h < 16000)',
+  '    envelope = np.minimum(1, np.minimum(t, t[::-1]) / 0.03)',
+  '    parts += [rng.choice([1.0, 0.8, 0.3]) * note * envelope, np.zeros(int(rng.uniform(0.1, 0.6) * sr))]',
+  'vocal = (0.1 * np.concatenate(parts)).astype(np.float32)',
+  'rounded = lambda regions: [[round(r["start"], 4), round(r["end"], 4)] for r in regions]'
+]
+
+describeIfPython('vad（ボーカル区間検出）', () => {
+  jest.setTimeout(120000)
+
+  it('従来の検出（窓なしエネルギー + librosa のスペクトル重心、閾値 0.15/0.3）と同じ区間を返す', () => {
+    const output = evalPython([
+      ...SYNTHETIC_VOCAL,
+      'import librosa',
+      'from vad import detect_vocal_regions',
+      // 従来の harmony-generator の実装（特徴量のフレーム数は短い方に揃える）
+      'energy = np.array([np.sum(vocal[i:i + 2048] ** 2) for i in range(0, len(vocal) - 2048, 512)])',
+      'centroid = librosa.feature.spectral_centroid(y=vocal, sr=sr, hop_length=512)[0]',
+      'n = min(len(energy), len(centroid))',
+      'mask = (energy[:n] / energy.max() > 0.15) & (centroid[:n] / centroid[:n].max() > 0.3)',
+      'times = librosa.frames_to_time(np.arange(n), sr=sr, hop_length=512)',
+      'baseline, start = [], None',
+      'for time, active in zip(times, mask):',
+      '    if active and start is None:',
+      '        start = time',
+      '    elif not active and start is not None:',
+      '        if time - start >= 0.2:',
+      "            baseline.append({'start': float(start), 'end': float(time)})",
+      '        start = None',
+      "print(json.dumps({'baseline': rounded(baseline), 'regions': rounded(detect_vocal_regions(vocal, sr))}))"
+    ])
+    // 小音量のノートは除かれ、それ以外のノートが1区間ずつ検出される
+    expect(output.baseline.length).toBeGreaterThan(10)
+    expect(output.baseline.length).toBeLessThan(24)
+    expect(output.regions).toEqual(output.baseline)
+  })
+
+  it('フレーム特徴量を分割して投入しても一括の場合と同じ区間になる', () => {
+    const output = evalPython([
+      ...SYNTHETIC_VOCAL,
+      'from vad import VoiceActivityDetector, detect_vocal_regions, frame_features',
+      'energy, centroid = frame_features(vocal, sr)',
+      'detector = VoiceActivityDetector(sr, float(energy.max()), float(centroid.max()))',
+      'chunked = []',
+      'for start in range(0, len(energy), 37):',
+      '    chunked += detector.feed_features(energy[start:start + 37], centroid[start:start + 37])',
+      'chunked += detector.flush()',
+      "print(json.dumps({'chunked': rounded(chunked), 'whole': rounded(detect_vocal_regions(vocal, sr))}))"
+    ])
+    expect(output.chunked.length).toBeGreaterThan(0)
+    expect(output.chunked).toEqual(output.whole)
+  })
+})
@@ -0,0 +1,47 @@
+import { parseWorkerEvents } from '../../worker/worker-events'
+
+describe('worker/worker-events', () => {
+  it('正常終了時は result イベントを最終結果とする', () => {
+    const stdout = [
+      '{"event": "stage", "elapsed_s": 1.2, "stage": "offset", "result": {"offset_ms": 120, "confidence": 0.9}}',
+      '{"event": "progress", "elapsed_s": 1.2, "stage": "analysis", "fraction": 0.333}',
+      '{"event": "result", "elapsed_s": 3.4, "result": {"offset": {"offset_ms": 120, "confidence": 0.9}}}',
+    ].join('\n')
+
+    const output = parseWorkerEvents(stdout)
+    expect(output.events).toHaveLength(3)
+    expect(output.stages.offset.offset_ms).toBe(120)
+    expect(output.result.offset.offset_ms).toBe(120)
+    expect(output.partial).toBeUndefined()
+  })
+
+  it('中断時は cancelled イベントを部分結果とする', () => {
+    const stdout = [
+      '{"event": "stage", "elapsed_s": 1.2, "stage": "offset", "result": {"offset_ms": 80, "confidence": 0.7}}',
+      '{"event": "cancelled", "elapsed_s": 2.0, "result": {"offset": {"offset_ms": 80, "confidence": 0.7}, "partial": true, "completed_stages": ["offset"]}}',
+    ].join('\n')
+
+    const output = parseWorkerEvents(stdout)
+    expect(output.result).toBeUndefined()
+    expect(output.partial.offset.offset_ms).toBe(80)
+    expect(output.partial.completed_stages).toEqual(['offset'])
+  })
+
+  it('cancelled がなくてもステージ結果から部分結果を組み立てる', () => {
+    const stdout = [
+      'Some library warning',
+      '{"event": "resume", "elapsed_s": 0.0, "stages": ["offset"]}',
+      '{"event": "stage", "elapsed_s": 2.1, "stage": "tempo", "result": {"dtw_applicable": false}}',
+      '{"event": "stage", "elapsed_s": 2.5, "stage": "pit',
+    ].join('\n')
+
+    const output = parseWorkerEvents(stdout)
+    expect(output.events.map(e => e.event)).toEqual(['resume', 'stage'])
+    expect(output.partial.tempo.dtw_applicable).toBe(false)
+    expect(output.partial.completed_stages).toEqual(['tempo'])
+  })
+
+  it('空の出力を扱える', () => {
+    expect(parseWorkerEvents(undefined)).toEqual({ events: [], stages: {} })
+  })
+})
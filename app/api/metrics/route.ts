@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server'
+import { readWorkerMetrics, renderWorkerMetrics } from '@/lib/worker-metrics'
 
 // Prometheus形式のメトリクス生成
 function generateMetrics() {
@@ -33,8 +34,8 @@ function generateMetrics() {
 
 export async function GET(request: NextRequest) {
   try {
-    // メトリクス生成
-    const metricsText = generateMetrics()
+    // メトリクス生成（Pythonワーカーのステージ集計を末尾に追加）
+    const metricsText = generateMetrics() + renderWorkerMetrics(await readWorkerMetrics())
     
     return new Response(metricsText, {
       status: 200,
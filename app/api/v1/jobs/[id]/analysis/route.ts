@@ -1,5 +1,7 @@
 // app/api/v1/jobs/[id]/analysis/route.ts
 import { NextRequest } from 'next/server'
+import os from 'os'
+import path from 'path'
 import { createClient } from '@supabase/supabase-js'
 import { authenticateUser } from '../../../../_lib/auth'
 import { ApiError, errorResponse } from '../../../../_lib/errors'
@@ -51,10 +53,13 @@ export async function POST(
     // 高度音声解析を実行
     let analysisResult
     try {
+      // 再アップロード時は前回の解析状態から差分区間のみ再解析
+      const statePath = path.join(os.tmpdir(), 'mixai-analysis-state', `${jobId}.npz`)
       const advancedResult = await performAdvancedAnalysis(
         job.vocal_path,
         job.instrumental_path, 
-        planCode
+        planCode,
+        statePath
       )
       
       analysisResult = {
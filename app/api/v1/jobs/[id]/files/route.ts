@@ -87,6 +87,8 @@ export async function PATCH(req: Request, ctx: { params: { id: string } }) {
       .update({ 
         instrumental_path: body.instrumental_path, 
         vocal_path: body.vocal_path,
+        // 差し替え前のボーカルのクイックスキャンは使わない
+        audio_scan: null,
         updated_at: new Date().toISOString()
       })
       .eq('id', jobId)
@@ -3,6 +3,7 @@ import { NextRequest } from 'next/server'
 import { createClient } from '@supabase/supabase-js'
 import { authenticateUser } from '../../../../_lib/auth'
 import { ApiError, errorResponse } from '../../../../_lib/errors'
+import { pythonEnv } from '../../../../../../worker/thread-budget'
 
 const supabase = createClient(
   process.env.NEXT_PUBLIC_SUPABASE_URL!,
@@ -72,7 +73,8 @@ export async function POST(
         '--corrections', correctionData,
         '--output', outputPath
       ], {
-        timeout: 180000 // 3分タイムアウト
+        timeout: 180000, // 3分タイムアウト
+        env: pythonEnv()
       })
 
       // 補正されたボーカルファイルをStorageにアップロード
@@ -92,6 +94,8 @@ export async function POST(
         .from('jobs')
         .update({
           vocal_path: correctedVocalPath,
+          // クイックスキャンは元のボーカルのもの（次回の処理で補正後のボーカルを再スキャン）
+          audio_scan: null,
           pitch_corrected: true,
           pitch_correction_applied_at: new Date().toISOString()
         })
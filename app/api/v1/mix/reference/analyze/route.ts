@@ -3,6 +3,7 @@ import { NextRequest } from 'next/server'
 import { createClient } from '@supabase/supabase-js'
 import { authenticateUser } from '../../../../_lib/auth'
 import { ApiError, errorResponse } from '../../../../_lib/errors'
+import { pythonEnv } from '../../../../../../worker/thread-budget'
 
 const supabase = createClient(
   process.env.NEXT_PUBLIC_SUPABASE_URL!,
@@ -162,7 +163,8 @@ async function performReferenceAnalysis(options: {
       '--input', refTempPath,
       '--format', 'json'
     ], {
-      timeout: 90000 // 90秒タイムアウト
+      timeout: 90000, // 90秒タイムアウト
+      env: pythonEnv()
     })
 
     // 一時ファイル削除
@@ -0,0 +1,197 @@
+import { promises as fs } from 'fs'
+import os from 'os'
+import path from 'path'
+
+/**
+ * Pythonワーカーの集計メトリクス（worker/worker_metrics.py が書き出すJSON）を
+ * Prometheus テキスト形式へ変換する
+ */
+
+export type WorkerHistogramWindow = { slot: number; counts: number[]; sum: number; count: number }
+export type WorkerCounterWindow = { slot: number; value: number }
+
+export type WorkerSeries =
+  | {
+      type: 'histogram'
+      name: string
+      labels: Record<string, string>
+      buckets: number[]
+      counts: number[]
+      sum: number
+      count: number
+      window: WorkerHistogramWindow[]
+    }
+  | {
+      type: 'counter'
+      name: string
+      labels: Record<string, string>
+      value: number
+      window: WorkerCounterWindow[]
+    }
+
+export type WorkerMetricsFile = {
+  version: number
+  updated_at: number
+  window_slot_seconds: number
+  window_slots: number
+  series: Record<string, WorkerSeries>
+}
+
+const PREFIX = 'mixai_worker_'
+const WINDOW_QUANTILES = [0.5, 0.95, 0.99]
+
+const HELP: Record<string, string> = {
+  stage_seconds: 'Wall time per worker stage',
+  run_seconds: 'Wall time per worker run',
+  input_seconds: 'Input audio duration per worker run',
+  realtime_factor: 'Run wall time divided by input duration',
+  peak_memory_mb: 'Peak RSS per worker run in MB',
+  runs_total: 'Worker runs by exit status',
+  cache_total: 'Worker cache lookups by result',
+}
+
+export function workerMetricsPath(): string | null {
+  const configured = process.env.MIXAI_WORKER_METRICS_FILE
+  if (configured === undefined) {
+    return path.join(os.tmpdir(), 'mixai-worker-metrics.json')
+  }
+  return ['', 'off', '0', 'false'].includes(configured.trim().toLowerCase()) ? null : configured
+}
+
+export async function readWorkerMetrics(filePath = workerMetricsPath()): Promise<WorkerMetricsFile | null> {
+  if (!filePath) {
+    return null
+  }
+  try {
+    return JSON.parse(await fs.readFile(filePath, 'utf8'))
+  } catch {
+    return null  // 未作成・書き込み途中
+  }
+}
+
+function formatLabels(labels: Record<string, string>, extra: Record<string, string> = {}): string {
+  const entries = Object.entries({ ...labels, ...extra })
+  if (!entries.length) {
+    return ''
+  }
+  const escaped = entries.map(([key, value]) =>
+    `${key}="${String(value).replace(/\\/g, '\\\\').replace(/\n/g, '\\n').replace(/"/g, '\\"')}"`
+  )
+  return `{${escaped.join(',')}}`
+}
+
+/**
+ * バケット集計からの分位点（Prometheus の histogram_quantile と同じ線形補間）
+ */
+export function bucketQuantile(q: number, buckets: number[], counts: number[]): number | null {
+  const total = counts.reduce((a, b) => a + b, 0)
+  if (!total) {
+    return null
+  }
+  const rank = q * total
+  let cumulative = 0
+  for (let i = 0; i < counts.length; i++) {
+    const previous = cumulative
+    cumulative += counts[i]
+    if (cumulative >= rank && counts[i] > 0) {
+      if (i >= buckets.length) {
+        return buckets[buckets.length - 1]  // +Inf バケット
+      }
+      const lower = i === 0 ? 0 : buckets[i - 1]
+      return lower + (buckets[i] - lower) * ((rank - previous) / counts[i])
+    }
+  }
+  return buckets[buckets.length - 1]
+}
+
+function liveWindows<T extends { slot: number }>(windows: T[], data: WorkerMetricsFile, nowMs: number): T[] {
+  const currentSlot = Math.floor(nowMs / 1000 / data.window_slot_seconds)
+  return windows.filter(w => w.slot > currentSlot - data.window_slots)
+}
+
+/**
+ * 累積ヒストグラム/カウンタと、直近ウィンドウの分位点・件数・キャッシュヒット率を出力
+ */
+export function renderWorkerMetrics(data: WorkerMetricsFile | null, nowMs = Date.now()): string {
+  if (!data?.series) {
+    return ''
+  }
+  // メトリクスファミリーごとに行をまとめる（テキスト形式ではファミリー内の行が連続している必要がある）
+  const families = new Map<string, { type: string; help: string; lines: string[] }>()
+  const add = (metric: string, type: string, help: string, line: string) => {
+    const family = families.get(metric) ?? { type, help, lines: [] }
+    family.lines.push(line)
+    families.set(metric, family)
+  }
+
+  const series = Object.values(data.series)
+  const windowSeconds = data.window_slot_seconds * data.window_slots
+
+  for (const s of series) {
+    const metric = PREFIX + s.name
+    const help = HELP[s.name] ?? s.name
+    if (s.type === 'histogram') {
+      let cumulative = 0
+      s.buckets.forEach((le, i) => {
+        cumulative += s.counts[i]
+        add(metric, 'histogram', help, `${metric}_bucket${formatLabels(s.labels, { le: String(le) })} ${cumulative}`)
+      })
+      add(metric, 'histogram', help, `${metric}_bucket${formatLabels(s.labels, { le: '+Inf' })} ${s.count}`)
+      add(metric, 'histogram', help, `${metric}_sum${formatLabels(s.labels)} ${s.sum}`)
+      add(metric, 'histogram', help, `${metric}_count${formatLabels(s.labels)} ${s.count}`)
+    } else {
+      add(metric, 'counter', help, `${metric}${formatLabels(s.labels)} ${s.value}`)
+    }
+  }
+
+  // 直近ウィンドウ（SLO・回帰検知用）
+  for (const s of series) {
+    if (s.type !== 'histogram') {
+      continue
+    }
+    const windows = liveWindows(s.window, data, nowMs)
+    const counts = s.counts.map((_, i) => windows.reduce((sum, w) => sum + w.counts[i], 0))
+    const count = windows.reduce((sum, w) => sum + w.count, 0)
+    const metric = `${PREFIX}${s.name}_window`
+    const help = `${HELP[s.name] ?? s.name} over the last ${windowSeconds}s`
+    for (const q of WINDOW_QUANTILES) {
+      const value = bucketQuantile(q, s.buckets, counts)
+      if (value !== null) {
+        add(metric, 'gauge', `${help} (quantiles)`, `${metric}${formatLabels(s.labels, { quantile: String(q) })} ${value}`)
+      }
+    }
+    add(`${metric}_count`, 'gauge', `${help} (observations)`, `${metric}_count${formatLabels(s.labels)} ${count}`)
+  }
+
+  // キャッシュヒット率（直近ウィンドウ）
+  const cacheTotals = new Map<string, { labels: Record<string, string>; hit: number; miss: number }>()
+  for (const s of series) {
+    if (s.type !== 'counter' || s.name !== 'cache_total') {
+      continue
+    }
+    const { result, ...labels } = s.labels
+    const key = JSON.stringify(labels)
+    const entry = cacheTotals.get(key) ?? { labels, hit: 0, miss: 0 }
+    const value = liveWindows(s.window, data, nowMs).reduce((sum, w) => sum + w.value, 0)
+    if (result === 'hit') entry.hit += value
+    if (result === 'miss') entry.miss += value
+    cacheTotals.set(key, entry)
+  }
+  for (const { labels, hit, miss } of cacheTotals.values()) {
+    if (hit + miss > 0) {
+      add(`${PREFIX}cache_hit_ratio_window`, 'gauge', `Cache hit ratio over the last ${windowSeconds}s`,
+        `${PREFIX}cache_hit_ratio_window${formatLabels(labels)} ${hit / (hit + miss)}`)
+    }
+  }
+
+  if (data.updated_at) {
+    add(`${PREFIX}metrics_updated_timestamp`, 'gauge', 'Last time a worker run was recorded',
+      `${PREFIX}metrics_updated_timestamp ${data.updated_at}`)
+  }
+
+  const lines: string[] = []
+  for (const [metric, family] of families) {
+    lines.push(`# HELP ${metric} ${family.help}`, `# TYPE ${metric} ${family.type}`, ...family.lines)
+  }
+  return lines.join('\n') + '\n'
+}
@@ -0,0 +1,5 @@
+-- アップロード音声のクイックスキャン（長さ・ピーク・RMSエンベロープ・無音マップ）
+-- ワーカーが初回処理時に保存し、再処理時はオフセット・DTW・ピッチ・ハモリの無音区間切り詰めに再利用する
+
+ALTER TABLE jobs
+ADD COLUMN IF NOT EXISTS audio_scan JSONB;
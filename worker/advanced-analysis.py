@@ -5,146 +5,185 @@ CLAUDE.md準拠の音声処理エンジン
 """
 import argparse
 import json
+# numpy より先に読み込む（BLAS等のスレッド数は読み込み時に決まる）
+from thread_budget import add_thread_args, apply_thread_budget, thread_report
 import numpy as np
-import librosa as lb
-import soundfile as sf
-from scipy import signal
-from scipy.spatial.distance import cdist
+
+from audio_io import read_info, write_audio
+from chroma_frontend import chroma_features
+from incremental import (REANALYZE_RATIO, changed_spans, fingerprint, load_state, recompute_events,
+                         reuse_events, save_state)
+from lazy_deps import has_module, lazy_import, optional_lazy_import
+from pcm_io import add_pcm_args, is_pcm, load_pcm, open_meta, validate_specs
+from profiles import PROFILES, add_profile_args, resolve_profile
+from silence_map import (active_extent, active_spans, add_scan_args, crop, crop_segments, load_scan, to_cropped,
+                         to_original, uncrop)
+from pitch_tracker import segment_notes, voiced_spans, yin_track
+from progress import Cancelled, ProgressReporter, add_progress_args, inputs_key
+from offset_engine import (ENGINE_SR, alignment_score, cached_offset, detect_offset, estimate_offset,
+                           mapped_alignment_score, onset_envelopes)
+from memory_plan import DTW_FRAME_OPTIONS, add_memory_args, plan_analysis, plan_pitch_correct, resolve_budget
+from stage_timer import NULL_TIMER, StageTimer, add_instrumentation_args, maybe_profile
+from time_warp import build_warp, render_time_warp
+from worker_metrics import record_run
+from world_vocoder import FRAME_PERIOD_MS, world_resynthesize
 import warnings
 warnings.filterwarnings('ignore')
 
-# 依存関係チェック（オプション）
-try:
-    import crepe
-    HAS_CREPE = True
-except ImportError:
-    HAS_CREPE = False
-    
-try:
-    import pyworld as pw
-    HAS_WORLD = True
-except ImportError:
-    HAS_WORLD = False
+# 重い依存は使用するステージで初めて読み込む
+lb = lazy_import('librosa')
+
+# 依存関係チェック（オプション、TensorFlowは読み込まない）
+HAS_CREPE = has_module('crepe')
+HAS_WORLD = has_module('pyworld')
+crepe = optional_lazy_import('crepe')
+pw = optional_lazy_import('pyworld')
+
+# メトリクスのscriptラベル
+SCRIPT = 'advanced-analysis'
+
+# analysisモードのステージ（チェックポイント・部分結果の単位）
+ANALYSIS_STAGES = ('offset', 'tempo', 'pitch')
+# ステージごとに読み込む入力（不要な入力はデコードしない）
+STAGE_INPUTS = {
+    'offset': ('vocal', 'inst'),
+    'tempo': ('vocal', 'inst'),
+    'pitch': ('vocal',),
+}
+# 他ステージの結果を使うステージ（現状は各ステージ独立、追加時はここに列挙すると自動で実行される）
+STAGE_DEPENDENCIES = {
+    'offset': (),
+    'tempo': (),
+    'pitch': (),
+}
+
+# モード別に実際に読み込まれる依存（起動時間予算の検証用）
+MODE_IMPORTS = {
+    'analysis': ['librosa', 'scipy.signal', 'crepe'],
+    'pitch_correct': ['librosa', 'soundfile', 'pyworld'],
+}
+
+def parse_stages(value):
+    """'pitch,offset' → ('offset', 'pitch')（依存ステージを加え、実行順に並べる / 空・all は全ステージ）"""
+    names = [name.strip().lower() for name in str(value or '').split(',') if name.strip()]
+    if not names or names == ['all']:
+        return ANALYSIS_STAGES
+    unknown = [name for name in names if name not in ANALYSIS_STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s) {', '.join(unknown)} (choose from {', '.join(ANALYSIS_STAGES)})")
+    selected = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(STAGE_DEPENDENCIES[name])
+    return tuple(name for name in ANALYSIS_STAGES if name in selected)
+
+def stage_inputs(stages):
+    """ステージの組み合わせに必要な入力（'vocal' / 'inst'）"""
+    return {source for name in stages for source in STAGE_INPUTS[name]}
 
 def safe_load(path, sr=44100):
     """安全な音声ファイル読み込み"""
     try:
-        y, _ = lb.load(path, sr=sr, mono=True)
+        if is_pcm(path):
+            y, _ = load_pcm(path, sr)
+        else:
+            y, _ = lb.load(path, sr=sr, mono=True)
         if np.max(np.abs(y)) > 0:
             y = y / np.max(np.abs(y)) * 0.95  # 正規化 + 余裕
         return y, sr
     except Exception as e:
         raise RuntimeError(f"Failed to load {path}: {e}")
 
-def advanced_offset_detection(vocal, inst, sr):
+def banded_dtw(chroma_v, chroma_i, band=None):
     """
-    高精度オフセット検出（±10ms目標）
-    相互相関 + onset-based の組み合わせ
+    Sakoe-Chibaバンド付きDTW（コサイン距離）
+    コスト・累積コストは各行のバンド内 2*band+1 セルのみ保持（band=None で全体）
     """
-    # オンセット強度ベース
-    ov = lb.onset.onset_strength(y=vocal, sr=sr, hop_length=256)
-    oi = lb.onset.onset_strength(y=inst, sr=sr, hop_length=256)
-    
-    n = min(len(ov), len(oi))
-    if n < 32:
-        return 0.0, 0.1
-    
-    ov, oi = ov[:n], oi[:n]
-    
-    # 正規化
-    ov = (ov - ov.mean()) / (ov.std() + 1e-9)
-    oi = (oi - oi.mean()) / (oi.std() + 1e-9)
-    
-    # 相互相関
-    xcorr = np.correlate(ov, oi, mode='full')
-    lag_samples = np.argmax(xcorr) - (n - 1)
-    
-    # サンプルからmsに変換（hop_length=256考慮）
-    hop_time_ms = (256 / sr) * 1000
-    offset_ms = lag_samples * hop_time_ms
-    
-    # 信頼度計算（ピーク強度とシャープネス）
-    max_corr = np.max(xcorr)
-    mean_corr = np.mean(xcorr)
-    confidence = min(1.0, max((max_corr - mean_corr) / (np.std(xcorr) + 1e-9), 0.0))
-    
-    return float(np.clip(offset_ms, -2000, 2000)), float(confidence)
+    m, n = chroma_v.shape[1], chroma_i.shape[1]
+    width = n if band is None else min(n, 2 * band + 1)
+    # 対角線上の中心列（長さの異なる系列にも対応）
+    centers = np.round(np.arange(m) * (n - 1) / max(m - 1, 1)).astype(int)
+    lows = np.clip(centers - (width // 2), 0, n - width)
+
+    vn = chroma_v / (np.linalg.norm(chroma_v, axis=0, keepdims=True) + 1e-9)
+    inn = chroma_i / (np.linalg.norm(chroma_i, axis=0, keepdims=True) + 1e-9)
 
-def dtw_tempo_analysis(vocal, inst, sr):
+    acc = np.full((m, width), np.inf)
+
+    def prev(i, j):
+        k = j - lows[i]
+        return acc[i, k] if 0 <= k < width else np.inf
+
+    for i in range(m):
+        lo = lows[i]
+        cost = 1.0 - vn[:, i] @ inn[:, lo:lo + width]
+        for k in range(width):
+            j = lo + k
+            if i == 0 and j == 0:
+                acc[0, 0] = cost[0]
+                continue
+            best = min(
+                prev(i - 1, j) if i > 0 else np.inf,          # 削除
+                acc[i, k - 1] if k > 0 else np.inf,           # 挿入
+                prev(i - 1, j - 1) if i > 0 else np.inf       # マッチ
+            )
+            acc[i, k] = cost[k] + best
+
+    # パス復元（簡易）
+    path = []
+    i, j = m - 1, n - 1
+    while i > 0 or j > 0:
+        path.append((i, j))
+        if i == 0:
+            j -= 1
+        elif j == 0:
+            i -= 1
+        else:
+            moves = [prev(i - 1, j - 1), prev(i - 1, j), prev(i, j - 1)]
+            move = np.argmin(moves)
+            if move == 0:
+                i, j = i - 1, j - 1
+            elif move == 1:
+                i = i - 1
+            else:
+                j = j - 1
+    path.reverse()
+    return path, prev(m - 1, n - 1)
+
+def dtw_tempo_analysis(vocal, inst, sr, timer=NULL_TIMER, max_frames=DTW_FRAME_OPTIONS[0], band=None,
+                       chroma='cqt'):
     """
     DTWベース可変テンポ解析
     ボーカル vs 伴奏の時間マップ生成
+    max_frames: DTWの最大フレーム数（超える場合はクロマをプーリングで縮約）
+    band: Sakoe-Chibaバンド幅（フレーム数、None で制限なし）
+    chroma: クロマの計算方式（chroma_frontend.CHROMA_METHODS）
     """
-    # クロマ特徴量で音楽的内容を比較
-    chroma_v = lb.feature.chroma_cqt(y=vocal, sr=sr, hop_length=512)
-    chroma_i = lb.feature.chroma_cqt(y=inst, sr=sr, hop_length=512)
+    # クロマ特徴量で音楽的内容を比較（間引いた信号から、DTW解像度に合わせて計算）
+    with timer.stage('tempo_chroma'):
+        chroma_v, times_v = chroma_features(vocal, sr, chroma, max_frames)
+        chroma_i, times_i = chroma_features(inst, sr, chroma, max_frames)
     
     n = min(chroma_v.shape[1], chroma_i.shape[1])
     if n < 16:
         return [], 0.0, 0.0
     
-    chroma_v, chroma_i = chroma_v[:, :n], chroma_i[:, :n]
-    
-    # コサイン距離行列
-    cost_matrix = cdist(chroma_v.T, chroma_i.T, metric='cosine')
-    
-    # 簡易DTW（メモリ効率重視）
-    def simple_dtw(cost):
-        m, n = cost.shape
-        if m > 500 or n > 500:  # 長すぎる場合は間引き
-            step = max(m // 300, n // 300, 1)
-            cost = cost[::step, ::step]
-            m, n = cost.shape
-            
-        dtw_matrix = np.full((m, n), np.inf)
-        dtw_matrix[0, 0] = cost[0, 0]
-        
-        for i in range(1, m):
-            dtw_matrix[i, 0] = cost[i, 0] + dtw_matrix[i-1, 0]
-        for j in range(1, n):
-            dtw_matrix[0, j] = cost[0, j] + dtw_matrix[0, j-1]
-            
-        for i in range(1, m):
-            for j in range(1, n):
-                dtw_matrix[i, j] = cost[i, j] + min(
-                    dtw_matrix[i-1, j],     # 削除
-                    dtw_matrix[i, j-1],     # 挿入
-                    dtw_matrix[i-1, j-1]    # マッチ
-                )
-        
-        # パス復元（簡易）
-        path = []
-        i, j = m-1, n-1
-        while i > 0 or j > 0:
-            path.append((i, j))
-            if i == 0:
-                j -= 1
-            elif j == 0:
-                i -= 1
-            else:
-                moves = [
-                    dtw_matrix[i-1, j-1],
-                    dtw_matrix[i-1, j],
-                    dtw_matrix[i, j-1]
-                ]
-                move = np.argmin(moves)
-                if move == 0:
-                    i, j = i-1, j-1
-                elif move == 1:
-                    i = i-1
-                else:
-                    j = j-1
-        path.reverse()
-        return path, dtw_matrix[-1, -1]
+    # ビート同期ではフレーム数が系列ごとに異なるためそのまま、それ以外は長さを揃える
+    if chroma != 'beat':
+        chroma_v, chroma_i = chroma_v[:, :n], chroma_i[:, :n]
     
     try:
-        path, dtw_cost = simple_dtw(cost_matrix)
+        with timer.stage('tempo_dtw'):
+            path, dtw_cost = banded_dtw(chroma_v, chroma_i, band)
         
         # テンポマップ生成（時間変換係数）
         time_map = []
-        for i, (v_idx, i_idx) in enumerate(path):
-            vocal_time = v_idx * (512 / sr)
-            inst_time = i_idx * (512 / sr)
+        for v_idx, i_idx in path:
+            vocal_time = times_v[v_idx]
+            inst_time = times_i[i_idx]
             ratio = inst_time / (vocal_time + 1e-6)
             time_map.append({
                 'vocal_time': float(vocal_time),
@@ -165,179 +204,140 @@ def dtw_tempo_analysis(vocal, inst, sr):
         print(f"DTW error: {e}")
         return [], 0.0, 0.0
 
-def pitch_analysis_crepe(vocal, sr, plan_code):
+# ピッチ補正候補の閾値・アクション（プラン別）
+PITCH_ERROR_THRESHOLDS = {
+    'lite': 45.0,      # 提示のみ
+    'standard': 35.0,  # ワンタップ修正
+    'creator': 50.0    # 自動修正
+}
+PITCH_PLAN_ACTIONS = {
+    'lite': 'suggest',
+    'standard': 'auto_with_confirmation',
+    'creator': 'auto'
+}
+MIN_NOTE_SECONDS = 0.08
+
+def pitch_candidates(times, frequency, confidence, plan_code, step_ms):
+    """
+    フレーム単位の f0・信頼度から "1音だけ外れ" の補正候補を作る（CREPE/YIN 共通）
+    有効フレームをノートにまとめ、平均セント誤差がプラン別閾値を超えるノートを返す
     """
-    CREPE/pYINベースピッチ分析
+    # 無音・低信頼度区間をフィルタ
+    valid_mask = (confidence > 0.7) & (frequency > 80) & (frequency < 800)
+    if not np.any(valid_mask):
+        return []
+    
+    # ノート化（半音が変わる点・フレームが途切れる点で分割）
+    notes = segment_notes(times[valid_mask], frequency[valid_mask], confidence[valid_mask],
+                          max_gap=2.5 * step_ms / 1000)
+    
+    # "外れ"検出
+    error_threshold = PITCH_ERROR_THRESHOLDS.get(plan_code, 35.0)
+    selected = ((notes['duration'] >= MIN_NOTE_SECONDS)
+                & (np.abs(notes['cent_error']) > error_threshold)
+                & (notes['confidence'] > 0.75))
+    action = PITCH_PLAN_ACTIONS.get(plan_code, 'suggest')
+    return [
+        {
+            'start_time': float(notes['start_time'][i]),
+            'duration': float(notes['duration'][i]),
+            'target_note': int(notes['note'][i]),
+            'current_cent_error': float(notes['cent_error'][i]),
+            'confidence': float(notes['confidence'][i]),
+            'recommended_correction': float(-notes['cent_error'][i]),  # 逆方向に補正
+            'plan_action': action
+        }
+        for i in np.flatnonzero(selected)
+    ]
+
+def pitch_analysis_crepe(vocal, sr, plan_code, profile=PROFILES['balanced']):
+    """
+    CREPEベースピッチ分析（未インストール時はYIN）
     "1音だけ外れ" 検出
+    profile: モデル容量とステップ（fast は tiny/20ms）
     """
     if not HAS_CREPE:
-        return pitch_analysis_basic(vocal, sr, plan_code)
+        return pitch_analysis_basic(vocal, sr, plan_code, profile)
     
     try:
         # CREPE pitch tracking
         time, frequency, confidence, _ = crepe.predict(
             vocal, sr, 
+            model_capacity=profile['crepe_capacity'],
             viterbi=True,
-            step_size=10  # 10ms step
+            step_size=profile['pitch_step_ms'],
+            verbose=0
         )
-        
-        # 無音・低信頼度区間をフィルタ
-        valid_mask = (confidence > 0.7) & (frequency > 80) & (frequency < 800)
-        if not np.any(valid_mask):
-            return []
-        
-        valid_f0 = frequency[valid_mask]
-        valid_times = time[valid_mask]
-        valid_conf = confidence[valid_mask]
-        
-        # ノート化（簡易）
-        notes = []
-        current_note = None
-        
-        for i, (t, f, c) in enumerate(zip(valid_times, valid_f0, valid_conf)):
-            midi_note = 12 * np.log2(f / 440) + 69
-            rounded_note = round(midi_note)
-            cent_error = (midi_note - rounded_note) * 100
-            
-            if current_note is None or abs(rounded_note - current_note['note']) > 0.5:
-                # 新しいノート
-                if current_note and current_note['duration'] >= 0.08:  # 80ms以上
-                    notes.append(current_note)
-                
-                current_note = {
-                    'start_time': float(t),
-                    'note': int(rounded_note),
-                    'cent_errors': [cent_error],
-                    'confidences': [c],
-                    'duration': 0.01,
-                    'f0_values': [f]
-                }
-            else:
-                # 継続
-                current_note['cent_errors'].append(cent_error)
-                current_note['confidences'].append(c)
-                current_note['f0_values'].append(f)
-                current_note['duration'] = t - current_note['start_time']
-        
-        if current_note and current_note['duration'] >= 0.08:
-            notes.append(current_note)
-        
-        # "外れ"検出
-        correction_candidates = []
-        for note in notes:
-            avg_error = np.mean(note['cent_errors'])
-            avg_conf = np.mean(note['confidences'])
-            
-            # 閾値：プラン別
-            error_threshold = {
-                'lite': 45.0,      # 提示のみ
-                'standard': 35.0,  # ワンタップ修正
-                'creator': 50.0    # 自動修正
-            }.get(plan_code, 35.0)
-            
-            if abs(avg_error) > error_threshold and avg_conf > 0.75:
-                correction_candidates.append({
-                    'start_time': note['start_time'],
-                    'duration': note['duration'],
-                    'target_note': note['note'],
-                    'current_cent_error': float(avg_error),
-                    'confidence': float(avg_conf),
-                    'recommended_correction': float(-avg_error),  # 逆方向に補正
-                    'plan_action': {
-                        'lite': 'suggest',
-                        'standard': 'auto_with_confirmation', 
-                        'creator': 'auto'
-                    }.get(plan_code, 'suggest')
-                })
-        
-        return correction_candidates
+        return pitch_candidates(time, frequency, confidence, plan_code, profile['pitch_step_ms'])
         
     except Exception as e:
         print(f"CREPE analysis error: {e}")
-        return pitch_analysis_basic(vocal, sr, plan_code)
+        return pitch_analysis_basic(vocal, sr, plan_code, profile)
 
-def pitch_analysis_basic(vocal, sr, plan_code):
+def pitch_analysis_basic(vocal, sr, plan_code, profile=PROFILES['balanced']):
     """
     基本的なピッチ分析（CREPE不使用時のフォールバック）
+    ボーカル区間のみFFTベースのYINで追跡し、CREPEと同じ候補形式で返す
     """
     try:
-        # librosa piptrack
-        pitches, magnitudes = lb.piptrack(y=vocal, sr=sr, threshold=0.3)
-        
-        correction_candidates = []
-        
-        # 簡易処理（実用レベルではないが動作する）
-        for t in range(0, pitches.shape[1], 50):  # 間引きサンプリング
-            frame_pitches = pitches[:, t]
-            frame_mags = magnitudes[:, t]
-            
-            if np.any(frame_mags > 0.1):
-                max_idx = np.argmax(frame_mags)
-                f0 = frame_pitches[max_idx]
-                
-                if 80 < f0 < 800:
-                    midi_note = 12 * np.log2(f0 / 440) + 69
-                    rounded_note = round(midi_note)
-                    cent_error = (midi_note - rounded_note) * 100
-                    
-                    if abs(cent_error) > 30:
-                        correction_candidates.append({
-                            'start_time': float(t * 512 / sr),
-                            'duration': 0.1,
-                            'target_note': int(rounded_note),
-                            'current_cent_error': float(cent_error),
-                            'confidence': 0.6,
-                            'recommended_correction': float(-cent_error * 0.8),
-                            'plan_action': 'suggest'
-                        })
-        
-        return correction_candidates[:10]  # 最大10個
+        times, frequency, confidence = yin_track(vocal, sr, voiced_spans(vocal, sr), profile['pitch_step_ms'])
+        return pitch_candidates(times, frequency, confidence, plan_code, profile['pitch_step_ms'])
         
     except Exception as e:
         print(f"Basic pitch analysis error: {e}")
         return []
 
-def world_pitch_correction(vocal, sr, corrections):
+def correction_ratio_curve(corrections, n_frames, frame_period=FRAME_PERIOD_MS):
+    """
+    補正リストからフレームごとのF0倍率カーブを作成
+    （エッジでフェード、無声フレームは F0=0 のため倍率の影響を受けない）
+    """
+    curve = np.ones(n_frames)
+    for corr in corrections:
+        start_frame = int(corr['start_time'] * 1000 / frame_period)
+        duration_frames = int(corr['duration'] * 1000 / frame_period)
+        end_frame = min(start_frame + duration_frames, n_frames)
+        
+        if start_frame < n_frames and corr['recommended_correction'] != 0:
+            cent_shift = corr['recommended_correction']
+            pitch_ratio = 2 ** (cent_shift / 1200)
+            
+            # スムーズな適用（エッジでフェード）
+            fade_frames = min(5, duration_frames // 4)
+            for i in range(start_frame, end_frame):
+                fade_factor = 1.0
+                if i < start_frame + fade_frames:
+                    fade_factor = (i - start_frame) / fade_frames
+                elif i > end_frame - fade_frames:
+                    fade_factor = (end_frame - i) / fade_frames
+                
+                curve[i] *= (1.0 + (pitch_ratio - 1.0) * fade_factor)
+    return curve
+
+def world_pitch_correction(vocal, sr, corrections, chunk_seconds=None, on_progress=None,
+                           frame_period=FRAME_PERIOD_MS):
     """
     WORLD vocoder による高品質ピッチ補正
     フォルマント保持
+    chunk_seconds 指定時は区間ごとに分析・再合成（メモリ予算用）
+    frame_period: 分析フレーム周期（ms、長いほど高速）
     """
     if not HAS_WORLD:
         return vocal  # WORLD未インストール時はそのまま返す
     
     try:
-        # float64に変換（WORLD要求）
-        x = vocal.astype(np.float64)
+        n_frames = int(len(vocal) / sr * 1000 / frame_period) + 2
+        curve = correction_ratio_curve(corrections, n_frames, frame_period)
         
-        # WORLD分析
-        f0, sp, ap = pw.wav2world(x, sr)
+        def apply_curve(f0, sp, ap, first_frame):
+            # ピッチ補正適用（区間先頭の全体フレーム位置に合わせる）
+            ratio = curve[first_frame:first_frame + len(f0)]
+            corrected_f0 = f0.copy()
+            corrected_f0[:len(ratio)] *= ratio
+            return corrected_f0, sp, ap
         
-        # ピッチ補正適用
-        corrected_f0 = f0.copy()
-        
-        for corr in corrections:
-            start_frame = int(corr['start_time'] * sr / pw.default_frame_period / 1000)
-            duration_frames = int(corr['duration'] * sr / pw.default_frame_period / 1000)
-            end_frame = min(start_frame + duration_frames, len(corrected_f0))
-            
-            if start_frame < len(corrected_f0) and corr['recommended_correction'] != 0:
-                cent_shift = corr['recommended_correction']
-                pitch_ratio = 2 ** (cent_shift / 1200)
-                
-                # スムーズな適用（エッジでフェード）
-                fade_frames = min(5, duration_frames // 4)
-                for i in range(start_frame, end_frame):
-                    if corrected_f0[i] > 0:  # 有声区間のみ
-                        fade_factor = 1.0
-                        if i < start_frame + fade_frames:
-                            fade_factor = (i - start_frame) / fade_frames
-                        elif i > end_frame - fade_frames:
-                            fade_factor = (end_frame - i) / fade_frames
-                        
-                        corrected_f0[i] *= (1.0 + (pitch_ratio - 1.0) * fade_factor)
-        
-        # WORLD再合成
-        corrected_vocal = pw.synthesize(corrected_f0, sp, ap, sr)
+        # WORLD分析・再合成（float64はWORLD要求）
+        corrected_vocal = world_resynthesize(vocal, sr, apply_curve, chunk_seconds, frame_period, on_progress)
         
         # 元の長さに調整・正規化
         corrected_vocal = corrected_vocal[:len(vocal)]
@@ -350,56 +350,477 @@ def world_pitch_correction(vocal, sr, corrections):
         print(f"WORLD correction error: {e}")
         return vocal
 
+def analyze_full(vocal, inst, sr, plan_code, plan, timer=NULL_TIMER, progress=None, stages=ANALYSIS_STAGES,
+                 scan=None, sources=None):
+    """
+    オフセット・テンポ・ピッチの全体解析
+    stages で実行するステージを選ぶ（parse_stages で依存を解決済みのもの、伴奏を使わないステージのみなら inst は None でよい）
+    progress があれば完了済みステージ（チェックポイント）を再利用し、完了ごとに保存する
+    plan['profile'] の処理プロファイルでDTW・ピッチ推定の設定を切り替える
+    scan: ボーカルのクイックスキャン（無音区間を切り詰めて解析し、時刻は元に戻す）
+    sources: 入力パス (vocal, inst)（オフセットは advanced-offset.py と共通のエンジン・キャッシュで求める）
+    """
+    progress = progress or ProgressReporter()
+    profile = PROFILES[plan.get('profile', 'balanced')]
+    
+    for index, name in enumerate(stages):
+        if not progress.done(name):
+            with timer.stage(name):
+                progress.complete(name, run_stage(name, vocal, inst, sr, plan_code, plan, profile, timer, scan,
+                                                  sources))
+        progress.progress('analysis', (index + 1) / len(stages))
+    
+    return {name: progress.get(name) for name in stages}
+
+def run_stage(name, vocal, inst, sr, plan_code, plan, profile, timer=NULL_TIMER, scan=None, sources=None):
+    """
+    1ステージ分の解析結果
+    scan があれば テンポは前後の無音を伴奏と同じ窓で、ピッチは区間間の無音も除いて解析する
+    """
+    if name == 'offset':
+        vocal_path, inst_path = sources or (None, None)
+        result, _ = detect_offset(inst_path, vocal_path, scan, signals=(vocal, inst, sr))
+        return result
+    if name == 'tempo':
+        max_frames = plan['dtw']['max_frames']
+        window = crop_segments([active_extent(scan)], sr, len(vocal)) if scan and scan['active'] else None
+        full_vocal, full_inst = vocal, inst
+        if window is not None:
+            # DTWのフレーム間隔は全体を解析する場合と同じに保つ
+            max_frames = max(int(max_frames * window[0, 2] / len(vocal)), 16)
+            vocal, inst = crop(vocal, window), crop(inst, window)
+        time_map, tempo_var, tempo_improvement = dtw_tempo_analysis(
+            vocal, inst, sr, timer, max_frames, plan['dtw']['band'], profile['chroma'])
+        if window is not None:
+            time_map, tempo_var = shift_time_map(time_map, window[0, 1] / sr)
+        return gate_time_warp(tempo_result(time_map, tempo_var, tempo_improvement), full_vocal, full_inst, sr)
+    
+    segments = crop_segments(active_spans(scan), sr, len(vocal)) if scan else None
+    if segments is None:
+        pitch_candidates = pitch_analysis_crepe(vocal, sr, plan_code, profile)
+    else:
+        pitch_candidates = pitch_analysis_crepe(crop(vocal, segments), sr, plan_code, profile)
+        starts = to_original([c['start_time'] for c in pitch_candidates], segments, sr)
+        for candidate, start in zip(pitch_candidates, starts):
+            candidate['start_time'] = float(start)
+    return {
+        'correction_candidates': pitch_candidates,
+        'total_candidates': len(pitch_candidates)
+    }
+
+def shift_time_map(time_map, seconds):
+    """切り詰めた窓の時間マップを元の時刻へ戻す（テンポ比・変動度は元の時刻で計算し直す）"""
+    for entry in time_map:
+        entry['vocal_time'] += seconds
+        entry['inst_time'] += seconds
+        entry['tempo_ratio'] = float(np.clip(entry['inst_time'] / (entry['vocal_time'] + 1e-6), 0.7, 1.3))
+    ratios = [entry['tempo_ratio'] for entry in time_map]
+    return time_map, float(np.std(ratios)) if len(ratios) > 1 else 0.0
+
+def splice_time_map(reused, recomputed):
+    """
+    再利用した点（前回の時間マップの順のまま）はそのまま残し、再解析した区間の点は
+    直前に残した点と次の再利用点の間に両軸とも収まるものだけを継ぎ足す（継ぎ目で時間が逆行しないようにする）
+    """
+    merged, r = [], 0
+    for entry in sorted(recomputed, key=lambda entry: (entry['vocal_time'], entry['inst_time'])):
+        while r < len(reused) and reused[r]['vocal_time'] <= entry['vocal_time']:
+            merged.append(reused[r])
+            r += 1
+        prev = merged[-1] if merged else None
+        following = reused[r] if r < len(reused) else None
+        if prev and (entry['vocal_time'] <= prev['vocal_time'] or entry['inst_time'] <= prev['inst_time']):
+            continue
+        if following and entry['inst_time'] >= following['inst_time']:
+            continue
+        merged.append(entry)
+    return merged + reused[r:]
+
+def tempo_result(time_map, tempo_var, tempo_improvement):
+    return {
+        'time_map': time_map,
+        'tempo_variability': tempo_var,
+        'improvement_estimate': tempo_improvement,
+        'dtw_applicable': len(time_map) > 10 and tempo_improvement > 0.3
+    }
+
+def analyze_incremental(vocal, inst, sr, plan_code, plan, previous, vocal_fp, inst_fp, timer=NULL_TIMER):
+    """
+    前回版との差分区間のみ再解析し、残りは前回結果を時間シフトして再利用
+    再利用できない場合は (None, 理由) を返す
+    """
+    meta = previous['meta']
+    profile_name = plan.get('profile', 'balanced')
+    if (meta.get('plan_code') != plan_code or meta.get('analysis_sr') != sr
+            or meta.get('profile', 'balanced') != profile_name):
+        return None, 'settings_changed'
+    
+    with timer.stage('diff'):
+        inst_diff = changed_spans(previous['inst_fp'], inst_fp)
+        if inst_diff['spans'] or inst_diff['lag_s'] != 0:
+            return None, 'inst_changed'
+        diff = changed_spans(previous['vocal_fp'], vocal_fp)
+    if diff['changed_ratio'] > REANALYZE_RATIO:
+        return None, 'mostly_changed'
+    
+    old = previous['result']
+    lag, spans = diff['lag_s'], diff['spans']
+    duration = len(vocal) / sr
+    
+    # オフセット: 伴奏は不変なのでボーカルの移動量だけずらす
+    offset = dict(old['offset'])
+    offset['offset_ms'] = float(offset['offset_ms'] + lag * 1000)
+    
+    # テンポ: 変更区間のみDTWし、時間マップに継ぎ足す
+    # 伴奏は不変なので、変更区間に対応する伴奏はボーカルの移動量だけ戻した位置（再利用分の vocal_time のみのシフトと揃える）
+    with timer.stage('tempo'):
+        reused = reuse_events(old['tempo']['time_map'], lag, spans, duration, start_key='vocal_time')
+        improvements = [(old['tempo']['improvement_estimate'], len(reused))]
+        recomputed = []
+        lag_samples = int(round(lag * sr))
+        for s_start, s_end in spans:
+            s, e = int(s_start * sr), int(s_end * sr)
+            i_s, i_e = max(0, s - lag_samples), min(len(inst), e - lag_samples)
+            if i_e - i_s < sr * 0.5:
+                continue  # 対応する伴奏が範囲外（前回版にない先頭・末尾の追加分）
+            span_map, _, span_improvement = dtw_tempo_analysis(
+                vocal[s:e], inst[i_s:i_e], sr, timer, plan['dtw']['max_frames'], plan['dtw']['band'],
+                PROFILES[profile_name]['chroma'])
+            for entry in span_map:
+                recomputed.append({
+                    'vocal_time': entry['vocal_time'] + s_start,
+                    'inst_time': entry['inst_time'] + i_s / sr
+                })
+            improvements.append((span_improvement, len(span_map)))
+        time_map = splice_time_map(reused, recomputed)
+        for entry in time_map:
+            entry['tempo_ratio'] = float(np.clip(entry['inst_time'] / (entry['vocal_time'] + 1e-6), 0.7, 1.3))
+        ratios = [entry['tempo_ratio'] for entry in time_map]
+        tempo_var = float(np.std(ratios)) if len(ratios) > 1 else 0.0
+        weight = sum(count for _, count in improvements)
+        tempo_improvement = float(sum(imp * count for imp, count in improvements) / weight) if weight else 0.0
+    
+    # ピッチ: 変更区間のノートのみ再検出
+    with timer.stage('pitch'):
+        pitch_candidates = reuse_events(old['pitch']['correction_candidates'], lag, spans, duration)
+        pitch_candidates += recompute_events(
+            vocal, sr, spans, lambda y: pitch_analysis_crepe(y, sr, plan_code, PROFILES[profile_name]))
+        pitch_candidates.sort(key=lambda candidate: candidate['start_time'])
+    
+    result = {
+        'offset': offset,
+        'tempo': gate_time_warp(tempo_result(time_map, tempo_var, tempo_improvement), vocal, inst, sr),
+        'pitch': {
+            'correction_candidates': pitch_candidates,
+            'total_candidates': len(pitch_candidates)
+        }
+    }
+    return result, {
+        'lag_s': diff['lag_s'],
+        'changed_spans': spans,
+        'changed_ratio': diff['changed_ratio'],
+        'reanalyzed_seconds': float(sum(e - s for s, e in spans))
+    }
+
+def predict_time_warp(time_map, vocal, inst, sr):
+    """
+    タイムワープの事前予測（WSOLAで描画する前に、事後確認で不採用になるかを見積もる）
+    時間マップでボーカルのオンセット包絡を伴奏の時間軸へ写し、最適な固定オフセットでの相関と比べる
+    """
+    t_grid, v_grid = build_warp(time_map, len(vocal) / sr)
+    envelopes = onset_envelopes(vocal, inst, sr)
+    predicted = mapped_alignment_score(vocal, inst, sr, lambda t: np.interp(t, t_grid, v_grid), envelopes)
+    offset_ms, offset_only = estimate_offset(vocal, inst, sr, envelopes)
+    return {
+        'predicted': round(predicted, 4),
+        'offset_only': round(offset_only, 4),
+        'offset_ms': round(offset_ms, 2),
+        'passed': predicted > offset_only
+    }
+
+def gate_time_warp(tempo, vocal, inst, sr):
+    """
+    DTWが有効と判定された場合のみ事前予測し、固定オフセットより揃わない見込みなら dtw_applicable を落とす
+    （呼び出し側は dtw_applicable を見て render を呼ぶため、不採用になる描画を省ける）
+    """
+    if tempo['dtw_applicable']:
+        tempo['predicted_alignment'] = predict_time_warp(tempo['time_map'], vocal, inst, sr)
+        tempo['dtw_applicable'] = tempo['predicted_alignment']['passed']
+    return tempo
+
+def check_time_warp(warped_path, vocal, inst, sr=ENGINE_SR):
+    """
+    タイムワープの事後確認
+    伸縮後のボーカルが、伸縮前のボーカル vocal を最適な固定オフセットでずらした場合より伴奏に揃っていれば passed
+    （揃っていなければ呼び出し側は伸縮結果を捨てて固定オフセットを使う）
+    """
+    warped, _ = safe_load(warped_path, sr)
+    offset_ms, offset_only = estimate_offset(vocal, inst, sr)
+    warped_score = alignment_score(warped, inst, sr)
+    return {
+        'warped': round(warped_score, 4),
+        'offset_only': round(offset_only, 4),
+        'offset_ms': round(offset_ms, 2),
+        'passed': warped_score > offset_only
+    }
+
+def run_analysis(args, plan, timer, progress, scan=None):
+    """analysisモード本体（選択ステージ・再開時に不要な入力はデコードしない）"""
+    # advanced-offset.py が同じ入力を解析済みならオフセットはキャッシュから（デコード不要）
+    if 'offset' in args.stages and not progress.done('offset') and not args.state and args.inst:
+        cached = cached_offset(args.inst, args.vocal, scan)
+        if cached is not None:
+            progress.complete('offset', cached)
+    pending = stage_inputs([name for name in args.stages if not progress.done(name)])
+    need_inst = args.state or 'inst' in pending
+    need_vocal = args.state or 'vocal' in pending
+    
+    # 音声読み込み
+    vocal = inst = None
+    sr = plan['analysis_sr']
+    if need_vocal:
+        with timer.stage('decode_vocal'):
+            vocal, sr = safe_load(args.vocal, sr)
+    if need_inst:
+        with timer.stage('decode_inst'):
+            inst, _ = safe_load(args.inst, sr)
+    
+    # 前回版の状態があれば差分区間のみ再解析
+    result, incremental = None, {'mode': 'full'}
+    if args.state:
+        with timer.stage('fingerprint'):
+            vocal_fp, inst_fp = fingerprint(vocal, sr), fingerprint(inst, sr)
+        previous = load_state(args.state)
+        if previous:
+            result, detail = analyze_incremental(
+                vocal, inst, sr, args.plan, plan, previous, vocal_fp, inst_fp, timer)
+            incremental = {'mode': 'incremental', **detail} if result else {'mode': 'full', 'reason': detail}
+    
+    # 高度解析実行（差分解析は前回結果の時刻をそのまま使うため無音の切り詰めは全体解析のみ）
+    if result is None:
+        result = analyze_full(vocal, inst, sr, args.plan, plan, timer, progress, args.stages, scan,
+                              (args.vocal, args.inst))
+    
+    if args.state:
+        save_state(args.state, vocal_fp, inst_fp, result,
+                   {'plan_code': args.plan, 'analysis_sr': sr, 'profile': plan['profile']})
+    
+    result['incremental'] = incremental
+    return result
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--vocal', required=True, help='Vocal audio file')
-    parser.add_argument('--inst', required=True, help='Instrumental audio file')
+    parser.add_argument('--vocal', required=True, help='Vocal audio file or pcm:<path|->?rate=..&channels=..&dtype=..')
+    parser.add_argument('--inst', help='Instrumental audio file or pcm: spec (required unless only pitch is analyzed)')
     parser.add_argument('--plan', default='standard', choices=['lite', 'standard', 'creator'])
-    parser.add_argument('--mode', default='analysis', choices=['analysis', 'pitch_correct'])
+    parser.add_argument('--mode', default='analysis', choices=['analysis', 'pitch_correct', 'render'])
     parser.add_argument('--corrections', help='JSON corrections for pitch_correct mode')
-    parser.add_argument('--output', help='Output file for pitch_correct mode')
+    parser.add_argument('--output', help='Output file for pitch_correct / render mode (pcm:- streams raw PCM to stdout)')
+    parser.add_argument('--time-map', metavar='PATH',
+                        help='JSON time map for render mode (analysis output or bare list); '
+                             'falls back to --state, then to a fresh DTW analysis')
+    parser.add_argument('--alignment-vocal', metavar='PATH',
+                        help='Unwarped vocal file for the post-warp alignment check in render mode '
+                             '(default: --vocal; needed when --vocal is a pipe)')
+    parser.add_argument('--stages', metavar='LIST', type=parse_stages, default=ANALYSIS_STAGES,
+                        help=f"Comma-separated analysis stages ({','.join(ANALYSIS_STAGES)}); dependencies are added "
+                             "and only the requested stages are returned (default: all)")
+    parser.add_argument('--state', metavar='PATH',
+                        help='Analysis state (.npz) from the previous upload; only changed spans are re-analyzed, '
+                             'and the new state is written back')
+    add_profile_args(parser)
+    add_scan_args(parser)
+    add_thread_args(parser)
+    add_memory_args(parser)
+    add_progress_args(parser)
+    add_pcm_args(parser)
+    add_instrumentation_args(parser)
     
     args = parser.parse_args()
+    apply_thread_budget(args.threads)
+    if args.mode == 'analysis':
+        if args.state and args.stages != ANALYSIS_STAGES:
+            parser.error('--state requires all analysis stages')
+        if 'inst' in stage_inputs(args.stages) and not args.inst:
+            parser.error(f"--inst is required for stages: {','.join(args.stages)}")
+    elif args.mode == 'render' and not args.inst:
+        parser.error('--inst is required for render mode')
+    try:
+        validate_specs([args.vocal, args.inst] if args.inst else [args.vocal], [args.output])
+    except ValueError as e:
+        parser.error(str(e))
     
-    # 音声読み込み
-    vocal, sr = safe_load(args.vocal)
-    inst, _ = safe_load(args.inst, sr)
+    with maybe_profile(args.profile):
+        run(args)
+
+def run(args):
+    timer = StageTimer(args.trace_memory)
+    budget_mb = resolve_budget(args.memory_budget)
+    # JSON結果の出力先（PCMが標準出力を使う場合は別チャネル）
+    meta = open_meta(args.meta, [args.output])
+    profile_name, profile = resolve_profile(args.plan, args.speed_profile)
+    scan = load_scan(args.scan, args.vocal)
     
     if args.mode == 'analysis':
-        # 高度解析実行
-        offset_ms, offset_conf = advanced_offset_detection(vocal, inst, sr)
-        time_map, tempo_var, tempo_improvement = dtw_tempo_analysis(vocal, inst, sr)
-        pitch_candidates = pitch_analysis_crepe(vocal, sr, args.plan)
+        # プロファイルの上限から、入力長とメモリ予算に収まる解析レート・DTW設定を決定
+        duration = read_info(args.vocal)['duration']
+        plan = dict(plan_analysis(duration, budget_mb, profile), profile=profile_name)
+        progress = ProgressReporter(args.stream, args.checkpoint, inputs_key(
+            [args.vocal, args.inst] if args.inst else [args.vocal], mode='analysis', plan=args.plan,
+            profile=profile_name, analysis_sr=plan['analysis_sr'], scan=bool(scan)), meta)
+        progress.install_signal_handlers()
         
-        result = {
-            'offset': {
-                'offset_ms': offset_ms,
-                'confidence': offset_conf
-            },
-            'tempo': {
-                'time_map': time_map,
-                'tempo_variability': tempo_var,
-                'improvement_estimate': tempo_improvement,
-                'dtw_applicable': len(time_map) > 10 and tempo_improvement > 0.3
-            },
-            'pitch': {
-                'correction_candidates': pitch_candidates,
-                'total_candidates': len(pitch_candidates)
-            }
-        }
+        try:
+            result = run_analysis(args, plan, timer, progress, scan)
+        except Cancelled:
+            # 完了済みステージ（例: DTW中ならオフセット）だけでも返す
+            partial = {name: progress.get(name) for name in args.stages if progress.done(name)}
+            timings = timer.report()
+            record_run(SCRIPT, args.mode, args.plan, timings, duration, 'cancelled')
+            progress.cancel({**partial, 'memory_plan': plan, 'timings': timings})
         
-        print(json.dumps(result, indent=2))
+        result['stages'] = list(args.stages)
+        if scan:
+            result['scan'] = {'active_ratio': scan['active_ratio'], 'silence_spans': len(scan['silence'])}
+        result['memory_plan'] = plan
+        result['threads'] = thread_report()
+        result['timings'] = timer.report()
+        cache = {'checkpoint': progress.cache_stats(args.stages)}
+        if args.state:
+            cache['incremental'] = {'hit' if result['incremental']['mode'] == 'incremental' else 'miss': 1}
+        record_run(SCRIPT, args.mode, args.plan, result['timings'], duration,
+                   cache={name: counts for name, counts in cache.items() if counts})
+        progress.finish(result)
         
     elif args.mode == 'pitch_correct':
         if not args.corrections or not args.output:
             raise ValueError("pitch_correct mode requires --corrections and --output")
         
+        duration = read_info(args.vocal)['duration']
+        plan = dict(plan_pitch_correct(duration, budget_mb), profile=profile_name,
+                    world_frame_period=profile['world_frame_period'])
+        # 出力ファイル単位の処理のためチェックポイントは使わない（進捗と中断のみ）
+        progress = ProgressReporter(args.stream, out=meta)
+        progress.install_signal_handlers()
         corrections = json.loads(args.corrections)
-        corrected_vocal = world_pitch_correction(vocal, sr, corrections)
         
-        # 出力
-        sf.write(args.output, corrected_vocal, sr)
-        print(f"Pitch-corrected vocal saved to {args.output}")
+        try:
+            # pitch_correct は伴奏を使わないためボーカルのみ読み込む
+            with timer.stage('decode_vocal'):
+                vocal, sr = safe_load(args.vocal, plan['analysis_sr'])
+            
+            # スキャンがあれば有音区間のみWORLDで分析・再合成し、無音区間は元のまま
+            segments = crop_segments(active_spans(scan), sr, len(vocal)) if scan else None
+            with timer.stage('world'):
+                if segments is None:
+                    corrected_vocal = world_pitch_correction(
+                        vocal, sr, corrections, plan['world_chunk_s'],
+                        on_progress=lambda fraction: progress.progress('world', fraction),
+                        frame_period=plan['world_frame_period'])
+                else:
+                    starts = to_cropped([c['start_time'] for c in corrections], segments, sr)
+                    corrected_vocal = uncrop(world_pitch_correction(
+                        crop(vocal, segments), sr,
+                        [dict(c, start_time=float(start)) for c, start in zip(corrections, starts)],
+                        plan['world_chunk_s'],
+                        on_progress=lambda fraction: progress.progress('world', fraction),
+                        frame_period=plan['world_frame_period']), segments, vocal)
+            
+            # 出力（拡張子に応じてWAV/FLAC/Ogg/MP3へエンコード）
+            with timer.stage('encode'):
+                write_audio(args.output, corrected_vocal, sr)
+        except Cancelled:
+            timings = timer.report()
+            record_run(SCRIPT, args.mode, args.plan, timings, duration, 'cancelled')
+            progress.cancel({'output': None, 'memory_plan': plan, 'timings': timings})
+        
+        timings = timer.report()
+        record_run(SCRIPT, args.mode, args.plan, timings, duration)
+        progress.finish({
+            'output': args.output,
+            'samplerate': sr,
+            'corrections_applied': len(corrections),
+            'memory_plan': plan,
+            'threads': thread_report(),
+            'timings': timings
+        })
+        
+    elif args.mode == 'render':
+        if not args.output:
+            raise ValueError("render mode requires --output")
+        
+        # 時間マップ: 指定ファイル → 前回解析の状態 → その場でDTW解析
+        time_map, source, dtw_applicable, plan = None, None, None, None
+        previous = load_state(args.state) if args.state else None
+        if args.time_map:
+            with open(args.time_map, encoding='utf-8') as f:
+                data = json.load(f)
+            tempo = data.get('tempo', {}) if isinstance(data, dict) else {}
+            time_map = tempo.get('time_map', data) if isinstance(data, dict) else data
+            dtw_applicable = tempo.get('dtw_applicable')
+            source = 'file'
+        elif previous:
+            tempo = previous['result']['tempo']
+            time_map, dtw_applicable, source = tempo['time_map'], tempo['dtw_applicable'], 'state'
+        else:
+            plan = dict(plan_analysis(read_info(args.vocal)['duration'], budget_mb, profile), profile=profile_name)
+            with timer.stage('decode_vocal'):
+                vocal, sr = safe_load(args.vocal, plan['analysis_sr'])
+            with timer.stage('decode_inst'):
+                inst, _ = safe_load(args.inst, sr)
+            with timer.stage('tempo'):
+                time_map, tempo_var, tempo_improvement = dtw_tempo_analysis(
+                    vocal, inst, sr, timer, plan['dtw']['max_frames'], plan['dtw']['band'], profile['chroma'])
+            dtw_applicable = tempo_result(time_map, tempo_var, tempo_improvement)['dtw_applicable']
+            source = 'computed'
+            del vocal, inst
+        
+        # 伸縮前のボーカル（パイプ入力なら --alignment-vocal）と伴奏を読み直せる場合は、描画前に効果を予測し、
+        # 固定オフセットより揃わない見込みなら WSOLA を省く
+        alignment = None
+        reference = args.alignment_vocal or (None if is_pcm(args.vocal) else args.vocal)
+        if reference:
+            with timer.stage('alignment_predict'):
+                reference_vocal, _ = safe_load(reference, ENGINE_SR)
+                reference_inst, _ = safe_load(args.inst, ENGINE_SR)
+                alignment = predict_time_warp(time_map, reference_vocal, reference_inst, ENGINE_SR)
+        
+        progress = ProgressReporter(args.stream, out=meta)
+        progress.install_signal_handlers()
+        if alignment and not alignment['passed']:
+            # パイプ入力は read_info で最後まで読み、上流を正常終了させる
+            render = {'output': None, 'input_duration': float(read_info(args.vocal)['duration']),
+                      'output_duration': None, 'skipped': 'predicted_rejection'}
+        else:
+            # 入力をブロック単位で読みながらWSOLAで伸縮し、逐次エンコード
+            try:
+                with timer.stage('time_warp'):
+                    render = render_time_warp(args.vocal, args.output, time_map,
+                                              on_progress=lambda fraction: progress.progress('time_warp', fraction))
+            except Cancelled:
+                timings = timer.report()
+                record_run(SCRIPT, args.mode, args.plan, timings, read_info(args.vocal)['duration'], 'cancelled')
+                progress.cancel({'output': None, 'time_map_source': source, 'memory_plan': plan,
+                                 'timings': timings})
+            
+            # 予測が通った場合は実際の出力で確認（出力を読み直せる場合のみ）
+            if alignment and not is_pcm(args.output):
+                with timer.stage('alignment_check'):
+                    alignment.update(check_time_warp(args.output, reference_vocal, reference_inst))
+        
+        timings = timer.report()
+        record_run(SCRIPT, args.mode, args.plan, timings, render['input_duration'],
+                   cache={'time_map': {'miss' if source == 'computed' else 'hit': 1}})
+        progress.finish({
+            **render,
+            'time_map_source': source,
+            'time_map_points': len(time_map),
+            'dtw_applicable': dtw_applicable,
+            'alignment': alignment,
+            'memory_plan': plan,
+            'threads': thread_report(),
+            'timings': timings
+        })
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,234 +1,127 @@
 #!/usr/bin/env python3
 """
 高度なオフセット検出スクリプト
-相互相関 + onset-based で ±10ms目標の精度を実現
+オフセット推定エンジン（offset_engine.py）の CLI、advanced-analysis.py のオフセットステージと同じ結果・同じキャッシュを使う
+
+best_result.offset_ms の符号はこのスクリプト従来のまま: 負 = ボーカルが伴奏より遅れて始まる
+（エンジン・advanced-analysis.py は逆符号、変換は出力時のみ）
+従来のMFCC法（spectral_method）は廃止（オンセット法の信頼度が正規化されておらず best_result に選ばれることがなかった）
 """
 
+import argparse
 import sys
 import json
-import numpy as np
-import librosa
-import scipy.signal
-from scipy.stats import pearsonr
+import time
+# numpy より先に読み込む（BLAS等のスレッド数は読み込み時に決まる）
+from thread_budget import add_thread_args, apply_thread_budget, thread_report
 from pathlib import Path
 import warnings
 
-warnings.filterwarnings('ignore')
+from offset_engine import ENGINE_SR, SEGMENT_SECONDS, detect_offset, window_start
+from pcm_io import add_pcm_args, is_pcm, open_meta, validate_specs
+from progress import Cancelled, ProgressReporter, add_progress_args, inputs_key
+from silence_map import add_scan_args, load_scan
+from memory_plan import add_memory_args, plan_offset, resolve_budget
+from worker_metrics import record_run
+from stage_timer import StageTimer, add_instrumentation_args, maybe_profile
 
-def load_audio_segment(file_path, duration=15.0, sr=22050):
-    """
-    音声ファイルの最初の部分を読み込み
-    Args:
-        file_path: 音声ファイルのパス
-        duration: 読み込み時間（秒）
-        sr: サンプリングレート
-    Returns:
-        numpy.array: オーディオデータ
-    """
-    try:
-        y, _ = librosa.load(file_path, sr=sr, duration=duration)
-        
-        # 音量正規化
-        if np.max(np.abs(y)) > 0:
-            y = y / np.max(np.abs(y))
-        
-        return y, sr
-    except Exception as e:
-        raise Exception(f"Failed to load audio {file_path}: {str(e)}")
+# モード別に実際に読み込まれる依存（起動時間予算の検証用）
+MODE_IMPORTS = {
+    'offset': ['librosa', 'scipy.signal'],
+}
 
-def extract_onset_strength(y, sr):
-    """
-    オンセット強度を抽出
-    """
-    # スペクトログラム計算
-    S = np.abs(librosa.stft(y, hop_length=512))
-    
-    # オンセット強度抽出（複数の手法を組み合わせ）
-    onset_strength_spectral = librosa.onset.onset_strength(
-        S=S, sr=sr, feature=librosa.feature.spectral_centroid
-    )
-    
-    onset_strength_melspec = librosa.onset.onset_strength(
-        y=y, sr=sr, aggregate=np.median
-    )
-    
-    # 2つの手法を重み付き平均
-    onset_strength = 0.6 * onset_strength_spectral + 0.4 * onset_strength_melspec
-    
-    return onset_strength
+warnings.filterwarnings('ignore')
 
-def cross_correlation_analysis(inst_path, vocal_path):
-    """
-    クロス相関による高精度オフセット検出
-    """
-    try:
-        # 音声データロード
-        inst_y, inst_sr = load_audio_segment(inst_path)
-        vocal_y, vocal_sr = load_audio_segment(vocal_path)
-        
-        if inst_sr != vocal_sr:
-            # サンプリングレート統一
-            vocal_y = librosa.resample(vocal_y, orig_sr=vocal_sr, target_sr=inst_sr)
-            vocal_sr = inst_sr
-        
-        # オンセット強度抽出
-        inst_onset = extract_onset_strength(inst_y, inst_sr)
-        vocal_onset = extract_onset_strength(vocal_y, vocal_sr)
-        
-        # 長さを統一（短い方に合わせる）
-        min_length = min(len(inst_onset), len(vocal_onset))
-        inst_onset = inst_onset[:min_length]
-        vocal_onset = vocal_onset[:min_length]
-        
-        # クロス相関計算
-        correlation = scipy.signal.correlate(inst_onset, vocal_onset, mode='full')
-        correlation = correlation / np.max(np.abs(correlation))  # 正規化
-        
-        # 相関の中心位置を計算
-        center = len(correlation) // 2
-        
-        # 検索範囲を制限（±2秒程度）
-        hop_length = 512
-        max_offset_samples = int(2.0 * inst_sr / hop_length)  # 2秒分
-        search_start = max(0, center - max_offset_samples)
-        search_end = min(len(correlation), center + max_offset_samples)
-        
-        # 検索範囲内で最大相関値を探索
-        search_correlation = correlation[search_start:search_end]
-        max_corr_idx = np.argmax(search_correlation)
-        global_max_idx = search_start + max_corr_idx
-        
-        # オフセット計算（ミリ秒）
-        offset_samples = global_max_idx - center
-        offset_ms = int(offset_samples * hop_length * 1000 / inst_sr)
-        
-        # 信頼度スコア計算
-        max_correlation = correlation[global_max_idx]
-        mean_correlation = np.mean(np.abs(correlation))
-        confidence = max_correlation / (mean_correlation + 1e-8)
-        
-        # 結果の妥当性チェック
-        if abs(offset_ms) > 2000:  # ±2秒を超える場合は無効
-            offset_ms = 0
-            confidence = 0.0
-        
-        return {
-            'offset_ms': offset_ms,
-            'confidence': float(confidence),
-            'max_correlation': float(max_correlation),
-            'method': 'cross_correlation_onset'
-        }
-        
-    except Exception as e:
-        return {
-            'offset_ms': 0,
-            'confidence': 0.0,
-            'error': str(e),
-            'method': 'cross_correlation_onset'
-        }
+# メトリクスのscriptラベル
+SCRIPT = 'advanced-offset'
 
-def spectral_analysis_method(inst_path, vocal_path):
-    """
-    スペクトル解析によるオフセット検出（補助手法）
-    """
-    try:
-        # 音声データロード
-        inst_y, inst_sr = load_audio_segment(inst_path)
-        vocal_y, vocal_sr = load_audio_segment(vocal_path)
-        
-        if inst_sr != vocal_sr:
-            vocal_y = librosa.resample(vocal_y, orig_sr=vocal_sr, target_sr=inst_sr)
-        
-        # MFCC特徴量抽出
-        inst_mfcc = librosa.feature.mfcc(y=inst_y, sr=inst_sr, n_mfcc=13)
-        vocal_mfcc = librosa.feature.mfcc(y=vocal_y, sr=vocal_sr, n_mfcc=13)
-        
-        # 時間軸平均でスペクトル特徴を比較
-        inst_spectral = np.mean(inst_mfcc, axis=0)
-        vocal_spectral = np.mean(vocal_mfcc, axis=0)
-        
-        # 長さを統一
-        min_length = min(len(inst_spectral), len(vocal_spectral))
-        inst_spectral = inst_spectral[:min_length]
-        vocal_spectral = vocal_spectral[:min_length]
-        
-        # クロス相関
-        correlation = scipy.signal.correlate(inst_spectral, vocal_spectral, mode='full')
-        correlation = correlation / np.max(np.abs(correlation))
-        
-        center = len(correlation) // 2
-        max_corr_idx = np.argmax(correlation)
-        
-        # オフセット計算
-        offset_samples = max_corr_idx - center
-        hop_length = 512
-        offset_ms = int(offset_samples * hop_length * 1000 / inst_sr)
-        
-        confidence = correlation[max_corr_idx]
-        
-        if abs(offset_ms) > 2000:
-            offset_ms = 0
-            confidence = 0.0
-        
-        return {
-            'offset_ms': offset_ms,
-            'confidence': float(confidence),
-            'method': 'spectral_mfcc'
-        }
-        
-    except Exception as e:
-        return {
-            'offset_ms': 0,
-            'confidence': 0.0,
-            'error': str(e),
-            'method': 'spectral_mfcc'
-        }
+def script_result(result):
+    """エンジンの結果をこのスクリプトの符号（負 = ボーカルが遅れている）に変換"""
+    return {**result, 'offset_ms': 0.0 - result['offset_ms']}
 
 def main():
-    if len(sys.argv) != 3:
-        print(json.dumps({'error': 'Usage: python advanced-offset.py <inst_path> <vocal_path>'}))
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Advanced offset detection')
+    parser.add_argument('inst_path', help='Instrumental audio file or pcm:<path|->?rate=..&channels=..&dtype=..')
+    parser.add_argument('vocal_path', help='Vocal audio file or pcm: spec')
+    add_scan_args(parser)
+    add_thread_args(parser)
+    add_memory_args(parser)
+    add_progress_args(parser)
+    add_pcm_args(parser)
+    add_instrumentation_args(parser)
+    args = parser.parse_args()
+    apply_thread_budget(args.threads)
+    try:
+        validate_specs([args.inst_path, args.vocal_path])
+    except ValueError as e:
+        parser.error(str(e))
     
-    inst_path = sys.argv[1]
-    vocal_path = sys.argv[2]
+    inst_path = args.inst_path
+    vocal_path = args.vocal_path
     
     # ファイル存在チェック
-    if not Path(inst_path).exists():
+    if not is_pcm(inst_path) and not Path(inst_path).exists():
         print(json.dumps({'error': f'Instrumental file not found: {inst_path}'}))
         sys.exit(1)
     
-    if not Path(vocal_path).exists():
+    if not is_pcm(vocal_path) and not Path(vocal_path).exists():
         print(json.dumps({'error': f'Vocal file not found: {vocal_path}'}))
         sys.exit(1)
     
+    timer = StageTimer(args.trace_memory)
+    # 解析は先頭区間のみ（入力長に依存しない、スキャンがあれば先頭の無音を飛ばす）
+    # サンプルレートは常に ENGINE_SR（advanced-analysis と同じ結果）、予算で縮めるのは窓の長さだけ
+    plan = plan_offset(SEGMENT_SECONDS, ENGINE_SR, resolve_budget(args.memory_budget))
+    segment = plan['segment_s']
+    scan = load_scan(args.scan, vocal_path)
+    progress = ProgressReporter(args.stream, args.checkpoint, inputs_key(
+        [inst_path, vocal_path], analysis_sr=ENGINE_SR, segment=segment, segment_start=window_start(scan, segment)),
+        open_meta(args.meta))
+    progress.install_signal_handlers()
     try:
-        # 複数手法で解析
-        result1 = cross_correlation_analysis(inst_path, vocal_path)
-        result2 = spectral_analysis_method(inst_path, vocal_path)
-        
-        # 信頼度に基づいて最適な結果を選択
-        if result1['confidence'] > result2['confidence']:
-            best_result = result1
-        else:
-            best_result = result2
+        cached = progress.done('offset')
+        if not cached:
+            with maybe_profile(args.profile):
+                # advanced-analysis.py が先に同じ入力を解析していればキャッシュから返る
+                with timer.stage('offset'):
+                    result, cached = detect_offset(inst_path, vocal_path, scan, segment=segment)
+                progress.complete('offset', result)
+        result = script_result(progress.get('offset'))
         
-        # 両手法の結果を含める
         output = {
-            'best_result': best_result,
-            'onset_method': result1,
-            'spectral_method': result2,
-            'timestamp': librosa.util.__time_to_frames(1, sr=22050)[0]  # メタデータ
+            'best_result': result,
+            'cached': cached,
+            'timestamp': time.time(),  # メタデータ
+            'segment_start_s': result['segment_start_s'],
+            'memory_plan': plan,
+            'threads': thread_report(),
+            'timings': timer.report()
         }
         
-        print(json.dumps(output, indent=2))
+        record_run(SCRIPT, 'offset', None, output['timings'], segment,
+                   cache={'offset': {'hit' if cached else 'miss': 1}})
+        progress.finish(output)
+        
+    except Cancelled:
+        timings = timer.report()
+        record_run(SCRIPT, 'offset', None, timings, segment, 'cancelled')
+        progress.cancel({
+            'best_result': {'offset_ms': 0, 'confidence': 0.0, 'method': 'fallback'},
+            'timestamp': time.time(),
+            'segment_start_s': window_start(scan, segment),
+            'memory_plan': plan,
+            'timings': timings
+        })
         
     except Exception as e:
         error_output = {
             'error': f'Analysis failed: {str(e)}',
-            'best_result': {'offset_ms': 0, 'confidence': 0.0, 'method': 'fallback'}
+            'best_result': {'offset_ms': 0, 'confidence': 0.0, 'method': 'fallback'},
+            'timings': timer.report()
         }
+        record_run(SCRIPT, 'offset', None, error_output['timings'], segment, 'error')
         print(json.dumps(error_output))
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -2,6 +2,8 @@ import { execa } from 'execa'
 import ffmpegStatic from 'ffmpeg-static'
 import { promises as fs } from 'fs'
 import path from 'path'
+import { pythonEnv } from './thread-budget'
+import { schedulePython } from './python-scheduler'
 import { getPresetParams, getDefaultPreset, type PresetKey } from './presets'
 
 const ffmpegPath = ffmpegStatic
@@ -70,23 +72,49 @@ export async function getAudioInfo(filePath: string) {
   }
 }
 
+/**
+ * アップロード音声のクイックスキャン（1回のデコードで長さ・ピーク・RMSエンベロープ・無音マップ）
+ * 完全版は outputPath に保存され、後段の解析に --scan で渡す（戻り値はエンベロープを除いた要約）
+ */
+export async function quickScan(filePath: string, outputPath: string): Promise<any> {
+  const result = await schedulePython({ jobClass: 'light', inputPath: filePath, timeoutMs: 30000, label: 'quick-scan' }, (slot) =>
+    execa('python3', [
+      path.join(__dirname, 'quick-scan.py'),
+      '--input', filePath,
+      '--output', outputPath
+    ], {
+      timeout: 30000,
+      encoding: 'utf8',
+      env: pythonEnv(1, slot)
+    })
+  )
+  return JSON.parse(result.stdout)
+}
+
 /**
  * オフセット検出（改良版クロス相関ベース）
  * より精度の高いオフセット検出を実装
+ * scanPath があればボーカル先頭の無音を飛ばして解析する
+ * 戻り値は advanced-offset.py の best_result.offset_ms（負 = ボーカルが伴奏より遅れている）
  */
-export async function detectOffset(instrumentalPath: string, vocalPath: string): Promise<number> {
+export async function detectOffset(instrumentalPath: string, vocalPath: string, scanPath?: string): Promise<number> {
   console.log('🔍 Starting advanced offset detection...')
   
   try {
     // 高精度Python解析を試行
-    const result = await execa('python3', [
-      path.join(__dirname, 'advanced-offset.py'),
-      instrumentalPath,
-      vocalPath
-    ], {
-      timeout: 30000,
-      encoding: 'utf8'
-    })
+    // 混雑で受け付けられない場合は catch 側の FFmpeg 版で代替する
+    const result = await schedulePython({ jobClass: 'light', inputPath: vocalPath, timeoutMs: 30000, label: 'advanced-offset' }, (slot) =>
+      execa('python3', [
+        path.join(__dirname, 'advanced-offset.py'),
+        instrumentalPath,
+        vocalPath,
+        ...(scanPath ? ['--scan', scanPath] : [])
+      ], {
+        timeout: 30000,
+        encoding: 'utf8',
+        env: pythonEnv(1, slot)
+      })
+    )
     
     const analysis = JSON.parse(result.stdout)
     
@@ -0,0 +1,115 @@
+"""
+音声ファイル出力ユーティリティ
+libsndfile (soundfile) で WAV/FLAC/Ogg/MP3 へ直接エンコード
+pcm: 指定（pcm_io）の入出力は生PCMとして扱う
+"""
+import os
+
+import numpy as np
+
+from lazy_deps import lazy_import
+from pcm_io import PcmWriter, is_pcm, iter_pcm_blocks, pcm_info, write_pcm
+
+sf = lazy_import('soundfile')
+
+# 出力フォーマット → (libsndfile format, subtype)
+OUTPUT_FORMATS = {
+    'wav': ('WAV', 'PCM_16'),
+    'flac': ('FLAC', 'PCM_16'),
+    'ogg': ('OGG', 'VORBIS'),
+    'mp3': ('MP3', 'MPEG_LAYER_III'),
+}
+
+def output_path_for(output_dir, stem, fmt):
+    """出力ファイルパスを生成"""
+    return os.path.join(output_dir, f"{stem}.{fmt}")
+
+def _resolve_format(path, fmt):
+    """fmt未指定時は拡張子から判定（不明ならWAV）"""
+    if fmt is None:
+        fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    file_format, subtype = OUTPUT_FORMATS.get(fmt, OUTPUT_FORMATS['wav'])
+
+    if file_format not in sf.available_formats():
+        raise RuntimeError(f"Output format '{fmt}' is not supported by libsndfile {sf.__libsndfile_version__}")
+    return file_format, subtype
+
+def write_audio(path, audio, sr, fmt=None):
+    """
+    音声をフォーマットに応じてエンコードして書き出す
+    fmt未指定時は拡張子から判定（不明ならWAV）
+    """
+    if is_pcm(path):
+        return write_pcm(path, audio, sr)
+    file_format, subtype = _resolve_format(path, fmt)
+
+    # 非可逆コーデックはクリップ前提のfloat入力を要求
+    data = np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0)
+    sf.write(path, data, sr, format=file_format, subtype=subtype)
+    return path
+
+class StreamWriter:
+    """
+    ブロック単位で追記エンコードする出力（全体をメモリに保持しない）
+    with StreamWriter(path, sr, channels) as writer: writer.write(block)
+    """
+
+    def __init__(self, path, sr, channels, fmt=None):
+        file_format, subtype = _resolve_format(path, fmt)
+        self.path = path
+        self.frames = 0
+        self._file = sf.SoundFile(path, 'w', samplerate=sr, channels=channels,
+                                  format=file_format, subtype=subtype)
+
+    def write(self, block):
+        data = np.clip(np.asarray(block, dtype=np.float32), -1.0, 1.0)
+        self._file.write(data)
+        self.frames += len(data)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_writer(path, sr, channels, fmt=None):
+    """StreamWriter（pcm: 指定なら PcmWriter）"""
+    if is_pcm(path):
+        return PcmWriter(path, sr, channels)
+    return StreamWriter(path, sr, channels, fmt)
+
+def read_info(path):
+    """サンプルレート・チャンネル数・長さ（秒）を取得（デコードなし）"""
+    if is_pcm(path):
+        return pcm_info(path)
+    try:
+        info = sf.info(path)
+        return {'samplerate': info.samplerate, 'channels': info.channels, 'duration': info.duration}
+    except RuntimeError:
+        import librosa
+        sr = librosa.get_samplerate(path)
+        return {'samplerate': sr, 'channels': None, 'duration': librosa.get_duration(path=path)}
+
+def iter_blocks(path, blocksize, overlap=0):
+    """
+    音声ファイルを (frames, channels) のfloat32ブロックで順次読み込む
+    libsndfile非対応形式は librosa でデコードしてから分割する
+    """
+    if is_pcm(path):
+        yield from iter_pcm_blocks(path, blocksize, overlap)
+        return
+    try:
+        sf.info(path)
+    except RuntimeError:
+        import librosa
+        y, _ = librosa.load(path, sr=None, mono=False)
+        y = np.atleast_2d(y).T.astype(np.float32)
+        step = blocksize - overlap
+        for start in range(0, max(len(y) - overlap, 1), step):
+            yield y[start:start + blocksize]
+        return
+
+    yield from sf.blocks(path, blocksize=blocksize, overlap=overlap, dtype='float32', always_2d=True)
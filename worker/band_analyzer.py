@@ -0,0 +1,139 @@
+"""
+ストリーミング帯域エネルギー解析
+Welch方式（50%オーバーラップ）でブロックごとにスペクトルを積算し、
+事前計算した帯域行列で帯域エネルギーと1/3オクターブ傾斜を求める
+メモリ使用量はトラック長に依存しない
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from lazy_deps import lazy_import
+
+sp_fft = lazy_import('scipy.fft')
+
+N_FFT = 2048
+HOP_LENGTH = N_FFT // 2
+FRAMES_PER_BATCH = 512
+
+# トーナル解析用の帯域（Hz）
+TONAL_BANDS = {
+    'low': (80, 350),
+    'mid': (350, 4000),
+    'high': (4000, 16000),
+}
+
+# 1/3オクターブ中心周波数（IEC 61260 基準、25Hz〜16kHz）
+THIRD_OCTAVE_CENTERS = 1000.0 * 2.0 ** (np.arange(-16, 13) / 3.0)
+
+def band_matrix(freqs, bands):
+    """
+    帯域平均行列 (n_bands, n_bins)
+    各行は帯域内ビンで1/ビン数（空帯域は0行）
+    """
+    matrix = np.zeros((len(bands), len(freqs)), dtype=np.float64)
+    for i, (lo, hi) in enumerate(bands):
+        mask = (freqs >= lo) & (freqs <= hi)
+        count = mask.sum()
+        if count:
+            matrix[i, mask] = 1.0 / count
+    return matrix
+
+def third_octave_bands(centers=THIRD_OCTAVE_CENTERS):
+    """1/3オクターブ帯域の (下限, 上限) リスト"""
+    edge = 2.0 ** (1.0 / 6.0)
+    return [(c / edge, c * edge) for c in centers]
+
+class BandEnergyAnalyzer:
+    """
+    ブロック単位で振幅・パワースペクトルを積算する解析器
+    feed() でブロックを投入し、band_means()/spectral_tilt() で帯域値を取得
+    """
+
+    def __init__(self, sr, n_fft=N_FFT, hop_length=HOP_LENGTH, bands=None):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = np.hanning(n_fft).astype(np.float32)
+        self.freqs = np.fft.rfftfreq(n_fft, d=1.0 / sr)
+
+        self.bands = dict(bands or TONAL_BANDS)
+        self.tonal_matrix = band_matrix(self.freqs, list(self.bands.values()))
+
+        # ナイキストを超える1/3オクターブ帯域は除外
+        centers = THIRD_OCTAVE_CENTERS[THIRD_OCTAVE_CENTERS * 2.0 ** (1.0 / 6.0) < sr / 2]
+        self.third_octave_centers = centers
+        self.third_octave_matrix = band_matrix(self.freqs, third_octave_bands(centers))
+
+        self.mag_sum = np.zeros(len(self.freqs), dtype=np.float64)
+        self.power_sum = np.zeros(len(self.freqs), dtype=np.float64)
+        self.n_frames = 0
+        self._tail = np.zeros(0, dtype=np.float32)
+
+    def feed(self, block):
+        """モノラルブロックを投入（フレーム境界は内部で持ち越し）"""
+        y = np.concatenate((self._tail, np.asarray(block, dtype=np.float32)))
+        if len(y) < self.n_fft:
+            self._tail = y
+            return
+
+        frames = sliding_window_view(y, self.n_fft)[::self.hop_length]
+        for start in range(0, len(frames), FRAMES_PER_BATCH):
+            spec = sp_fft.rfft(frames[start:start + FRAMES_PER_BATCH] * self.window, axis=1)
+            power = spec.real ** 2 + spec.imag ** 2
+            self.power_sum += power.sum(axis=0)
+            self.mag_sum += np.sqrt(power).sum(axis=0)
+
+        self.n_frames += len(frames)
+        self._tail = y[len(frames) * self.hop_length:]
+
+    def reset_continuity(self):
+        """不連続な区間の間でフレームがまたがらないよう端数を破棄"""
+        self._tail = np.zeros(0, dtype=np.float32)
+
+    def band_means(self):
+        """帯域ごとの平均振幅（従来のSTFTマスク平均と同じ定義）"""
+        if self.n_frames == 0:
+            return {name: 0.0 for name in self.bands}
+        mean_mag = self.mag_sum / self.n_frames
+        values = self.tonal_matrix @ mean_mag
+        return {name: float(v) for name, v in zip(self.bands, values)}
+
+    def spectral_tilt(self):
+        """
+        1/3オクターブ帯域レベル（dB）と傾斜（dB/oct）
+        傾斜は log2(周波数) に対する最小二乗直線の傾き
+        """
+        if self.n_frames == 0:
+            return {'centers_hz': [], 'levels_db': [], 'tilt_db_per_octave': 0.0}
+        mean_power = self.power_sum / self.n_frames
+        band_power = self.third_octave_matrix @ mean_power
+        valid = band_power > 0
+        levels_db = 10 * np.log10(band_power + 1e-20)
+
+        tilt = 0.0
+        if valid.sum() >= 2:
+            x = np.log2(self.third_octave_centers[valid])
+            tilt = float(np.polyfit(x, levels_db[valid], 1)[0])
+
+        return {
+            'centers_hz': [round(float(c), 1) for c in self.third_octave_centers[valid]],
+            'levels_db': [round(float(l), 2) for l in levels_db[valid]],
+            'tilt_db_per_octave': tilt
+        }
+
+def analyze_bands(y, sr, block_size=1 << 18):
+    """メモリ上の信号をブロック単位で解析"""
+    analyzer = BandEnergyAnalyzer(sr)
+    for start in range(0, len(y), block_size):
+        analyzer.feed(y[start:start + block_size])
+    return analyzer
+
+def analyze_bands_file(path, block_seconds=10.0):
+    """ファイル全体をデコードしながらストリーミング解析（ネイティブSRのまま）"""
+    from audio_io import iter_blocks, read_info
+
+    sr = read_info(path)['samplerate']
+    analyzer = BandEnergyAnalyzer(sr)
+    for block in iter_blocks(path, int(block_seconds * sr)):
+        analyzer.feed(block.mean(axis=1))
+    return analyzer
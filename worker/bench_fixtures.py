@@ -0,0 +1,118 @@
+"""
+ベンチマーク・評価用の合成フィクスチャ
+正解（オフセット・ずらしたノート）が既知のボーカル/伴奏ペアを決定的に生成
+"""
+import importlib.util
+import os
+
+import numpy as np
+
+SR = 44100
+NOTE_SECONDS = 0.5
+GAP_SECONDS = 0.1
+# Cメジャースケール（C4〜C5）
+SCALE_MIDI = [60, 62, 64, 65, 67, 69, 71, 72]
+
+def midi_to_hz(midi):
+    return 440.0 * 2 ** ((midi - 69) / 12)
+
+def _tone(f0, n, sr, partials=(1.0, 0.5, 0.25)):
+    """倍音付きトーン（ADSR風エンベロープ）"""
+    t = np.arange(n) / sr
+    y = sum(a * np.sin(2 * np.pi * f0 * (k + 1) * t) for k, a in enumerate(partials))
+    attack = min(n, int(0.02 * sr))
+    release = min(n - attack, int(0.05 * sr))
+    env = np.ones(n)
+    env[:attack] = np.linspace(0, 1, attack)
+    if release:
+        env[-release:] = np.linspace(1, 0, release)
+    return y * env
+
+def _click(n, sr, rng):
+    """減衰ノイズバーストのクリック"""
+    length = min(n, int(0.03 * sr))
+    burst = rng.standard_normal(length) * np.exp(-np.arange(length) / (0.005 * sr))
+    out = np.zeros(n)
+    out[:length] = burst
+    return out
+
+def make_fixture(duration, sr=SR, offset_ms=120.0, detune_cents=40.0, detune_every=4,
+                 tempo_ratio=1.0, seed=0, gap_jitter=0.0):
+    """
+    合成ボーカル/伴奏ペアを生成
+    - ボーカル: スケール上のノート列、detune_every 個ごとに detune_cents ずらす
+    - 伴奏: ノート頭に揃えたクリック + ベース音
+    - ボーカルは伴奏に対して offset_ms 遅れて開始
+    - tempo_ratio != 1 の場合ボーカルのノート間隔を伸縮（DTW評価用）
+    - gap_jitter > 0 の場合ノート間隔に 0〜gap_jitter 秒のランダムな揺らぎを加える
+      （等間隔だとオフセットがノート周期分だけ曖昧になるため、精度評価ではこちらを使う）
+    """
+    rng = np.random.default_rng(seed)
+    n = int(duration * sr)
+    vocal = np.zeros(n)
+    inst = np.zeros(n)
+    offset = int(offset_ms * sr / 1000)
+
+    notes = []
+    step = NOTE_SECONDS + GAP_SECONDS
+    i = 0
+    t = 0.5
+    while t + step + gap_jitter < duration - offset_ms / 1000:
+        midi = SCALE_MIDI[i % len(SCALE_MIDI)]
+        cents = detune_cents if detune_every and i % detune_every == detune_every - 1 else 0.0
+
+        inst_start = int(t * sr)
+        note_len = int(NOTE_SECONDS * sr)
+        inst[inst_start:inst_start + note_len] += 0.6 * _click(note_len, sr, rng)
+        inst[inst_start:inst_start + note_len] += 0.3 * _tone(midi_to_hz(midi - 24), note_len, sr, (1.0, 0.3))
+
+        v_time = t * tempo_ratio
+        v_start = int(v_time * sr) + offset
+        v_len = min(int(NOTE_SECONDS * tempo_ratio * sr), n - v_start)
+        if v_len > 0:
+            vocal[v_start:v_start + v_len] += 0.5 * _tone(midi_to_hz(midi + cents / 100), v_len, sr)
+            notes.append({
+                'start_time': v_start / sr,
+                'duration': v_len / sr,
+                'midi': midi,
+                'cent_error': cents
+            })
+
+        t += step + (rng.uniform(0.0, gap_jitter) if gap_jitter else 0.0)
+        i += 1
+
+    vocal += 0.001 * rng.standard_normal(n)
+    inst += 0.001 * rng.standard_normal(n)
+    return {
+        'vocal': vocal.astype(np.float32),
+        'inst': inst.astype(np.float32),
+        'sr': sr,
+        'duration': duration,
+        'truth': {
+            'offset_ms': offset_ms,
+            'tempo_ratio': tempo_ratio,
+            'notes': notes,
+            'detuned_notes': [note for note in notes if note['cent_error'] != 0]
+        }
+    }
+
+def write_fixture(fixture, directory, prefix='fixture'):
+    """フィクスチャをWAVで書き出してパスを返す"""
+    import soundfile as sf
+
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for key in ('vocal', 'inst'):
+        path = os.path.join(directory, f"{prefix}_{int(fixture['duration'])}s_{key}.wav")
+        sf.write(path, fixture[key], fixture['sr'], subtype='FLOAT')
+        paths[key] = path
+    return paths
+
+def load_script(name):
+    """ハイフン付きワーカースクリプトをモジュールとして読み込む"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    module_name = os.path.splitext(name)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
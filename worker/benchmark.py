@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+ワーカー各ステージのベンチマーク
+合成フィクスチャで処理時間・CPU時間・ピークメモリを計測し、
+ベースラインと比較して閾値を超える劣化を検出する
+
+Usage:
+python worker/benchmark.py --durations 10 30 60 --save-baseline
+python worker/benchmark.py --compare
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+from bench_fixtures import load_script, make_fixture, write_fixture
+from chroma_frontend import chroma_features
+from memory_plan import DTW_FRAME_OPTIONS
+import offset_engine
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+DEFAULT_DURATIONS = [10, 30, 60]
+
+def build_stages(fixture, paths):
+    """
+    計測対象ステージ（名前 → 引数なし呼び出し）
+    スクリプトは実運用と同じ関数をそのまま呼ぶ
+    """
+    analysis = load_script('advanced-analysis.py')
+    harmony = load_script('harmony-generator.py')
+    reference = load_script('reference-analysis.py')
+    quick_scan = load_script('quick-scan.py')
+
+    sr = fixture['sr']
+    vocal, inst = fixture['vocal'], fixture['inst']
+    vocal_22k = offset_engine.load_window(paths['vocal'], 0.0)
+    inst_22k = offset_engine.load_window(paths['inst'], 0.0)
+    corrections = [
+        {
+            'start_time': note['start_time'],
+            'duration': note['duration'],
+            'recommended_correction': -note['cent_error']
+        }
+        for note in fixture['truth']['detuned_notes']
+    ]
+
+    return {
+        'quick_scan': lambda: quick_scan.scan_audio(paths['vocal']),
+        'onset_envelope': lambda: offset_engine.onset_envelope(inst_22k, offset_engine.ENGINE_SR),
+        'estimate_offset': lambda: offset_engine.estimate_offset(vocal_22k, inst_22k, offset_engine.ENGINE_SR),
+        'dtw_tempo_analysis': lambda: analysis.dtw_tempo_analysis(vocal, inst, sr),
+        'chroma_features_cqt': lambda: chroma_features(inst, sr, 'cqt', DTW_FRAME_OPTIONS[0]),
+        'chroma_features_stft': lambda: chroma_features(inst, sr, 'stft', DTW_FRAME_OPTIONS[0]),
+        'chroma_features_beat': lambda: chroma_features(inst, sr, 'beat', DTW_FRAME_OPTIONS[0]),
+        'pitch_analysis_crepe': lambda: analysis.pitch_analysis_crepe(vocal, sr, 'standard'),
+        'world_pitch_correction': lambda: analysis.world_pitch_correction(vocal, sr, corrections),
+        'generate_all_harmonies': lambda: harmony.generate_all_harmonies(vocal, sr),
+        'analyze_reference_track': lambda: reference.analyze_reference_track(paths['inst']),
+    }
+
+def measure(fn, repeat=1):
+    """
+    wall/CPU時間（repeat回の最小）とピークメモリ（tracemalloc、別実行）を計測
+    """
+    fn()  # ウォームアップ（numba JIT・キャッシュ構築を除外）
+
+    walls, cpus = [], []
+    for _ in range(repeat):
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        fn()
+        walls.append(time.perf_counter() - wall0)
+        cpus.append(time.process_time() - cpu0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'wall_s': min(walls), 'cpu_s': min(cpus), 'peak_mb': peak / 1e6}
+
+def run_benchmarks(durations, stages=None, repeat=1, workdir=None):
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for duration in durations:
+            fixture = make_fixture(duration)
+            paths = write_fixture(fixture, tmp)
+            for name, fn in build_stages(fixture, paths).items():
+                if stages and name not in stages:
+                    continue
+                stats = measure(fn, repeat)
+                stats['rtf'] = stats['wall_s'] / duration
+                results[f"{name}@{duration:g}s"] = stats
+                print(f"{name:<28} {duration:>4g}s  wall {stats['wall_s']:7.3f}s  "
+                      f"cpu {stats['cpu_s']:7.3f}s  peak {stats['peak_mb']:8.1f}MB", file=sys.stderr)
+    return results
+
+def compare(results, baseline, threshold):
+    """ベースライン比で threshold を超えて悪化した項目を返す"""
+    regressions = []
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric in ('wall_s', 'peak_mb'):
+            if base[metric] > 0 and stats[metric] > base[metric] * (1 + threshold):
+                regressions.append({
+                    'stage': key,
+                    'metric': metric,
+                    'baseline': base[metric],
+                    'current': stats[metric],
+                    'ratio': stats[metric] / base[metric]
+                })
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='MIXAI worker stage benchmarks')
+    parser.add_argument('--durations', type=float, nargs='+', default=DEFAULT_DURATIONS,
+                        help='Fixture durations in seconds')
+    parser.add_argument('--stages', nargs='+', help='Only run these stages')
+    parser.add_argument('--repeat', type=int, default=1, help='Timed repetitions (best is kept)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON path')
+    parser.add_argument('--save-baseline', action='store_true', help='Write results as the new baseline')
+    parser.add_argument('--compare', action='store_true', help='Fail on regressions against the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown / memory growth ratio before flagging (default 0.25)')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.durations, args.stages, args.repeat)
+    output = {'results': results}
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            parser.error(f"Baseline not found: {args.baseline}")
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        output['regressions'] = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')}, f, indent=2)
+
+    print(json.dumps(output, indent=2))
+    if output.get('regressions'):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+DTW用のクロマ特徴量フロントエンド
+- 11.025kHz に間引いてから計算（クロマに必要な帯域は C8 ≒ 4.2kHz まで）
+- cqt: 定Q変換カーネル（Brown–Puckette）/ stft: クロマフィルタバンク / beat: stft をビート同期で集約
+- カーネルは (sr, n_fft, bins) ごとにディスクへキャッシュし、プロセス起動ごとの再構築を省く
+- フレームはブロック単位で処理し、DTW解像度（max_frames）に合わせて平均プーリングする
+"""
+import math
+import os
+import tempfile
+
+import numpy as np
+
+from lazy_deps import lazy_import
+
+signal = lazy_import('scipy.signal')
+librosa = lazy_import('librosa')
+
+KERNEL_CACHE_ENV = 'MIXAI_KERNEL_CACHE_DIR'
+DEFAULT_KERNEL_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'mixai-kernels')
+
+CHROMA_METHODS = ('cqt', 'stft', 'beat')
+CHROMA_SR = 11025
+# 11.6ms（従来の 44.1kHz・hop 512 と同じフレーム間隔）
+BASE_HOP = 128
+STFT_N_FFT = 2048
+CQT_N_FFT = 4096
+# C2〜C8（72ビン、12ビン/オクターブ）
+CQT_FMIN = 65.40639132514966
+CQT_BINS = 72
+# STFTを一度に計算するフレーム数（作業メモリ上限）
+BLOCK_FRAMES = 1024
+
+# プロセス内のカーネル（ディスクから読み込み済み）
+_kernels = {}
+
+def kernel_cache_dir():
+    """キャッシュ先（環境変数が空文字・off ならディスクに保存しない）"""
+    path = os.environ.get(KERNEL_CACHE_ENV)
+    if path is None:
+        return DEFAULT_KERNEL_CACHE_DIR
+    if path.strip().lower() in ('', 'off', '0', 'false'):
+        return None
+    return path
+
+def cached_kernel(name, build, **config):
+    """名前と設定ごとのカーネルをメモリ → ディスク → 構築 の順で取得"""
+    key = name + ''.join(f"_{k}{v}" for k, v in sorted(config.items()))
+    if key in _kernels:
+        return _kernels[key]
+    directory = kernel_cache_dir()
+    path = os.path.join(directory, key + '.npy') if directory else None
+    kernel = None
+    if path and os.path.exists(path):
+        try:
+            kernel = np.load(path)
+        except (OSError, ValueError):
+            kernel = None  # 壊れたキャッシュは作り直す
+    if kernel is None:
+        kernel = build(**config)
+        if path:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp.npy"
+                np.save(tmp, kernel)
+                os.replace(tmp, path)
+            except OSError:
+                pass  # キャッシュできなくても計算は続ける
+    _kernels[key] = kernel
+    return kernel
+
+def build_cqt_kernel(sr, n_fft, bins, fmin):
+    """
+    定Q変換のスペクトルカーネル (bins, n_fft/2+1)
+    各ビンは中心周波数 f_k、長さ Q*sr/f_k のハン窓付き複素正弦波のFFT（の複素共役）
+    """
+    q = 1.0 / (2 ** (1 / 12) - 1)
+    kernel = np.zeros((bins, n_fft // 2 + 1), dtype=np.complex64)
+    for k in range(bins):
+        freq = fmin * 2 ** (k / 12)
+        length = min(int(math.ceil(q * sr / freq)), n_fft)
+        n = np.arange(length)
+        atom = np.hanning(length) * np.exp(2j * np.pi * freq * n / sr) / length
+        start = (n_fft - length) // 2
+        padded = np.zeros(n_fft, dtype=np.complex128)
+        padded[start:start + length] = atom
+        spectrum = np.fft.fft(padded)[:n_fft // 2 + 1]
+        spectrum[np.abs(spectrum) < 0.0054 * np.abs(spectrum).max()] = 0  # 疎化（寄与の小さい成分を除く）
+        kernel[k] = np.conj(spectrum)
+    return kernel
+
+def build_stft_kernel(sr, n_fft, bins):
+    """STFTパワー → クロマのフィルタバンク (bins, n_fft/2+1)（librosa.feature.chroma_stft と同じ）"""
+    return librosa.filters.chroma(sr=sr, n_fft=n_fft, n_chroma=bins).astype(np.float32)
+
+def decimate(y, sr, target_sr=CHROMA_SR):
+    """クロマ用に間引き（ポリフェーズ、target_sr 以下ならそのまま）"""
+    if sr <= target_sr:
+        return np.asarray(y, dtype=np.float32), sr
+    g = math.gcd(int(sr), int(target_sr))
+    return signal.resample_poly(y, target_sr // g, sr // g).astype(np.float32), target_sr
+
+def _frames(y, n_fft, hop):
+    """中心揃えのフレーム（ビュー）"""
+    padded = np.pad(y, n_fft // 2)
+    if len(padded) < n_fft:
+        padded = np.pad(padded, (0, n_fft - len(padded)))
+    return np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop]
+
+def _blocked_spectra(y, n_fft, hop, project):
+    """ブロックごとに窓掛け → rfft → project(spectrum) を計算して連結"""
+    frames = _frames(y, n_fft, hop)
+    window = np.hanning(n_fft).astype(np.float32)
+    out = []
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        spectrum = np.fft.rfft(frames[start:start + BLOCK_FRAMES] * window, axis=1)
+        out.append(project(spectrum))
+    return np.concatenate(out, axis=0).T
+
+def _normalize(chroma):
+    """フレームごとに最大値で正規化（librosa の norm=inf 相当）"""
+    return chroma / (np.max(chroma, axis=0, keepdims=True) + 1e-9)
+
+def _pool(chroma, times, factor):
+    """factor フレームずつ平均（間引きではなく集約するため短いノートも残る）"""
+    if factor <= 1:
+        return chroma, times
+    n = chroma.shape[1]
+    starts = np.arange(0, n, factor)
+    sums = np.add.reduceat(chroma, starts, axis=1)
+    counts = np.diff(np.append(starts, n))
+    return sums / counts, times[starts]
+
+def cqt_chroma(y, sr, hop):
+    kernel = cached_kernel('cqt', build_cqt_kernel, sr=sr, n_fft=CQT_N_FFT, bins=CQT_BINS, fmin=round(CQT_FMIN, 3))
+    cqt = _blocked_spectra(y, CQT_N_FFT, hop, lambda spectrum: np.abs(spectrum @ kernel.T))
+    # C始まりなので ビン % 12 がピッチクラス
+    return cqt.reshape(CQT_BINS // 12, 12, -1).sum(axis=0)
+
+def stft_chroma(y, sr, hop):
+    kernel = cached_kernel('stft_chroma', build_stft_kernel, sr=sr, n_fft=STFT_N_FFT, bins=12)
+    return _blocked_spectra(y, STFT_N_FFT, hop, lambda spectrum: (np.abs(spectrum) ** 2) @ kernel.T)
+
+def chroma_features(y, sr, method='stft', max_frames=None):
+    """
+    クロマ (12, n) とフレーム時刻 (n,) 秒
+    max_frames 指定時はフレーム数がそれ以下になるようホップ拡大と平均プーリングで縮約
+    （ホップは窓の半分まで広げ、残りはプーリング）
+    """
+    if method not in CHROMA_METHODS:
+        raise ValueError(f"Unknown chroma method '{method}' (choose from {', '.join(CHROMA_METHODS)})")
+    y, sr = decimate(y, sr)
+    n_base = len(y) // BASE_HOP + 1
+    factor = max(int(math.ceil(n_base / max_frames)), 1) if max_frames and method != 'beat' else 1
+
+    if method == 'cqt':
+        hop_mult = max(min(factor, CQT_N_FFT // 2 // BASE_HOP), 1)
+        chroma = cqt_chroma(y, sr, BASE_HOP * hop_mult)
+    else:
+        hop_mult = max(min(factor, STFT_N_FFT // 2 // BASE_HOP), 1)
+        chroma = stft_chroma(y, sr, BASE_HOP * hop_mult)
+    hop = BASE_HOP * hop_mult
+    times = np.arange(chroma.shape[1]) * hop / sr
+    chroma, times = _pool(chroma, times, int(math.ceil(factor / hop_mult)))
+
+    if method == 'beat':
+        # ビート間で中央値集約（ビートが少なすぎる場合はフレームのまま）
+        _, beats = librosa.beat.beat_track(y=y, sr=sr, hop_length=hop, units='frames')
+        beats = beats[beats < chroma.shape[1]]
+        if len(beats) >= 16:
+            bounds = np.unique(np.concatenate([[0], beats]))
+            chroma = librosa.util.sync(chroma, bounds, aggregate=np.median)
+            times = times[bounds]
+        if max_frames and chroma.shape[1] > max_frames:
+            chroma, times = _pool(chroma, times, int(math.ceil(chroma.shape[1] / max_frames)))
+
+    return _normalize(chroma).astype(np.float32), times
@@ -27,6 +27,7 @@ export type JobRow = {
   hnr_after?: number
   measured_lufs?: number
   true_peak?: number
+  audio_scan?: any  // ボーカルのクイックスキャン（quick-scan.py の出力 + スキャンした vocal_path）
   created_at: string
   updated_at: string
 }
@@ -60,7 +61,7 @@ export async function fetchNextProcessingJob(): Promise<JobRow | null> {
         target_lufs, offset_ms, atempo, tempo_map_applied, rescue_applied,
         beat_dev_ms_before, beat_dev_ms_after,
         pitch_err_cent_before, pitch_err_cent_after,
-        hnr_before, hnr_after, measured_lufs, true_peak,
+        hnr_before, hnr_after, measured_lufs, true_peak, audio_scan,
         created_at, updated_at
       `)
       .eq('status', 'processing')
@@ -134,6 +135,18 @@ export async function markDone(jobId: string, resultPath: string, offsetMs = 0,
   })
 }
 
+// ボーカルのクイックスキャンをジョブに保存（再処理時はダウンロード後に再スキャンせず再利用）
+export async function saveAudioScan(jobId: string, scan: any) {
+  const { error } = await serviceDb()
+    .from('jobs')
+    .update({ audio_scan: scan })
+    .eq('id', jobId)
+    
+  if (error) {
+    console.warn(`Failed to save audio scan for job ${jobId}:`, error)
+  }
+}
+
 export async function markFailed(jobId: string, errorMessage: string) {
   return withTransaction(async (supabase) => {
     const updateData = {
@@ -1,8 +1,14 @@
 import { execa } from 'execa'
 import ffmpegStatic from 'ffmpeg-static'
+import { createHash } from 'crypto'
 import { promises as fs } from 'fs'
+import os from 'os'
 import path from 'path'
 import { createClient } from '@supabase/supabase-js'
+import { parseWorkerEvents } from './worker-events'
+import { PCM_META_FD, PCM_STDIO, WORKER_PCM_FORMAT, parsePcmMeta, pcmSpec } from './pcm-pipe'
+import { pythonEnv } from './thread-budget'
+import { schedulePython } from './python-scheduler'
 
 const ffmpegPath = ffmpegStatic
 if (!ffmpegPath) {
@@ -23,6 +29,7 @@ export type EnhancedAudioParams = {
     brightness?: number  // -1..1
   }
   offsetMs?: number
+  scanPath?: string  // ボーカルのクイックスキャン（未指定なら処理開始時に作成）
   enableHarmony?: boolean
   harmonyType?: 'up_m3' | 'down_m3' | 'perfect_5th'
   targetFormat?: 'mp3' | 'wav'
@@ -53,38 +60,83 @@ export type EnhancedProcessingResult = {
   error?: string
 }
 
+/**
+ * 解析チェックポイントのパス（入力と設定ごと）
+ */
+function analysisCheckpointPath(vocalPath: string, instPath: string, planCode: PlanCode): string {
+  const key = createHash('sha1').update(`${vocalPath}\0${instPath}\0${planCode}`).digest('hex')
+  return path.join(os.tmpdir(), 'mixai-checkpoints', `analysis-${key}.json`)
+}
+
+export type AnalysisStage = 'offset' | 'tempo' | 'pitch'
+
 /**
  * 高度音声解析の実行
  * CLAUDE.md準拠の解析エンジン
+ * stages 指定時はそのステージのみ実行し、結果もそのキーだけを含む（差分解析の状態は全ステージ時のみ）
+ * scanPath（クイックスキャン）があれば無音区間を切り詰めて解析する
  */
 export async function performAdvancedAnalysis(
   vocalPath: string, 
   instPath: string, 
-  planCode: PlanCode
+  planCode: PlanCode,
+  statePath?: string,
+  stages?: AnalysisStage[],
+  scanPath?: string
 ): Promise<any> {
   const startTime = Date.now()
   
   try {
     console.log('🧪 Starting advanced audio analysis...')
     
-    const result = await execa('python3', [
+    const args = [
       path.join(__dirname, 'advanced-analysis.py'),
       '--vocal', vocalPath,
       '--inst', instPath,
       '--plan', planCode,
       '--mode', 'analysis'
-    ], {
-      timeout: 60000,
-      encoding: 'utf8'
-    })
-    
-    const analysis = JSON.parse(result.stdout)
+    ]
+    if (stages?.length) {
+      args.push('--stages', stages.join(','))
+    }
+    if (scanPath) {
+      args.push('--scan', scanPath)
+    }
+    // 前回解析の状態があれば差分区間のみ再解析
+    if (statePath && !stages?.length) {
+      args.push('--state', statePath)
+    }
+    // 進捗をNDJSONで受け取り、完了ステージはチェックポイントに残す（再試行時に再利用）
+    args.push('--stream', '--checkpoint', analysisCheckpointPath(vocalPath, instPath, planCode))
+    
+    const result = await schedulePython(
+      { jobClass: 'analysis', plan: planCode, inputPath: vocalPath, timeoutMs: 60000, label: 'advanced-analysis' },
+      (slot) => execa('python3', args, {
+        timeout: 60000,
+        encoding: 'utf8',
+        env: pythonEnv(1, slot)
+      })
+    )
+    
+    const analysis = parseWorkerEvents(result.stdout).result
+    if (!analysis) {
+      throw new Error('Advanced analysis produced no result')
+    }
     const processingTime = Date.now() - startTime
     
     console.log(`✅ Analysis complete in ${processingTime}ms`)
     console.log(`   Offset: ${analysis.offset?.offset_ms || 0}ms (conf: ${analysis.offset?.confidence || 0})`)
     console.log(`   Tempo analysis: ${analysis.tempo?.dtw_applicable ? 'DTW available' : 'basic only'}`)
     console.log(`   Pitch candidates: ${analysis.pitch?.total_candidates || 0}`)
+    if (analysis.incremental?.mode === 'incremental') {
+      console.log(`   Incremental: re-analyzed ${analysis.incremental.reanalyzed_seconds.toFixed(1)}s (shift ${analysis.incremental.lag_s.toFixed(2)}s)`)
+    }
+    if (analysis.timings?.stages) {
+      const stages = Object.entries(analysis.timings.stages as Record<string, { wall_s: number }>)
+        .map(([name, t]) => `${name}=${Math.round(t.wall_s * 1000)}ms`)
+        .join(' ')
+      console.log(`   Stage timings: ${stages} (peak RSS ${analysis.timings.rss_peak_mb}MB)`)
+    }
     
     return {
       ...analysis,
@@ -92,6 +144,19 @@ export async function performAdvancedAnalysis(
     }
     
   } catch (error) {
+    // タイムアウト時はSIGTERMで中断され、完了済みステージ（オフセット等）が返る
+    const partial = parseWorkerEvents((error as any)?.stdout).partial
+    if (partial?.offset) {
+      console.warn(`⚠️  Advanced analysis interrupted, using partial result (${partial.completed_stages?.join(', ')})`)
+      return {
+        offset: partial.offset,
+        tempo: partial.tempo ?? { dtw_applicable: false },
+        pitch: partial.pitch ?? { correction_candidates: [], total_candidates: 0 },
+        processingTime: Date.now() - startTime,
+        partial: true
+      }
+    }
+    
     console.warn('⚠️  Advanced analysis failed, using fallback:', error)
     
     // フォールバック：基本的なオフセット検出のみ
@@ -115,7 +180,9 @@ export async function performAdvancedAnalysis(
 export async function applyPitchCorrections(
   vocalPath: string,
   corrections: any[],
-  outputPath: string
+  outputPath: string,
+  scanPath?: string,
+  planCode?: PlanCode
 ): Promise<boolean> {
   if (!corrections.length) {
     // 補正なし：元ファイルをコピー
@@ -126,17 +193,22 @@ export async function applyPitchCorrections(
   try {
     console.log(`🎵 Applying ${corrections.length} pitch corrections...`)
     
-    await execa('python3', [
-      path.join(__dirname, 'advanced-analysis.py'),
-      '--vocal', vocalPath,
-      '--inst', '/dev/null', // ダミー
-      '--mode', 'pitch_correct',
-      '--corrections', JSON.stringify(corrections),
-      '--output', outputPath
-    ], {
-      timeout: 120000,
-      encoding: 'utf8'
-    })
+    await schedulePython(
+      { jobClass: 'heavy', plan: planCode, inputPath: vocalPath, timeoutMs: 120000, label: 'pitch-correct' },
+      (slot) => execa('python3', [
+        path.join(__dirname, 'advanced-analysis.py'),
+        '--vocal', vocalPath,
+        '--inst', '/dev/null', // ダミー
+        '--mode', 'pitch_correct',
+        '--corrections', JSON.stringify(corrections),
+        '--output', outputPath,
+        ...(scanPath ? ['--scan', scanPath] : [])
+      ], {
+        timeout: 120000,
+        encoding: 'utf8',
+        env: pythonEnv(1, slot)
+      })
+    )
     
     console.log('✅ Pitch corrections applied')
     return true
@@ -149,30 +221,182 @@ export async function applyPitchCorrections(
   }
 }
 
+/**
+ * タイムワープの結果
+ * warped: 採用 / rejected: 事後確認で固定オフセットより伴奏に揃わなかったため破棄 / failed: 実行エラー
+ */
+export type TimeWarpOutcome = 'warped' | 'rejected' | 'failed'
+
+/**
+ * render の alignment（描画前の予測・描画後の確認）で伸縮後のボーカルが固定オフセットより揃っていなければ出力を破棄
+ * 予測の段階で不採用なら render は描画せずに返る（出力ファイルなし）
+ */
+async function acceptTimeWarp(render: any, outputPath: string): Promise<TimeWarpOutcome> {
+  const alignment = render.alignment
+  if (alignment?.passed) {
+    return 'warped'
+  }
+  console.warn(`⚠️  Time warp rejected${render.skipped ? ' before rendering' : ''}: ` +
+    `alignment ${alignment?.warped ?? alignment?.predicted ?? 'n/a'} ` +
+    `vs ${alignment?.offset_only ?? 'n/a'} with static offset, keeping the offset`)
+  await fs.unlink(outputPath).catch(() => {})
+  return 'rejected'
+}
+
+/**
+ * DTW時間マップに沿ったタイムワープ
+ * WSOLAでボーカルを伴奏の時間軸へ伸縮（ブロック単位の逐次処理）
+ */
+export async function applyTimeWarp(
+  vocalPath: string,
+  instPath: string,
+  timeMap: any[],
+  outputPath: string,
+  planCode?: PlanCode
+): Promise<TimeWarpOutcome> {
+  const timeMapPath = `${outputPath}.time_map.json`
+  
+  try {
+    console.log(`⏱️  Applying DTW time warp (${timeMap.length} map points)...`)
+    await fs.writeFile(timeMapPath, JSON.stringify(timeMap))
+    
+    const result = await schedulePython(
+      { jobClass: 'heavy', plan: planCode, inputPath: vocalPath, timeoutMs: 300000, label: 'time-warp' },
+      (slot) => execa('python3', [
+        path.join(__dirname, 'advanced-analysis.py'),
+        '--vocal', vocalPath,
+        '--inst', instPath,
+        '--mode', 'render',
+        '--time-map', timeMapPath,
+        '--output', outputPath
+      ], {
+        timeout: 300000,
+        encoding: 'utf8',
+        env: pythonEnv(1, slot)
+      })
+    )
+    
+    const render = JSON.parse(result.stdout)
+    const outcome = await acceptTimeWarp(render, outputPath)
+    if (outcome === 'warped') {
+      console.log(`✅ Time warp applied (${render.input_duration.toFixed(1)}s → ${render.output_duration.toFixed(1)}s)`)
+    }
+    return outcome
+    
+  } catch (error) {
+    console.error('❌ Time warp failed:', error)
+    return 'failed'
+  } finally {
+    await fs.unlink(timeMapPath).catch(() => {})
+  }
+}
+
+/**
+ * ピッチ補正 → タイムワープをパイプで連結
+ * 補正結果は生PCMのまま render へ渡し、中間WAVを書かない
+ * （事後確認は補正前のボーカルで行う: 補正は時間軸を変えない）
+ */
+export async function applyPitchCorrectionsAndTimeWarp(
+  vocalPath: string,
+  instPath: string,
+  corrections: any[],
+  timeMap: any[],
+  outputPath: string,
+  scanPath?: string,
+  planCode?: PlanCode
+): Promise<TimeWarpOutcome> {
+  const timeMapPath = `${outputPath}.time_map.json`
+  
+  try {
+    console.log(`🎵 Applying ${corrections.length} pitch corrections + DTW time warp (piped)...`)
+    await fs.writeFile(timeMapPath, JSON.stringify(timeMap))
+    
+    // 補正と render は同時に走るため、合わせて1つの重いジョブとして枠を取る
+    const { render, corrected } = await schedulePython(
+      { jobClass: 'heavy', plan: planCode, inputPath: vocalPath, timeoutMs: 300000, label: 'pitch-correct+render' },
+      async (slot) => {
+        const correction = execa('python3', [
+          path.join(__dirname, 'advanced-analysis.py'),
+          '--vocal', vocalPath,
+          '--inst', '/dev/null', // ダミー
+          '--mode', 'pitch_correct',
+          '--corrections', JSON.stringify(corrections),
+          '--output', pcmSpec('-', { dtype: WORKER_PCM_FORMAT.dtype }),
+          '--meta', `fd:${PCM_META_FD}`,
+          ...(scanPath ? ['--scan', scanPath] : [])
+        ], {
+          stdio: [...PCM_STDIO],
+          encoding: 'buffer',
+          timeout: 120000,
+          env: pythonEnv(2, slot)
+        })
+        
+        const render = await correction.pipe('python3', [
+          path.join(__dirname, 'advanced-analysis.py'),
+          '--vocal', pcmSpec('-', WORKER_PCM_FORMAT),
+          '--inst', instPath,
+          '--mode', 'render',
+          '--time-map', timeMapPath,
+          '--alignment-vocal', vocalPath,
+          '--output', outputPath
+        ], {
+          timeout: 300000,
+          encoding: 'utf8',
+          env: pythonEnv(2, slot)
+        })
+        
+        const corrected = parsePcmMeta((await correction).stdio[PCM_META_FD] as Uint8Array)
+        return { render, corrected }
+      }
+    )
+    const warped = JSON.parse(render.stdout)
+    const outcome = await acceptTimeWarp(warped, outputPath)
+    if (outcome === 'warped') {
+      console.log(`✅ Pitch corrections (${corrected?.corrections_applied ?? 0}) and time warp applied ` +
+        `(${warped.input_duration.toFixed(1)}s → ${warped.output_duration.toFixed(1)}s)`)
+    }
+    return outcome
+    
+  } catch (error) {
+    console.error('❌ Piped pitch correction + time warp failed:', error)
+    return 'failed'
+  } finally {
+    await fs.unlink(timeMapPath).catch(() => {})
+  }
+}
+
 /**
  * ハモリ生成
+ * scanPath（クイックスキャン）があれば無音区間はピッチシフト・EQしない
  */
 export async function generateHarmony(
   vocalPath: string,
   harmonyType: 'up_m3' | 'down_m3' | 'perfect_5th',
-  outputDir: string
+  outputDir: string,
+  scanPath?: string,
+  planCode?: PlanCode
 ): Promise<string | null> {
   try {
     console.log(`🎶 Generating ${harmonyType} harmony...`)
     
-    await execa('python3', [
-      path.join(__dirname, 'harmony-generator.py'),
-      '--vocal', vocalPath,
-      '--output-dir', outputDir,
-      '--harmony-type', harmonyType,
-      '--detect-regions',
-      '--format', 'wav'
-    ], {
-      timeout: 120000,
-      encoding: 'utf8'
-    })
-    
-    const harmonyPath = path.join(outputDir, `harmony_${harmonyType}.wav`)
+    await schedulePython(
+      { jobClass: 'heavy', plan: planCode, inputPath: vocalPath, timeoutMs: 120000, label: 'harmony' },
+      (slot) => execa('python3', [
+        path.join(__dirname, 'harmony-generator.py'),
+        '--vocal', vocalPath,
+        '--output-dir', outputDir,
+        '--harmony-type', harmonyType,
+        '--detect-regions',
+        '--format', 'flac',
+        ...(scanPath ? ['--scan', scanPath] : [])
+      ], {
+        timeout: 120000,
+        encoding: 'utf8',
+        env: pythonEnv(1, slot)
+      })
+    )
+    
+    const harmonyPath = path.join(outputDir, `harmony_${harmonyType}.flac`)
     
     // ファイル存在確認
     try {
@@ -331,27 +555,74 @@ export async function processEnhancedAudio(params: EnhancedAudioParams): Promise
   try {
     console.log(`🚀 Enhanced audio processing started (${planCode} plan)`)
     
-    // 1. 高度音声解析
-    const analysisResult = await performAdvancedAnalysis(vocalPath, instrumentalPath, planCode)
+    // 0. クイックスキャン（無音マップ、以降の解析・ピッチ補正・ハモリで無音区間を切り詰める）
+    let scanPath = params.scanPath
+    let ownScan = false
+    if (!scanPath) {
+      const { quickScan } = await import('./audio')
+      ownScan = await quickScan(vocalPath, `${vocalPath}.scan.json`).then(() => true, (error) => {
+        console.warn('⚠️  Quick scan failed, processing the full signal:', error)
+        return false
+      })
+      scanPath = ownScan ? `${vocalPath}.scan.json` : undefined
+    }
+    
+    // 1. 高度音声解析（Liteはピッチ補正・タイムワープを行わないためオフセットのみ）
+    const analysisResult = await performAdvancedAnalysis(
+      vocalPath, instrumentalPath, planCode, undefined,
+      planCode === 'lite' ? ['offset'] : undefined, scanPath
+    )
     
     // オフセット決定（パラメータ優先、なければ解析結果）
     const finalOffsetMs = offsetMs ?? analysisResult.offset?.offset_ms ?? 0
     
     // 2. ピッチ補正（Standard/Creator）
     let processedVocalPath = vocalPath
-    if (planCode !== 'lite' && analysisResult.pitch?.correction_candidates?.length > 0) {
+    const corrections = planCode !== 'lite'
+      ? (analysisResult.pitch?.correction_candidates ?? []).filter((c: any) => 
+          planCode === 'creator' || c.plan_action === 'auto_with_confirmation'
+        )
+      : []
+    // dtw_applicable は解析時の予測（時間マップで固定オフセットより揃う見込み）を含むため、不採用になる描画は呼ばない
+    const warpEnabled = planCode !== 'lite' && process.env.FEATURE_TEMPO_DTW !== 'false' && analysisResult.tempo?.dtw_applicable
+    
+    // 補正とタイムワープの両方を行う場合は中間ファイルなしでパイプ連結
+    // タイムワープは事後確認で固定オフセットより伴奏に揃った場合のみ採用（破棄したら再試行しない）
+    let timeWarped = false
+    let warpRejected = false
+    if (corrections.length > 0 && warpEnabled) {
+      const warpedVocalPath = path.join(path.dirname(outputPath), `temp_vocal_warped_${Date.now()}.wav`)
+      const outcome = await applyPitchCorrectionsAndTimeWarp(
+        vocalPath, instrumentalPath, corrections, analysisResult.tempo.time_map, warpedVocalPath, scanPath, planCode
+      )
+      timeWarped = outcome === 'warped'
+      warpRejected = outcome === 'rejected'
+      if (timeWarped) {
+        processedVocalPath = warpedVocalPath
+      }
+    }
+    
+    if (!timeWarped && corrections.length > 0) {
       const tempVocalPath = path.join(path.dirname(outputPath), `temp_vocal_corrected_${Date.now()}.wav`)
       
-      const corrections = analysisResult.pitch.correction_candidates.filter((c: any) => 
-        planCode === 'creator' || c.plan_action === 'auto_with_confirmation'
-      )
+      const success = await applyPitchCorrections(vocalPath, corrections, tempVocalPath, scanPath, planCode)
+      if (success) {
+        processedVocalPath = tempVocalPath
+        console.log(`✅ Applied ${corrections.length} pitch corrections`)
+      }
+    }
+    
+    // 2.5 DTWタイムワープ（Standard/Creator、時間マップが有効な場合）
+    if (!timeWarped && !warpRejected && warpEnabled) {
+      const warpedVocalPath = path.join(path.dirname(outputPath), `temp_vocal_warped_${Date.now()}.wav`)
       
-      if (corrections.length > 0) {
-        const success = await applyPitchCorrections(vocalPath, corrections, tempVocalPath)
-        if (success) {
-          processedVocalPath = tempVocalPath
-          console.log(`✅ Applied ${corrections.length} pitch corrections`)
+      const outcome = await applyTimeWarp(processedVocalPath, instrumentalPath, analysisResult.tempo.time_map, warpedVocalPath, planCode)
+      timeWarped = outcome === 'warped'
+      if (timeWarped) {
+        if (processedVocalPath !== vocalPath) {
+          await fs.unlink(processedVocalPath).catch(() => {})
         }
+        processedVocalPath = warpedVocalPath
       }
     }
     
@@ -361,7 +632,10 @@ export async function processEnhancedAudio(params: EnhancedAudioParams): Promise
       const harmonyDir = path.join(path.dirname(outputPath), 'harmony')
       await fs.mkdir(harmonyDir, { recursive: true })
       
-      harmonyPath = await generateHarmony(processedVocalPath, harmonyType, harmonyDir) || undefined
+      // タイムワープ後は時間軸が変わるため無音マップは使わない
+      harmonyPath = await generateHarmony(
+        processedVocalPath, harmonyType, harmonyDir, timeWarped ? undefined : scanPath, planCode
+      ) || undefined
     }
     
     // 4. 品質測定（Before）
@@ -371,7 +645,8 @@ export async function processEnhancedAudio(params: EnhancedAudioParams): Promise
     await fs.mkdir(path.dirname(outputPath), { recursive: true })
     
     const filterGraph = buildAdvancedFilterGraph({
-      vocalOffset: finalOffsetMs,
+      // タイムワープ済み（事後確認で固定オフセットより揃っている）ボーカルは伴奏の時間軸に揃っているためオフセット不要
+      vocalOffset: timeWarped ? 0 : finalOffsetMs,
       instOffset: 0,
       atempo: 1.0, // DTW結果に基づく動的調整は今後の拡張
       presetKey,
@@ -423,6 +698,9 @@ export async function processEnhancedAudio(params: EnhancedAudioParams): Promise
     if (processedVocalPath !== vocalPath) {
       await fs.unlink(processedVocalPath).catch(() => {})
     }
+    if (ownScan && scanPath) {
+      await fs.unlink(scanPath).catch(() => {})
+    }
     
     const processingTime = Date.now() - startTime
     console.log(`✅ Enhanced processing complete in ${processingTime}ms`)
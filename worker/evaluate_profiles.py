@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+処理プロファイルの精度/処理時間評価
+正解既知の合成フィクスチャで、プロファイルごとに
+オフセット誤差・時間マップ誤差・ピッチ補正候補の再現率/適合率・ステージ処理時間を計測する
+オフセットは全プロファイル共通のエンジンで求めるため、誤差はエンジン設定（レポートの offset_engine）の精度
+
+Usage:
+python worker/evaluate_profiles.py --durations 10 30 --offsets 37 120 263
+python worker/evaluate_profiles.py --profiles fast balanced --output eval.json
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from bench_fixtures import load_script, make_fixture
+from lazy_deps import lazy_import
+from memory_plan import plan_analysis
+import offset_engine
+from profiles import PROFILES
+from stage_timer import StageTimer
+
+librosa = lazy_import('librosa')
+
+DEFAULT_DURATIONS = [10, 30]
+DEFAULT_OFFSETS = [37.0, 120.0, 263.0]
+# 等間隔のノート列ではオフセットがノート周期分だけ曖昧になるため間隔を揺らす
+GAP_JITTER_SECONDS = 0.3
+WARMUP_SECONDS = 5
+# ピッチ候補の閾値はプランの方針（計算量とは独立）なので、プロファイル間の比較では固定する
+EVAL_PLAN = 'standard'
+
+def overlaps(a_start, a_duration, b_start, b_duration):
+    return a_start < b_start + b_duration and b_start < a_start + a_duration
+
+def pitch_scores(candidates, detuned_notes):
+    """ずらしたノートと時間が重なる候補を正解とみなした再現率/適合率"""
+    found = sum(
+        1 for note in detuned_notes
+        if any(overlaps(c['start_time'], c['duration'], note['start_time'], note['duration']) for c in candidates)
+    )
+    correct = sum(
+        1 for c in candidates
+        if any(overlaps(c['start_time'], c['duration'], note['start_time'], note['duration']) for note in detuned_notes)
+    )
+    return {
+        'recall': found / len(detuned_notes) if detuned_notes else None,
+        'precision': correct / len(candidates) if candidates else None,
+        'candidates': len(candidates)
+    }
+
+def tempo_error(time_map, truth, duration):
+    """時間マップと正解（inst = (vocal - offset) / tempo_ratio）の差の中央値（秒）"""
+    offset = truth['offset_ms'] / 1000
+    errors = [
+        abs(entry['inst_time'] - (entry['vocal_time'] - offset) / truth['tempo_ratio'])
+        for entry in time_map if offset < entry['vocal_time'] < duration - 1.0
+    ]
+    return float(np.median(errors)) if errors else None
+
+def evaluate_case(analysis, profile_name, fixture, world=True):
+    """1フィクスチャ × 1プロファイル（解析レートへのリサンプルも処理時間に含める）"""
+    profile = PROFILES[profile_name]
+    plan = dict(plan_analysis(fixture['duration'], None, profile), profile=profile_name)
+    sr = plan['analysis_sr']
+    timer = StageTimer()
+
+    with timer.stage('resample'):
+        vocal = librosa.resample(fixture['vocal'], orig_sr=fixture['sr'], target_sr=sr)
+        inst = librosa.resample(fixture['inst'], orig_sr=fixture['sr'], target_sr=sr)
+    result = analysis.analyze_full(vocal, inst, sr, EVAL_PLAN, plan, timer)
+
+    if world and analysis.HAS_WORLD:
+        corrections = [
+            {'start_time': note['start_time'], 'duration': note['duration'],
+             'recommended_correction': -note['cent_error']}
+            for note in fixture['truth']['detuned_notes']
+        ]
+        with timer.stage('world'):
+            analysis.world_pitch_correction(fixture['vocal'], fixture['sr'], corrections,
+                                            frame_period=profile['world_frame_period'])
+
+    timings = timer.report()
+    truth = fixture['truth']
+    return {
+        'offset_error_ms': abs(result['offset']['offset_ms'] - truth['offset_ms']),
+        'tempo_error_s': tempo_error(result['tempo']['time_map'], truth, fixture['duration']),
+        **pitch_scores(result['pitch']['correction_candidates'], truth['detuned_notes']),
+        'analysis_sr': sr,
+        'stages_s': {name: record['wall_s'] for name, record in timings['stages'].items()},
+        'wall_s': timings['total_wall_s']
+    }
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return float(np.mean(values)) if values else None
+
+def summarize(cases):
+    errors = [case['offset_error_ms'] for case in cases]
+    duration = sum(case['duration'] for case in cases)
+    wall = sum(case['wall_s'] for case in cases)
+    return {
+        'offset_error_ms_mean': _mean(errors),
+        'offset_error_ms_max': float(max(errors)),
+        'tempo_error_s': _mean(case['tempo_error_s'] for case in cases),
+        'pitch_recall': _mean(case['recall'] for case in cases),
+        'pitch_precision': _mean(case['precision'] for case in cases),
+        'wall_s': wall,
+        'rtf': wall / duration
+    }
+
+def evaluate(profiles, durations, offsets, world=True):
+    analysis = load_script('advanced-analysis.py')
+    output = {}
+    for name in profiles:
+        # ウォームアップ（numba JIT・リサンプルフィルタ構築を除外）
+        evaluate_case(analysis, name, make_fixture(WARMUP_SECONDS, gap_jitter=GAP_JITTER_SECONDS), world)
+        cases = []
+        for duration in durations:
+            for seed, offset_ms in enumerate(offsets):
+                fixture = make_fixture(duration, offset_ms=offset_ms, seed=seed, gap_jitter=GAP_JITTER_SECONDS)
+                case = evaluate_case(analysis, name, fixture, world)
+                case.update(duration=duration, offset_ms=offset_ms)
+                cases.append(case)
+                print(f"{name:<9} {duration:>4g}s offset {offset_ms:6.1f}ms  "
+                      f"err {case['offset_error_ms']:6.1f}ms  recall {case['recall'] or 0:4.2f}  "
+                      f"wall {case['wall_s']:7.3f}s", file=sys.stderr)
+        output[name] = {'settings': PROFILES[name], 'summary': summarize(cases), 'cases': cases}
+    return output
+
+def main():
+    parser = argparse.ArgumentParser(description='MIXAI processing profile accuracy/latency evaluation')
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument('--durations', type=float, nargs='+', default=DEFAULT_DURATIONS,
+                        help='Fixture durations in seconds')
+    parser.add_argument('--offsets', type=float, nargs='+', default=DEFAULT_OFFSETS,
+                        help='Ground-truth vocal offsets in ms (one fixture per offset)')
+    parser.add_argument('--no-world', action='store_true', help='Skip timing WORLD pitch correction')
+    parser.add_argument('--output', help='Also write the JSON report to this path')
+    args = parser.parse_args()
+
+    report = {
+        'profiles': evaluate(args.profiles, args.durations, args.offsets, not args.no_world),
+        'offset_engine': {
+            'version': offset_engine.ENGINE_VERSION,
+            'method': offset_engine.METHOD,
+            'sr': offset_engine.ENGINE_SR,
+            'hop': offset_engine.HOP,
+            'resolution_ms': round(offset_engine.HOP / offset_engine.ENGINE_SR * 1000, 2),
+            'refinement': 'parabolic',
+        },
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
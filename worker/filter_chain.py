@@ -0,0 +1,132 @@
+"""
+DSPフィルタチェーン
+バイクアッド設計のキャッシュ + 単一SOSパスでのカスケード処理
+ハモリEQ・プレゼンス調整・マスタリング段で共通利用
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from lazy_deps import lazy_import
+
+signal = lazy_import('scipy.signal')
+
+# 1ブロックあたりのサンプル数（in-place処理時の一時領域サイズ）
+DEFAULT_BLOCK_SIZE = 65536
+
+FILTER_TYPES = ('lowpass', 'highpass', 'bandpass', 'peaking', 'lowshelf', 'highshelf')
+
+@lru_cache(maxsize=256)
+def design_section(filter_type, freq, q, sr, gain_db=0.0):
+    """
+    RBJ Audio EQ Cookbook 準拠のバイクアッド設計
+    (type, freq, q, sr, gain) ごとにキャッシュし、1行のSOSを返す
+    """
+    if filter_type not in FILTER_TYPES:
+        raise ValueError(f"Unknown filter type: {filter_type}")
+
+    # ナイキスト直下にクランプ（高域設定が低SRで破綻しないように）
+    freq = min(float(freq), sr * 0.49)
+    w0 = 2 * np.pi * freq / sr
+    cos_w0 = np.cos(w0)
+    alpha = np.sin(w0) / (2 * q)
+    a = 10 ** (gain_db / 40)
+
+    if filter_type == 'lowpass':
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+        den = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif filter_type == 'highpass':
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+        den = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif filter_type == 'bandpass':
+        b = [alpha, 0.0, -alpha]
+        den = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif filter_type == 'peaking':
+        b = [1 + alpha * a, -2 * cos_w0, 1 - alpha * a]
+        den = [1 + alpha / a, -2 * cos_w0, 1 - alpha / a]
+    else:
+        sqrt_a = 2 * np.sqrt(a) * alpha
+        if filter_type == 'lowshelf':
+            b = [a * ((a + 1) - (a - 1) * cos_w0 + sqrt_a),
+                 2 * a * ((a - 1) - (a + 1) * cos_w0),
+                 a * ((a + 1) - (a - 1) * cos_w0 - sqrt_a)]
+            den = [(a + 1) + (a - 1) * cos_w0 + sqrt_a,
+                   -2 * ((a - 1) + (a + 1) * cos_w0),
+                   (a + 1) + (a - 1) * cos_w0 - sqrt_a]
+        else:  # highshelf
+            b = [a * ((a + 1) + (a - 1) * cos_w0 + sqrt_a),
+                 -2 * a * ((a - 1) + (a + 1) * cos_w0),
+                 a * ((a + 1) + (a - 1) * cos_w0 - sqrt_a)]
+            den = [(a + 1) - (a - 1) * cos_w0 + sqrt_a,
+                   2 * ((a - 1) - (a + 1) * cos_w0),
+                   (a + 1) - (a - 1) * cos_w0 - sqrt_a]
+
+    sos = np.concatenate([np.asarray(b) / den[0], np.asarray(den) / den[0]])
+    sos.setflags(write=False)  # キャッシュ共有のため読み取り専用
+    return sos
+
+class FilterChain:
+    """
+    複数セクションを1つのSOS行列にまとめたフィルタチェーン
+    sections: [{'type': 'lowpass', 'freq': 8000, 'q': 0.7, 'gain': 0.0}, ...]
+    """
+
+    def __init__(self, sections, sr, gain=1.0):
+        self.sr = sr
+        self.gain = float(gain)
+        rows = [
+            design_section(s['type'], float(s['freq']), float(s.get('q', 0.7071)), int(sr), float(s.get('gain', 0.0)))
+            for s in sections
+        ]
+        self.sos = np.vstack(rows).astype(np.float32) if rows else np.zeros((0, 6), dtype=np.float32)
+
+    @classmethod
+    def from_sos(cls, sos, sr, gain=1.0):
+        """設計済みのSOS行列からチェーンを作成（規格で係数が決まっているフィルタ用）"""
+        chain = cls([], sr, gain)
+        chain.sos = np.asarray(sos, dtype=np.float32).reshape(-1, 6)
+        return chain
+
+    def __len__(self):
+        return len(self.sos)
+
+    def initial_state(self, channels=None):
+        """ストリーミング用のフィルタ状態（ゼロ初期化、多チャンネル時は (sections, 2, ch)）"""
+        if channels is None:
+            return np.zeros((len(self.sos), 2), dtype=np.float32)
+        return np.zeros((len(self.sos), 2, channels), dtype=np.float32)
+
+    def process(self, audio, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        全セクションを単一SOSパスで適用（float32・in-place）
+        一時領域はblock_size分のみ
+        """
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        stream = self.stream()
+        for start in range(0, len(audio), block_size):
+            block = audio[start:start + block_size]
+            block[:] = stream.process(block)
+        return audio
+
+    def stream(self, channels=None):
+        """ブロック単位処理用のストリームを生成（channels指定時は (frames, ch) 入力）"""
+        return FilterStream(self, channels)
+
+class FilterStream:
+    """フィルタ状態をブロック間で引き継ぐストリーム処理"""
+
+    def __init__(self, chain, channels=None):
+        self.chain = chain
+        self.zi = chain.initial_state(channels)
+
+    def process(self, block):
+        """1ブロックを処理して返す（状態は次のブロックへ持ち越し）"""
+        block = np.asarray(block, dtype=np.float32)
+        if len(self.chain) == 0:
+            out = block.copy()
+        else:
+            out, self.zi = signal.sosfilt(self.chain.sos, block, axis=0, zi=self.zi)
+            out = out.astype(np.float32, copy=False)
+        if self.chain.gain != 1.0:
+            out *= self.chain.gain
+        return out
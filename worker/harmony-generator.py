@@ -3,133 +3,85 @@
 ハモリ生成システム
 上3度・下3度・完全5度のハーモニー生成
 CLAUDE.md準拠のハモリ機能
+
+--lazy（--harmony-type all）: 共通の解析（ボーカル区間・無音マップ・WORLDのF0）と各タイプの短いプレビューだけを作り、
+全長のレンダリングはユーザーが選んだタイプのみ --analysis で解析を再利用して行う
 """
 import argparse
 import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+# numpy より先に読み込む（BLAS等のスレッド数は読み込み時に決まる）
+from thread_budget import add_thread_args, apply_thread_budget, pool_size, thread_report
 import numpy as np
-import librosa as lb
-import soundfile as sf
-from scipy import signal
 
-# ピッチシフト関係のインポート
-try:
-    import crepe
-    HAS_CREPE = True
-except ImportError:
-    HAS_CREPE = False
+from audio_io import OUTPUT_FORMATS, output_path_for, read_info, write_audio
+from filter_chain import FilterChain
+from lazy_deps import has_module, lazy_import, optional_lazy_import
+from pcm_io import add_pcm_args, is_pcm, load_pcm, open_meta, validate_specs
+from progress import Cancelled, ProgressReporter, add_progress_args, inputs_key
+from silence_map import active_spans, add_scan_args, crop, crop_segments, input_signature, load_scan, uncrop
+from memory_plan import add_memory_args, plan_harmony, resolve_budget
+from stage_timer import NULL_TIMER, StageTimer, add_instrumentation_args, maybe_profile
+from vad import detect_vocal_regions
+from worker_metrics import record_run
+from world_vocoder import world_f0, world_resynthesize
+
+# 重い依存は使用するステージで初めて読み込む
+lb = lazy_import('librosa')
 
-try:
-    import pyworld as pw
-    HAS_WORLD = True
-except ImportError:
-    HAS_WORLD = False
+# ピッチシフト関係（機能プローブのみ、CREPEはハモリ生成では未使用）
+HAS_CREPE = has_module('crepe')
+HAS_WORLD = has_module('pyworld')
+pw = optional_lazy_import('pyworld')
+
+# モード別に実際に読み込まれる依存（起動時間予算の検証用）
+MODE_IMPORTS = {
+    'harmony': ['librosa', 'scipy.signal', 'scipy.fft', 'soundfile', 'pyworld'],
+}
 
 def safe_load(path, sr=44100):
     """安全な音声ファイル読み込み"""
     try:
-        y, _ = lb.load(path, sr=sr, mono=True)
+        if is_pcm(path):
+            y, _ = load_pcm(path, sr)
+        else:
+            y, _ = lb.load(path, sr=sr, mono=True)
         if np.max(np.abs(y)) > 0:
             y = y / np.max(np.abs(y)) * 0.95
         return y, sr
     except Exception as e:
         raise RuntimeError(f"Failed to load {path}: {e}")
 
-def detect_vocal_regions(vocal, sr, min_duration=0.2):
-    """
-    ボーカル区間検出
-    ハモリを適用する区間を特定
-    """
-    # 短時間エネルギーとスペクトル重心で判定
-    hop_length = 512
-    frame_length = 2048
-    
-    # エネルギー計算
-    energy = np.array([
-        np.sum(np.abs(vocal[i:i+frame_length]**2))
-        for i in range(0, len(vocal) - frame_length, hop_length)
-    ])
-    
-    # スペクトル重心
-    spectral_centroids = lb.feature.spectral_centroid(
-        y=vocal, sr=sr, hop_length=hop_length
-    )[0]
-    
-    # 正規化
-    energy = energy / (np.max(energy) + 1e-9)
-    centroids_norm = spectral_centroids / (np.max(spectral_centroids) + 1e-9)
-    
-    # ボーカル区間判定（エネルギー + スペクトル特徴）
-    energy_threshold = 0.15
-    centroid_threshold = 0.3
-    
-    vocal_mask = (energy > energy_threshold) & (centroids_norm > centroid_threshold)
-    
-    # 時間軸に変換
-    times = lb.frames_to_time(np.arange(len(vocal_mask)), sr=sr, hop_length=hop_length)
-    
-    # 連続区間の抽出
-    regions = []
-    start_time = None
-    
-    for i, (time, is_vocal) in enumerate(zip(times, vocal_mask)):
-        if is_vocal and start_time is None:
-            start_time = time
-        elif not is_vocal and start_time is not None:
-            duration = time - start_time
-            if duration >= min_duration:
-                regions.append({
-                    'start': float(start_time),
-                    'end': float(time),
-                    'duration': float(duration)
-                })
-            start_time = None
-    
-    # 最後の区間処理
-    if start_time is not None:
-        duration = times[-1] - start_time
-        if duration >= min_duration:
-            regions.append({
-                'start': float(start_time),
-                'end': float(times[-1]),
-                'duration': float(duration)
-            })
-    
-    return regions
-
-def pitch_shift_world(audio, sr, semitones):
+def pitch_shift_world(audio, sr, semitones, chunk_seconds=None, f0s=None):
     """
     WORLD vocoder によるピッチシフト
     フォルマント保持で自然なハモリ生成
+    chunk_seconds 指定時は区間ごとに分析・再合成（メモリ予算用）
+    f0s: 同じ音声・区間長で求めた区間ごとのF0（world_f0、タイプ間で共有して推定を省く）
     """
     if not HAS_WORLD:
         return pitch_shift_basic(audio, sr, semitones)
     
     try:
-        # float64変換
-        x = audio.astype(np.float64)
-        
-        # WORLD分析
-        f0, sp, ap = pw.wav2world(x, sr)
-        
         # ピッチシフト（セント単位）
         pitch_ratio = 2 ** (semitones / 12)
-        shifted_f0 = f0 * pitch_ratio
         
-        # フォルマント周波数は維持（スペクトル包絡はそのまま）
-        # 音質向上のため、わずかにスペクトル調整
-        if semitones > 0:  # 上行
-            # 高音での鋭さを少し抑制
-            for i in range(sp.shape[1]):
-                if i > sp.shape[1] * 0.7:  # 高域
-                    sp[:, i] *= 0.95
-        else:  # 下行
-            # 低音での厚みを少し追加
-            for i in range(sp.shape[1]):
-                if i < sp.shape[1] * 0.3:  # 低域
-                    sp[:, i] *= 1.05
+        def shift(f0, sp, ap, first_frame):
+            # フォルマント周波数は維持（スペクトル包絡はそのまま）
+            # 音質向上のため、わずかにスペクトル調整
+            bins = np.arange(sp.shape[1])
+            if semitones > 0:  # 上行
+                # 高音での鋭さを少し抑制
+                sp[:, bins > sp.shape[1] * 0.7] *= 0.95
+            else:  # 下行
+                # 低音での厚みを少し追加
+                sp[:, bins < sp.shape[1] * 0.3] *= 1.05
+            return f0 * pitch_ratio, sp, ap
         
-        # WORLD再合成
-        shifted_audio = pw.synthesize(shifted_f0, sp, ap, sr)
+        # WORLD分析・再合成（float64はWORLD要求）
+        shifted_audio = world_resynthesize(audio, sr, shift, chunk_seconds, f0s=f0s)
         
         # 長さ調整・正規化
         shifted_audio = shifted_audio[:len(audio)]
@@ -157,68 +109,73 @@ def pitch_shift_basic(audio, sr, semitones):
         print(f"Basic pitch shift error: {e}")
         return audio
 
+# EQ設定（ハモリタイプ別）
+HARMONY_EQ_SETTINGS = {
+    'up_m3': {
+        # 上3度：少し控えめに、高域を少しカット
+        'high_cut': {'freq': 8000, 'q': 0.7, 'gain': -1.5},
+        'presence': {'freq': 3000, 'q': 1.0, 'gain': -0.8},
+        'low_cut': {'freq': 120, 'q': 0.5, 'gain': 0.0}
+    },
+    'down_m3': {
+        # 下3度：温かみを強調、低域を少し抑制
+        'high_cut': {'freq': 6000, 'q': 0.6, 'gain': -1.0},
+        'presence': {'freq': 2500, 'q': 1.0, 'gain': -0.5},
+        'low_cut': {'freq': 150, 'q': 0.5, 'gain': -1.0}
+    },
+    'perfect_5th': {
+        # 完全5度：透明感を重視、中域を少し控えめ
+        'high_cut': {'freq': 7000, 'q': 0.8, 'gain': -0.8},
+        'presence': {'freq': 2800, 'q': 1.0, 'gain': -1.2},
+        'low_cut': {'freq': 100, 'q': 0.5, 'gain': -0.5}
+    }
+}
+
+# ゲイン調整（全体音量）
+HARMONY_OUTPUT_GAIN = {
+    'up_m3': 0.85,      # 上3度は少し控えめ
+    'down_m3': 0.90,    # 下3度は標準
+    'perfect_5th': 0.80  # 5度は最も控えめ
+}
+
+def build_harmony_eq_chain(sr, harmony_type):
+    """
+    ハモリEQのフィルタチェーン構築
+    High Cut → Presence → Low Cut を1つのSOSにカスケード
+    """
+    settings = HARMONY_EQ_SETTINGS.get(harmony_type, HARMONY_EQ_SETTINGS['up_m3'])
+    
+    sections = [
+        {'type': 'lowpass', 'freq': settings['high_cut']['freq'], 'q': settings['high_cut']['q']},
+        {'type': 'peaking', **settings['presence']},
+    ]
+    
+    lc = settings['low_cut']
+    if lc['gain'] < -0.1:
+        sections.append({'type': 'highpass', 'freq': lc['freq'], 'q': lc['q']})
+    
+    return FilterChain(sections, sr, gain=HARMONY_OUTPUT_GAIN.get(harmony_type, 0.85))
+
 def apply_harmony_eq(harmony_audio, sr, harmony_type):
     """
     ハモリ専用EQ処理
     メインボーカルとの棲み分けのための音質調整
     """
     try:
-        # EQ設定（ハモリタイプ別）
-        eq_settings = {
-            'up_m3': {
-                # 上3度：少し控えめに、高域を少しカット
-                'high_cut': {'freq': 8000, 'q': 0.7, 'gain': -1.5},
-                'presence': {'freq': 3000, 'q': 1.0, 'gain': -0.8},
-                'low_cut': {'freq': 120, 'q': 0.5, 'gain': 0.0}
-            },
-            'down_m3': {
-                # 下3度：温かみを強調、低域を少し抑制
-                'high_cut': {'freq': 6000, 'q': 0.6, 'gain': -1.0},
-                'presence': {'freq': 2500, 'q': 1.0, 'gain': -0.5},
-                'low_cut': {'freq': 150, 'q': 0.5, 'gain': -1.0}
-            },
-            'perfect_5th': {
-                # 完全5度：透明感を重視、中域を少し控えめ
-                'high_cut': {'freq': 7000, 'q': 0.8, 'gain': -0.8},
-                'presence': {'freq': 2800, 'q': 1.0, 'gain': -1.2},
-                'low_cut': {'freq': 100, 'q': 0.5, 'gain': -0.5}
-            }
-        }
-        
-        settings = eq_settings.get(harmony_type, eq_settings['up_m3'])
-        
-        # 簡易EQフィルタ適用（バイクアッド）
-        audio_processed = harmony_audio.copy()
-        
-        # High Cut
-        hc = settings['high_cut']
-        sos = signal.butter(2, hc['freq'] / (sr/2), btype='low', output='sos')
-        audio_processed = signal.sosfilt(sos, audio_processed)
-        
-        # Low Cut  
-        lc = settings['low_cut']
-        if lc['gain'] < -0.1:
-            sos = signal.butter(1, lc['freq'] / (sr/2), btype='high', output='sos')
-            audio_processed = signal.sosfilt(sos, audio_processed)
-        
-        # ゲイン調整（全体音量）
-        overall_gain = {
-            'up_m3': 0.85,      # 上3度は少し控えめ
-            'down_m3': 0.90,    # 下3度は標準
-            'perfect_5th': 0.80  # 5度は最も控えめ
-        }.get(harmony_type, 0.85)
-        
-        audio_processed *= overall_gain
-        
-        return audio_processed
+        chain = build_harmony_eq_chain(sr, harmony_type)
+        return chain.process(np.array(harmony_audio, dtype=np.float32))
         
     except Exception as e:
         print(f"Harmony EQ error: {e}")
         return harmony_audio * 0.8  # フォールバック
 
-def generate_harmony(vocal, sr, harmony_type='up_m3', vocal_regions=None):
+def generate_harmony(vocal, sr, harmony_type='up_m3', vocal_regions=None, timer=NULL_TIMER, world_chunk_s=None,
+                     segments=None, f0s=None):
     """
     ハモリ生成メイン関数
+    world_chunk_s: WORLD処理の区間長（メモリ予算用、None で全体）
+    segments: 有音区間の対応表（silence_map.crop_segments）、指定時はその区間のみピッチシフト・EQし無音区間は0
+    f0s: ピッチシフト元（segments で切り詰めた後）の区間ごとのF0（shared_f0）
     """
     # セミトーン設定
     semitone_map = {
@@ -229,14 +186,21 @@ def generate_harmony(vocal, sr, harmony_type='up_m3', vocal_regions=None):
     
     semitones = semitone_map.get(harmony_type, 4)
     
+    source = vocal if segments is None else crop(vocal, segments)
+    
     # ピッチシフト実行
-    if HAS_WORLD:
-        harmony_audio = pitch_shift_world(vocal, sr, semitones)
-    else:
-        harmony_audio = pitch_shift_basic(vocal, sr, semitones)
+    with timer.stage('pitch_shift'):
+        if HAS_WORLD:
+            harmony_audio = pitch_shift_world(source, sr, semitones, world_chunk_s, f0s)
+        else:
+            harmony_audio = pitch_shift_basic(source, sr, semitones)
     
     # ハモリ専用EQ
-    harmony_audio = apply_harmony_eq(harmony_audio, sr, harmony_type)
+    with timer.stage('eq'):
+        harmony_audio = apply_harmony_eq(harmony_audio, sr, harmony_type)
+    
+    if segments is not None:
+        harmony_audio = uncrop(harmony_audio[:len(source)], segments, np.zeros(len(vocal), dtype=np.float32))
     
     # ボーカル区間のみに制限（指定があれば）
     if vocal_regions:
@@ -269,30 +233,54 @@ def generate_harmony(vocal, sr, harmony_type='up_m3', vocal_regions=None):
     
     return harmony_audio
 
-def generate_all_harmonies(vocal, sr, vocal_regions=None):
+# メトリクスのscriptラベル
+SCRIPT = 'harmony-generator'
+
+HARMONY_TYPES = ['up_m3', 'down_m3', 'perfect_5th']
+
+HARMONY_DESCRIPTIONS = {
+    'up_m3': '上3度（明るく華やか）',
+    'down_m3': '下3度（温かく厚み）', 
+    'perfect_5th': '完全5度（透明で広がり）'
+}
+
+HARMONY_RECOMMENDED_FOR = {
+    'up_m3': ['ポップス', 'アイドル楽曲', '明るいバラード'],
+    'down_m3': ['R&B', 'ソウル', '温かいバラード'],
+    'perfect_5th': ['ゴスペル', 'ロック', '壮大な楽曲']
+}
+
+# --lazy の共通解析（--analysis で全長レンダリングに再利用）
+ANALYSIS_FILE = 'harmony_analysis.npz'
+ANALYSIS_VERSION = 1
+PREVIEW_SECONDS = 12.0
+# プレビュー区間の先頭に残す余白（歌い出しの子音）
+PREVIEW_LEAD_SECONDS = 0.25
+
+def shared_f0(vocal, sr, timer=NULL_TIMER, world_chunk_s=None, segments=None):
+    """全タイプ共通のピッチシフト元のF0（区間ごと、WORLDなしなら None）"""
+    if not HAS_WORLD:
+        return None
+    source = vocal if segments is None else crop(vocal, segments)
+    with timer.stage('f0'):
+        return world_f0(source, sr, world_chunk_s)
+
+def generate_all_harmonies(vocal, sr, vocal_regions=None, timer=NULL_TIMER, world_chunk_s=None, segments=None):
     """
     全ハモリタイプを生成
-    プレビュー用
+    プレビュー用（F0推定は全タイプで共有）
     """
     harmonies = {}
+    f0s = shared_f0(vocal, sr, timer, world_chunk_s, segments)
     
-    harmony_types = ['up_m3', 'down_m3', 'perfect_5th']
-    
-    for harmony_type in harmony_types:
+    for harmony_type in HARMONY_TYPES:
         try:
-            harmony_audio = generate_harmony(vocal, sr, harmony_type, vocal_regions)
+            harmony_audio = generate_harmony(vocal, sr, harmony_type, vocal_regions, timer, world_chunk_s, segments,
+                                             f0s)
             harmonies[harmony_type] = {
                 'audio': harmony_audio,
-                'description': {
-                    'up_m3': '上3度（明るく華やか）',
-                    'down_m3': '下3度（温かく厚み）', 
-                    'perfect_5th': '完全5度（透明で広がり）'
-                }.get(harmony_type, harmony_type),
-                'recommended_for': {
-                    'up_m3': ['ポップス', 'アイドル楽曲', '明るいバラード'],
-                    'down_m3': ['R&B', 'ソウル', '温かいバラード'],
-                    'perfect_5th': ['ゴスペル', 'ロック', '壮大な楽曲']
-                }.get(harmony_type, [])
+                'description': HARMONY_DESCRIPTIONS.get(harmony_type, harmony_type),
+                'recommended_for': HARMONY_RECOMMENDED_FOR.get(harmony_type, [])
             }
         except Exception as e:
             print(f"Error generating {harmony_type}: {e}")
@@ -303,86 +291,348 @@ def generate_all_harmonies(vocal, sr, vocal_regions=None):
     
     return harmonies
 
+def render_all_harmonies(vocal, sr, vocal_regions, output_dir, fmt, progress, timer=NULL_TIMER, world_chunk_s=None,
+                         segments=None, f0s=None):
+    """
+    全ハモリタイプを生成して並列エンコード
+    libsndfileのエンコード中はGILが解放されるため、生成済みタイプの書き出しは互いに・次のタイプの生成と並行して進む
+    （メモリ計画 plan_harmony は全タイプ分の出力を保持する前提）
+    ステージ完了・チェックポイント保存は主スレッドだけで行い、書き出し完了ごとに記録する
+    中断時は書き出し中のタイプを完了・記録してから Cancelled を再送出する
+    チェックポイントに記録済みで出力ファイルが残っているタイプは再生成しない
+    """
+    results = {}
+    pending = []
+    
+    def collect(wait):
+        for harmony_type, future in list(pending):
+            if wait or future.done():
+                future.result()
+                pending.remove((harmony_type, future))
+                results[harmony_type] = progress.complete(harmony_type, results[harmony_type])
+    
+    with ThreadPoolExecutor(max_workers=pool_size(len(HARMONY_TYPES))) as pool:
+        try:
+            for index, harmony_type in enumerate(HARMONY_TYPES):
+                collect(wait=False)
+                saved = progress.get(harmony_type)
+                if saved and os.path.exists(saved['file']):
+                    results[harmony_type] = saved
+                    progress.progress('harmony', (index + 1) / len(HARMONY_TYPES))
+                    continue
+                
+                output_path = output_path_for(output_dir, f"harmony_{harmony_type}", fmt)
+                try:
+                    # F0推定は最初に生成するタイプで1回だけ
+                    if f0s is None:
+                        f0s = shared_f0(vocal, sr, timer, world_chunk_s, segments)
+                    harmony_audio = generate_harmony(vocal, sr, harmony_type, vocal_regions, timer, world_chunk_s,
+                                                     segments, f0s)
+                except Exception as e:
+                    print(f"Error generating {harmony_type}: {e}", file=sys.stderr)
+                    harmony_audio = np.zeros_like(vocal)
+                
+                results[harmony_type] = {
+                    'file': output_path,
+                    'description': HARMONY_DESCRIPTIONS.get(harmony_type, harmony_type),
+                    'recommended_for': HARMONY_RECOMMENDED_FOR.get(harmony_type, [])
+                }
+                pending.append((harmony_type, pool.submit(write_audio, output_path, harmony_audio, sr, fmt)))
+                del harmony_audio
+                progress.progress('harmony', (index + 1) / len(HARMONY_TYPES))
+            
+            with timer.stage('encode'):
+                collect(wait=True)
+        except Cancelled:
+            # 書き出し中のタイプは完了させて記録してから中断（再開時に再生成しない）
+            collect(wait=True)
+            raise
+    
+    return {harmony_type: results[harmony_type] for harmony_type in HARMONY_TYPES}
+
+def preview_window(spans, duration, seconds=PREVIEW_SECONDS):
+    """プレビュー区間 (start, end) 秒: 有音区間 spans を最も多く含む seconds 秒（各有音区間の先頭から探す）"""
+    if duration <= seconds:
+        return 0.0, round(duration, 3)
+    best, best_cover = 0.0, -1.0
+    for candidate in [0.0] + [start - PREVIEW_LEAD_SECONDS for start, _ in spans]:
+        start = min(max(candidate, 0.0), duration - seconds)
+        cover = sum(max(0.0, min(e, start + seconds) - max(s, start)) for s, e in spans)
+        if cover > best_cover:
+            best, best_cover = start, cover
+    return round(best, 3), round(best + seconds, 3)
+
+def render_previews(vocal, sr, vocal_regions, window, output_dir, fmt, progress, timer=NULL_TIMER):
+    """
+    全タイプのプレビュー（window の区間のみ）を生成して書き出す
+    F0は区間で1回だけ推定し、チェックポイントに記録済みでファイルが残っているタイプは再生成しない
+    """
+    start, end = window
+    excerpt = vocal[int(start * sr):int(end * sr)]
+    regions = None
+    if vocal_regions is not None:
+        regions = [{**region, 'start': max(region['start'], start) - start, 'end': min(region['end'], end) - start}
+                   for region in vocal_regions if region['end'] > start and region['start'] < end]
+    
+    results, f0s = {}, None
+    for index, harmony_type in enumerate(HARMONY_TYPES):
+        saved = progress.get(harmony_type)
+        if saved and os.path.exists(saved['preview_file']):
+            results[harmony_type] = saved
+        else:
+            if f0s is None:
+                f0s = shared_f0(excerpt, sr, timer)
+            output_path = output_path_for(output_dir, f"harmony_{harmony_type}_preview", fmt)
+            harmony_audio = generate_harmony(excerpt, sr, harmony_type, regions, timer, None, None, f0s)
+            with timer.stage('encode'):
+                write_audio(output_path, harmony_audio, sr, fmt)
+            results[harmony_type] = progress.complete(harmony_type, {
+                'preview_file': output_path,
+                'description': HARMONY_DESCRIPTIONS.get(harmony_type, harmony_type),
+                'recommended_for': HARMONY_RECOMMENDED_FOR.get(harmony_type, [])
+            })
+        progress.progress('harmony', (index + 1) / len(HARMONY_TYPES))
+    return results
+
+def vocal_signature(path):
+    return input_signature(path, read_info(path))
+
+def save_analysis(path, meta, segments, f0s):
+    """共通解析（ボーカル区間・切り詰め対応表・区間ごとのF0・設定）を npz で保存"""
+    tmp = path + '.tmp.npz'
+    np.savez(
+        tmp,
+        f0=np.concatenate(f0s) if f0s else np.zeros(0),
+        f0_lengths=np.array([len(f0) for f0 in f0s] if f0s else [], dtype=np.int64),
+        segments=segments if segments is not None else np.zeros((0, 3), dtype=np.int64),
+        meta=json.dumps(meta)
+    )
+    os.replace(tmp, path)
+
+def load_analysis(path, vocal_path):
+    """save_analysis の逆（読めない・版や入力が一致しない場合は None）"""
+    try:
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            f0, lengths, segments = data['f0'], data['f0_lengths'], data['segments']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring harmony analysis {path}: {e}", file=sys.stderr)
+        return None
+    if meta.get('version') != ANALYSIS_VERSION or meta.get('input') != vocal_signature(vocal_path):
+        print(f"Ignoring harmony analysis {path}: does not match {vocal_path}", file=sys.stderr)
+        return None
+    return {
+        **meta,
+        'segments': segments if len(segments) else None,
+        'f0s': np.split(f0, np.cumsum(lengths)[:-1]) if len(lengths) else None
+    }
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--vocal', required=True, help='Vocal audio file')
-    parser.add_argument('--output-dir', required=True, help='Output directory')
+    parser.add_argument('--vocal', required=True, help='Vocal audio file or pcm:<path|->?rate=..&channels=..&dtype=..')
+    parser.add_argument('--output-dir', help='Output directory')
+    parser.add_argument('--output', help='Output file for a single --harmony-type (pcm:- streams raw PCM to stdout)')
     parser.add_argument('--harmony-type', choices=['up_m3', 'down_m3', 'perfect_5th', 'all'], 
                        default='all', help='Harmony type to generate')
     parser.add_argument('--detect-regions', action='store_true', 
                        help='Auto-detect vocal regions')
-    parser.add_argument('--format', choices=['wav', 'mp3'], default='wav', 
-                       help='Output format')
+    parser.add_argument('--format', choices=list(OUTPUT_FORMATS), default='wav', 
+                       help='Output format (encoded in-process via libsndfile)')
+    parser.add_argument('--lazy', action='store_true',
+                        help=f'With --harmony-type all: write the shared analysis ({ANALYSIS_FILE}) and short previews '
+                             'only; render the chosen type later with --analysis')
+    parser.add_argument('--analysis', metavar='PATH',
+                        help='Shared analysis from a --lazy run, reused to render a single --harmony-type')
+    parser.add_argument('--preview-seconds', type=float, default=PREVIEW_SECONDS,
+                        help='Length of each --lazy preview excerpt in seconds')
+    add_scan_args(parser)
+    add_thread_args(parser)
+    add_memory_args(parser)
+    add_progress_args(parser)
+    add_pcm_args(parser)
+    add_instrumentation_args(parser)
     
     args = parser.parse_args()
+    apply_thread_budget(args.threads)
+    if args.output and args.harmony_type == 'all':
+        parser.error('--output requires a single --harmony-type')
+    if not args.output and not args.output_dir:
+        parser.error('--output-dir or --output is required')
+    if args.lazy and args.harmony_type != 'all':
+        parser.error('--lazy requires --harmony-type all')
+    if args.analysis and args.harmony_type == 'all':
+        parser.error('--analysis requires a single --harmony-type')
+    try:
+        validate_specs([args.vocal], [args.output])
+    except ValueError as e:
+        parser.error(str(e))
+    
+    with maybe_profile(args.profile):
+        run(args)
+
+def run(args):
+    timer = StageTimer(args.trace_memory)
+    meta = open_meta(args.meta, [args.output])
+    
+    # 生成済みハモリを保持したまま次を生成するため、出力数込みでWORLD区間長を決定（--lazy は全長を1つも生成しない）
+    n_outputs = 3 if args.harmony_type == 'all' and not args.lazy else 1
+    duration = read_info(args.vocal)['duration']
+    plan = plan_harmony(duration, resolve_budget(args.memory_budget), n_outputs)
+    scan = load_scan(args.scan, args.vocal)
+    # --lazy の共通解析があれば区間分割・ボーカル区間・F0をそのまま使う
+    analysis = load_analysis(args.analysis, args.vocal) if args.analysis else None
+    if analysis:
+        plan['world_chunk_s'] = analysis['world_chunk_s']
+    
+    progress = ProgressReporter(args.stream, args.checkpoint, inputs_key(
+        [args.vocal], harmony_type=args.harmony_type, detect_regions=args.detect_regions,
+        output=args.output or os.path.abspath(args.output_dir), format=args.format, scan=bool(scan),
+        lazy=args.lazy, preview_seconds=args.preview_seconds, analysis=bool(analysis)), meta)
     
     # 音声読み込み
-    vocal, sr = safe_load(args.vocal)
+    with timer.stage('decode'):
+        vocal, sr = safe_load(args.vocal)
+    # スキャンがあれば無音区間はピッチシフト・EQしない（共通解析のF0は解析時の対応表に合わせる）
+    if analysis:
+        segments = analysis['segments']
+    else:
+        segments = crop_segments(active_spans(scan), sr, len(vocal)) if scan else None
     
     # ボーカル区間検出
-    vocal_regions = None
-    if args.detect_regions:
-        vocal_regions = detect_vocal_regions(vocal, sr)
-        print(f"Detected {len(vocal_regions)} vocal regions")
+    vocal_regions = analysis['vocal_regions'] if analysis else None
+    if args.detect_regions and vocal_regions is None:
+        with timer.stage('vad'):
+            vocal_regions = detect_vocal_regions(vocal, sr)
+        print(f"Detected {len(vocal_regions)} vocal regions", file=sys.stderr)
     
-    import os
-    os.makedirs(args.output_dir, exist_ok=True)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    progress.install_signal_handlers()
     
-    if args.harmony_type == 'all':
-        # 全ハモリ生成
-        harmonies = generate_all_harmonies(vocal, sr, vocal_regions)
-        
-        results = {}
-        for harmony_type, harmony_data in harmonies.items():
-            if 'audio' in harmony_data:
-                # ファイル出力
-                output_path = os.path.join(
-                    args.output_dir, 
-                    f"harmony_{harmony_type}.{args.format}"
-                )
-                
-                if args.format == 'wav':
-                    sf.write(output_path, harmony_data['audio'], sr)
-                else:
-                    # MP3出力は外部エンコーダ使用を想定
-                    wav_path = output_path.replace('.mp3', '.wav')
-                    sf.write(wav_path, harmony_data['audio'], sr)
-                    print(f"WAV saved to {wav_path} (MP3 conversion needed)")
-                
-                results[harmony_type] = {
-                    'file': output_path,
-                    'description': harmony_data.get('description', ''),
-                    'recommended_for': harmony_data.get('recommended_for', [])
-                }
+    if args.lazy:
+        run_lazy(args, vocal, sr, vocal_regions, segments, scan, plan, duration, progress, timer)
+    elif args.harmony_type == 'all':
+        # 全ハモリ生成（タイプごとにチェックポイント）
+        try:
+            results = render_all_harmonies(vocal, sr, vocal_regions, args.output_dir, args.format,
+                                           progress, timer, plan['world_chunk_s'], segments)
+        except Cancelled:
+            timings = timer.report()
+            record_run(SCRIPT, args.harmony_type, None, timings, duration, 'cancelled')
+            progress.cancel({
+                'vocal_regions': vocal_regions,
+                'harmonies': {t: progress.get(t) for t in HARMONY_TYPES if progress.done(t)},
+                'memory_plan': plan,
+                'timings': timings
+            })
         
         # プレビュー情報出力
         preview_info = {
             'vocal_regions': vocal_regions,
             'harmonies': results,
-            'usage_note': 'プレビュー後、1つを選択して適用してください'
+            'usage_note': 'プレビュー後、1つを選択して適用してください',
+            'memory_plan': plan,
+            'threads': thread_report(),
+            'timings': timer.report()
         }
         
         with open(os.path.join(args.output_dir, 'harmony_preview.json'), 'w', encoding='utf-8') as f:
             json.dump(preview_info, f, indent=2, ensure_ascii=False)
         
-        print(f"All harmonies generated in {args.output_dir}")
+        print(f"All harmonies generated in {args.output_dir}", file=sys.stderr)
+        record_run(SCRIPT, args.harmony_type, None, preview_info['timings'], duration,
+                   cache={'checkpoint': progress.cache_stats(HARMONY_TYPES)} if args.checkpoint else None)
+        progress.finish(preview_info)
         
     else:
         # 単一ハモリ生成
-        harmony_audio = generate_harmony(vocal, sr, args.harmony_type, vocal_regions)
-        
-        output_path = os.path.join(
-            args.output_dir, 
-            f"harmony_{args.harmony_type}.{args.format}"
+        output_path = args.output or output_path_for(
+            args.output_dir, f"harmony_{args.harmony_type}", args.format
         )
+        try:
+            harmony_audio = generate_harmony(vocal, sr, args.harmony_type, vocal_regions, timer, plan['world_chunk_s'],
+                                             segments, analysis['f0s'] if analysis else None)
+            with timer.stage('encode'):
+                write_audio(output_path, harmony_audio, sr, args.format)
+        except Cancelled:
+            timings = timer.report()
+            record_run(SCRIPT, args.harmony_type, None, timings, duration, 'cancelled')
+            progress.cancel({
+                'harmony_type': args.harmony_type,
+                'file': None,
+                'vocal_regions': vocal_regions,
+                'memory_plan': plan,
+                'timings': timings
+            })
         
-        if args.format == 'wav':
-            sf.write(output_path, harmony_audio, sr)
+        print(f"Harmony generated: {output_path}", file=sys.stderr)
+        timings = timer.report()
+        record_run(SCRIPT, args.harmony_type, None, timings, duration)
+        progress.finish({
+            'harmony_type': args.harmony_type,
+            'file': output_path,
+            'samplerate': sr,
+            'vocal_regions': vocal_regions,
+            'analysis_reused': bool(analysis),
+            'memory_plan': plan,
+            'threads': thread_report(),
+            'timings': timings
+        })
+
+def run_lazy(args, vocal, sr, vocal_regions, segments, scan, plan, duration, progress, timer):
+    """
+    --lazy: 共通解析の保存 + 全タイプのプレビューのみ
+    選ばれたタイプは --harmony-type <type> --analysis <harmony_analysis.npz> で全長をレンダリングする
+    """
+    analysis_path = os.path.join(args.output_dir, ANALYSIS_FILE)
+    try:
+        saved = progress.get('analysis')
+        if saved and os.path.exists(saved['file']):
+            window = tuple(saved['preview_window'])
         else:
-            wav_path = output_path.replace('.mp3', '.wav')
-            sf.write(wav_path, harmony_audio, sr)
-            
-        print(f"Harmony generated: {output_path}")
+            spans = [(r['start'], r['end']) for r in vocal_regions] if vocal_regions is not None else (
+                active_spans(scan) if scan else [])
+            window = preview_window(spans, len(vocal) / sr, args.preview_seconds)
+            # 全長レンダリング用のF0（切り詰め後の信号・WORLD区間長ごと）
+            f0s = shared_f0(vocal, sr, timer, plan['world_chunk_s'], segments)
+            save_analysis(analysis_path, {
+                'version': ANALYSIS_VERSION,
+                'input': vocal_signature(args.vocal),
+                'samplerate': sr,
+                'world_chunk_s': plan['world_chunk_s'],
+                'vocal_regions': vocal_regions,
+                'preview_window': list(window)
+            }, segments, f0s)
+            progress.complete('analysis', {'file': analysis_path, 'preview_window': list(window)})
+        results = render_previews(vocal, sr, vocal_regions, window, args.output_dir, args.format, progress, timer)
+    except Cancelled:
+        timings = timer.report()
+        record_run(SCRIPT, 'lazy', None, timings, duration, 'cancelled')
+        progress.cancel({
+            'vocal_regions': vocal_regions,
+            'harmonies': {t: progress.get(t) for t in HARMONY_TYPES if progress.done(t)},
+            'memory_plan': plan,
+            'timings': timings
+        })
+    
+    preview_info = {
+        'mode': 'lazy',
+        'vocal_regions': vocal_regions,
+        'preview_window': {'start': window[0], 'end': window[1]},
+        'analysis_file': analysis_path,
+        'harmonies': results,
+        'usage_note': 'プレビュー後、1つを選択して適用してください（選択したタイプのみ全長を生成します）',
+        'memory_plan': plan,
+        'threads': thread_report(),
+        'timings': timer.report()
+    }
+    with open(os.path.join(args.output_dir, 'harmony_preview.json'), 'w', encoding='utf-8') as f:
+        json.dump(preview_info, f, indent=2, ensure_ascii=False)
+    
+    print(f"Harmony previews and analysis written to {args.output_dir}", file=sys.stderr)
+    record_run(SCRIPT, 'lazy', None, preview_info['timings'], duration,
+               cache={'checkpoint': progress.cache_stats(['analysis', *HARMONY_TYPES])} if args.checkpoint else None)
+    progress.finish(preview_info)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
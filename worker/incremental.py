@@ -0,0 +1,194 @@
+"""
+増分再解析
+固定ブロックのフィンガープリント（帯域別対数エネルギー）で前回版との差分区間を検出し、
+変更区間のみ再計算して残りの解析結果を時間シフトして再利用する
+先頭の無音トリム等による全体のずれは包絡の相互相関で推定する
+"""
+import json
+import os
+
+import numpy as np
+
+from lazy_deps import lazy_import
+
+signal = lazy_import('scipy.signal')
+sfft = lazy_import('scipy.fft')
+
+FP_N_FFT = 2048
+FP_HOP = 1024
+FP_BANDS = 16
+FP_FMIN, FP_FMAX = 80.0, 8000.0
+FP_FLOOR_DB = -80.0
+FP_BATCH = 256
+BLOCK_SECONDS = 1.0
+# ブロック内の帯域エネルギー差（dB、中央値）がこれを超えたら変更とみなす
+CHANGE_TOLERANCE_DB = 3.0
+# 再計算区間の前後に付ける余白（ノート境界・DTW文脈）
+SPAN_MARGIN_SECONDS = 0.5
+MAX_LAG_SECONDS = 30.0
+# 変更割合がこれを超えたら全体を再解析
+REANALYZE_RATIO = 0.5
+
+def _band_matrix(sr):
+    """rfftビン → 対数間隔 FP_BANDS 帯域の集約行列"""
+    freqs = np.fft.rfftfreq(FP_N_FFT, 1.0 / sr)
+    edges = np.geomspace(FP_FMIN, min(FP_FMAX, sr / 2), FP_BANDS + 1)
+    idx = np.digitize(freqs, edges) - 1
+    matrix = np.zeros((len(freqs), FP_BANDS), dtype=np.float32)
+    valid = (idx >= 0) & (idx < FP_BANDS)
+    matrix[np.flatnonzero(valid), idx[valid]] = 1.0
+    return matrix
+
+def fingerprint(y, sr):
+    """
+    フレームごとの帯域別対数エネルギー（dB）
+    Returns: {'sr', 'hop', 'features': (n_frames, FP_BANDS) float32}
+    """
+    y = np.asarray(y, dtype=np.float32)
+    if len(y) < FP_N_FFT:
+        y = np.pad(y, (0, FP_N_FFT - len(y)))
+    frames = np.lib.stride_tricks.sliding_window_view(y, FP_N_FFT)[::FP_HOP]
+    window = np.hanning(FP_N_FFT).astype(np.float32)
+    bands = _band_matrix(sr)
+    features = np.empty((len(frames), FP_BANDS), dtype=np.float32)
+    for start in range(0, len(frames), FP_BATCH):
+        spec = sfft.rfft(frames[start:start + FP_BATCH] * window, axis=1)
+        power = (spec.real ** 2 + spec.imag ** 2) @ bands
+        features[start:start + FP_BATCH] = 10 * np.log10(power + 1e-10)
+    np.maximum(features, FP_FLOOR_DB, out=features)
+    return {'sr': sr, 'hop': FP_HOP, 'features': features}
+
+def estimate_lag(old, new, max_lag_seconds=MAX_LAG_SECONDS):
+    """
+    全体のずれ（フレーム数）: new[t + lag] ≒ old[t]
+    フレームラウドネス包絡の相互相関（±max_lag_seconds）
+    """
+    env_old = old['features'].mean(axis=1)
+    env_new = new['features'].mean(axis=1)
+    env_old = env_old - env_old.mean()
+    env_new = env_new - env_new.mean()
+    corr = signal.correlate(env_new, env_old, mode='full', method='fft')
+    lags = np.arange(-(len(env_old) - 1), len(env_new))
+    max_lag = int(max_lag_seconds * new['sr'] / new['hop'])
+    window = np.abs(lags) <= max_lag
+    return int(lags[window][np.argmax(corr[window])])
+
+def _merge_spans(spans, gap):
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(float(s), float(e)) for s, e in merged]
+
+def changed_spans(old, new, tolerance_db=CHANGE_TOLERANCE_DB, block_seconds=BLOCK_SECONDS,
+                  margin_seconds=SPAN_MARGIN_SECONDS):
+    """
+    前回版との差分区間（新しい版の時間軸、秒）
+    Returns: {'lag_s', 'gain_db', 'spans': [(start, end)], 'changed_ratio', 'duration'}
+    """
+    if old['sr'] != new['sr'] or old['hop'] != new['hop']:
+        raise ValueError('Fingerprints were computed with different settings')
+
+    frame_s = new['hop'] / new['sr']
+    lag = estimate_lag(old, new)
+    n_new = len(new['features'])
+    duration = n_new * frame_s
+    block = max(int(round(block_seconds / frame_s)), 1)
+
+    # ピーク正規化等による全体のゲイン差を除去（重なり部分の差の中央値）
+    lo, hi = max(0, lag), min(n_new, len(old['features']) + lag)
+    gain_db = 0.0
+    if hi > lo:
+        new_overlap, old_overlap = new['features'][lo:hi], old['features'][lo - lag:hi - lag]
+        audible = (new_overlap > FP_FLOOR_DB + 20) & (old_overlap > FP_FLOOR_DB + 20)
+        if np.any(audible):
+            gain_db = float(np.median((new_overlap - old_overlap)[audible]))
+
+    spans = []
+    changed_frames = 0
+    for start in range(0, n_new, block):
+        stop = min(start + block, n_new)
+        old_start, old_stop = start - lag, stop - lag
+        if old_start < 0 or old_stop > len(old['features']):
+            changed = True  # 前回版に対応する区間がない（追加部分）
+        else:
+            reference = np.maximum(old['features'][old_start:old_stop] + gain_db, FP_FLOOR_DB)
+            diff = np.abs(new['features'][start:stop] - reference)
+            changed = float(np.median(diff)) > tolerance_db
+        if changed:
+            changed_frames += stop - start
+            spans.append((max(start * frame_s - margin_seconds, 0.0),
+                          min(stop * frame_s + margin_seconds, duration)))
+
+    return {
+        'lag_s': float(lag * frame_s),
+        'gain_db': gain_db,
+        'spans': _merge_spans(spans, margin_seconds),
+        'changed_ratio': float(changed_frames / max(n_new, 1)),
+        'duration': float(duration)
+    }
+
+def in_spans(start, end, spans):
+    """[start, end) が変更区間のいずれかと重なるか"""
+    return any(start < s_end and end > s_start for s_start, s_end in spans)
+
+def reuse_events(events, lag_s, spans, duration, start_key='start_time', duration_key='duration'):
+    """
+    前回の結果（start/duration を持つイベント列）を lag_s だけシフトし、
+    変更区間・範囲外にかかるものを除外して返す
+    """
+    reused = []
+    for event in events:
+        start = event[start_key] + lag_s
+        end = start + event.get(duration_key, 0.0)
+        if start < 0 or end > duration or in_spans(start, end, spans):
+            continue
+        shifted = dict(event)
+        shifted[start_key] = float(start)
+        reused.append(shifted)
+    return reused
+
+def recompute_events(y, sr, spans, analyze, start_key='start_time'):
+    """
+    変更区間ごとに analyze(y_span) を実行し、区間先頭を足して全体の時間軸へ戻す
+    区間内で始まるイベントのみ採用（余白部分は再利用側が担当）
+    """
+    events = []
+    for s_start, s_end in spans:
+        segment = y[int(s_start * sr):int(s_end * sr)]
+        for event in analyze(segment):
+            start = event[start_key] + s_start
+            shifted = dict(event)
+            shifted[start_key] = float(start)
+            events.append(shifted)
+    return events
+
+def save_state(path, vocal_fp, inst_fp, result, meta):
+    """前回版の状態（フィンガープリント + 解析結果 + 設定）を npz で保存"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp.npz'
+    np.savez(
+        tmp,
+        vocal_features=vocal_fp['features'],
+        inst_features=inst_fp['features'],
+        sr=vocal_fp['sr'],
+        hop=vocal_fp['hop'],
+        result=json.dumps(result),
+        meta=json.dumps(meta)
+    )
+    os.replace(tmp, path)
+
+def load_state(path):
+    """save_state の逆（存在しなければ None）"""
+    if not path or not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        sr, hop = int(data['sr']), int(data['hop'])
+        return {
+            'vocal_fp': {'sr': sr, 'hop': hop, 'features': data['vocal_features']},
+            'inst_fp': {'sr': sr, 'hop': hop, 'features': data['inst_features']},
+            'result': json.loads(str(data['result'])),
+            'meta': json.loads(str(data['meta']))
+        }
@@ -0,0 +1,59 @@
+"""
+重い依存の遅延インポートと軽量な機能プローブ
+librosa/scipy/crepe(TensorFlow)/pyworld は実際に使うステージで初めて読み込む
+"""
+import importlib
+import importlib.util
+import sys
+import time
+
+def lazy_import(name):
+    """
+    属性アクセス時に初めて実行されるモジュールを返す
+    未インストールの場合は ImportError をその場で送出（存在確認のみで読み込みはしない）
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+def optional_lazy_import(name):
+    """オプション依存：未インストールなら None"""
+    try:
+        return lazy_import(name)
+    except ImportError:
+        return None
+
+def has_module(name):
+    """インポートせずにインストール有無だけを確認（TensorFlow等を読み込まない）"""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def time_imports(names):
+    """
+    モジュール群を実際に読み込み、それぞれの所要時間（ms）を返す
+    起動時間予算の検証用（未インストールのオプション依存は None）
+    """
+    timings = {}
+    for name in names:
+        if not has_module(name):
+            timings[name] = None
+            continue
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        # LazyLoader 経由の場合は属性アクセスで本体を実行させる
+        getattr(module, '__name__')
+        dir(module)
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    return timings
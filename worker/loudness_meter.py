@@ -0,0 +1,295 @@
+"""
+ストリーミング・ラウドネス/ステレオメーター
+ITU-R BS.1770 準拠のKウェイト・ゲーティングでトラック全体を1パス計測
+メモリ使用量はトラック長に依存しない（ゲーティングはヒストグラムで集計）
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from filter_chain import FilterChain
+from lazy_deps import lazy_import
+
+signal = lazy_import('scipy.signal')
+
+# BS.1770 Kウェイト（プリフィルタ＋RLBハイパス）のアナログ原型
+# 規格の係数は48kHz用のみのため、他のレートでは同じ原型から双一次変換で設計し直す
+# （RBJのシェルフとは形が異なるので design_section は使わない）
+K_SHELF_FREQ = 1681.974450955533
+K_SHELF_GAIN_DB = 3.999843853973347
+K_SHELF_Q = 0.7071752369554196
+K_SHELF_VB_EXPONENT = 0.4996667741545416
+K_HIGHPASS_FREQ = 38.13547087602444
+K_HIGHPASS_Q = 0.5003270373238773
+
+STEP_SECONDS = 0.1          # ゲーティングブロックの刻み（400msの75%オーバーラップ）
+MOMENTARY_STEPS = 4         # 400ms
+SHORT_TERM_STEPS = 30       # 3s
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+# ゲーティング用ヒストグラム（0.01LU刻み）
+HIST_MIN_LUFS = -70.0
+HIST_MAX_LUFS = 10.0
+HIST_RESOLUTION = 0.01
+
+TRUE_PEAK_OVERSAMPLE = 4
+TRUE_PEAK_CONTEXT = 32
+
+@lru_cache(maxsize=16)
+def k_weighting_sos(sr):
+    """
+    Kウェイトの2段SOS (2, 6)（48kHzで規格の係数に一致）
+    キャッシュ共有のため読み取り専用
+    """
+    # プリフィルタ（高域シェルフ）: Vh/Vb/Vl で分子を決める
+    k = np.tan(np.pi * K_SHELF_FREQ / sr)
+    vh = 10 ** (K_SHELF_GAIN_DB / 20)
+    vb = vh ** K_SHELF_VB_EXPONENT
+    a0 = 1 + k / K_SHELF_Q + k * k
+    shelf = [
+        (vh + vb * k / K_SHELF_Q + k * k) / a0,
+        2 * (k * k - vh) / a0,
+        (vh - vb * k / K_SHELF_Q + k * k) / a0,
+        1.0,
+        2 * (k * k - 1) / a0,
+        (1 - k / K_SHELF_Q + k * k) / a0,
+    ]
+
+    # RLBハイパス: 分子は [1, -2, 1] 固定（規格どおり正規化しない）
+    k = np.tan(np.pi * K_HIGHPASS_FREQ / sr)
+    a0 = 1 + k / K_HIGHPASS_Q + k * k
+    highpass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / K_HIGHPASS_Q + k * k) / a0]
+
+    sos = np.array([shelf, highpass], dtype=np.float64)
+    sos.setflags(write=False)
+    return sos
+
+def power_to_lufs(power):
+    return -0.691 + 10 * np.log10(np.maximum(power, 1e-20))
+
+class _GatingHistogram:
+    """ブロックラウドネスの分布を固定長で保持（件数とパワー和）"""
+
+    def __init__(self):
+        n_bins = int(round((HIST_MAX_LUFS - HIST_MIN_LUFS) / HIST_RESOLUTION)) + 1
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.power_sums = np.zeros(n_bins, dtype=np.float64)
+
+    def add(self, powers):
+        lufs = power_to_lufs(powers)
+        keep = lufs > ABSOLUTE_GATE_LUFS
+        if not np.any(keep):
+            return
+        idx = np.clip(((lufs[keep] - HIST_MIN_LUFS) / HIST_RESOLUTION).astype(np.int64), 0, len(self.counts) - 1)
+        np.add.at(self.counts, idx, 1)
+        np.add.at(self.power_sums, idx, powers[keep])
+
+    def integrated(self):
+        """絶対ゲート通過ブロックから相対ゲートを求めて統合ラウドネスを算出"""
+        total = self.counts.sum()
+        if total == 0:
+            return None
+        relative_gate = power_to_lufs(self.power_sums.sum() / total) + RELATIVE_GATE_LU
+        start = max(0, int((relative_gate - HIST_MIN_LUFS) / HIST_RESOLUTION))
+        count = self.counts[start:].sum()
+        if count == 0:
+            return None
+        return float(power_to_lufs(self.power_sums[start:].sum() / count))
+
+class LoudnessMeter:
+    """
+    ブロック投入型のメーター
+    feed((frames, channels)) を繰り返し、dynamics()/stereo() で結果取得
+    """
+
+    def __init__(self, sr, channels):
+        self.sr = sr
+        self.channels = channels
+        self.step = max(1, int(round(STEP_SECONDS * sr)))
+
+        self.k_stream = FilterChain.from_sos(k_weighting_sos(int(sr)), sr).stream(channels)
+        self._pending = np.zeros((0, channels), dtype=np.float32)   # 100ms未満の端数
+        self._recent = np.zeros(0, dtype=np.float64)                 # 直近3sのステップパワー
+        self.momentary = _GatingHistogram()
+        self.short_term_max = None
+
+        # トゥルーピーク（オーバーサンプリング）用の前後文脈
+        self._tp_context = np.zeros((2 * TRUE_PEAK_CONTEXT, channels), dtype=np.float32)
+        self.true_peak = 0.0
+        self.sample_peak = 0.0
+
+        # 統計量の積算
+        self.n_samples = 0
+        self.sum_sq = np.zeros(channels, dtype=np.float64)
+        self.sum_lr = 0.0
+        self.sum_l = 0.0
+        self.sum_r = 0.0
+        self.mid_sq = 0.0
+        self.side_sq = 0.0
+        self.step_rms_sum = 0.0
+        self.step_rms_sq_sum = 0.0
+        self.n_steps = 0
+
+    def feed(self, block):
+        block = np.asarray(block, dtype=np.float32)
+        if block.ndim == 1:
+            block = block[:, None]
+        if len(block) == 0:
+            return
+
+        self._update_statistics(block)
+        self._update_true_peak(block)
+
+        weighted = self.k_stream.process(block)
+        pending = np.concatenate((self._pending, weighted))
+        n_steps = len(pending) // self.step
+        if n_steps:
+            steps = pending[:n_steps * self.step].reshape(n_steps, self.step, self.channels)
+            # チャンネル重み G=1.0（L/R/C）で合算
+            step_power = (steps.astype(np.float64) ** 2).mean(axis=1).sum(axis=1)
+            self._update_gating(step_power)
+        self._pending = pending[n_steps * self.step:]
+
+    def _update_statistics(self, block):
+        x = block.astype(np.float64)
+        self.n_samples += len(x)
+        self.sum_sq += (x ** 2).sum(axis=0)
+        self.sample_peak = max(self.sample_peak, float(np.abs(x).max()))
+
+        left = x[:, 0]
+        right = x[:, 1] if self.channels > 1 else left
+        self.sum_l += left.sum()
+        self.sum_r += right.sum()
+        self.sum_lr += left @ right
+        self.mid_sq += (((left + right) / 2) ** 2).sum()
+        self.side_sq += (((left - right) / 2) ** 2).sum()
+
+    def _update_true_peak(self, block):
+        buf = np.concatenate((self._tp_context, block))
+        self._scan_true_peak(buf, len(buf) - TRUE_PEAK_CONTEXT)
+        self._tp_context = buf[-2 * TRUE_PEAK_CONTEXT:]
+
+    def _scan_true_peak(self, buf, end):
+        """buf[CONTEXT:end] の区間をオーバーサンプリングしてピーク検出"""
+        if end <= TRUE_PEAK_CONTEXT:
+            return
+        up = signal.resample_poly(buf, TRUE_PEAK_OVERSAMPLE, 1, axis=0)
+        valid = up[TRUE_PEAK_CONTEXT * TRUE_PEAK_OVERSAMPLE:end * TRUE_PEAK_OVERSAMPLE]
+        if len(valid):
+            self.true_peak = max(self.true_peak, float(np.abs(valid).max()))
+
+    def _update_gating(self, step_power):
+        recent = np.concatenate((self._recent, step_power))
+        offset = len(self._recent)
+
+        # 400msブロック（100ms刻み）
+        if len(recent) >= MOMENTARY_STEPS:
+            momentary = np.convolve(recent, np.ones(MOMENTARY_STEPS) / MOMENTARY_STEPS, mode='valid')
+            first_new = max(0, offset - MOMENTARY_STEPS + 1)
+            self.momentary.add(momentary[first_new:])
+
+        # 3sショートターム
+        if len(recent) >= SHORT_TERM_STEPS:
+            short = np.convolve(recent, np.ones(SHORT_TERM_STEPS) / SHORT_TERM_STEPS, mode='valid')
+            first_new = max(0, offset - SHORT_TERM_STEPS + 1)
+            if first_new < len(short):
+                peak = float(power_to_lufs(short[first_new:].max()))
+                self.short_term_max = peak if self.short_term_max is None else max(self.short_term_max, peak)
+
+        rms = np.sqrt(step_power / self.channels)
+        self.step_rms_sum += rms.sum()
+        self.step_rms_sq_sum += (rms ** 2).sum()
+        self.n_steps += len(step_power)
+
+        self._recent = recent[-(SHORT_TERM_STEPS - 1):]
+
+    def finish(self):
+        """末尾のトゥルーピーク区間を確定"""
+        buf = np.concatenate((self._tp_context, np.zeros((TRUE_PEAK_CONTEXT, self.channels), dtype=np.float32)))
+        self._scan_true_peak(buf, len(buf) - TRUE_PEAK_CONTEXT)
+        self._tp_context = np.zeros((2 * TRUE_PEAK_CONTEXT, self.channels), dtype=np.float32)
+        return self
+
+    def reset_continuity(self):
+        """
+        不連続な区間を続けて投入する前に呼ぶ
+        フィルタ状態・ゲーティング窓をリセットし、区間をまたぐブロックを作らない
+        """
+        self.finish()
+        self.k_stream.zi = self.k_stream.chain.initial_state(self.channels)
+        self._pending = np.zeros((0, self.channels), dtype=np.float32)
+        self._recent = np.zeros(0, dtype=np.float64)
+
+    def dynamics(self):
+        integrated = self.momentary.integrated()
+        rms = float(np.sqrt(self.sum_sq.sum() / max(self.n_samples * self.channels, 1)))
+        true_peak_db = 20 * np.log10(self.true_peak + 1e-10)
+
+        crest_factor = 20.0 if rms == 0 else 20 * np.log10(self.sample_peak / rms)
+        loudness = integrated if integrated is not None else ABSOLUTE_GATE_LUFS
+        plr = true_peak_db - loudness
+
+        rms_variation = 0.0
+        if self.n_steps > 1:
+            mean = self.step_rms_sum / self.n_steps
+            rms_variation = float(np.sqrt(max(self.step_rms_sq_sum / self.n_steps - mean ** 2, 0.0)))
+
+        return {
+            'crest_factor': float(np.clip(crest_factor, 0, 25)),
+            'plr': float(np.clip(plr, 0, 25)),
+            'rms_variation': rms_variation,
+            'integrated_lufs': integrated,
+            'short_term_max_lufs': self.short_term_max,
+            'true_peak_dbtp': float(true_peak_db)
+        }
+
+    def stereo(self):
+        if self.channels < 2 or self.n_samples == 0:
+            return {'width': 0.0, 'correlation': 1.0, 'balance': 0.0}
+
+        total = self.mid_sq + self.side_sq
+        width = 0.0 if total == 0 else self.side_sq / total
+
+        n = self.n_samples
+        left_energy, right_energy = self.sum_sq[0], self.sum_sq[1]
+        cov = self.sum_lr - self.sum_l * self.sum_r / n
+        var_l = left_energy - self.sum_l ** 2 / n
+        var_r = right_energy - self.sum_r ** 2 / n
+        correlation = 1.0 if var_l <= 0 or var_r <= 0 else cov / np.sqrt(var_l * var_r)
+
+        energy = left_energy + right_energy
+        balance = 0.0 if energy == 0 else (right_energy - left_energy) / energy
+
+        return {
+            'width': float(np.clip(width, 0.0, 1.0)),
+            'correlation': float(np.clip(correlation, -1.0, 1.0)),
+            'balance': float(np.clip(balance, -1.0, 1.0))
+        }
+
+def measure_blocks(blocks, sr, channels=None, extra_consumers=(), continuous=True):
+    """
+    ブロック列を計測
+    extra_consumers: 同じブロックを受け取る関数（例：帯域解析へのモノラル供給）
+    continuous=False の場合は各ブロックを独立区間として扱う
+    """
+    meter = None
+    for block in blocks:
+        if meter is None:
+            meter = LoudnessMeter(sr, block.shape[1])
+        elif not continuous:
+            meter.reset_continuity()
+        meter.feed(block)
+        for consumer in extra_consumers:
+            consumer(block)
+    if meter is None:
+        meter = LoudnessMeter(sr, channels or 1)
+    return meter.finish()
+
+def measure_file(path, block_seconds=5.0, extra_consumers=()):
+    """ファイル全体を1パスで計測"""
+    from audio_io import iter_blocks, read_info
+
+    info = read_info(path)
+    sr = info['samplerate']
+    return measure_blocks(iter_blocks(path, int(block_seconds * sr)), sr, info['channels'], extra_consumers)
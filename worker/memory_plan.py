@@ -0,0 +1,164 @@
+"""
+メモリ予算に応じた実行計画
+入力長から各ステージのピークメモリを見積もり、予算内に収まるよう
+解析サンプルレート・DTW解像度/バンド幅・WORLD区間長を選ぶ
+予算は --memory-budget または環境変数 MIXAI_MEMORY_BUDGET_MB（未指定なら無制限）
+"""
+import math
+import os
+
+MEMORY_BUDGET_ENV = 'MIXAI_MEMORY_BUDGET_MB'
+
+# インタプリタ + numpy/scipy/librosa 読み込み後の常駐RSS
+BASE_MB = 250.0
+# 実測値（MB / 音声1秒、44.1kHz換算）: tracemalloc ピークに C 側の作業領域分の余裕を加味
+DECODE_MB_PER_S = 0.6      # librosa.load（ステレオ原音のデコード + リサンプル）
+CHROMA_MB_PER_S = 0.7      # chroma_frontend（11.025kHzへ間引き + ブロック単位のスペクトル）
+ONSET_MB_PER_S = 2.5       # onset_strength（hop=256）
+WORLD_MB_PER_S = 6.0       # wav2world + synthesize（sp/ap は float64）
+STREAM_MB_PER_S = 0.1      # ブロック処理（メーター・帯域解析）の1秒あたり作業領域
+
+ANALYSIS_RATES = (44100, 22050, 16000)
+# advanced-offset の解析窓（秒）: サンプルレートはエンジン固定のため、予算で縮めるのは窓の長さだけ
+OFFSET_WINDOW_SECONDS = (30.0, 20.0, 10.0)
+# None = 全体を一度に処理
+WORLD_CHUNK_SECONDS = (None, 60.0, 30.0, 15.0, 8.0)
+STREAM_BLOCK_SECONDS = (5.0, 2.0, 1.0)
+DTW_FRAME_OPTIONS = (500, 250, 125)
+# バンド幅の下限（フレーム数比）: テンポ比 0.7〜1.3 のずれを許容
+DTW_MIN_BAND_RATIO = 0.3
+DTW_HOP = 512
+
+def parse_budget(value):
+    """'1500' / '1500M' / '1.5G' → MB（空・0 は無制限として None）"""
+    if value is None:
+        return None
+    text = str(value).strip().upper().rstrip('B')
+    if not text:
+        return None
+    scale = 1.0
+    if text[-1] in ('K', 'M', 'G'):
+        scale = {'K': 1 / 1024, 'M': 1.0, 'G': 1024.0}[text[-1]]
+        text = text[:-1]
+    try:
+        mb = float(text) * scale
+    except ValueError:
+        raise ValueError(f"Invalid memory budget: {value}")
+    return mb if mb > 0 else None
+
+def resolve_budget(cli_value=None):
+    """CLI指定 → 環境変数 → 無制限(None) の順"""
+    if cli_value is not None:
+        return parse_budget(cli_value)
+    return parse_budget(os.environ.get(MEMORY_BUDGET_ENV))
+
+def add_memory_args(parser):
+    """メモリ予算の共通CLIオプション"""
+    parser.add_argument('--memory-budget', metavar='SIZE', type=parse_budget,
+                        help=f'Peak memory budget, e.g. 1500M or 2G (default: ${MEMORY_BUDGET_ENV} or unlimited)')
+
+def _fits(estimate, budget_mb):
+    return budget_mb is None or estimate <= budget_mb
+
+def estimate_signal_mb(duration, sr, copies=1, itemsize=4):
+    """メモリ上に保持する信号配列"""
+    return duration * sr * itemsize * copies / 1e6
+
+def estimate_dtw_mb(frames, band):
+    """帯域制限DTW: コスト行列 + 累積コスト（float64、各行 2*band+1 セル）"""
+    width = min(frames, 2 * band + 1)
+    return frames * width * 8 * 2 / 1e6
+
+def plan_dtw(duration, budget_mb, sr=ANALYSIS_RATES[0], max_frames_cap=None):
+    """DTWの解像度（最大フレーム数）とSakoe-Chibaバンド幅（max_frames_cap: プロファイルの上限）"""
+    n_frames = max(int(duration * sr / DTW_HOP), 1)
+    options = [f for f in DTW_FRAME_OPTIONS if max_frames_cap is None or f <= max_frames_cap] or [DTW_FRAME_OPTIONS[-1]]
+    for max_frames in options:
+        frames = min(n_frames, max_frames)
+        if _fits(estimate_dtw_mb(frames, frames), budget_mb):
+            return {'max_frames': max_frames, 'band': None, 'estimated_mb': round(estimate_dtw_mb(frames, frames), 1)}
+        band = max(int(math.ceil(frames * DTW_MIN_BAND_RATIO)), 1)
+        if _fits(estimate_dtw_mb(frames, band), budget_mb):
+            return {'max_frames': max_frames, 'band': band, 'estimated_mb': round(estimate_dtw_mb(frames, band), 1)}
+    frames = min(n_frames, DTW_FRAME_OPTIONS[-1])
+    band = max(int(math.ceil(frames * DTW_MIN_BAND_RATIO)), 1)
+    return {'max_frames': DTW_FRAME_OPTIONS[-1], 'band': band, 'estimated_mb': round(estimate_dtw_mb(frames, band), 1)}
+
+def estimate_world_mb(duration, sr, chunk_seconds, resident_copies=3):
+    """
+    WORLD処理のピーク
+    常駐: 入力(float32) + float64変換 + 出力(float64) / 作業: 区間長に比例する sp/ap
+    """
+    seconds = duration if chunk_seconds is None else min(chunk_seconds, duration)
+    resident = estimate_signal_mb(duration, sr, 1) + estimate_signal_mb(duration, sr, resident_copies - 1, 8)
+    return BASE_MB + resident + WORLD_MB_PER_S * seconds * sr / 44100
+
+def plan_world(duration, sr, budget_mb, extra_mb=0.0):
+    """予算内で最も長いWORLD区間長（全体処理を優先）"""
+    for chunk in WORLD_CHUNK_SECONDS:
+        estimate = estimate_world_mb(duration, sr, chunk) + extra_mb
+        if _fits(estimate, budget_mb):
+            return chunk, estimate, True
+    chunk = WORLD_CHUNK_SECONDS[-1]
+    return chunk, estimate_world_mb(duration, sr, chunk) + extra_mb, False
+
+def estimate_analysis_mb(duration, sr, dtw_mb=0.0):
+    """
+    解析モードのピーク
+    常駐: ボーカル+伴奏（float32）/ 作業: デコード・オンセット・クロマのうち最大
+    """
+    resident = estimate_signal_mb(duration, sr, 2)
+    scale = sr / 44100
+    working = max(DECODE_MB_PER_S * duration, ONSET_MB_PER_S * duration * scale,
+                  CHROMA_MB_PER_S * duration * scale, dtw_mb)
+    return BASE_MB + resident + working
+
+def _plan(budget_mb, estimate, fits, **choices):
+    plan = {'budget_mb': budget_mb, 'estimated_peak_mb': round(estimate, 1), 'fits': fits}
+    plan.update(choices)
+    return plan
+
+def plan_analysis(duration, budget_mb, profile=None):
+    """
+    advanced-analysis（analysisモード）: 解析サンプルレートとDTW設定
+    profile（profiles.PROFILES の設定）があれば、その上限から予算内に収まるものを選ぶ
+    """
+    max_sr = profile['analysis_sr'] if profile else None
+    rates = [r for r in ANALYSIS_RATES if max_sr is None or r <= max_sr] or [ANALYSIS_RATES[-1]]
+    dtw = plan_dtw(duration, budget_mb, max_frames_cap=profile['dtw_max_frames'] if profile else None)
+    for sr in rates:
+        estimate = estimate_analysis_mb(duration, sr, dtw['estimated_mb'])
+        if _fits(estimate, budget_mb):
+            return _plan(budget_mb, estimate, True, analysis_sr=sr, dtw=dtw)
+    return _plan(budget_mb, estimate, False, analysis_sr=rates[-1], dtw=dtw)
+
+def plan_pitch_correct(duration, budget_mb, sr=ANALYSIS_RATES[0]):
+    """advanced-analysis（pitch_correctモード）: 出力品質のため原音レートのままWORLD区間長を選ぶ"""
+    chunk, estimate, fits = plan_world(duration, sr, budget_mb)
+    return _plan(budget_mb, estimate, fits, analysis_sr=sr, world_chunk_s=chunk)
+
+def plan_harmony(duration, budget_mb, n_outputs=1, sr=ANALYSIS_RATES[0]):
+    """harmony-generator: 生成済みハモリ（float32）を保持したままWORLD区間長を選ぶ"""
+    held = estimate_signal_mb(duration, sr, n_outputs)
+    chunk, estimate, fits = plan_world(duration, sr, budget_mb, held)
+    return _plan(budget_mb, estimate, fits, analysis_sr=sr, world_chunk_s=chunk)
+
+def plan_offset(segment, sr, budget_mb):
+    """
+    advanced-offset: デコードする解析窓の長さ
+    sr は offset_engine.ENGINE_SR 固定（advanced-analysis と同じ結果・キャッシュを共有するため変えない）
+    """
+    windows = (segment,) + tuple(s for s in OFFSET_WINDOW_SECONDS if s < segment)
+    for seconds in windows:
+        estimate = estimate_analysis_mb(seconds, sr)
+        if _fits(estimate, budget_mb):
+            return _plan(budget_mb, estimate, True, analysis_sr=sr, segment_s=seconds)
+    return _plan(budget_mb, estimate, False, analysis_sr=sr, segment_s=windows[-1])
+
+def plan_stream(sr, channels, budget_mb):
+    """reference-analysis: ストリーミングのブロック長（トラック長に依存しない）"""
+    for seconds in STREAM_BLOCK_SECONDS:
+        estimate = BASE_MB + estimate_signal_mb(seconds, sr, channels) + STREAM_MB_PER_S * seconds * channels
+        if _fits(estimate, budget_mb):
+            return _plan(budget_mb, estimate, True, block_seconds=seconds)
+    return _plan(budget_mb, estimate, False, block_seconds=STREAM_BLOCK_SECONDS[-1])
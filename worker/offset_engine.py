@@ -0,0 +1,191 @@
+"""
+オフセット推定エンジン（advanced-offset.py / advanced-analysis.py 共通）
+- 伴奏とボーカルの同じ窓（スキャンがあれば最初の有音の少し前から SEGMENT_SECONDS 秒）をオンセット強度包絡にし、
+  ±MAX_OFFSET_MS の範囲で相互相関のピークを探す（放物線補間でホップ以下の分解能）
+- 結果は入力内容と設定をキーに result_cache へ保存し、同じ入力を後から解析するスクリプトは再計算しない
+
+結果スキーマ（ENGINE_VERSION を上げるまで変えない）:
+    offset_ms        ボーカルが伴奏より遅れて始まる時間（負ならボーカルが先行）
+    confidence       ピーク位置の相関係数（0〜1）
+    method           'onset_xcorr'
+    engine_version   ENGINE_VERSION
+    analysis_sr      解析サンプルレート
+    resolution_ms    包絡のフレーム間隔（補間前の分解能）
+    segment_start_s  解析窓の開始位置（秒）
+    segment_s        解析窓の長さ（秒、入力が短ければそれ以下）
+"""
+import numpy as np
+
+from lazy_deps import lazy_import
+from pcm_io import is_pcm, load_pcm
+from result_cache import content_key, load_result, save_result
+from silence_map import active_extent
+
+librosa = lazy_import('librosa')
+signal = lazy_import('scipy.signal')
+
+ENGINE_VERSION = 1
+METHOD = 'onset_xcorr'
+CACHE_NAMESPACE = 'offset'
+ENGINE_SR = 22050
+# 5.8ms（22.05kHz）
+HOP = 128
+SEGMENT_SECONDS = 30.0
+MAX_OFFSET_MS = 2000.0
+# 包絡がこれより短い窓は推定しない
+MIN_FRAMES = 32
+# onset_strength と同じ STFT 設定
+N_FFT = 2048
+N_MELS = 128
+TOP_DB = 80.0
+# これより長い入力は包絡をブロック単位で求める（全体のSTFTを保持しない、約35MB/ブロック）
+ONSET_BLOCK_FRAMES = 8192
+
+def window_start(scan, segment=SEGMENT_SECONDS):
+    """
+    解析窓の開始位置（秒）
+    ボーカルの先頭が無音の場合、最初の有音の少し前から読む（入力の終端を越える場合は末尾に寄せる）
+    """
+    extent = active_extent(scan) if scan else None
+    if extent is None:
+        return 0.0
+    return round(max(0.0, min(extent[0], scan['duration'] - segment)), 3)
+
+def cache_key(inst_path, vocal_path, start, sr=ENGINE_SR, segment=SEGMENT_SECONDS):
+    """入力内容と解析設定のキー（パスのない信号・パイプ入力は None）"""
+    if not inst_path or not vocal_path:
+        return None
+    return content_key([inst_path, vocal_path], engine=ENGINE_VERSION, sr=sr, hop=HOP,
+                       segment_start=start, segment=segment, max_offset_ms=MAX_OFFSET_MS)
+
+def load_window(path, start, sr=ENGINE_SR, segment=SEGMENT_SECONDS):
+    """解析窓だけを読み込み（モノラル）"""
+    if is_pcm(path):
+        y, _ = load_pcm(path, sr, duration=start + segment)
+        return y[int(start * sr):]
+    y, _ = librosa.load(path, sr=sr, mono=True, offset=start, duration=segment)
+    return y
+
+def _blockwise_onset_strength(y, sr):
+    """
+    librosa.onset.onset_strength(y, sr, hop_length=HOP) と同じ包絡をブロック単位で計算
+    メルパワー（dB）だけを全体分保持し、top_db の下限は全フレームの最大値から決める
+    """
+    n_frames = 1 + len(y) // HOP
+    padded = np.pad(y, N_FFT // 2)
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=N_FFT, n_mels=N_MELS, fmax=0.5 * sr)
+    mel_db = np.empty((N_MELS, n_frames), dtype=np.float32)
+    for start in range(0, n_frames, ONSET_BLOCK_FRAMES):
+        stop = min(start + ONSET_BLOCK_FRAMES, n_frames)
+        block = padded[start * HOP:(stop - 1) * HOP + N_FFT]
+        power = np.abs(librosa.stft(block, n_fft=N_FFT, hop_length=HOP, center=False)) ** 2
+        mel_db[:, start:stop] = 10.0 * np.log10(np.maximum(mel_basis @ power, 1e-10))
+    np.maximum(mel_db, mel_db.max() - TOP_DB, out=mel_db)
+
+    onset = np.maximum(0.0, np.diff(mel_db, axis=1)).mean(axis=0)
+    return np.pad(onset, (1 + N_FFT // (2 * HOP), 0))[:n_frames]
+
+def onset_envelope(y, sr):
+    """標準化したオンセット強度包絡"""
+    if 1 + len(y) // HOP > ONSET_BLOCK_FRAMES:
+        envelope = _blockwise_onset_strength(y, sr)
+    else:
+        envelope = librosa.onset.onset_strength(y=y, sr=sr, hop_length=HOP)
+    return (envelope - envelope.mean()) / (envelope.std() + 1e-9)
+
+def onset_envelopes(vocal, inst, sr):
+    """ボーカル・伴奏の包絡（同じ信号で複数の指標を求める場合に一度だけ計算する）"""
+    return onset_envelope(vocal, sr), onset_envelope(inst, sr)
+
+def estimate_offset(vocal, inst, sr, envelopes=None):
+    """
+    同じ窓から切り出したボーカル・伴奏のずれ
+    envelopes: onset_envelopes() の結果（計算済みなら再利用）
+    Returns: (offset_ms, confidence)
+    """
+    ov, oi = envelopes or onset_envelopes(vocal, inst, sr)
+    n = min(len(ov), len(oi))
+    if n < MIN_FRAMES:
+        return 0.0, 0.0
+    ov, oi = ov[:n], oi[:n]
+
+    max_lag = min(int(MAX_OFFSET_MS / 1000 * sr / HOP), n - MIN_FRAMES)
+    lags = np.arange(-max_lag, max_lag + 1)
+    # 正のラグ = ボーカルが遅れている
+    # 窓長で割る（重なりの短い大きなラグほど小さくなり、周期的な伴奏で1拍ずれたピークを選びにくい）
+    xcorr = signal.correlate(ov, oi, mode='full', method='fft')[n - 1 - max_lag:n + max_lag] / n
+    peak = int(np.argmax(xcorr))
+    lag = float(lags[peak])
+    if 0 < peak < len(xcorr) - 1:
+        y0, y1, y2 = xcorr[peak - 1], xcorr[peak], xcorr[peak + 1]
+        denom = y0 - 2 * y1 + y2
+        if denom < 0:
+            lag += float(np.clip(0.5 * (y0 - y2) / denom, -0.5, 0.5))
+
+    return lag * HOP / sr * 1000, float(np.clip(xcorr[peak], 0.0, 1.0))
+
+def alignment_score(vocal, inst, sr):
+    """
+    そのままの時間軸でのボーカル・伴奏のオンセット包絡の相関（0〜1）
+    estimate_offset の confidence（最適な固定オフセットでの相関）と同じ尺度（タイムワープの事後確認用）
+    """
+    ov, oi = onset_envelope(vocal, sr), onset_envelope(inst, sr)
+    n = min(len(ov), len(oi))
+    if n < MIN_FRAMES:
+        return 0.0
+    return float(np.clip(np.dot(ov[:n], oi[:n]) / n, 0.0, 1.0))
+
+def mapped_alignment_score(vocal, inst, sr, vocal_times, envelopes=None):
+    """
+    ボーカルの包絡を時間写像で伴奏の時間軸へ写した場合の相関（0〜1、alignment_score と同じ尺度）
+    vocal_times(t): 伴奏時刻 t（秒の配列）に対応するボーカル時刻
+    タイムワープを描画する前にその効果を見積もる（写像の範囲外は無音として扱う）
+    """
+    ov, oi = envelopes or onset_envelopes(vocal, inst, sr)
+    if min(len(ov), len(oi)) < MIN_FRAMES:
+        return 0.0
+    frames = vocal_times(np.arange(len(oi)) * HOP / sr) * sr / HOP
+    mapped = np.interp(frames, np.arange(len(ov)), ov, left=0.0, right=0.0)
+    return float(np.clip(np.dot(mapped, oi) / len(oi), 0.0, 1.0))
+
+def cached_offset(inst_path, vocal_path, scan=None, sr=ENGINE_SR, segment=SEGMENT_SECONDS):
+    """保存済みの結果（なければ None、入力をデコードしない）"""
+    return load_result(CACHE_NAMESPACE, cache_key(inst_path, vocal_path, window_start(scan, segment), sr, segment))
+
+def detect_offset(inst_path, vocal_path, scan=None, sr=ENGINE_SR, signals=None, segment=SEGMENT_SECONDS):
+    """
+    オフセット推定（キャッシュ経由）
+    ファイル入力は解析窓を読み直すため、どの呼び出し元からでも同じ結果になる
+    signals: 読み込み済みの (vocal, inst, signal_sr)（パイプ入力・パスのない信号の場合に使う）
+    segment: 解析窓の長さ（メモリ予算で縮める場合のみ指定、既定以外はキャッシュも別）
+    Returns: (result, cached)
+    """
+    start = window_start(scan, segment)
+    key = cache_key(inst_path, vocal_path, start, sr, segment)
+    result = load_result(CACHE_NAMESPACE, key)
+    if result is not None:
+        return result, True
+
+    if key is None and signals is not None:
+        vocal, inst, signal_sr = signals
+        window = slice(int(start * signal_sr), int((start + segment) * signal_sr))
+        vocal, inst = vocal[window], inst[window]
+        if signal_sr != sr:
+            vocal = librosa.resample(vocal, orig_sr=signal_sr, target_sr=sr)
+            inst = librosa.resample(inst, orig_sr=signal_sr, target_sr=sr)
+    else:
+        vocal, inst = load_window(vocal_path, start, sr, segment), load_window(inst_path, start, sr, segment)
+
+    offset_ms, confidence = estimate_offset(vocal, inst, sr)
+    result = {
+        'offset_ms': round(offset_ms, 2),
+        'confidence': round(confidence, 4),
+        'method': METHOD,
+        'engine_version': ENGINE_VERSION,
+        'analysis_sr': sr,
+        'resolution_ms': round(HOP / sr * 1000, 2),
+        'segment_start_s': start,
+        'segment_s': round(min(len(vocal), len(inst)) / sr, 3),
+    }
+    save_result(CACHE_NAMESPACE, key, result)
+    return result, False
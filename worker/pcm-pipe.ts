@@ -0,0 +1,42 @@
+/**
+ * Pythonワーカー間の生PCM受け渡し
+ * ファイルパスの代わりに pcm:<path|->?rate=..&channels=..&dtype=.. を渡すと
+ * ワーカーは標準入出力（または名前付きパイプ）を生PCMとして読み書きする
+ * PCMが標準出力を使う間、JSON結果は fd 3（PCM_META_FD）へ出力される
+ */
+
+export type PcmDtype = 'f32' | 's16' | 's32'
+
+export type PcmFormat = {
+  rate?: number
+  channels?: number
+  dtype?: PcmDtype
+}
+
+// 中間データは変換誤差のない float32 モノラル・44.1kHz（ワーカーの処理形式）
+export const WORKER_PCM_FORMAT: Required<PcmFormat> = { rate: 44100, channels: 1, dtype: 'f32' }
+
+export const PCM_META_FD = 3
+
+// 標準入出力に加えてメタデータ用の fd 3 を開く
+export const PCM_STDIO = ['pipe', 'pipe', 'pipe', 'pipe'] as const
+
+export function pcmSpec(target: string = '-', format: PcmFormat = {}): string {
+  const params = new URLSearchParams()
+  if (format.rate) params.set('rate', String(format.rate))
+  if (format.channels) params.set('channels', String(format.channels))
+  if (format.dtype) params.set('dtype', format.dtype)
+  const query = params.toString()
+  return `pcm:${target}${query ? `?${query}` : ''}`
+}
+
+/**
+ * fd 3 に出力されたJSON結果（Uint8Array / string）を解析
+ */
+export function parsePcmMeta(output: Uint8Array | string | undefined): any {
+  if (!output) {
+    return undefined
+  }
+  const text = typeof output === 'string' ? output : Buffer.from(output).toString('utf8')
+  return text.trim() ? JSON.parse(text) : undefined
+}
@@ -0,0 +1,188 @@
+"""
+生PCMの入出力（パイプ連携用）
+ファイルパスの代わりに pcm:<path>?rate=44100&channels=2&dtype=f32 を指定すると
+<path>（'-' は標準入出力、それ以外は名前付きパイプ等）をヘッダなしのインターリーブPCMとして扱う
+PCMを標準出力へ書く場合、JSONメタデータは --meta で指定した別チャネルへ出力する
+"""
+import os
+import sys
+from urllib.parse import parse_qs
+
+import numpy as np
+
+from lazy_deps import lazy_import
+
+librosa = lazy_import('librosa')
+
+PCM_PREFIX = 'pcm:'
+STDIO = '-'
+
+# dtype名 → (numpy dtype, float32 との換算係数)
+PCM_DTYPES = {
+    'f32': ('<f4', 1.0),
+    's16': ('<i2', 32768.0),
+    's32': ('<i4', 2147483648.0),
+}
+
+# 読み込んだ入力ストリーム（再読み込みできないため1回だけ読んで保持）
+_sources = {}
+_stdout_pcm = None
+
+def is_pcm(spec):
+    return isinstance(spec, str) and spec.startswith(PCM_PREFIX)
+
+def parse_spec(spec):
+    """pcm:<path>?rate=..&channels=..&dtype=.. → dict"""
+    body = spec[len(PCM_PREFIX):]
+    path, _, query = body.partition('?')
+    params = {k: v[-1] for k, v in parse_qs(query).items()}
+    dtype = params.get('dtype', 'f32')
+    if dtype not in PCM_DTYPES:
+        raise ValueError(f"Unsupported PCM dtype '{dtype}' (choose from {', '.join(PCM_DTYPES)})")
+    return {
+        'path': path or STDIO,
+        'rate': int(params['rate']) if 'rate' in params else None,
+        'channels': int(params.get('channels', 1)),
+        'dtype': dtype,
+    }
+
+def uses_stdout(spec):
+    return is_pcm(spec) and parse_spec(spec)['path'] == STDIO
+
+def validate_specs(inputs, outputs=()):
+    """標準入力・標準出力はそれぞれ1つの指定にしか使えない"""
+    stdin_inputs = [s for s in inputs if is_pcm(s) and parse_spec(s)['path'] == STDIO]
+    if len(stdin_inputs) > 1:
+        raise ValueError('Only one input can be read from stdin; use a named pipe for the others')
+    if sum(1 for s in outputs if uses_stdout(s)) > 1:
+        raise ValueError('Only one output can be written to stdout')
+    for spec in inputs:
+        if is_pcm(spec) and parse_spec(spec)['rate'] is None:
+            raise ValueError(f"PCM input requires a sample rate: {spec}")
+
+def read_pcm(spec):
+    """入力を (frames, channels) float32 と サンプルレートで返す"""
+    if spec in _sources:
+        return _sources[spec]
+    fmt = parse_spec(spec)
+    if fmt['path'] == STDIO:
+        raw = sys.stdin.buffer.read()
+    else:
+        with open(fmt['path'], 'rb') as f:
+            raw = f.read()
+    dtype, scale = PCM_DTYPES[fmt['dtype']]
+    width = np.dtype(dtype).itemsize * fmt['channels']
+    data = np.frombuffer(raw[:len(raw) // width * width], dtype=dtype).reshape(-1, fmt['channels'])
+    data = data.astype(np.float32) / scale if scale != 1.0 else data.astype(np.float32)
+    _sources[spec] = (data, fmt['rate'])
+    return _sources[spec]
+
+def pcm_info(spec):
+    data, rate = read_pcm(spec)
+    return {'samplerate': rate, 'channels': data.shape[1], 'duration': len(data) / rate}
+
+def read_span(spec, start, duration):
+    """start秒からduration秒（(frames, channels) float32）"""
+    data, rate = read_pcm(spec)
+    lo = min(int(start * rate), max(len(data) - 1, 0))
+    return data[lo:lo + int(duration * rate)]
+
+def iter_pcm_blocks(spec, blocksize, overlap=0):
+    data, _ = read_pcm(spec)
+    step = blocksize - overlap
+    for start in range(0, max(len(data) - overlap, 1), step):
+        yield data[start:start + blocksize]
+
+def load_pcm(spec, sr=None, mono=True, duration=None):
+    """
+    librosa.load 相当（リサンプル・モノラル化・先頭 duration 秒）
+    Returns: (y, sr)
+    """
+    data, rate = read_pcm(spec)
+    if duration is not None:
+        data = data[:int(duration * rate)]
+    y = data.mean(axis=1) if mono else data.T
+    if sr is not None and sr != rate:
+        y = librosa.resample(y, orig_sr=rate, target_sr=sr)
+    return np.ascontiguousarray(y, dtype=np.float32), sr or rate
+
+def claim_stdout():
+    """
+    標準出力をPCM専用にする
+    元の fd 1 を複製してPCM出力に使い、fd 1 は標準エラーへ向ける
+    （print やライブラリの出力がPCMに混入しないように）
+    """
+    global _stdout_pcm
+    if _stdout_pcm is None:
+        sys.stdout.flush()
+        _stdout_pcm = os.fdopen(os.dup(1), 'wb')
+        os.dup2(2, 1)
+    return _stdout_pcm
+
+class PcmWriter:
+    """audio_io.StreamWriter と同じインターフェースでPCMを書き出す"""
+
+    def __init__(self, spec, sr, channels):
+        fmt = parse_spec(spec)
+        self.path = spec
+        self.frames = 0
+        self.samplerate = sr
+        self.channels = channels
+        self.dtype = fmt['dtype']
+        self._numpy_dtype, self._scale = PCM_DTYPES[fmt['dtype']]
+        self._owned = fmt['path'] != STDIO
+        self._file = open(fmt['path'], 'wb') if self._owned else claim_stdout()
+
+    def write(self, block):
+        data = np.clip(np.asarray(block, dtype=np.float32), -1.0, 1.0)
+        if data.ndim == 1:
+            data = data[:, None]
+        if self._scale != 1.0:
+            data = np.round(data * (self._scale - 1))
+        self._file.write(np.ascontiguousarray(data, dtype=self._numpy_dtype).tobytes())
+        self.frames += len(data)
+
+    def close(self):
+        self._file.flush()
+        if self._owned:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_pcm(spec, audio, sr):
+    audio = np.asarray(audio)
+    with PcmWriter(spec, sr, 1 if audio.ndim == 1 else audio.shape[1]) as writer:
+        writer.write(audio)
+    return spec
+
+def add_pcm_args(parser):
+    """メタデータ出力先の共通CLIオプション"""
+    parser.add_argument('--meta', metavar='TARGET',
+                        help='Where to write JSON results and progress events: a file path or fd:N '
+                             '(default: stdout, or fd:3/stderr when stdout carries PCM)')
+
+def open_meta(target=None, outputs=()):
+    """
+    JSONメタデータの出力先
+    未指定時は標準出力。PCMが標準出力を使う場合は fd 3（開いていれば）または標準エラー
+    """
+    if any(uses_stdout(spec) for spec in outputs):
+        claim_stdout()
+        if target is None:
+            target = 'fd:3' if _fd_open(3) else 'fd:2'
+    if target is None or target == STDIO:
+        return sys.stdout
+    if target.startswith('fd:'):
+        return os.fdopen(int(target[3:]), 'w', encoding='utf-8', closefd=False)
+    return open(target, 'w', encoding='utf-8')
+
+def _fd_open(fd):
+    try:
+        os.fstat(fd)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,138 @@
+"""
+CREPE不使用時のピッチ追跡（YIN）とノート分割
+差分関数を自己相関（rFFT）から一括計算し、ボーカル区間（VAD）のフレームのみ処理する
+ノート分割はCREPE経路と共通（連続区間をベクトル演算で集約）
+"""
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from chroma_frontend import decimate
+from vad import VoiceActivityDetector, frame_features, region_spans
+
+YIN_SR = 22050
+FMIN = 80.0
+FMAX = 800.0
+# 累積平均正規化差分（CMNDF）の閾値（これ未満の最初の極小を周期とする）
+YIN_THRESHOLD = 0.1
+# 1回のFFTで処理するフレーム数（一時メモリ上限）
+FRAMES_PER_BATCH = 512
+# 有声区間: 最大フレームエネルギー比 -20dB 以上（スペクトル重心は見ない）
+VOICED_ENERGY_THRESHOLD = 0.01
+VOICED_MIN_SECONDS = 0.08
+
+def _next_pow2(n):
+    return 1 << int(math.ceil(math.log2(max(n, 1))))
+
+def yin_frames(frames, sr, fmin=FMIN, fmax=FMAX, threshold=YIN_THRESHOLD):
+    """
+    フレーム (n, frame_length) ごとの f0 と信頼度（1 - CMNDF最小値）
+    d(τ) = E(0) + E(τ) - 2 r(τ) を相互相関のFFTとエネルギーの累積和から求める
+    """
+    n, frame_length = frames.shape
+    max_lag = min(int(sr / fmin), frame_length // 2)
+    min_lag = max(int(sr / fmax), 2)
+    window = frame_length - max_lag
+    n_fft = _next_pow2(frame_length + window)
+
+    f0 = np.zeros(n, dtype=np.float32)
+    confidence = np.zeros(n, dtype=np.float32)
+    lags = np.arange(max_lag + 1)
+    for start in range(0, n, FRAMES_PER_BATCH):
+        x = np.asarray(frames[start:start + FRAMES_PER_BATCH], dtype=np.float64)
+        head = x[:, :window]
+        r = np.fft.irfft(np.conj(np.fft.rfft(head, n_fft)) * np.fft.rfft(x, n_fft), n_fft)[:, :max_lag + 1]
+        power = np.concatenate([np.zeros((len(x), 1)), np.cumsum(x ** 2, axis=1)], axis=1)
+        energy_lag = power[:, lags + window] - power[:, lags]
+        diff = np.maximum(power[:, window:window + 1] + energy_lag - 2 * r, 0.0)
+
+        # CMNDF: d'(τ) = d(τ) τ / Σ_{j<=τ} d(j)、d'(0) = 1
+        cmndf = np.ones_like(diff)
+        cumulative = np.cumsum(diff[:, 1:], axis=1)
+        cmndf[:, 1:] = diff[:, 1:] * lags[1:] / (cumulative + 1e-12)
+
+        # 閾値未満の最初の極小（なければ探索範囲の最小値）
+        search = cmndf[:, min_lag:max_lag]
+        is_min = (search <= cmndf[:, min_lag - 1:max_lag - 1]) & (search <= cmndf[:, min_lag + 1:max_lag + 1])
+        below = is_min & (search < threshold)
+        tau = np.where(below.any(axis=1), below.argmax(axis=1), search.argmin(axis=1)) + min_lag
+
+        # 放物線補間で周期を精密化
+        rows = np.arange(len(x))
+        y0, y1, y2 = cmndf[rows, tau - 1], cmndf[rows, tau], cmndf[rows, tau + 1]
+        denom = y0 - 2 * y1 + y2
+        shift = np.where(denom > 0, np.clip(0.5 * (y0 - y2) / np.where(denom > 0, denom, 1.0), -0.5, 0.5), 0.0)
+
+        f0[start:start + len(x)] = sr / (tau + shift)
+        confidence[start:start + len(x)] = np.clip(1.0 - y1, 0.0, 1.0)
+    return f0, confidence
+
+def voiced_spans(y, sr, energy_threshold=VOICED_ENERGY_THRESHOLD, min_duration=VOICED_MIN_SECONDS):
+    """
+    ピッチ追跡対象のサンプル範囲
+    VADのフレーム特徴量を流用し、エネルギーのみで判定（重心条件は低い声・純音を落とすため使わない）
+    """
+    energy, centroid = frame_features(y, sr)
+    if len(energy) == 0:
+        return []
+    detector = VoiceActivityDetector(sr, float(energy.max()), float(centroid.max()), min_duration=min_duration,
+                                     energy_threshold=energy_threshold, centroid_threshold=0.0)
+    return region_spans(detector.feed_features(energy, centroid) + detector.flush(), sr, len(y))
+
+def yin_track(y, sr, spans=None, step_ms=10.0, fmin=FMIN, fmax=FMAX):
+    """
+    時刻・f0・信頼度の配列（spans のサンプル範囲内のフレームのみ、None なら全体）
+    Returns: (times, f0, confidence)
+    """
+    if spans is None:
+        spans = [(0, len(y))]
+    y, yin_sr = decimate(y, sr, YIN_SR)
+    scale = yin_sr / sr
+    frame_length = _next_pow2(2 * int(yin_sr / fmin))
+    hop = max(int(round(yin_sr * step_ms / 1000)), 1)
+    # 時刻は差分関数の積分窓（先頭 frame_length - max_lag サンプル）の中心
+    center = (frame_length - min(int(yin_sr / fmin), frame_length // 2)) // 2
+
+    times, f0s, confidences = [], [], []
+    for start, end in spans:
+        start, end = int(start * scale), min(int(end * scale), len(y))
+        if end - start < frame_length:
+            continue
+        frames = sliding_window_view(y[start:end], frame_length)[::hop]
+        f0, confidence = yin_frames(frames, yin_sr, fmin, fmax)
+        times.append((start + np.arange(len(frames)) * hop + center) / yin_sr)
+        f0s.append(f0)
+        confidences.append(confidence)
+    if not times:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty, empty
+    return np.concatenate(times), np.concatenate(f0s), np.concatenate(confidences)
+
+def segment_notes(times, f0, confidence, max_gap=None):
+    """
+    有効フレームの連続区間をノートにまとめる（最寄り半音が変わる点・時間が max_gap 秒以上空く点で分割）
+    Returns: 各ノートの start_time/duration/note/cent_error/confidence（平均）の配列dict
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if len(times) == 0:
+        empty = np.zeros(0)
+        return {'start_time': empty, 'duration': empty, 'note': empty.astype(int),
+                'cent_error': empty, 'confidence': empty}
+    midi = 12 * np.log2(np.asarray(f0, dtype=np.float64) / 440) + 69
+    rounded = np.round(midi).astype(int)
+    cents = (midi - rounded) * 100
+
+    breaks = rounded[1:] != rounded[:-1]
+    if max_gap is not None:
+        breaks |= np.diff(times) > max_gap
+    starts = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+    ends = np.append(starts[1:], len(times))
+    counts = ends - starts
+    return {
+        'start_time': times[starts],
+        'duration': times[ends - 1] - times[starts],
+        'note': rounded[starts],
+        'cent_error': np.add.reduceat(cents, starts) / counts,
+        'confidence': np.add.reduceat(np.asarray(confidence, dtype=np.float64), starts) / counts,
+    }
@@ -1,7 +1,8 @@
-import { fetchNextProcessingJob, markDone, markFailed } from './db'
+import { fetchNextProcessingJob, markDone, markFailed, saveAudioScan } from './db'
 import { putObjectService, parseStoragePath, downloadFile } from '../storage/service'
 import { resultPrefix } from '../app/api/_lib/paths'
-import { processAudio, detectOffset, cleanupTempFiles, getAudioInfo } from './audio'
+import { processAudio, detectOffset, cleanupTempFiles, getAudioInfo, quickScan } from './audio'
+import { AdmissionError } from './python-scheduler'
 import { promises as fs } from 'fs'
 import path from 'path'
 
@@ -18,11 +19,23 @@ interface WorkerError {
   message: string
   details?: any
   retryable: boolean
+  retryAfterMs?: number
 }
 
 function classifyError(error: unknown): WorkerError {
   const message = error instanceof Error ? error.message : String(error)
   
+  // スケジューラの受付拒否（混雑・期限超過見込み）は待ってから再投入
+  if (error instanceof AdmissionError) {
+    return {
+      type: 'temporary',
+      message: '処理待ちが混雑しています',
+      details: message,
+      retryable: true,
+      retryAfterMs: error.retryAfterMs
+    }
+  }
+  
   // 一時的なエラー（リトライ可能）
   if (message.includes('ECONNREFUSED') || 
       message.includes('ENOTFOUND') || 
@@ -140,8 +153,9 @@ async function processJobWithRetry(job: any): Promise<boolean> {
       }
       
       // リトライ前の待機
-      console.log(`Job ${job.id} retrying in ${RETRY_DELAY_MS}ms...`)
-      await sleep(RETRY_DELAY_MS * retryCount) // 指数バックオフ
+      const delayMs = Math.max(RETRY_DELAY_MS * retryCount, errorInfo.retryAfterMs ?? 0) // 指数バックオフ
+      console.log(`Job ${job.id} retrying in ${delayMs}ms...`)
+      await sleep(delayMs)
     }
   }
   
@@ -165,6 +179,7 @@ async function processJobInternal(job: any): Promise<boolean> {
   
   const instLocal = path.join(tempDir, `inst_${fileId}.wav`)
   const vocalLocal = path.join(tempDir, `vocal_${fileId}.wav`)
+  const vocalScan = `${vocalLocal}.scan.json`
   const outputLocal = path.join(tempDir, `output_${fileId}.mp3`)
 
   let filesToCleanup: string[] = []
@@ -198,11 +213,28 @@ async function processJobInternal(job: any): Promise<boolean> {
     
     console.log(`Audio files validated - Inst: ${instInfo.duration}s, Vocal: ${vocalInfo.duration}s`)
 
+    // 4.5 クイックスキャン（無音マップ、同じボーカルのスキャンがジョブに保存済みなら再利用）
+    // 補正後のボーカルは長さ・形式が同じでスキャン内の照合値では区別できないため、保存時のパスでも照合する
+    let scanPath: string | undefined = vocalScan
+    filesToCleanup.push(vocalScan)
+    try {
+      if (job.audio_scan && job.audio_scan.vocal_path === job.vocal_path) {
+        await fs.writeFile(vocalScan, JSON.stringify(job.audio_scan))
+      } else {
+        await quickScan(vocalLocal, vocalScan)
+        const scan = JSON.parse(await fs.readFile(vocalScan, 'utf8'))
+        await saveAudioScan(job.id, { ...scan, vocal_path: job.vocal_path })
+      }
+    } catch (error) {
+      console.warn(`Quick scan failed for job ${job.id}, processing full signal:`, error)
+      scanPath = undefined
+    }
+
     // 5. オフセット検出（エラーハンドリング強化）
     console.log(`Detecting offset for job ${job.id}`)
     let offsetMs = 0
     try {
-      offsetMs = await detectOffset(instLocal, vocalLocal)
+      offsetMs = await detectOffset(instLocal, vocalLocal, scanPath)
       console.log(`Detected offset: ${offsetMs}ms`)
     } catch (error) {
       console.warn(`Offset detection failed for job ${job.id}, using default (0ms):`, error)
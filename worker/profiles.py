@@ -0,0 +1,52 @@
+"""
+処理プロファイル（速度と精度のトレードオフ）
+プランごとに fast / balanced / accurate を選び、解析サンプルレート・CREPEモデル容量・
+DTW解像度/クロマ方式・WORLDフレーム周期をまとめて切り替える
+オフセットはプロファイルによらず共通エンジン（offset_engine.py）の固定設定
+（ホップ・放物線補間を変えると advanced-offset.py と結果・キャッシュを共有できないため、オフセットの精緻化はプロファイルに含めない）
+各プロファイルの精度/処理時間は worker/evaluate_profiles.py で計測する
+"""
+
+PROFILES = {
+    'fast': {
+        'analysis_sr': 16000,         # 解析サンプルレートの上限（メモリ予算でさらに下がる場合あり）
+        'crepe_capacity': 'tiny',
+        'pitch_step_ms': 20,          # ピッチ追跡のフレーム間隔（CREPE/YIN 共通）
+        'dtw_max_frames': 125,
+        'chroma': 'stft',             # DTW用クロマ（chroma_frontend.CHROMA_METHODS）
+        'world_frame_period': 10.0,
+    },
+    'balanced': {
+        'analysis_sr': 22050,
+        'crepe_capacity': 'small',
+        'pitch_step_ms': 10,
+        'dtw_max_frames': 250,
+        'chroma': 'stft',
+        'world_frame_period': 5.0,
+    },
+    'accurate': {
+        'analysis_sr': 44100,
+        'crepe_capacity': 'full',
+        'pitch_step_ms': 10,
+        'dtw_max_frames': 500,
+        'chroma': 'cqt',
+        'world_frame_period': 5.0,
+    },
+}
+
+PLAN_PROFILES = {
+    'lite': 'fast',
+    'standard': 'balanced',
+    'creator': 'accurate',
+}
+
+def resolve_profile(plan_code, override=None):
+    """--speed-profile 指定 → プラン既定 の順で (名前, 設定) を返す"""
+    name = override or PLAN_PROFILES.get(plan_code, 'balanced')
+    return name, PROFILES[name]
+
+def add_profile_args(parser):
+    """処理プロファイルの共通CLIオプション"""
+    parser.add_argument('--speed-profile', choices=list(PROFILES),
+                        help='Speed/accuracy profile (default: from --plan; '
+                             + ', '.join(f'{plan}={name}' for plan, name in PLAN_PROFILES.items()) + ')')
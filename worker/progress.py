@@ -0,0 +1,144 @@
+"""
+進捗イベント・中断処理・チェックポイント
+--stream 指定時は標準出力へ NDJSON（1行1イベント）で進捗・ステージ完了・結果を逐次出力する
+SIGTERM を受けると Cancelled を送出し、完了済みステージの結果を出力してから終了する
+--checkpoint 指定時は完了ステージの結果を保存し、次回の実行で再利用する
+"""
+import hashlib
+import json
+import os
+import signal
+import sys
+import time
+
+from pcm_io import is_pcm
+
+CHECKPOINT_VERSION = 1
+EXIT_CANCELLED = 128 + signal.SIGTERM
+
+class Cancelled(BaseException):
+    """
+    SIGTERM による中断
+    解析関数内の except Exception に握りつぶされないよう BaseException を継承
+    """
+
+def add_progress_args(parser):
+    """進捗・チェックポイントの共通CLIオプション"""
+    parser.add_argument('--stream', action='store_true',
+                        help='Emit newline-delimited JSON progress, stage and result events on stdout (or --meta)')
+    parser.add_argument('--checkpoint', metavar='PATH',
+                        help='Save completed stage results to PATH and resume from it on the next attempt')
+
+def inputs_key(paths, **options):
+    """
+    入力ファイル（パス・サイズ・更新時刻）と設定から、チェックポイントの照合キーを作る
+    パイプ入力（pcm:）は内容を照合できないため None（チェックポイントを再利用しない）
+    """
+    parts = []
+    for path in paths:
+        if is_pcm(path):
+            return None
+        stat = os.stat(path)
+        parts.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    payload = json.dumps({'inputs': parts, 'options': options}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class ProgressReporter:
+    """
+    complete(name, result) でステージ結果をチェックポイントへ保存し、イベントを出力する
+    install_signal_handlers() 後は SIGTERM が Cancelled として送出される
+    """
+
+    def __init__(self, stream=False, checkpoint=None, key=None, out=None):
+        self.stream = stream
+        # 結果・イベントの出力先（PCMを標準出力へ書く場合は別チャネル）
+        self.out = out or sys.stdout
+        self.checkpoint = checkpoint
+        self.key = key
+        self.results = {}
+        self.resumed = []
+        self._t0 = time.perf_counter()
+        if checkpoint and key and os.path.exists(checkpoint):
+            try:
+                with open(checkpoint, encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get('version') == CHECKPOINT_VERSION and saved.get('key') == key:
+                    self.results = saved.get('stages', {})
+                    self.resumed = list(self.results)
+            except (OSError, ValueError):
+                pass  # 壊れたチェックポイントは無視して最初から
+        if self.resumed:
+            self.emit('resume', stages=self.resumed)
+
+    def emit(self, event, **fields):
+        """NDJSONイベントを1行出力（--stream時のみ）"""
+        if not self.stream:
+            return
+        record = {'event': event, 'elapsed_s': round(time.perf_counter() - self._t0, 3)}
+        record.update(fields)
+        self.out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.out.flush()
+
+    def progress(self, stage, fraction):
+        self.emit('progress', stage=stage, fraction=round(float(min(max(fraction, 0.0), 1.0)), 3))
+
+    def done(self, name):
+        """前回までに完了済みのステージか"""
+        return name in self.results
+
+    def get(self, name):
+        return self.results.get(name)
+
+    def cache_stats(self, stages):
+        """チェックポイントの再利用状況（メトリクス用、未使用なら None）"""
+        if not self.checkpoint:
+            return None
+        hits = sum(1 for name in stages if name in self.resumed)
+        return {'hit': hits, 'miss': len(stages) - hits}
+
+    def complete(self, name, result):
+        """ステージ完了: 結果を保持・チェックポイントへ保存・イベント出力"""
+        self.results[name] = result
+        self._save()
+        self.emit('stage', stage=name, result=result)
+        return result
+
+    def _save(self):
+        if not self.checkpoint:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint)), exist_ok=True)
+        tmp = self.checkpoint + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': CHECKPOINT_VERSION, 'key': self.key, 'stages': self.results}, f)
+        os.replace(tmp, self.checkpoint)
+
+    def finish(self, result, pretty=True):
+        """
+        最終結果を出力（--stream時は result イベント、通常時は従来どおりJSON）
+        正常終了したのでチェックポイントは削除
+        """
+        if self.stream:
+            self.emit('result', result=result)
+        else:
+            print(json.dumps(result, indent=2 if pretty else None, ensure_ascii=False), file=self.out, flush=True)
+        self.clear_checkpoint()
+
+    def clear_checkpoint(self):
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    def cancel(self, partial):
+        """中断時: 完了済みの結果を出力して終了コード 143 で終了"""
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        partial = dict(partial, partial=True, completed_stages=list(self.results))
+        if self.stream:
+            self.emit('cancelled', result=partial)
+        else:
+            print(json.dumps(partial, indent=2, ensure_ascii=False), file=self.out, flush=True)
+        sys.exit(EXIT_CANCELLED)
+
+    def install_signal_handlers(self):
+        """SIGTERM（execaのタイムアウト）を Cancelled 例外として主スレッドへ届ける"""
+        def handler(signum, frame):
+            raise Cancelled()
+        signal.signal(signal.SIGTERM, handler)
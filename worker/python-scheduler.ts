@@ -0,0 +1,327 @@
+import os from 'os'
+import { promises as fs } from 'fs'
+
+/**
+ * Pythonジョブのローカルスケジューラ
+ * - ジョブクラス（light: オフセット・スキャン / analysis: 解析 / heavy: WORLD・ハモリ・タイムワープ）ごとの同時実行枠
+ * - クラス内はプラン別キュー（creator > standard > lite、待ち時間で優先度を上げて飢餓を防ぐ）
+ * - 入力長から推定した処理時間で枠の占有数を決め、混雑していてタイムアウトまでに終わらない見込みのジョブは受付時点で拒否する
+ *   （推定は label ごとの実測で補正し、実測のない label は期限で拒否せず待たせる）
+ * - 枠の合計はコア数まで、各ジョブのスレッド数は占有する枠の割合で決める（thread-budget.ts の pythonEnv）
+ */
+
+export type JobClass = 'light' | 'analysis' | 'heavy'
+export type SchedulerPlan = 'lite' | 'standard' | 'creator'
+
+export const JOB_CLASSES: JobClass[] = ['light', 'analysis', 'heavy']
+export const SCHEDULER_PLANS: SchedulerPlan[] = ['creator', 'standard', 'lite']
+
+export type ScheduleRequest = {
+  jobClass: JobClass
+  plan?: SchedulerPlan
+  durationSec?: number  // 入力長（不明なら0: 固定コストのみ）
+  timeoutMs?: number    // 待ち時間 + 推定処理時間がこれを超える見込みなら受け付けない
+  label?: string
+}
+
+// ジョブが占有する枠（task に渡し、スレッド予算の配分に使う）
+export type SlotShare = { slots: number, totalSlots: number }
+
+export type SchedulerOptions = {
+  limits?: Partial<Record<JobClass, number>>  // クラスごとの同時実行枠
+  queueLimit?: number                         // クラス×プランごとの待ち行列の上限
+  now?: () => number
+}
+
+type Cost = { fixedSec: number, perSecond: number, samples: number }
+
+// 推定処理時間 = fixedSec + 入力秒 × perSecond（label ごとの実測で補正する）
+// heavy はハモリ1タイプ（WORLD）の実測 0.2〜0.25 秒/入力秒、ピッチ補正・タイムワープはこれ以下
+const DEFAULT_COST: Record<JobClass, Omit<Cost, 'samples'>> = {
+  light: { fixedSec: 1.5, perSecond: 0.02 },
+  analysis: { fixedSec: 3, perSecond: 0.15 },
+  heavy: { fixedSec: 3, perSecond: 0.25 },
+}
+// 1枠分の入力長（これを超える入力は複数枠を占有する）
+const SLOT_SECONDS: Record<JobClass, number> = { light: 600, analysis: 300, heavy: 240 }
+const PLAN_PRIORITY: Record<SchedulerPlan, number> = { creator: 2, standard: 1, lite: 0 }
+// 待ち時間がこれだけ伸びるごとに優先度を1段上げる
+const AGING_MS = 30000
+const DEFAULT_QUEUE_LIMIT = 20
+// 実測による単価補正の重み
+const COST_EWMA = 0.2
+
+export class AdmissionError extends Error {
+  constructor(public reason: 'queue_full' | 'deadline', message: string, public retryAfterMs: number) {
+    super(message)
+    this.name = 'AdmissionError'
+  }
+}
+
+type Entry = {
+  request: ScheduleRequest
+  plan: SchedulerPlan
+  weight: number
+  estimateMs: number
+  enqueuedAt: number
+  start: () => void
+  reject: (error: Error) => void
+}
+
+/**
+ * 環境変数 PYTHON_SCHEDULER_LIMITS（例: "light=4,analysis=2,heavy=1"）、未指定ならコア数から決める
+ * 既定では枠の合計がコア数を超えない（各クラス最低1枠）
+ */
+export function defaultLimits(cpus = os.cpus().length, env: NodeJS.ProcessEnv = process.env): Record<JobClass, number> {
+  const analysis = Math.max(1, Math.floor(cpus / 4))
+  const heavy = Math.max(1, Math.floor(cpus / 4))
+  const limits: Record<JobClass, number> = {
+    light: Math.max(1, cpus - analysis - heavy),
+    analysis,
+    heavy,
+  }
+  for (const part of (env.PYTHON_SCHEDULER_LIMITS || '').split(',')) {
+    const [name, value] = part.split('=').map((s) => s.trim())
+    const limit = Number(value)
+    if ((JOB_CLASSES as string[]).includes(name) && Number.isInteger(limit) && limit > 0) {
+      limits[name as JobClass] = limit
+    }
+  }
+  return limits
+}
+
+export class PythonScheduler {
+  private limits: Record<JobClass, number>
+  private queueLimit: number
+  private now: () => number
+  private costs = new Map<string, Cost>()
+  private queues = new Map<string, Entry[]>()
+  private running: Record<JobClass, { weight: number, until: number }[]> = { light: [], analysis: [], heavy: [] }
+  private counters = { admitted: 0, rejected: 0, completed: 0 }
+
+  constructor(options: SchedulerOptions = {}) {
+    this.limits = { ...defaultLimits(), ...options.limits }
+    this.queueLimit = options.queueLimit ?? DEFAULT_QUEUE_LIMIT
+    this.now = options.now ?? Date.now
+  }
+
+  /** 推定処理時間（ミリ秒） */
+  estimateMs(jobClass: JobClass, durationSec = 0, label?: string): number {
+    const cost = this.cost(jobClass, label)
+    return Math.round((cost.fixedSec + durationSec * cost.perSecond) * 1000)
+  }
+
+  /** 占有する枠数（入力長に比例、クラスの枠数が上限） */
+  weight(jobClass: JobClass, durationSec = 0): number {
+    return Math.min(this.limits[jobClass], Math.max(1, Math.ceil(durationSec / SLOT_SECONDS[jobClass])))
+  }
+
+  /**
+   * 枠が空くまで待って task を実行
+   * キューが満杯、または待ちが発生してタイムアウトまでに終わらない見込みなら AdmissionError で即座に拒否する
+   * （すぐ開始できるジョブ・実測のない label のジョブは期限で拒否しない: 超えた場合は呼び出し側のタイムアウトに任せる）
+   */
+  run<T>(request: ScheduleRequest, task: (slot: SlotShare) => Promise<T>): Promise<T> {
+    const jobClass = request.jobClass
+    const plan = request.plan ?? 'standard'
+    const queue = this.queue(jobClass, plan)
+    const estimateMs = this.estimateMs(jobClass, request.durationSec, request.label)
+    const weight = this.weight(jobClass, request.durationSec)
+
+    if (queue.length >= this.queueLimit) {
+      return this.refuse('queue_full', `${jobClass}/${plan} queue is full (${queue.length})`, this.waitEstimateMs(jobClass, plan, weight))
+    }
+    const waitMs = this.waitEstimateMs(jobClass, plan, weight)
+    if (request.timeoutMs !== undefined && waitMs > 0 && this.measured(jobClass, request.label)
+        && waitMs + estimateMs > request.timeoutMs) {
+      return this.refuse('deadline',
+        `${jobClass}/${plan} job would exceed its ${request.timeoutMs}ms timeout (wait ~${waitMs}ms + run ~${estimateMs}ms)`,
+        waitMs)
+    }
+
+    this.counters.admitted++
+    return new Promise<T>((resolve, reject) => {
+      const entry: Entry = {
+        request, plan, weight, estimateMs, enqueuedAt: this.now(), reject,
+        start: () => {
+          const slot = { weight, until: this.now() + estimateMs }
+          this.running[jobClass].push(slot)
+          const startedAt = this.now()
+          task({ slots: weight, totalSlots: this.totalSlots() }).then(resolve, reject).finally(() => {
+            this.running[jobClass].splice(this.running[jobClass].indexOf(slot), 1)
+            this.observe(jobClass, request.label, request.durationSec ?? 0, this.now() - startedAt)
+            this.counters.completed++
+            this.dispatch(jobClass)
+          })
+        }
+      }
+      queue.push(entry)
+      this.dispatch(jobClass)
+    })
+  }
+
+  /** クラス・プランごとの実行中／待ち数 */
+  stats() {
+    const classes = Object.fromEntries(JOB_CLASSES.map((jobClass) => [jobClass, {
+      limit: this.limits[jobClass],
+      running: this.running[jobClass].length,
+      usedSlots: this.usedSlots(jobClass),
+      queued: Object.fromEntries(SCHEDULER_PLANS.map((plan) => [plan, this.queue(jobClass, plan).length]))
+    }]))
+    return { classes, ...this.counters }
+  }
+
+  private queue(jobClass: JobClass, plan: SchedulerPlan): Entry[] {
+    const key = `${jobClass}:${plan}`
+    let queue = this.queues.get(key)
+    if (!queue) {
+      queue = []
+      this.queues.set(key, queue)
+    }
+    return queue
+  }
+
+  private totalSlots(): number {
+    return JOB_CLASSES.reduce((sum, jobClass) => sum + this.limits[jobClass], 0)
+  }
+
+  private cost(jobClass: JobClass, label?: string): Cost {
+    const key = `${jobClass}:${label ?? ''}`
+    let cost = this.costs.get(key)
+    if (!cost) {
+      cost = { ...DEFAULT_COST[jobClass], samples: 0 }
+      this.costs.set(key, cost)
+    }
+    return cost
+  }
+
+  /** 実測で補正済みの推定か（既定値のままなら期限による拒否に使わない） */
+  private measured(jobClass: JobClass, label?: string): boolean {
+    return this.cost(jobClass, label).samples > 0
+  }
+
+  private usedSlots(jobClass: JobClass): number {
+    return this.running[jobClass].reduce((sum, slot) => sum + slot.weight, 0)
+  }
+
+  private priority(entry: Entry): number {
+    return PLAN_PRIORITY[entry.plan] + (this.now() - entry.enqueuedAt) / AGING_MS
+  }
+
+  /**
+   * 開始までの待ち時間の見積もり
+   * 実行中ジョブの残り時間と、同じか高い優先度で待っているジョブの推定時間を枠数で割る
+   */
+  private waitEstimateMs(jobClass: JobClass, plan: SchedulerPlan, weight: number): number {
+    const now = this.now()
+    const limit = this.limits[jobClass]
+    const ahead = SCHEDULER_PLANS
+      .filter((other) => PLAN_PRIORITY[other] >= PLAN_PRIORITY[plan])
+      .flatMap((other) => this.queue(jobClass, other))
+    if (!ahead.length && this.usedSlots(jobClass) + weight <= limit) {
+      return 0
+    }
+    const remaining = this.running[jobClass].reduce((sum, slot) => sum + Math.max(0, slot.until - now) * slot.weight, 0)
+    const queued = ahead.reduce((sum, entry) => sum + entry.estimateMs * entry.weight, 0)
+    return Math.round((remaining + queued) / limit)
+  }
+
+  /** 空き枠に優先度順で開始（先頭が入らない間は後続も待たせ、重いジョブの飢餓を防ぐ） */
+  private dispatch(jobClass: JobClass) {
+    for (;;) {
+      const candidates = SCHEDULER_PLANS.map((plan) => this.queue(jobClass, plan)).filter((queue) => queue.length)
+      if (!candidates.length) {
+        return
+      }
+      const best = candidates.reduce((a, b) => (this.priority(b[0]) > this.priority(a[0]) ? b : a))
+      const entry = best[0]
+      // 待っている間に期限を過ぎる見込みになったジョブは実行せず拒否（実測がなければ待ち時間だけで判定）
+      const timeoutMs = entry.request.timeoutMs
+      const runMs = this.measured(jobClass, entry.request.label) ? entry.estimateMs : 0
+      if (timeoutMs !== undefined && this.now() - entry.enqueuedAt + runMs > timeoutMs) {
+        best.shift()
+        this.counters.rejected++
+        entry.reject(new AdmissionError('deadline',
+          `${jobClass}/${entry.plan} job waited too long to finish within ${timeoutMs}ms`, 0))
+        continue
+      }
+      if (this.usedSlots(jobClass) + entry.weight > this.limits[jobClass]) {
+        return
+      }
+      best.shift()
+      entry.start()
+    }
+  }
+
+  /** 実測時間で1秒あたりの単価を補正（固定コストは据え置き、初回の実測はそのまま採用） */
+  private observe(jobClass: JobClass, label: string | undefined, durationSec: number, elapsedMs: number) {
+    if (durationSec <= 0) {
+      return
+    }
+    const cost = this.cost(jobClass, label)
+    const perSecond = Math.max(0, elapsedMs / 1000 - cost.fixedSec) / durationSec
+    cost.perSecond = cost.samples ? cost.perSecond * (1 - COST_EWMA) + perSecond * COST_EWMA : perSecond
+    cost.samples++
+  }
+
+  private refuse<T>(reason: 'queue_full' | 'deadline', message: string, retryAfterMs: number): Promise<T> {
+    this.counters.rejected++
+    return Promise.reject(new AdmissionError(reason, message, retryAfterMs))
+  }
+}
+
+/**
+ * 入力長の推定（秒）
+ * クイックスキャン（<path>.scan.json）→ WAVヘッダ → ファイルサイズ（128kbps相当）の順
+ */
+export async function estimateDurationSec(filePath: string): Promise<number> {
+  try {
+    const scan = JSON.parse(await fs.readFile(`${filePath}.scan.json`, 'utf8'))
+    if (typeof scan.duration === 'number') {
+      return scan.duration
+    }
+  } catch {
+    // スキャンなし
+  }
+  try {
+    const handle = await fs.open(filePath, 'r')
+    try {
+      const { size } = await handle.stat()
+      const header = Buffer.alloc(44)
+      await handle.read(header, 0, 44, 0)
+      if (header.toString('ascii', 0, 4) === 'RIFF' && header.toString('ascii', 8, 12) === 'WAVE') {
+        const byteRate = header.readUInt32LE(28)
+        if (byteRate > 0) {
+          return Math.max(0, size - 44) / byteRate
+        }
+      }
+      return size / 16000
+    } finally {
+      await handle.close()
+    }
+  } catch {
+    return 0
+  }
+}
+
+let shared: PythonScheduler | undefined
+
+/** プロセス内で共有するスケジューラ */
+export function pythonScheduler(): PythonScheduler {
+  shared ??= new PythonScheduler()
+  return shared
+}
+
+/**
+ * Pythonスクリプトの実行をスケジューラ経由にする
+ * inputPath から入力長を推定し、timeoutMs（execaのタイムアウト）を受付判定の期限にする
+ * task には占有する枠が渡る（pythonEnv(processes, slot) でスレッド数を枠の割合にする）
+ */
+export async function schedulePython<T>(
+  request: Omit<ScheduleRequest, 'durationSec'> & { inputPath?: string, durationSec?: number },
+  task: (slot: SlotShare) => Promise<T>
+): Promise<T> {
+  const { inputPath, ...rest } = request
+  const durationSec = rest.durationSec ?? (inputPath ? await estimateDurationSec(inputPath) : 0)
+  return pythonScheduler().run({ ...rest, durationSec }, task)
+}
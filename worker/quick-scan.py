@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+アップロード時のクイックスキャン
+1回のブロック読み込みで 長さ・サンプルレート・ピーク・RMSエンベロープ・無音マップ を求める
+結果はジョブに保存し、後段（オフセット・DTW・ピッチ・ハモリ）が --scan で無音区間の切り詰めに使う
+"""
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from audio_io import iter_blocks, read_info
+from silence_map import SCAN_VERSION, input_signature
+from stage_timer import StageTimer, add_instrumentation_args, maybe_profile
+from vad import mask_to_runs
+from worker_metrics import record_run
+
+# メトリクスのscriptラベル
+SCRIPT = 'quick-scan'
+
+ENVELOPE_HOP_SECONDS = 0.05
+BLOCK_SECONDS = 10.0
+# 無音判定: エンベロープ最大値から -40dB 未満（ただし -70dBFS 以上は無音としない）
+SILENCE_RELATIVE_DB = -40.0
+SILENCE_FLOOR_DB = -70.0
+# これより短い無音は切り詰めない（息継ぎ・子音の間）
+MIN_SILENCE_SECONDS = 0.5
+DB_FLOOR = -120.0
+
+def to_db(x):
+    return np.maximum(20 * np.log10(np.maximum(x, 1e-12)), DB_FLOOR)
+
+def envelope(path, sr, hop_seconds=ENVELOPE_HOP_SECONDS, block_seconds=BLOCK_SECONDS):
+    """
+    ブロック単位で読みながらホップごとのRMSとピークを集計（ホップ境界をまたぐ端数は次ブロックへ持ち越す）
+    Returns: (rms, peak, n_samples)
+    """
+    hop = max(int(round(sr * hop_seconds)), 1)
+    blocksize = hop * max(int(block_seconds / hop_seconds), 1)
+    mean_squares, peak, n_samples = [], 0.0, 0
+    carry = np.zeros(0, dtype=np.float64)
+    for block in iter_blocks(path, blocksize):
+        if len(block) == 0:
+            continue
+        peak = max(peak, float(np.abs(block).max()))
+        n_samples += len(block)
+        mono = np.concatenate([carry, block.mean(axis=1, dtype=np.float64)])
+        n_full = len(mono) // hop * hop
+        if n_full:
+            mean_squares.append((mono[:n_full].reshape(-1, hop) ** 2).mean(axis=1))
+        carry = mono[n_full:]
+    if len(carry):
+        mean_squares.append(np.array([(carry ** 2).mean()]))
+    rms = np.sqrt(np.concatenate(mean_squares)) if mean_squares else np.zeros(0)
+    return rms, peak, n_samples
+
+def silence_map(rms_db, hop_seconds, duration):
+    """無音区間と有音区間（秒）"""
+    if len(rms_db) == 0:
+        return -np.inf, [[0.0, round(duration, 3)]], []
+    threshold = max(float(rms_db.max()) + SILENCE_RELATIVE_DB, SILENCE_FLOOR_DB)
+    starts, ends = mask_to_runs(rms_db < threshold)
+    keep = (ends - starts) * hop_seconds >= MIN_SILENCE_SECONDS
+    silence = [[round(s * hop_seconds, 3), round(min(e * hop_seconds, duration), 3)]
+               for s, e in zip(starts[keep], ends[keep])]
+
+    active, position = [], 0.0
+    for start, end in silence:
+        if start > position:
+            active.append([position, start])
+        position = end
+    if position < duration:
+        active.append([position, round(duration, 3)])
+    return threshold, silence, active
+
+def scan_audio(path):
+    info = read_info(path)
+    sr = info['samplerate']
+    rms, peak, n_samples = envelope(path, sr)
+    duration = n_samples / sr
+    rms_db = to_db(rms)
+    threshold, silence, active = silence_map(rms_db, ENVELOPE_HOP_SECONDS, duration)
+    overall_rms = float(np.sqrt(np.mean(rms ** 2))) if len(rms) else 0.0
+    return {
+        'version': SCAN_VERSION,
+        'input': input_signature(path, info),
+        'duration': round(duration, 3),
+        'samplerate': sr,
+        'channels': info['channels'],
+        'peak': round(peak, 6),
+        'peak_db': round(float(to_db(peak)), 2),
+        'rms_db': round(float(to_db(overall_rms)), 2),
+        'envelope': {
+            'hop_s': ENVELOPE_HOP_SECONDS,
+            'rms_db': [round(float(v), 1) for v in rms_db]
+        },
+        'silence_threshold_db': round(threshold, 2) if np.isfinite(threshold) else None,
+        'silence': silence,
+        'active': active,
+        'active_ratio': round(sum(e - s for s, e in active) / duration, 4) if duration else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Single-pass audio scan (duration, peak, RMS envelope, silence map)')
+    parser.add_argument('--input', required=True, help='Audio file or pcm: spec')
+    parser.add_argument('--output', help='Write the scan JSON to this path (summary is printed to stdout)')
+    add_instrumentation_args(parser)
+    args = parser.parse_args()
+
+    timer = StageTimer(args.trace_memory)
+    try:
+        with maybe_profile(args.profile):
+            with timer.stage('scan'):
+                scan = scan_audio(args.input)
+    except Exception as e:
+        record_run(SCRIPT, 'scan', None, timer.report(), None, 'error')
+        print(json.dumps({'error': f'Scan failed: {e}'}))
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(scan, f)
+    timings = timer.report()
+    record_run(SCRIPT, 'scan', None, timings, scan['duration'])
+    # 標準出力にはエンベロープを除いた要約（ジョブ保存用の完全版は --output）
+    summary = {key: value for key, value in scan.items() if key != 'envelope'}
+    print(json.dumps({**summary, 'output': args.output, 'timings': timings}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -12,41 +12,40 @@ pip install librosa numpy scipy soundfile argparse
 
 import argparse
 import json
+import os
 import sys
+from functools import partial
+# numpy より先に読み込む（BLAS等のスレッド数は読み込み時に決まる）
+from thread_budget import add_thread_args, apply_thread_budget, pool_size, thread_report
 import numpy as np
-import librosa
-import soundfile as sf
 from pathlib import Path
-from scipy import signal
-from scipy.stats import pearsonr
 
-def load_audio(file_path, sr=44100, duration=60):
-    """
-    音声ファイルを読み込む（最初の60秒）
-    """
-    try:
-        y, sr = librosa.load(file_path, sr=sr, duration=duration)
-        return y, sr
-    except Exception as e:
-        raise Exception(f"Audio loading failed: {e}")
+from audio_io import iter_blocks, read_info
+from band_analyzer import BandEnergyAnalyzer
+from loudness_meter import measure_blocks
+from reference_db import ReferenceProfileDB, build_database, find_audio_files, npz_path
+from pcm_io import add_pcm_args, is_pcm, open_meta, validate_specs
+from progress import Cancelled, ProgressReporter, add_progress_args, inputs_key
+from memory_plan import add_memory_args, plan_stream, resolve_budget
+from segment_sampler import N_SEGMENTS, iter_segments, sample_segments
+from worker_metrics import record_run
+from stage_timer import NULL_TIMER, StageTimer, add_instrumentation_args, maybe_profile, timed_iter
+
+# モード別に実際に読み込まれる依存（起動時間予算の検証用）
+MODE_IMPORTS = {
+    'reference': ['soundfile', 'scipy.signal', 'scipy.fft'],
+}
+
+# メトリクスのscriptラベル
+SCRIPT = 'reference-analysis'
 
-def analyze_tonal_characteristics(y, sr):
+def tonal_from_band_means(band_means):
     """
-    トーナル特性の解析
+    帯域別平均振幅からEQ特性を推定
     """
-    # スペクトラム解析
-    D = librosa.stft(y)
-    magnitude = np.abs(D)
-    freqs = librosa.fft_frequencies(sr=sr)
-    
-    # 周波数帯域別のエネルギー計算
-    low_freq_mask = (freqs >= 80) & (freqs <= 350)    # 低域
-    mid_freq_mask = (freqs >= 350) & (freqs <= 4000)  # 中域
-    high_freq_mask = (freqs >= 4000) & (freqs <= 16000)  # 高域
-    
-    low_energy = np.mean(magnitude[low_freq_mask, :])
-    mid_energy = np.mean(magnitude[mid_freq_mask, :])
-    high_energy = np.mean(magnitude[high_freq_mask, :])
+    low_energy = band_means['low']
+    mid_energy = band_means['mid']
+    high_energy = band_means['high']
     
     # エネルギーバランスからEQ特性を推定
     total_energy = low_energy + mid_energy + high_energy
@@ -83,87 +82,6 @@ def analyze_tonal_characteristics(y, sr):
         'high_shelf': float(high_shelf)
     }
 
-def analyze_dynamics(y, sr):
-    """
-    ダイナミクス特性の解析
-    """
-    # RMS計算（フレーム単位）
-    frame_length = int(sr * 0.025)  # 25ms
-    hop_length = int(sr * 0.010)    # 10ms
-    
-    rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
-    
-    # Crest Factor計算
-    peak_amplitude = np.max(np.abs(y))
-    rms_avg = np.sqrt(np.mean(y**2))
-    
-    if rms_avg == 0:
-        crest_factor = 20.0  # デフォルト値
-    else:
-        crest_factor = 20 * np.log10(peak_amplitude / rms_avg)
-    
-    # Peak-to-Loudness Ratio (PLR)
-    # LUFS推定（簡易版）
-    lufs_estimate = -23 + 20 * np.log10(rms_avg + 1e-10)
-    true_peak_db = 20 * np.log10(peak_amplitude + 1e-10)
-    plr = true_peak_db - lufs_estimate
-    
-    return {
-        'crest_factor': float(np.clip(crest_factor, 0, 25)),
-        'plr': float(np.clip(plr, 0, 25)),
-        'rms_variation': float(np.std(rms))
-    }
-
-def analyze_stereo_characteristics(y, sr):
-    """
-    ステレオ特性の解析
-    """
-    if len(y.shape) < 2:
-        # モノラル音源の場合
-        return {
-            'width': 0.0,
-            'correlation': 1.0,
-            'balance': 0.0
-        }
-    
-    # ステレオの場合
-    left = y[0, :] if len(y.shape) == 2 else y
-    right = y[1, :] if len(y.shape) == 2 else y
-    
-    # ステレオ幅計算（Mid/Side解析）
-    mid = (left + right) / 2
-    side = (left - right) / 2
-    
-    mid_energy = np.mean(mid**2)
-    side_energy = np.mean(side**2)
-    
-    if mid_energy + side_energy == 0:
-        width = 0.0
-    else:
-        width = side_energy / (mid_energy + side_energy)
-    
-    # チャンネル相関
-    if len(left) == len(right) and len(left) > 1:
-        correlation, _ = pearsonr(left, right)
-        correlation = np.clip(correlation, -1.0, 1.0)
-    else:
-        correlation = 1.0
-    
-    # L/Rバランス
-    left_energy = np.mean(left**2)
-    right_energy = np.mean(right**2)
-    
-    if left_energy + right_energy == 0:
-        balance = 0.0
-    else:
-        balance = (right_energy - left_energy) / (left_energy + right_energy)
-    
-    return {
-        'width': float(np.clip(width, 0.0, 1.0)),
-        'correlation': float(correlation),
-        'balance': float(np.clip(balance, -1.0, 1.0))
-    }
-
 def calculate_adjustment_weights(tonal, dynamics, stereo):
     """
     調整の重み付け計算
@@ -233,18 +151,63 @@ def calculate_suggested_adjustments(tonal, dynamics, stereo, weights):
     
     return suggestions
 
-def analyze_reference_track(file_path):
+def report_blocks(blocks, total_frames, on_progress):
+    """ブロック列をそのまま流しつつ、デコード済みの割合を通知"""
+    done = 0
+    for block in blocks:
+        yield block
+        done += len(block)
+        on_progress(done / max(total_frames, 1))
+
+def analyze_reference_track(file_path, sampling='full', n_segments=N_SEGMENTS, timer=NULL_TIMER, block_seconds=5.0,
+                            on_progress=None):
     """
     参照曲の統合解析
+    sampling='full': トラック全体を1パスでデコード
+    sampling='segments': RMS下見で選んだ代表区間のみデコード（固定コスト・推定値）
+    on_progress(fraction) はデコードしたブロックごとに呼ばれる
     """
     try:
-        # 音声読み込み
-        y, sr = load_audio(file_path)
+        info = read_info(file_path)
+        sr = info['samplerate']
+        bands = BandEnergyAnalyzer(sr)
+        
+        def feed_bands(block):
+            if sampling == 'segments':
+                bands.reset_continuity()
+            bands.feed(block.mean(axis=1))
+        
+        if sampling == 'segments':
+            with timer.stage('segment_probe'):
+                segments = sample_segments(file_path, info['duration'], n_segments)
+            blocks = iter_segments(file_path, segments)
+            sampling_info = {
+                'mode': 'segments',
+                'segments': segments,
+                'decoded_seconds': float(sum(s['duration'] for s in segments)),
+                'track_duration': float(info['duration'])
+            }
+        else:
+            blocks = iter_blocks(file_path, int(block_seconds * sr))
+            sampling_info = {
+                'mode': 'full',
+                'decoded_seconds': float(info['duration']),
+                'track_duration': float(info['duration'])
+            }
+        
+        if on_progress:
+            blocks = report_blocks(blocks, sampling_info['decoded_seconds'] * sr, on_progress)
+        
+        # ステレオのままメーターと帯域解析へ同じブロックを供給（decode は analysis に内包）
+        with timer.stage('analysis'):
+            meter = measure_blocks(timed_iter(timer, 'decode', blocks), sr, info['channels'],
+                                   extra_consumers=[feed_bands], continuous=(sampling != 'segments'))
         
         # 各特性を解析
-        tonal = analyze_tonal_characteristics(y, sr)
-        dynamics = analyze_dynamics(y, sr)
-        stereo = analyze_stereo_characteristics(y, sr)
+        tonal = tonal_from_band_means(bands.band_means())
+        spectrum = bands.spectral_tilt()
+        dynamics = meter.dynamics()
+        stereo = meter.stereo()
         
         # 重み付け計算
         weights = calculate_adjustment_weights(tonal, dynamics, stereo)
@@ -256,6 +219,8 @@ def analyze_reference_track(file_path):
             'tonal': tonal,
             'dynamics': dynamics,
             'stereo': stereo,
+            'spectrum': spectrum,
+            'sampling': sampling_info,
             'weights': weights,
             'suggest_diff': suggest_diff,
             'analyzed_at': None  # フロントエンドで設定
@@ -264,35 +229,113 @@ def analyze_reference_track(file_path):
     except Exception as e:
         raise Exception(f"Reference analysis failed: {e}")
 
+def build_profile_db(args):
+    """
+    ディレクトリ内の参照曲を一括解析してプロファイルDBを作成
+    """
+    paths = find_audio_files(args.build_db)
+    # ワーカーごとのピーク見積もりから、予算内に収まるプロセス数に制限
+    plan = plan_stream(44100, 2, resolve_budget(args.memory_budget))
+    workers = args.workers or pool_size(os.cpu_count())
+    if plan['budget_mb']:
+        workers = max(1, min(workers, int(plan['budget_mb'] // plan['estimated_peak_mb'])))
+    plan['workers'] = workers
+    analyze = partial(analyze_reference_track, sampling=args.sampling, n_segments=args.segments,
+                      block_seconds=plan['block_seconds'])
+    db, errors = build_database(paths, analyze, workers)
+    db.save(args.db)
+    
+    print(json.dumps({
+        'success': True,
+        'profiles': len(db),
+        'database': npz_path(args.db),
+        'memory_plan': plan,
+        'threads': thread_report(),
+        'errors': errors
+    }, indent=2, ensure_ascii=False))
+
 def main():
     parser = argparse.ArgumentParser(description='MIXAI Reference Track Analysis')
-    parser.add_argument('--input', required=True, help='Input audio file path')
+    parser.add_argument('--input', help='Input audio file path or pcm:<path|->?rate=..&channels=..&dtype=..')
     parser.add_argument('--format', default='json', choices=['json'], help='Output format')
     parser.add_argument('--output', help='Output file path (default: stdout)')
+    parser.add_argument('--sampling', default='full', choices=['full', 'segments'],
+                        help='Decode the full track or only representative segments')
+    parser.add_argument('--segments', type=int, default=N_SEGMENTS,
+                        help='Number of segments for --sampling segments')
+    parser.add_argument('--db', help='Reference profile database (.npz)')
+    parser.add_argument('--build-db', metavar='DIR',
+                        help='Analyze every audio file in DIR and write the profiles to --db')
+    parser.add_argument('--workers', type=int, help='Process pool size for --build-db')
+    parser.add_argument('--k', type=int, default=5, help='Number of nearest profiles to return')
+    add_thread_args(parser)
+    add_memory_args(parser)
+    add_progress_args(parser)
+    add_pcm_args(parser)
+    add_instrumentation_args(parser)
     
     args = parser.parse_args()
+    apply_thread_budget(args.threads)
+    
+    if args.build_db:
+        if not args.db:
+            parser.error('--build-db requires --db')
+        build_profile_db(args)
+        return
+    if not args.input:
+        parser.error('--input is required')
+    try:
+        validate_specs([args.input])
+    except ValueError as e:
+        parser.error(str(e))
     
     try:
         # 入力ファイル検証
         input_path = Path(args.input)
-        if not input_path.exists():
+        if not is_pcm(args.input) and not input_path.exists():
             raise Exception(f"Input file not found: {args.input}")
         
         # 解析実行
-        result = analyze_reference_track(args.input)
+        timer = StageTimer(args.trace_memory)
+        info = read_info(args.input)
+        plan = plan_stream(info['samplerate'], info['channels'], resolve_budget(args.memory_budget))
+        progress = ProgressReporter(args.stream, args.checkpoint, inputs_key(
+            [args.input], sampling=args.sampling, segments=args.segments), open_meta(args.meta))
+        progress.install_signal_handlers()
+        with maybe_profile(args.profile):
+            if not progress.done('analysis'):
+                progress.complete('analysis', analyze_reference_track(
+                    args.input, args.sampling, args.segments, timer, plan['block_seconds'],
+                    on_progress=lambda fraction: progress.progress('analysis', fraction)))
+            result = dict(progress.get('analysis'))
+            
+            # 近傍プロファイル検索
+            if args.db:
+                with timer.stage('profile_query'):
+                    result['similar_profiles'] = ReferenceProfileDB.load(args.db).query(result, args.k)
+        result['memory_plan'] = plan
+        result['threads'] = thread_report()
+        result['timings'] = timer.report()
+        record_run(SCRIPT, args.sampling, None, result['timings'], result['sampling']['decoded_seconds'],
+                   cache={'checkpoint': progress.cache_stats(['analysis'])} if args.checkpoint else None)
         
         # 結果出力
         if args.format == 'json':
-            output_data = json.dumps(result, indent=2)
-            
             if args.output:
                 with open(args.output, 'w', encoding='utf-8') as f:
-                    f.write(output_data)
+                    f.write(json.dumps(result, indent=2))
+                progress.emit('result', result=result)
+                progress.clear_checkpoint()
             else:
-                print(output_data)
+                progress.finish(result)
         
         sys.exit(0)
         
+    except Cancelled:
+        timings = timer.report()
+        record_run(SCRIPT, args.sampling, None, timings, info['duration'], 'cancelled')
+        progress.cancel({'memory_plan': plan, 'timings': timings})
+        
     except Exception as e:
         error_data = {
             'error': str(e),
@@ -0,0 +1,150 @@
+"""
+参照曲プロファイルDB
+解析結果の特徴量ベクトルを列指向（.npz）で保存し、
+ベクトル化した距離計算で近傍プロファイルとそのMIXパラメータを返す
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from thread_budget import single_thread_initializer
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.mp3', '.ogg', '.aiff', '.aif', '.m4a')
+
+# 特徴量列（解析結果のセクション, キー）
+FEATURE_COLUMNS = [
+    ('tonal', 'low_shelf'),
+    ('tonal', 'mid_boost'),
+    ('tonal', 'high_shelf'),
+    ('dynamics', 'crest_factor'),
+    ('dynamics', 'plr'),
+    ('dynamics', 'rms_variation'),
+    ('dynamics', 'integrated_lufs'),
+    ('dynamics', 'true_peak_dbtp'),
+    ('stereo', 'width'),
+    ('stereo', 'correlation'),
+    ('stereo', 'balance'),
+    ('spectrum', 'tilt_db_per_octave'),
+]
+
+def npz_path(path):
+    """np.savez と同じ規則で拡張子を補完"""
+    return path if path.endswith('.npz') else path + '.npz'
+
+def column_name(section, key):
+    return f"{section}.{key}"
+
+def feature_vector(result):
+    """解析結果から特徴量ベクトルを生成（欠損は0）"""
+    values = []
+    for section, key in FEATURE_COLUMNS:
+        value = (result.get(section) or {}).get(key)
+        values.append(0.0 if value is None else float(value))
+    return np.asarray(values, dtype=np.float32)
+
+def find_audio_files(directory):
+    """ディレクトリ配下の音声ファイルを列挙"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+class ReferenceProfileDB:
+    """
+    プロファイルDB
+    features: (n, d) float32、paths/presets は行ごとのメタデータ
+    """
+
+    def __init__(self, features=None, paths=None, presets=None):
+        d = len(FEATURE_COLUMNS)
+        self.features = np.zeros((0, d), dtype=np.float32) if features is None else np.asarray(features, dtype=np.float32)
+        self.paths = list(paths or [])
+        self.presets = list(presets or [])
+        self._scale = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def add(self, path, result):
+        """解析結果を1件追加（プリセットは suggest_diff を保存）"""
+        self.features = np.vstack([self.features, feature_vector(result)[None, :]])
+        self.paths.append(path)
+        self.presets.append(result.get('suggest_diff', {}))
+        self._scale = None
+
+    def save(self, path):
+        """列ごとに保存（特徴量列 + パス + プリセットJSON）"""
+        columns = {column_name(s, k): self.features[:, i] for i, (s, k) in enumerate(FEATURE_COLUMNS)}
+        np.savez(
+            npz_path(path),
+            paths=np.asarray(self.paths, dtype=str),
+            presets=np.asarray([json.dumps(p, ensure_ascii=False) for p in self.presets], dtype=str),
+            **columns
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(npz_path(path), allow_pickle=False) as data:
+            n = len(data['paths'])
+            features = np.zeros((n, len(FEATURE_COLUMNS)), dtype=np.float32)
+            for i, (s, k) in enumerate(FEATURE_COLUMNS):
+                name = column_name(s, k)
+                if name in data:
+                    features[:, i] = data[name]
+            return cls(features, data['paths'].tolist(), [json.loads(p) for p in data['presets']])
+
+    def _standardized(self):
+        """DB全体の平均・標準偏差で正規化（列ごとのスケール差を吸収、結果はキャッシュ）"""
+        if self._scale is None:
+            mean = self.features.mean(axis=0)
+            std = self.features.std(axis=0)
+            std = np.where(std > 1e-6, std, 1.0)
+            self._scale = (mean, std, (self.features - mean) / std)
+        return self._scale
+
+    def query(self, result, k=5):
+        """解析結果（またはベクトル）に最も近いk件を返す"""
+        if len(self) == 0:
+            return []
+        vector = result if isinstance(result, np.ndarray) else feature_vector(result)
+        mean, std, db = self._standardized()
+        q = (vector - mean) / std
+
+        distances = np.sqrt(((db - q) ** 2).sum(axis=1))
+        k = min(k, len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+
+        return [
+            {'path': self.paths[i], 'distance': float(distances[i]), 'preset': self.presets[i]}
+            for i in nearest
+        ]
+
+def build_database(paths, analyze, max_workers=None):
+    """
+    プロセスプールで一括解析してDBを構築
+    analyze: パスを受け取り解析結果dictを返す関数（pickle可能であること）
+    """
+    vectors, stored_paths, presets, errors = [], [], [], []
+    # 並列はプロセス数で取るため、各プロセスのBLAS等は1スレッド
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=single_thread_initializer) as pool:
+        for path, outcome in zip(paths, pool.map(_safe_analyze, [analyze] * len(paths), paths)):
+            if 'error' in outcome:
+                errors.append({'path': path, 'error': outcome['error']})
+                continue
+            vectors.append(feature_vector(outcome['result']))
+            stored_paths.append(path)
+            presets.append(outcome['result'].get('suggest_diff', {}))
+
+    features = np.stack(vectors) if vectors else None
+    return ReferenceProfileDB(features, stored_paths, presets), errors
+
+def _safe_analyze(analyze, path):
+    try:
+        return {'result': analyze(path)}
+    except Exception as e:
+        return {'error': str(e)}
@@ -0,0 +1,96 @@
+"""
+解析結果のディスクキャッシュ（スクリプト間で共有）
+入力ファイルの内容ハッシュと設定をキーに JSON で保存し、別プロセス・別パスで同じ入力を解析する呼び出し元が再利用する
+（例: advanced-offset.py と advanced-analysis.py のオフセット）
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from pcm_io import is_pcm
+
+RESULT_CACHE_ENV = 'MIXAI_RESULT_CACHE_DIR'
+DEFAULT_RESULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'mixai-results')
+# これより古いエントリは使わず、保存時に掃除する
+MAX_AGE_SECONDS = 24 * 3600
+HASH_BLOCK_BYTES = 1 << 20
+
+# プロセス内で計算済みのハッシュ（パス・サイズ・更新時刻ごと）
+_digests = {}
+
+def result_cache_dir():
+    """キャッシュ先（環境変数が空文字・off ならキャッシュしない）"""
+    path = os.environ.get(RESULT_CACHE_ENV)
+    if path is None:
+        return DEFAULT_RESULT_CACHE_DIR
+    if path.strip().lower() in ('', 'off', '0', 'false'):
+        return None
+    return path
+
+def file_digest(path):
+    """ファイル内容のSHA-1（ダウンロードし直して別パス・別更新時刻になっても同じ値）"""
+    stat = os.stat(path)
+    memo = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo not in _digests:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+                digest.update(block)
+        _digests[memo] = digest.hexdigest()
+    return _digests[memo]
+
+def content_key(paths, **options):
+    """
+    入力の内容と設定からキャッシュキーを作る
+    パイプ入力（pcm:）は内容を読み直せないため None（キャッシュしない）
+    """
+    if any(is_pcm(path) for path in paths):
+        return None
+    payload = json.dumps({'inputs': [file_digest(path) for path in paths], 'options': options}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def _entry_path(namespace, key):
+    directory = result_cache_dir()
+    if not directory or not key:
+        return None
+    return os.path.join(directory, namespace, key + '.json')
+
+def load_result(namespace, key):
+    """保存済みの結果（なし・期限切れ・破損は None）"""
+    path = _entry_path(namespace, key)
+    if not path:
+        return None
+    try:
+        if time.time() - os.path.getmtime(path) > MAX_AGE_SECONDS:
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_result(namespace, key, result):
+    """結果を保存（保存できなくても解析は続ける）"""
+    path = _entry_path(namespace, key)
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        os.replace(tmp, path)
+        _prune(directory)
+    except OSError:
+        pass
+
+def _prune(directory):
+    now = time.time()
+    for entry in os.scandir(directory):
+        try:
+            if now - entry.stat().st_mtime > MAX_AGE_SECONDS:
+                os.remove(entry.path)
+        except OSError:
+            pass  # 他プロセスが同時に掃除した
@@ -0,0 +1,77 @@
+"""
+代表区間サンプリング
+疎なRMSプローブで曲全体を下見し、曲中に分散したK個の短区間だけをデコードする
+デコード量はトラック長に依存しない固定予算
+"""
+import numpy as np
+
+from lazy_deps import lazy_import
+from pcm_io import is_pcm, read_span
+
+sf = lazy_import('soundfile')
+
+N_PROBES = 48
+PROBE_SECONDS = 0.25
+N_SEGMENTS = 6
+SEGMENT_SECONDS = 5.0
+# 最大プローブから -40dB 未満のゾーンは無音扱いでスキップ
+SILENCE_FLOOR_DB = -40.0
+
+def _read_span(path, start, duration):
+    """start秒からduration秒を (frames, channels) float32 で読み込む"""
+    if is_pcm(path):
+        return read_span(path, start, duration)
+    try:
+        with sf.SoundFile(path) as f:
+            sr = f.samplerate
+            f.seek(min(int(start * sr), max(f.frames - 1, 0)))
+            return f.read(int(duration * sr), dtype='float32', always_2d=True)
+    except RuntimeError:
+        import librosa
+        y, _ = librosa.load(path, sr=None, mono=False, offset=start, duration=duration)
+        return np.atleast_2d(y).T.astype(np.float32)
+
+def probe_rms(path, duration, n_probes=N_PROBES, probe_seconds=PROBE_SECONDS):
+    """等間隔のプローブ位置でRMS（dB）を測定"""
+    usable = max(duration - probe_seconds, 0.0)
+    times = np.linspace(0.0, usable, n_probes) if usable > 0 else np.zeros(1)
+    levels = np.empty(len(times))
+    for i, t in enumerate(times):
+        x = _read_span(path, t, probe_seconds)
+        rms = np.sqrt(np.mean(x ** 2)) if x.size else 0.0
+        levels[i] = 20 * np.log10(rms + 1e-10)
+    return times, levels
+
+def select_segments(times, levels, duration, n_segments=N_SEGMENTS, segment_seconds=SEGMENT_SECONDS):
+    """
+    曲をn_segments個のゾーンに分け、各ゾーンで最も大きいプローブを中心に区間を配置
+    無音ゾーンは除外
+    """
+    if duration <= n_segments * segment_seconds:
+        return [{'start': 0.0, 'duration': float(duration)}]
+
+    floor = levels.max() + SILENCE_FLOOR_DB
+    zones = np.minimum((times / duration * n_segments).astype(int), n_segments - 1)
+    segments = []
+    for zone in range(n_segments):
+        idx = np.flatnonzero((zones == zone) & (levels > floor))
+        if len(idx) == 0:
+            continue
+        center = times[idx[np.argmax(levels[idx])]]
+        start = float(np.clip(center - segment_seconds / 2, 0.0, duration - segment_seconds))
+        if segments and start < segments[-1]['start'] + segment_seconds:
+            start = segments[-1]['start'] + segment_seconds
+            if start + segment_seconds > duration:
+                continue
+        segments.append({'start': start, 'duration': float(segment_seconds)})
+    return segments
+
+def sample_segments(path, duration, n_segments=N_SEGMENTS, segment_seconds=SEGMENT_SECONDS):
+    """RMS下見 → 区間選択（デコードはまだ行わない）"""
+    times, levels = probe_rms(path, duration)
+    return select_segments(times, levels, duration, n_segments, segment_seconds)
+
+def iter_segments(path, segments):
+    """選択区間のみをシークしてデコード"""
+    for segment in segments:
+        yield _read_span(path, segment['start'], segment['duration'])
@@ -0,0 +1,115 @@
+"""
+クイックスキャン（quick-scan.py）の無音マップを使った切り詰め
+- ピッチ・WORLD・ハモリ: 有音区間だけを連結して処理し、結果を元の位置・時刻へ戻す
+- オフセット・DTW: 伴奏と時間軸を揃えたまま、前後の無音のみ同じ窓で切る
+スキャンは入力ファイル（サイズ・長さ・サンプルレート）と照合し、一致しない場合は使わない
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+from pcm_io import is_pcm
+
+SCAN_VERSION = 1
+# 有音区間の前後に残す余白（フィルタ・WORLD・CREPEの窓の立ち上がり分）
+SPAN_PAD_SECONDS = 0.1
+# オフセット・DTW の窓の余白（オフセット探索範囲 ±2s より広く残す）
+EXTENT_PAD_SECONDS = 2.5
+# 削減がこれ未満なら切り詰めない（コピーに見合わない）
+MIN_CROP_RATIO = 0.05
+
+def add_scan_args(parser):
+    """クイックスキャンの共通CLIオプション"""
+    parser.add_argument('--scan', metavar='PATH',
+                        help='Quick-scan JSON of the vocal (quick-scan.py); silent spans are skipped or cropped')
+
+def input_signature(path, info):
+    """スキャンと入力ファイルの照合用（ダウンロードし直しても変わらない値のみ）"""
+    return {
+        'size': None if is_pcm(path) else os.path.getsize(path),
+        'samplerate': info['samplerate'],
+        'duration': round(float(info['duration']), 3),
+    }
+
+def load_scan(path, audio_path=None):
+    """スキャンJSONを読む（存在しない・版が違う・入力と一致しない場合は None）"""
+    if not path:
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            scan = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring scan {path}: {e}", file=sys.stderr)
+        return None
+    if scan.get('version') != SCAN_VERSION:
+        return None
+    if audio_path and not is_pcm(audio_path):
+        from audio_io import read_info
+        if scan.get('input') != input_signature(audio_path, read_info(audio_path)):
+            print(f"Ignoring scan {path}: does not match {audio_path}", file=sys.stderr)
+            return None
+    return scan
+
+def _merge(spans, gap=0.0):
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(float(start), float(end)) for start, end in merged]
+
+def active_spans(scan, pad=SPAN_PAD_SECONDS):
+    """有音区間 [(start, end), ...] 秒（余白付き・重なりは結合）"""
+    duration = scan['duration']
+    return _merge([(max(0.0, start - pad), min(duration, end + pad)) for start, end in scan['active']])
+
+def active_extent(scan, pad=EXTENT_PAD_SECONDS):
+    """最初の有音から最後の有音までの窓 (start, end) 秒（有音がなければ None）"""
+    if not scan['active']:
+        return None
+    return (max(0.0, scan['active'][0][0] - pad), min(scan['duration'], scan['active'][-1][1] + pad))
+
+def crop_segments(spans, sr, length, min_ratio=MIN_CROP_RATIO):
+    """
+    秒区間をサンプル単位の対応表 (n, 3) [切り詰め後の先頭, 元の先頭, 長さ] に変換
+    削減が min_ratio 未満なら None（切り詰めずに全体を処理する）
+    """
+    rows, position = [], 0
+    for start, end in spans:
+        s, e = max(0, int(start * sr)), min(length, int(np.ceil(end * sr)))
+        if e > s:
+            rows.append((position, s, e - s))
+            position += e - s
+    if not rows or position > length * (1 - min_ratio):
+        return None
+    return np.array(rows, dtype=np.int64)
+
+def crop(y, segments):
+    """対応表の区間だけを連結"""
+    return np.concatenate([y[orig:orig + n] for _, orig, n in segments])
+
+def uncrop(cropped, segments, base):
+    """切り詰め後の信号を元の位置へ戻す（区間外は base のまま）"""
+    out = np.array(base, copy=True)
+    for pos, orig, n in segments:
+        out[orig:orig + n] = cropped[pos:pos + n]
+    return out
+
+def to_original(times, segments, sr):
+    """切り詰め後の時刻（秒）→ 元の時刻"""
+    times = np.asarray(times, dtype=np.float64)
+    index = np.clip(np.searchsorted(segments[:, 0], times * sr, side='right') - 1, 0, len(segments) - 1)
+    return times + (segments[index, 1] - segments[index, 0]) / sr
+
+def to_cropped(times, segments, sr):
+    """元の時刻（秒）→ 切り詰め後の時刻（区間外は次の区間の先頭に寄せる）"""
+    samples = np.asarray(times, dtype=np.float64) * sr
+    index = np.clip(np.searchsorted(segments[:, 1], samples, side='right') - 1, 0, len(segments) - 1)
+    offset = np.clip(samples - segments[index, 1], 0, segments[index, 2])
+    after = offset >= segments[index, 2]
+    nxt = np.minimum(index + 1, len(segments) - 1)
+    cropped = np.where(after & (index + 1 < len(segments)), segments[nxt, 0], segments[index, 0] + offset)
+    return cropped / sr
@@ -0,0 +1,105 @@
+"""
+ステージ別計測
+wall/CPU時間・プロセスのピークRSS・（任意で）tracemallocピークを記録し、
+各スクリプトのJSON出力に timings ブロックとして含める
+"""
+import cProfile
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+def _rss_peak_mb():
+    """プロセスのピークRSS（Linux: KB, macOS: bytes）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class StageTimer:
+    """
+    with timer.stage('decode'): ... で各ステージを計測
+    trace_memory=True の場合は tracemalloc でステージ内のピーク割り当ても記録
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory or os.environ.get('MIXAI_TRACE_MEMORY') == '1'
+        self.stages = {}
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = {
+                'wall_s': round(time.perf_counter() - wall0, 4),
+                'cpu_s': round(time.process_time() - cpu0, 4),
+                'rss_peak_mb': round(_rss_peak_mb(), 1)
+            }
+            if self.trace_memory:
+                record['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+            # 同名ステージは合算（ループ内での複数回呼び出し）
+            if name in self.stages:
+                prev = self.stages[name]
+                record['wall_s'] = round(prev['wall_s'] + record['wall_s'], 4)
+                record['cpu_s'] = round(prev['cpu_s'] + record['cpu_s'], 4)
+                if 'tracemalloc_peak_mb' in prev:
+                    record['tracemalloc_peak_mb'] = max(prev['tracemalloc_peak_mb'], record['tracemalloc_peak_mb'])
+            self.stages[name] = record
+
+    def report(self):
+        """JSON出力用の timings ブロック"""
+        return {
+            'stages': self.stages,
+            'total_wall_s': round(time.perf_counter() - self._wall0, 4),
+            'total_cpu_s': round(time.process_time() - self._cpu0, 4),
+            'rss_peak_mb': round(_rss_peak_mb(), 1)
+        }
+
+def add_instrumentation_args(parser):
+    """計測関連の共通CLIオプション"""
+    parser.add_argument('--profile', metavar='PATH',
+                        help='Write a cProfile dump of this run to PATH (inspect with pstats/snakeviz)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Record per-stage tracemalloc peaks (slower)')
+
+@contextmanager
+def maybe_profile(path):
+    """path指定時のみ cProfile で実行全体をプロファイル"""
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+class _NullTimer:
+    """計測不要時に渡すダミー（stage() は何もしない）"""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+NULL_TIMER = _NullTimer()
+
+def timed_iter(timer, name, iterable):
+    """イテレータの next() にかかる時間（ストリーミングデコード等）をステージとして積算"""
+    iterator = iter(iterable)
+    while True:
+        with timer.stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
@@ -0,0 +1,39 @@
+import os from 'os'
+import type { SlotShare } from './python-scheduler'
+
+/**
+ * Pythonジョブのスレッド予算
+ * 同時に走るPythonプロセス数でコアを分け、MIXAI_WORKER_THREADS としてジョブへ渡す
+ * （ワーカー側で BLAS / numba / TensorFlow / 自前プールに同じ上限を適用する: worker/thread_budget.py）
+ */
+
+export const WORKER_THREADS_ENV = 'MIXAI_WORKER_THREADS'
+
+/**
+ * 1ジョブあたりのスレッド数
+ * MIXAI_WORKER_THREADS が明示されていればそれを優先し、
+ * なければ コア数 × share / (同一ホストのワーカー数 WORKER_PYTHON_CONCURRENCY × ジョブ内の同時プロセス数)
+ * share はスケジューラの全枠のうちジョブが占有する割合（スケジューラ外の実行は1）
+ */
+export function pythonThreadBudget(
+  processes = 1,
+  cpus = os.cpus().length,
+  env: NodeJS.ProcessEnv = process.env,
+  share = 1
+): number {
+  const configured = Number(env[WORKER_THREADS_ENV])
+  if (Number.isInteger(configured) && configured > 0) {
+    return configured
+  }
+  const workers = Math.max(1, Number(env.WORKER_PYTHON_CONCURRENCY) || 1)
+  return Math.max(1, Math.floor(cpus * share / (workers * Math.max(1, processes))))
+}
+
+/**
+ * execa の env オプション（親の環境変数は execa が引き継ぐ）
+ * slot: schedulePython が task に渡す占有枠（同時に走る他クラスのジョブとコアを分け合う）
+ */
+export function pythonEnv(processes = 1, slot?: SlotShare): Record<string, string> {
+  const share = slot ? slot.slots / Math.max(1, slot.totalSlots) : 1
+  return { [WORKER_THREADS_ENV]: String(pythonThreadBudget(processes, undefined, undefined, share)) }
+}
@@ -0,0 +1,119 @@
+"""
+ジョブごとのスレッド予算
+Nodeワーカーは複数のPythonジョブを同時に起動するため、BLAS(OpenMP)・numba・TensorFlow(CREPE)が
+それぞれ全コア分のスレッドを立てると過剰サブスクリプションになる
+予算は --threads または環境変数 MIXAI_WORKER_THREADS（未指定なら各ライブラリの既定のまま）
+
+BLASのスレッド数は numpy 読み込み時に決まるため、このモジュールは各スクリプトで numpy より先に
+読み込む（環境変数はその時点で反映）。--threads は読み込み後に threadpoolctl / numba API で適用する
+"""
+import os
+import sys
+
+THREADS_ENV = 'MIXAI_WORKER_THREADS'
+
+# 読み込み時にスレッド数を決めるライブラリの環境変数
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'NUMBA_NUM_THREADS',
+    'TF_NUM_INTRAOP_THREADS',
+)
+# TensorFlow の演算間並列（予算はオペレータ内並列に回す）
+TF_INTEROP_ENV = 'TF_NUM_INTEROP_THREADS'
+
+_budget = None
+_source = None
+_limiter = None
+
+def parse_threads(value):
+    """'4' → 4（空・0・auto は予算なしとして None）"""
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    if text in ('', '0', 'auto'):
+        return None
+    try:
+        threads = int(text)
+    except ValueError:
+        raise ValueError(f"Invalid thread budget: {value}")
+    if threads < 0:
+        raise ValueError(f"Invalid thread budget: {value}")
+    return threads or None
+
+def _set_env(threads):
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    os.environ[TF_INTEROP_ENV] = '1'
+
+def add_thread_args(parser):
+    """スレッド予算の共通CLIオプション"""
+    parser.add_argument('--threads', metavar='N', type=parse_threads,
+                        help=f'Thread budget for BLAS/numba/TensorFlow and worker pools (default: ${THREADS_ENV} or library defaults)')
+
+def apply_thread_budget(cli_value=None):
+    """
+    CLI指定 → 環境変数 の順で予算を決めて適用
+    読み込み済みのライブラリには threadpoolctl / numba.set_num_threads、未読み込みのものには環境変数で反映
+    """
+    global _budget, _source, _limiter
+    if cli_value is not None:
+        _budget, _source = cli_value, 'cli'
+    if _budget is None:
+        return None
+    _set_env(_budget)
+    try:
+        from threadpoolctl import threadpool_limits
+        _limiter = threadpool_limits(limits=_budget)
+    except ImportError:
+        pass  # 環境変数のみ（numpy 読み込み前に設定されていれば有効）
+    numba = sys.modules.get('numba')
+    if numba is not None and hasattr(numba, 'set_num_threads'):
+        numba.set_num_threads(min(_budget, numba.config.NUMBA_NUM_THREADS))
+    return _budget
+
+def thread_budget():
+    return _budget
+
+def pool_size(default):
+    """自前のスレッド/プロセスプールの大きさ（予算があれば上限にする）"""
+    default = max(int(default or 1), 1)
+    return min(default, _budget) if _budget else default
+
+def single_thread_initializer():
+    """プロセスプールの子プロセス用（並列はプロセス数で取るため各プロセスは1スレッド）"""
+    _set_env(1)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=1)
+    except ImportError:
+        pass
+
+def thread_report():
+    """ジョブ出力用: 使用した予算と各ライブラリの実際のスレッド数"""
+    report = {'budget': _budget, 'source': _source, 'cpu_count': os.cpu_count()}
+    try:
+        from threadpoolctl import threadpool_info
+        pools = sorted({(info['internal_api'], info['num_threads']) for info in threadpool_info()})
+        report['blas'] = [{'api': api, 'threads': threads} for api, threads in pools]
+    except ImportError:
+        pass
+    numba = sys.modules.get('numba')
+    if numba is not None and hasattr(numba, 'get_num_threads'):
+        report['numba'] = numba.get_num_threads()
+    if 'tensorflow' in sys.modules:
+        report['tensorflow'] = int(os.environ.get('TF_NUM_INTRAOP_THREADS', 0)) or None
+    return report
+
+# 環境変数の予算は読み込み時に反映（numpy/numba/TensorFlow の読み込み前）
+try:
+    _budget = parse_threads(os.environ.get(THREADS_ENV))
+except ValueError as e:
+    print(f"Ignoring {THREADS_ENV}: {e}", file=sys.stderr)
+    _budget = None
+if _budget is not None:
+    _source = 'env'
+    _set_env(_budget)
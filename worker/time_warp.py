@@ -0,0 +1,155 @@
+"""
+DTW時間マップに沿ったボーカルのタイムワープ（WSOLA）
+入力はブロック単位で読み込み、出力もブロック単位で書き出すため
+メモリはトラック長に依存せず、処理時間は長さに比例する
+"""
+import numpy as np
+
+from audio_io import iter_blocks, open_writer, read_info
+from lazy_deps import lazy_import
+
+signal = lazy_import('scipy.signal')
+
+FRAME_SECONDS = 0.04
+# 自然な継続位置からの探索幅（位相の連続性を優先して位置を微調整）
+TOLERANCE_SECONDS = 0.01
+# 時間マップの平滑化（DTWパスの階段状の変化を滑らかなレート変化へ）
+GRID_SECONDS = 0.05
+SMOOTH_SECONDS = 1.0
+# 伸縮率の範囲（dtw_tempo_analysis の tempo_ratio と同じ）
+MIN_RATE, MAX_RATE = 0.7, 1.3
+READ_BLOCK_SECONDS = 1.0
+WRITE_BLOCK_SECONDS = 1.0
+
+def build_warp(time_map, vocal_duration, grid=GRID_SECONDS, smooth=SMOOTH_SECONDS):
+    """
+    time_map（vocal_time/inst_time の対応列）から、出力時刻 → ボーカル時刻の単調写像を作る
+    マップの範囲外は等速で延長
+    Returns: (出力時刻グリッド, 対応するボーカル時刻)
+    """
+    points = sorted((p['inst_time'], p['vocal_time']) for p in time_map)
+    if len(points) < 2:
+        t = np.arange(0.0, vocal_duration + grid, grid)
+        return t, t.copy()
+
+    inst = np.array([p[0] for p in points])
+    voc = np.array([p[1] for p in points])
+    out_end = inst[-1] + max(vocal_duration - voc[-1], 0.0)
+    t = np.arange(0.0, out_end + grid, grid)
+    v = np.interp(t, inst, voc)
+    v[t < inst[0]] = voc[0] - (inst[0] - t[t < inst[0]])
+    v[t > inst[-1]] = voc[-1] + (t[t > inst[-1]] - inst[-1])
+
+    # 移動平均で平滑化し、伸縮率を範囲内に制限して単調増加を保証
+    width = max(int(round(smooth / grid)), 1)
+    if width > 1 and len(v) > width:
+        padded = np.pad(v, (width // 2, width - 1 - width // 2), mode='edge')
+        v = np.convolve(padded, np.ones(width) / width, mode='valid')
+    rate = np.clip(np.diff(v) / grid, MIN_RATE, MAX_RATE)
+    v = np.concatenate([[max(v[0], 0.0)], max(v[0], 0.0) + np.cumsum(rate * grid)])
+    return t, v
+
+class _InputWindow:
+    """
+    単調に進む読み出し位置に対する入力の窓
+    必要な分だけブロックを読み足し、通過した部分は破棄する
+    """
+
+    def __init__(self, blocks):
+        self._blocks = iter(blocks)
+        first = next(self._blocks, None)
+        self.channels = first.shape[1] if first is not None else 1
+        self.data = first if first is not None else np.zeros((0, 1), dtype=np.float32)
+        self.start = 0
+        self.eof = first is None
+
+    def _fill(self, end):
+        while not self.eof and self.start + len(self.data) < end:
+            block = next(self._blocks, None)
+            if block is None:
+                self.eof = True
+            else:
+                self.data = np.concatenate([self.data, block])
+
+    def get(self, start, length):
+        """[start, start+length) を返す（範囲外はゼロ）"""
+        self._fill(start + length)
+        out = np.zeros((length, self.channels), dtype=np.float32)
+        lo = max(start, self.start)
+        hi = min(start + length, self.start + len(self.data))
+        if hi > lo:
+            out[lo - start:hi - start] = self.data[lo - self.start:hi - self.start]
+        return out
+
+    def discard_before(self, pos):
+        drop = min(max(pos - self.start, 0), len(self.data))
+        if drop:
+            self.data = self.data[drop:]
+            self.start += drop
+
+def render_time_warp(in_path, out_path, time_map, fmt=None, on_progress=None):
+    """
+    WSOLAでボーカルを時間マップに沿って伸縮し、out_path へ逐次書き出す
+    出力は伴奏の時間軸（inst_time）に揃う
+    on_progress(fraction) は書き出しブロックごとに呼ばれる
+    """
+    info = read_info(in_path)
+    sr = info['samplerate']
+    frame = int(FRAME_SECONDS * sr) // 2 * 2
+    hop = frame // 2
+    tol = int(TOLERANCE_SECONDS * sr)
+    # 50%オーバーラップで総和が1になる周期Hann窓
+    window = np.hanning(frame + 1)[:-1].astype(np.float32)[:, None]
+
+    t_grid, v_grid = build_warp(time_map, info['duration'])
+    # ボーカル末尾に到達する出力時刻で終了
+    out_duration = float(np.interp(info['duration'], v_grid, t_grid))
+    n_out = int(out_duration * sr)
+
+    source = _InputWindow(iter_blocks(in_path, int(READ_BLOCK_SECONDS * sr)))
+    ola = np.zeros((frame, source.channels), dtype=np.float32)
+    pending, pending_frames = [], 0
+    write_block = int(WRITE_BLOCK_SECONDS * sr)
+    prev_pos = None
+
+    with open_writer(out_path, sr, source.channels, fmt) as writer:
+        # k=-1 から始めて先頭のフェードイン区間を捨てる
+        for k in range(-1, n_out // hop + 2):
+            out_t = k * hop / sr
+            nominal = int(np.interp(out_t, t_grid, v_grid, left=v_grid[0] + out_t) * sr)
+            if prev_pos is None:
+                pos = nominal
+            else:
+                # 前フレームの自然な継続と最も相関の高い位置を探索範囲内から選ぶ
+                template = source.get(prev_pos + hop, frame).mean(axis=1)
+                region = source.get(nominal - tol, frame + 2 * tol).mean(axis=1)
+                corr = signal.correlate(region, template, mode='valid', method='fft')
+                pos = nominal - tol + int(np.argmax(corr))
+
+            ola += source.get(pos, frame) * window
+            if k >= 0:
+                pending.append(ola[:hop].copy())
+                pending_frames += hop
+            ola[:hop] = ola[hop:]
+            ola[hop:] = 0.0
+            source.discard_before(min(pos, nominal - tol))
+            prev_pos = pos
+
+            if pending_frames >= write_block:
+                block = np.concatenate(pending)
+                writer.write(block[:max(n_out - writer.frames, 0)])
+                pending, pending_frames = [], 0
+                if on_progress:
+                    on_progress(writer.frames / max(n_out, 1))
+
+        if pending:
+            block = np.concatenate(pending)
+            writer.write(block[:max(n_out - writer.frames, 0)])
+
+    return {
+        'output': out_path,
+        'input_duration': float(info['duration']),
+        'output_duration': float(n_out / sr),
+        'samplerate': sr,
+        'channels': source.channels
+    }
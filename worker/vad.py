@@ -0,0 +1,157 @@
+"""
+ボーカル区間検出（VAD）
+ストライドフレーミング + バッチrFFTでエネルギーとスペクトル重心を計算（特徴量は従来の検出と同じ定義）
+区間はフレーム特徴量を順に投入して確定したものから出力する
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from lazy_deps import lazy_import
+
+sp_fft = lazy_import('scipy.fft')
+signal = lazy_import('scipy.signal')
+
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
+# 1回のFFTで処理するフレーム数（一時メモリ上限）
+FRAMES_PER_BATCH = 256
+
+def frame_signal(y, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
+    """コピーなしのストライドフレーム化 (n_frames, frame_length)"""
+    if len(y) < frame_length:
+        return np.empty((0, frame_length), dtype=y.dtype)
+    return sliding_window_view(y, frame_length)[::hop_length]
+
+def frame_features(y, sr, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
+    """
+    フレームごとのエネルギーとスペクトル重心（従来の librosa ベースの検出と同じ定義）
+    エネルギー: フレーム先頭 i*hop からの窓なし二乗和
+    重心: i*hop を中心とするHann窓（周期）フレームの振幅スペクトル重心（先頭はゼロ詰め、librosa の center=True 相当）
+    両者を1つのストライド（前半分のゼロ詰め + frame_length * 1.5）から切り出す
+    """
+    pad = frame_length // 2
+    padded = np.concatenate((np.zeros(pad, dtype=np.float32), np.asarray(y, dtype=np.float32)))
+    spans = frame_signal(padded, frame_length + pad, hop_length)
+    n_frames = len(spans)
+    energy = np.empty(n_frames, dtype=np.float32)
+    centroid = np.empty(n_frames, dtype=np.float32)
+
+    window = signal.get_window('hann', frame_length).astype(np.float32)
+    freqs = np.fft.rfftfreq(frame_length, d=1.0 / sr).astype(np.float32)
+
+    for start in range(0, n_frames, FRAMES_PER_BATCH):
+        batch = spans[start:start + FRAMES_PER_BATCH]
+        tail = batch[:, pad:]
+        energy[start:start + len(batch)] = np.einsum('ij,ij->i', tail, tail)
+
+        mag = np.abs(sp_fft.rfft(batch[:, :frame_length] * window, axis=1))
+        centroid[start:start + len(batch)] = (mag @ freqs) / (mag.sum(axis=1) + 1e-9)
+
+    return energy, centroid
+
+def mask_to_runs(mask):
+    """真偽マスクの連続区間を (start, end) フレームインデックスで返す（end は排他）"""
+    padded = np.concatenate(([False], np.asarray(mask, dtype=bool), [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return edges[0::2], edges[1::2]
+
+class VoiceActivityDetector:
+    """
+    フレーム特徴量を順に投入するボーカル区間検出
+    energy_ref/centroid_ref（信号全体の最大値）を基準に正規化して閾値と比べる
+    """
+
+    def __init__(self, sr, energy_ref, centroid_ref, min_duration=0.2, energy_threshold=0.15, centroid_threshold=0.3,
+                 frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
+        self.sr = sr
+        self.min_duration = min_duration
+        self.energy_threshold = energy_threshold
+        self.centroid_threshold = centroid_threshold
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.energy_ref = energy_ref
+        self.centroid_ref = centroid_ref
+
+        self._frame_offset = 0      # 次に処理するフレーム番号
+        self._open_start = None     # 未確定区間の開始フレーム
+        self._last_frame = -1
+
+    def _frame_time(self, frame_index):
+        return frame_index * self.hop_length / self.sr
+
+    def _region(self, start_frame, end_frame):
+        start = self._frame_time(start_frame)
+        end = self._frame_time(end_frame)
+        if end - start < self.min_duration:
+            return None
+        return {'start': float(start), 'end': float(end), 'duration': float(end - start)}
+
+    def classify(self, energy, centroid):
+        """特徴量からボーカルマスクを生成"""
+        energy_norm = energy / (self.energy_ref + 1e-9)
+        centroid_norm = centroid / (self.centroid_ref + 1e-9)
+        return (energy_norm > self.energy_threshold) & (centroid_norm > self.centroid_threshold)
+
+    def feed_features(self, energy, centroid):
+        """フレーム特徴量を投入し、確定した区間を返す"""
+        mask = self.classify(energy, centroid)
+        base = self._frame_offset
+        self._frame_offset += len(mask)
+        if len(mask) == 0:
+            return []
+        self._last_frame = self._frame_offset - 1
+
+        starts, ends = mask_to_runs(mask)
+        starts = starts + base
+        ends = ends + base
+
+        regions = []
+        if len(starts) and starts[0] == base and self._open_start is not None:
+            starts[0] = self._open_start
+            self._open_start = None
+        elif self._open_start is not None:
+            # ブロック先頭が無音 → 持ち越し区間はここで終了
+            region = self._region(self._open_start, base)
+            if region:
+                regions.append(region)
+            self._open_start = None
+
+        if len(ends) and ends[-1] == self._frame_offset:
+            # ブロック末尾まで続く区間は次ブロックへ持ち越し
+            self._open_start = int(starts[-1])
+            starts, ends = starts[:-1], ends[:-1]
+
+        for s, e in zip(starts, ends):
+            region = self._region(s, e)
+            if region:
+                regions.append(region)
+        return regions
+
+    def flush(self):
+        """末尾の未確定区間を確定して返す"""
+        if self._open_start is None:
+            return []
+        region = self._region(self._open_start, self._last_frame)
+        self._open_start = None
+        return [region] if region else []
+
+def detect_vocal_regions(vocal, sr, min_duration=0.2):
+    """
+    メモリ上の信号に対するボーカル区間検出
+    全体の最大値で正規化（フレーム特徴量のみ保持するため省メモリ）
+    """
+    energy, centroid = frame_features(vocal, sr)
+    if len(energy) == 0:
+        return []
+    detector = VoiceActivityDetector(sr, float(energy.max()), float(centroid.max()), min_duration=min_duration)
+    return detector.feed_features(energy, centroid) + detector.flush()
+
+def region_spans(regions, sr, length):
+    """区間リストをサンプル範囲 [(start, end), ...] に変換（他ステージ向け）"""
+    spans = []
+    for region in regions or []:
+        start = max(0, int(region['start'] * sr))
+        end = min(length, int(region['end'] * sr))
+        if end > start:
+            spans.append((start, end))
+    return spans
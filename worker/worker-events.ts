@@ -0,0 +1,62 @@
+/**
+ * Pythonワーカーの --stream 出力（NDJSON: 1行1イベント）の解析
+ * progress / stage / resume / result / cancelled の各イベントを集約する
+ */
+
+export type WorkerEvent = {
+  event: 'progress' | 'stage' | 'resume' | 'result' | 'cancelled'
+  elapsed_s: number
+  stage?: string
+  fraction?: number
+  stages?: string[]
+  result?: any
+}
+
+export type WorkerOutput = {
+  events: WorkerEvent[]
+  // 完了したステージの結果（stage イベント順）
+  stages: Record<string, any>
+  // 正常終了時の最終結果
+  result?: any
+  // SIGTERM（タイムアウト）時の部分結果
+  partial?: any
+}
+
+export function parseWorkerEvents(stdout: string | undefined | null): WorkerOutput {
+  const output: WorkerOutput = { events: [], stages: {} }
+  if (!stdout) {
+    return output
+  }
+
+  for (const line of stdout.split('\n')) {
+    const trimmed = line.trim()
+    if (!trimmed.startsWith('{')) {
+      continue  // ライブラリのログ等は無視
+    }
+    let event: WorkerEvent
+    try {
+      event = JSON.parse(trimmed)
+    } catch {
+      continue  // 中断で途切れた最終行
+    }
+    if (!event || typeof event.event !== 'string') {
+      continue
+    }
+
+    output.events.push(event)
+    if (event.event === 'stage' && event.stage) {
+      output.stages[event.stage] = event.result
+    } else if (event.event === 'result') {
+      output.result = event.result
+    } else if (event.event === 'cancelled') {
+      output.partial = event.result
+    }
+  }
+
+  // cancelled が出力される前に強制終了された場合もステージ結果から部分結果を組み立てる
+  if (!output.result && !output.partial && Object.keys(output.stages).length > 0) {
+    output.partial = { ...output.stages, partial: true, completed_stages: Object.keys(output.stages) }
+  }
+
+  return output
+}
@@ -0,0 +1,132 @@
+"""
+ワーカーの集計メトリクス
+各スクリプトの実行ごとに、ステージ処理時間・入力長・実時間比・ピークメモリのヒストグラムと
+キャッシュ利用・実行結果のカウンタを、スクリプト/モード/プラン別にJSONファイルへ積算する
+累積値に加えて直近 WINDOW_SLOTS × WINDOW_SLOT_SECONDS のローリング集計を保持し、
+/api/metrics が Prometheus 形式に変換して公開する
+"""
+import fcntl
+import json
+import os
+import sys
+import tempfile
+import time
+
+METRICS_FILE_ENV = 'MIXAI_WORKER_METRICS_FILE'
+DEFAULT_METRICS_FILE = os.path.join(tempfile.gettempdir(), 'mixai-worker-metrics.json')
+METRICS_VERSION = 1
+
+# ローリング集計: 5分スロット × 12 = 直近1時間
+WINDOW_SLOT_SECONDS = 300
+WINDOW_SLOTS = 12
+
+# ヒストグラム名 → バケット上限（le）
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+HISTOGRAMS = {
+    'stage_seconds': LATENCY_BUCKETS,
+    'run_seconds': LATENCY_BUCKETS,
+    'input_seconds': (5, 15, 30, 60, 120, 240, 480, 900),
+    'realtime_factor': (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5),
+    'peak_memory_mb': (128, 256, 512, 768, 1024, 1536, 2048, 4096, 8192),
+}
+
+def metrics_path():
+    """出力先（環境変数が空文字・off なら記録しない）"""
+    path = os.environ.get(METRICS_FILE_ENV)
+    if path is None:
+        return DEFAULT_METRICS_FILE
+    if path.strip().lower() in ('', 'off', '0', 'false'):
+        return None
+    return path
+
+def _series(data, kind, name, labels):
+    key = name + json.dumps(labels, sort_keys=True, separators=(',', ':'))
+    series = data['series'].get(key)
+    if series is None:
+        series = {'type': kind, 'name': name, 'labels': labels, 'window': []}
+        if kind == 'histogram':
+            series.update(buckets=list(HISTOGRAMS[name]), counts=[0] * (len(HISTOGRAMS[name]) + 1), sum=0.0, count=0)
+        else:
+            series['value'] = 0.0
+        data['series'][key] = series
+    return series
+
+def _window_slot(series, slot):
+    """現在スロットの集計（古いスロットは破棄）"""
+    series['window'] = [w for w in series['window'] if w['slot'] > slot - WINDOW_SLOTS]
+    if not series['window'] or series['window'][-1]['slot'] != slot:
+        entry = {'slot': slot}
+        if series['type'] == 'histogram':
+            entry.update(counts=[0] * len(series['counts']), sum=0.0, count=0)
+        else:
+            entry['value'] = 0.0
+        series['window'].append(entry)
+    return series['window'][-1]
+
+def observe(data, name, labels, value, slot):
+    """ヒストグラムに1観測を追加（累積とローリングの両方）"""
+    series = _series(data, 'histogram', name, labels)
+    index = next((i for i, le in enumerate(series['buckets']) if value <= le), len(series['buckets']))
+    for target in (series, _window_slot(series, slot)):
+        target['counts'][index] += 1
+        target['sum'] += float(value)
+        target['count'] += 1
+
+def increment(data, name, labels, amount, slot):
+    series = _series(data, 'counter', name, labels)
+    series['value'] += amount
+    _window_slot(series, slot)['value'] += amount
+
+def _update(path, apply):
+    """ロックを取って読み込み → 更新 → アトミックに書き戻し（複数ワーカーの同時書き込み対策）"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        data = None
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except ValueError:
+                data = None  # 壊れたファイルは作り直す
+        if not data or data.get('version') != METRICS_VERSION:
+            data = {'version': METRICS_VERSION, 'window_slot_seconds': WINDOW_SLOT_SECONDS,
+                    'window_slots': WINDOW_SLOTS, 'series': {}}
+        apply(data)
+        data['updated_at'] = time.time()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+def record_run(script, mode, plan, timings, input_seconds=None, status='ok', cache=None, path=None):
+    """
+    1回の実行を記録
+    timings: StageTimer.report() / cache: {キャッシュ名: {'hit': n, 'miss': m}}
+    記録の失敗で処理自体を失敗させない
+    """
+    path = path or metrics_path()
+    if not path:
+        return
+    labels = {'script': script, 'mode': mode or '', 'plan': plan or ''}
+    slot = int(time.time() // WINDOW_SLOT_SECONDS)
+
+    def apply(data):
+        increment(data, 'runs_total', dict(labels, status=status), 1, slot)
+        for stage, record in timings.get('stages', {}).items():
+            observe(data, 'stage_seconds', dict(labels, stage=stage), record['wall_s'], slot)
+        observe(data, 'run_seconds', labels, timings['total_wall_s'], slot)
+        observe(data, 'peak_memory_mb', labels, timings['rss_peak_mb'], slot)
+        if input_seconds:
+            observe(data, 'input_seconds', labels, input_seconds, slot)
+            if status == 'ok':
+                observe(data, 'realtime_factor', labels, timings['total_wall_s'] / input_seconds, slot)
+        for name, counts in (cache or {}).items():
+            for result in ('hit', 'miss'):
+                if counts.get(result):
+                    increment(data, 'cache_total', dict(labels, cache=name, result=result), counts[result], slot)
+
+    try:
+        _update(path, apply)
+    except OSError as e:
+        print(f"Failed to record worker metrics: {e}", file=sys.stderr)
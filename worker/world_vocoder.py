@@ -0,0 +1,113 @@
+"""
+区間分割WORLD処理
+sp/ap（float64, 5ms毎 × fft_size/2+1）のメモリを区間長に比例させるため、
+無音付近の境界で分割して分析→加工→再合成し、短いクロスフェードで接続する
+"""
+import numpy as np
+
+from lazy_deps import optional_lazy_import
+
+pw = optional_lazy_import('pyworld')
+
+FRAME_PERIOD_MS = 5.0
+CROSSFADE_SECONDS = 0.02
+# 境界を探す範囲（名目境界 ± この秒数内で最もエネルギーの小さい点）
+BOUNDARY_SEARCH_SECONDS = 1.0
+
+def _quiet_boundary(x, sr, nominal, lo, hi):
+    """nominal 付近で10ms窓のエネルギーが最小になるサンプル位置"""
+    search = int(BOUNDARY_SEARCH_SECONDS * sr)
+    start = max(nominal - search, lo)
+    stop = min(nominal + search, hi)
+    win = max(int(0.01 * sr), 1)
+    if stop - start < 2 * win:
+        return nominal
+    seg = x[start:stop]
+    n = len(seg) // win
+    energy = np.sum(seg[:n * win].reshape(n, win) ** 2, axis=1)
+    return start + int(np.argmin(energy)) * win + win // 2
+
+def chunk_bounds(x, sr, chunk_seconds):
+    """区間境界（サンプル位置のリスト、先頭0・末尾len(x)を含む）"""
+    n = len(x)
+    if not chunk_seconds or n <= int(chunk_seconds * sr):
+        return [0, n]
+    hop = int(chunk_seconds * sr)
+    margin = int(CROSSFADE_SECONDS * sr) + 1
+    bounds = [0]
+    while n - bounds[-1] > hop:
+        nominal = bounds[-1] + hop
+        bounds.append(_quiet_boundary(x, sr, nominal, bounds[-1] + hop // 2, n - margin))
+    bounds.append(n)
+    return bounds
+
+def _chunks(x, sr, chunk_seconds):
+    """(区間番号, 先頭, 名目終端, クロスフェード込みの終端)"""
+    bounds = chunk_bounds(x, sr, chunk_seconds)
+    fade = int(CROSSFADE_SECONDS * sr)
+    for k in range(len(bounds) - 1):
+        start, end = bounds[k], bounds[k + 1]
+        # 次区間とのクロスフェード分だけ延長して処理
+        stop = min(end + fade, len(x)) if k < len(bounds) - 2 else end
+        yield k, start, end, stop
+
+def world_analyze(seg, sr, frame_period=FRAME_PERIOD_MS, f0=None):
+    """
+    WORLD分析（pw.wav2world と同じ DIO → StoneMask → CheapTrick → D4C）
+    f0 を渡せば基本周波数の推定を省く
+    """
+    if f0 is None:
+        f0, t = pw.dio(seg, sr, frame_period=frame_period)
+        f0 = pw.stonemask(seg, f0, t, sr)
+    else:
+        t = np.arange(len(f0)) * frame_period / 1000
+    sp = pw.cheaptrick(seg, f0, t, sr)
+    ap = pw.d4c(seg, f0, t, sr)
+    return f0, sp, ap
+
+def world_f0(x, sr, chunk_seconds=None, frame_period=FRAME_PERIOD_MS):
+    """
+    world_resynthesize と同じ区間分割での基本周波数（区間ごとのリスト）
+    保存しておき、同じ x・chunk_seconds の再合成に f0s として渡す
+    """
+    x = np.asarray(x, dtype=np.float64)
+    f0s = []
+    for _, start, _, stop in _chunks(x, sr, chunk_seconds):
+        seg = np.ascontiguousarray(x[start:stop])
+        f0, t = pw.dio(seg, sr, frame_period=frame_period)
+        f0s.append(pw.stonemask(seg, f0, t, sr))
+    return f0s
+
+def world_resynthesize(x, sr, modify, chunk_seconds=None, frame_period=FRAME_PERIOD_MS, on_progress=None, f0s=None):
+    """
+    WORLD分析 → modify(f0, sp, ap, first_frame) → 再合成
+    first_frame は区間先頭の全体フレーム番号（補正カーブの位置合わせ用）
+    chunk_seconds=None なら全体を一度に処理（従来動作）
+    on_progress(fraction) は区間ごとに呼ばれる
+    f0s: world_f0 で求めた区間ごとの基本周波数（区間数が合わなければ推定し直す）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    chunks = list(_chunks(x, sr, chunk_seconds))
+    if f0s is not None and len(f0s) != len(chunks):
+        f0s = None
+    fade = int(CROSSFADE_SECONDS * sr)
+    out = np.zeros(len(x))
+
+    for k, start, end, stop in chunks:
+        seg = np.ascontiguousarray(x[start:stop])
+        f0, sp, ap = world_analyze(seg, sr, frame_period, f0s[k] if f0s is not None else None)
+        first_frame = int(round(start / sr * 1000 / frame_period))
+        f0, sp, ap = modify(f0, sp, ap, first_frame)
+        y = pw.synthesize(f0, sp, ap, sr, frame_period=frame_period)[:stop - start]
+        del sp, ap
+
+        gain = np.ones(len(y))
+        if k > 0:
+            gain[:fade] = np.linspace(0.0, 1.0, fade)[:len(gain)]
+        if stop > end:
+            gain[end - start:] = np.linspace(1.0, 0.0, stop - end)
+        out[start:start + len(y)] += y * gain
+        if on_progress:
+            on_progress(end / len(x))
+
+    return out